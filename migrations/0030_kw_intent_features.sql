@@ -0,0 +1,19 @@
+-- Per-keyword intent feature vectors (serp_adapter.intent_features).
+-- Re-weighting the intent buckets scores these rows instead of re-running
+-- keyword matching and SERP archetype counting for every keyword.
+CREATE TABLE IF NOT EXISTS kw_intent_features (
+  kw_id TEXT PRIMARY KEY,
+  inputs_hash TEXT NOT NULL,          -- sha256 of kw + cpc + serp_top_domains + brand-term version
+  has_hire INTEGER NOT NULL DEFAULT 0,
+  has_diy INTEGER NOT NULL DEFAULT 0,
+  has_local INTEGER NOT NULL DEFAULT 0,
+  has_comparison INTEGER NOT NULL DEFAULT 0,
+  has_brand INTEGER NOT NULL DEFAULT 0,
+  cpc_norm REAL NOT NULL,             -- 0..1
+  directory_ratio REAL NOT NULL,      -- 0..1
+  local_service_ratio REAL NOT NULL,  -- 0..1
+  publisher_ratio REAL NOT NULL,      -- 0..1
+  cpc REAL,
+  archetypes_json TEXT NOT NULL,      -- archetype counts, for explanations
+  updated_at INTEGER NOT NULL
+);
@@ -0,0 +1,14 @@
+-- Incremental kw_intent backfill (scripts/backfill_kw_intent.py).
+-- inputs_hash = sha256 of kw + cpc + serp_top_domains + brand-term version;
+-- rows whose hash is unchanged are skipped on the next run.
+ALTER TABLE kw_intent ADD COLUMN inputs_hash TEXT;
+
+-- Resumable cursors for long-running keyset-paginated backfills.
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+  job_id TEXT PRIMARY KEY,
+  cursor TEXT NOT NULL,               -- last fully written key
+  rows_scanned INTEGER NOT NULL DEFAULT 0,
+  rows_written INTEGER NOT NULL DEFAULT 0,
+  started_at INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL
+);
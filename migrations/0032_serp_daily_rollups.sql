@@ -0,0 +1,32 @@
+-- Daily SERP rollups (serp_adapter.rollups), maintained as runs are written.
+-- The daily graph and domain-average reads become index range scans instead
+-- of a ROW_NUMBER() window over every serp_runs row of a phrase.
+
+-- Winning (latest ok) run per serp_key, i.e. per keyword/region/device/day.
+CREATE TABLE IF NOT EXISTS serp_daily_latest (
+  serp_key TEXT PRIMARY KEY,
+  keyword_norm TEXT NOT NULL,
+  region_key TEXT NOT NULL,
+  device_key TEXT NOT NULL,
+  day TEXT NOT NULL,                  -- YYYY-MM-DD (UTC)
+  serp_id TEXT NOT NULL,
+  created_at INTEGER NOT NULL         -- ms, of the winning run
+);
+
+CREATE INDEX IF NOT EXISTS idx_serp_daily_latest_series_day
+  ON serp_daily_latest (keyword_norm, region_key, device_key, day);
+
+-- Best rank per root domain in each day's winning run.
+CREATE TABLE IF NOT EXISTS serp_daily_domain_best (
+  keyword_norm TEXT NOT NULL,
+  region_key TEXT NOT NULL,
+  device_key TEXT NOT NULL,
+  day TEXT NOT NULL,
+  root_domain TEXT NOT NULL,
+  best_rank INTEGER NOT NULL,
+  serp_id TEXT NOT NULL,
+  PRIMARY KEY (keyword_norm, region_key, device_key, day, root_domain)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_serp_daily_domain_best_domain_day
+  ON serp_daily_domain_best (root_domain, day);
@@ -0,0 +1,21 @@
+-- Compressed rank history (serp_adapter.rank_series): one row per
+-- keyword/region/device series and root domain instead of one serp_results
+-- row per day.  Appended to as runs are written.
+
+CREATE TABLE IF NOT EXISTS serp_rank_series (
+  keyword_norm TEXT NOT NULL,
+  region_key TEXT NOT NULL,
+  device_key TEXT NOT NULL,
+  root_domain TEXT NOT NULL,
+  first_day INTEGER NOT NULL,         -- days since 1970-01-01 (UTC)
+  last_day INTEGER NOT NULL,
+  last_rank INTEGER NOT NULL,         -- 0: fetched, not in the results
+  last_run_at INTEGER NOT NULL,       -- ms, of the run behind the last point
+  tail INTEGER NOT NULL,              -- byte offset of the last point
+  n_points INTEGER NOT NULL,
+  points BLOB NOT NULL,               -- varint (day delta, rank) pairs
+  PRIMARY KEY (keyword_norm, region_key, device_key, root_domain)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_serp_rank_series_domain
+  ON serp_rank_series (root_domain, keyword_norm);
@@ -0,0 +1,24 @@
+-- Cold SERP history (serp_adapter.archive).  scripts/compact_serp_archive.py
+-- moves old serp_results / step2_serp_results rows into one block per
+-- series and month: a keyframe snapshot followed by per-snapshot edit
+-- scripts (entered, dropped, moved).
+
+CREATE TABLE IF NOT EXISTS serp_archive_blocks (
+  source TEXT NOT NULL,               -- serp_results | step2_serp_results
+  series_key TEXT NOT NULL,           -- keyword_norm|region_key|device_key, or site_id|keyword|geo
+  period TEXT NOT NULL,               -- YYYY-MM (UTC)
+  n_snapshots INTEGER NOT NULL,
+  n_rows INTEGER NOT NULL,            -- result rows the block replaces
+  data BLOB NOT NULL,                 -- zlib-compressed JSON
+  updated_at INTEGER NOT NULL,
+  PRIMARY KEY (source, series_key, period)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS serp_archive_snapshots (
+  source TEXT NOT NULL,
+  serp_id TEXT NOT NULL,
+  series_key TEXT NOT NULL,
+  period TEXT NOT NULL,
+  created_at INTEGER NOT NULL,        -- ms
+  PRIMARY KEY (source, serp_id)
+) WITHOUT ROWID;
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""Incrementally (re)fill kw_intent from keywords + kw_metrics.
+
+Keywords are read in kw_id order with keyset pagination.  Each row's inputs
+(kw, cpc, serp_top_domains_json, brand-term set version) are hashed and
+compared with kw_intent.inputs_hash; only new or changed rows are scored.
+Scoring runs on a process pool, and every chunk is written with one
+executemany + checkpoint update per transaction, so an interrupted run
+resumes after the last written chunk.
+
+Usage:
+  python -m scripts.backfill_kw_intent --db ./local.sqlite
+  python -m scripts.backfill_kw_intent --db ./local.sqlite --brand-terms-file brands.txt --workers 8
+  python -m scripts.backfill_kw_intent --db ./local.sqlite --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, List, Optional, Sequence, Tuple
+
+from serp_adapter.infer_intent import compile_intent_matcher, infer_intent
+from serp_adapter.intent_features import brand_terms_version, intent_inputs_hash
+from serp_adapter.matcher import MultiPatternMatcher
+from serp_adapter.models import KeywordUniverseRow
+
+JOB_ID = "kw_intent"
+
+_IntentRow = Tuple[str, str, float, str, str, int, str]  # kw_intent column order
+
+
+@dataclass
+class BackfillResult:
+    scanned: int = 0
+    unchanged: int = 0
+    inserted_or_updated: int = 0
+    chunks: int = 0
+    resumed_from: Optional[str] = None
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "scanned": self.scanned,
+            "unchanged": self.unchanged,
+            "inserted_or_updated": self.inserted_or_updated,
+            "chunks": self.chunks,
+            "resumed_from": self.resumed_from,
+        }
+
+
+def _domains(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return []
+    try:
+        loaded = json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(loaded, list):
+        return []
+    return [str(d) for d in loaded if isinstance(d, str) and d]
+
+
+def _fetch_page(
+    conn: sqlite3.Connection, after: str, size: int
+) -> List[Tuple[str, KeywordUniverseRow, Optional[str]]]:
+    records = conn.execute(
+        """
+        SELECT
+          k.kw_id,
+          COALESCE(k.kw, k.phrase) AS kw,
+          COALESCE(k.geo_bucket, '') AS geo_bucket,
+          k.serp_top_domains_json,
+          COALESCE(m.cpc, m.avg_cpc_micros / 1000000.0) AS cpc,
+          COALESCE(m.volume, m.monthly_volume) AS volume,
+          m.difficulty,
+          i.inputs_hash
+        FROM keywords k
+        LEFT JOIN kw_metrics m ON m.kw_id = k.kw_id
+        LEFT JOIN kw_intent i ON i.kw_id = k.kw_id
+        WHERE k.kw_id > ?
+        ORDER BY k.kw_id
+        LIMIT ?
+        """,
+        (after, size),
+    ).fetchall()
+    return [
+        (
+            kw_id,
+            KeywordUniverseRow(
+                kw=kw or "",
+                geo_bucket=geo_bucket,
+                volume=volume,
+                cpc=cpc,
+                difficulty=difficulty,
+                serp_top_domains=_domains(domains_json),
+            ),
+            stored_hash,
+        )
+        for kw_id, kw, geo_bucket, domains_json, cpc, volume, difficulty, stored_hash in records
+    ]
+
+
+_worker_matcher: Optional[MultiPatternMatcher] = None
+
+
+def _init_worker(brand_terms: Tuple[str, ...]) -> None:
+    """Pool initializer: compile the brand dictionary once per process."""
+    global _worker_matcher
+    _worker_matcher = compile_intent_matcher(brand_terms)
+
+
+def _score_chunk(
+    work: Sequence[Tuple[str, KeywordUniverseRow, str]],
+    now_epoch: int,
+    matcher: Optional[MultiPatternMatcher] = None,
+) -> List[_IntentRow]:
+    """Worker entry point: score changed rows into kw_intent parameters.
+
+    *matcher* defaults to the one :func:`_init_worker` compiled.
+    """
+    matcher = matcher or _worker_matcher
+    out: List[_IntentRow] = []
+    for kw_id, row, inputs_hash in work:
+        intent = infer_intent(row, brand_terms=matcher)
+        out.append(
+            (
+                kw_id,
+                intent.intent_bucket,
+                intent.confidence,
+                json.dumps(intent.scores, sort_keys=True),
+                intent.explanation,
+                now_epoch,
+                inputs_hash,
+            )
+        )
+    return out
+
+
+def _write_chunk(
+    conn: sqlite3.Connection,
+    params: List[_IntentRow],
+    cursor: str,
+    scanned: int,
+    now_epoch: int,
+) -> None:
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO kw_intent
+              (kw_id, intent_bucket, confidence, scores_json, explanation, updated_at, inputs_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(kw_id) DO UPDATE SET
+              intent_bucket = excluded.intent_bucket,
+              confidence = excluded.confidence,
+              scores_json = excluded.scores_json,
+              explanation = excluded.explanation,
+              updated_at = excluded.updated_at,
+              inputs_hash = excluded.inputs_hash
+            """,
+            params,
+        )
+        conn.execute(
+            """
+            INSERT INTO backfill_checkpoints
+              (job_id, cursor, rows_scanned, rows_written, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+              cursor = excluded.cursor,
+              rows_scanned = backfill_checkpoints.rows_scanned + excluded.rows_scanned,
+              rows_written = backfill_checkpoints.rows_written + excluded.rows_written,
+              updated_at = excluded.updated_at
+            """,
+            (JOB_ID, cursor, scanned, len(params), now_epoch, now_epoch),
+        )
+
+
+def backfill_kw_intent(
+    conn: sqlite3.Connection,
+    *,
+    brand_terms: Sequence[str] = (),
+    brand_version: Optional[str] = None,
+    chunk_size: int = 1000,
+    workers: Optional[int] = 1,
+    limit: Optional[int] = None,
+    resume: bool = True,
+    dry_run: bool = False,
+) -> BackfillResult:
+    """Score new/changed keywords into kw_intent.
+
+    ``workers=None`` uses ``os.cpu_count()``; ``workers=1`` scores in this
+    process.  ``limit`` stops after roughly that many scanned rows (whole
+    chunks), leaving the checkpoint for the next run.  A run that reaches
+    the end of ``keywords`` clears its checkpoint.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    brand_terms = tuple(brand_terms)
+    if brand_version is None:
+        brand_version = brand_terms_version(brand_terms)
+    workers = workers or os.cpu_count() or 1
+    now_epoch = int(datetime.now(tz=timezone.utc).timestamp())
+
+    result = BackfillResult()
+    cursor = ""
+    if resume:
+        found = conn.execute(
+            "SELECT cursor FROM backfill_checkpoints WHERE job_id = ?", (JOB_ID,)
+        ).fetchone()
+        if found:
+            cursor = result.resumed_from = found[0]
+
+    # (cursor after chunk, rows scanned, worker future, rows already scored inline)
+    pending: Deque[Tuple[str, int, Optional[Future], List[_IntentRow]]] = deque()
+
+    def _drain_one() -> None:
+        chunk_cursor, scanned, future, params = pending.popleft()
+        if future is not None:
+            params = future.result()
+        if not dry_run:
+            _write_chunk(conn, params, chunk_cursor, scanned, now_epoch)
+        result.inserted_or_updated += len(params)
+        result.chunks += 1
+
+    # Workers get the brand terms once, not pickled with every chunk.
+    pool = (
+        ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(brand_terms,))
+        if workers > 1
+        else None
+    )
+    matcher = compile_intent_matcher(brand_terms) if pool is None else None
+    reached_end = False
+    try:
+        while limit is None or result.scanned < limit:
+            page = _fetch_page(conn, cursor, chunk_size)
+            if not page:
+                reached_end = True
+                break
+            cursor = page[-1][0]
+            result.scanned += len(page)
+            work = []
+            for kw_id, row, stored_hash in page:
+                inputs_hash = intent_inputs_hash(row, brand_version)
+                if inputs_hash == stored_hash:
+                    result.unchanged += 1
+                else:
+                    work.append((kw_id, row, inputs_hash))
+
+            if pool is not None and work:
+                future = pool.submit(_score_chunk, work, now_epoch)
+                pending.append((cursor, len(page), future, []))
+            else:
+                params = _score_chunk(work, now_epoch, matcher) if work else []
+                pending.append((cursor, len(page), None, params))
+            while len(pending) > 2 * workers or (pool is None and pending):
+                _drain_one()
+        while pending:
+            _drain_one()
+    finally:
+        for _cursor, _scanned, future, _params in pending:
+            if future is not None:
+                future.cancel()
+        if pool is not None:
+            pool.shutdown()
+
+    if reached_end and not dry_run:
+        with conn:
+            conn.execute("DELETE FROM backfill_checkpoints WHERE job_id = ?", (JOB_ID,))
+    return result
+
+
+def _validate_required_tables(conn: sqlite3.Connection) -> None:
+    needed = {"keywords", "kw_metrics", "kw_intent", "backfill_checkpoints"}
+    found = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        ).fetchall()
+    }
+    missing = sorted(needed - found)
+    if missing:
+        raise RuntimeError(f"Missing required table(s): {', '.join(missing)}")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(kw_intent)")}
+    if "inputs_hash" not in columns:
+        raise RuntimeError("kw_intent.inputs_hash missing; apply migration 0031")
+
+
+def _read_brand_terms(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip() and not line.startswith("#")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Incrementally backfill kw_intent.")
+    parser.add_argument("--db", required=True, help="SQLite DB path (e.g., local D1 export).")
+    parser.add_argument("--brand-terms-file", default=None, help="One brand term per line.")
+    parser.add_argument(
+        "--brand-version",
+        default=None,
+        help="Brand-term set version for change detection (default: hash of the terms).",
+    )
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Keywords per page/transaction.")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: CPU count).")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after about this many keywords.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint.")
+    parser.add_argument("--dry-run", action="store_true", help="Do not write changes.")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        _validate_required_tables(conn)
+        result = backfill_kw_intent(
+            conn,
+            brand_terms=_read_brand_terms(args.brand_terms_file),
+            brand_version=args.brand_version,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            limit=args.limit,
+            resume=not args.restart,
+            dry_run=args.dry_run,
+        )
+        print(json.dumps({"ok": True, **result.to_dict(), "dry_run": args.dry_run}, indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Replay the adaptive refresh policy over daily SERP history.
+
+Reports fetches saved against daily refreshes and how many days late
+material SERP changes are noticed.  History comes from a local copy of the
+D1 database (``--db``), or is generated: a mix of stable, moderate and
+volatile keywords with daily reshuffles and occasional shake-ups.
+
+Usage:
+  python -m scripts.bench_adaptive_refresh
+  python -m scripts.bench_adaptive_refresh --db d1-export.sqlite --days 90
+  python -m scripts.bench_adaptive_refresh --max-days 7 --change-threshold 0.85
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import time
+from typing import Dict, List
+
+from serp_adapter.refresh import RefreshPolicy, SeriesKey, Snapshot, load_serp_history, replay_refresh
+
+# (share of keywords, daily probability of a shake-up)
+_MIX = ((0.6, 0.01), (0.3, 0.08), (0.1, 0.5))
+
+
+def _synthetic_history(series: int, days: int, seed: int) -> Dict[SeriesKey, List[Snapshot]]:
+    rng = random.Random(seed)
+    history: Dict[SeriesKey, List[Snapshot]] = {}
+    fresh = iter(range(10**9))
+    for i in range(series):
+        roll, cumulative, shake = rng.random(), 0.0, _MIX[-1][1]
+        for share, probability in _MIX:
+            cumulative += share
+            if roll < cumulative:
+                shake = probability
+                break
+        urls = [f"u{next(fresh)}" for _ in range(20)]
+        snapshots: List[Snapshot] = []
+        for day in range(days):
+            urls = list(urls)
+            if rng.random() < 0.3:
+                # Everyday noise: neighbours in the bottom half swap.
+                j = rng.randrange(10, 19)
+                urls[j], urls[j + 1] = urls[j + 1], urls[j]
+            if rng.random() < shake:
+                # Shake-up: new pages enter the top 5, others fall out.
+                for _ in range(rng.randint(2, 4)):
+                    urls.insert(rng.randrange(0, 5), f"u{next(fresh)}")
+                    urls.pop()
+            snapshots.append((day, urls))
+        history[(f"kw {i}", "US-en", "desktop")] = snapshots
+    return history
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="SQLite copy of the D1 database (default: synthetic history)")
+    parser.add_argument("--days", type=int, default=90, help="Days of history to replay")
+    parser.add_argument("--series", type=int, default=5000, help="Synthetic keywords")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--min-days", type=int, default=1)
+    parser.add_argument("--max-days", type=int, default=14)
+    parser.add_argument("--change-threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    if args.db:
+        conn = sqlite3.connect(args.db)
+        until = int(time.time())
+        history = load_serp_history(conn, since_ts=until - args.days * 86400, until_ts=until)
+        conn.close()
+    else:
+        history = _synthetic_history(args.series, args.days, args.seed)
+
+    policy = RefreshPolicy(
+        min_days=args.min_days,
+        max_days=args.max_days,
+        change_threshold=args.change_threshold,
+    )
+    started = time.perf_counter()
+    result = replay_refresh(history, policy)
+    elapsed = time.perf_counter() - started
+    print(
+        json.dumps(
+            {
+                "source": args.db or "synthetic",
+                **result.to_dict(),
+                "policy": {
+                    "min_days": policy.min_days,
+                    "max_days": policy.max_days,
+                    "change_threshold": policy.change_threshold,
+                },
+                "replay_seconds": round(elapsed, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Keyword throughput of the compiled intent matcher vs per-term scans.
+
+Usage:
+  python -m scripts.bench_modifier_matcher
+  python -m scripts.bench_modifier_matcher --brands 10,1000,100000 --keywords 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Iterable, List
+
+from serp_adapter.infer_intent import (
+    COMPARISON_MODIFIERS,
+    DIY_MODIFIERS,
+    HIRE_MODIFIERS,
+    LOCAL_MODIFIERS,
+    compile_intent_matcher,
+)
+
+
+def _scan(text: str, terms: Iterable[str]) -> bool:
+    lowered = text.lower()
+    return any(term in lowered for term in terms)
+
+
+def _brands(n: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return [
+        "".join(rng.choice(letters) for _ in range(rng.randint(5, 12))) + " plumbing"
+        for _ in range(n)
+    ]
+
+
+def _keywords(n: int, brands: List[str], rng: random.Random) -> List[str]:
+    stems = ["water heater repair", "drain cleaning", "plumber", "sump pump install"]
+    tails = ["near me", "san jose", "cost", "reviews", "how to fix", "24/7 emergency"]
+    out = []
+    for i in range(n):
+        kw = f"{rng.choice(stems)} {rng.choice(tails)}"
+        if i % 10 == 0:
+            kw = f"{rng.choice(brands)} {kw}"
+        out.append(kw)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--brands", default="10,1000,100000")
+    parser.add_argument("--keywords", type=int, default=5000)
+    parser.add_argument("--scan-keywords", type=int, default=200, help="Keywords for the slow per-term baseline.")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    report = []
+    for n in [int(v) for v in args.brands.split(",")]:
+        brands = _brands(n, rng)
+        keywords = _keywords(args.keywords, brands, rng)
+
+        started = time.perf_counter()
+        matcher = compile_intent_matcher(brands)
+        compile_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for kw in keywords:
+            matcher.match_flags(kw)
+        matcher_rate = len(keywords) / (time.perf_counter() - started)
+
+        sample = keywords[: args.scan_keywords]
+        started = time.perf_counter()
+        for kw in sample:
+            for terms in (HIRE_MODIFIERS, DIY_MODIFIERS, LOCAL_MODIFIERS, COMPARISON_MODIFIERS, brands):
+                _scan(kw, terms)
+        scan_rate = len(sample) / (time.perf_counter() - started)
+
+        report.append(
+            {
+                "brand_terms": n,
+                "compile_seconds": round(compile_s, 3),
+                "matcher_keywords_per_sec": round(matcher_rate),
+                "per_term_scan_keywords_per_sec": round(scan_rate),
+                "speedup": round(matcher_rate / scan_rate, 1),
+            }
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
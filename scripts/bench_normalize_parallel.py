@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Measure normalize_parallel throughput at increasing worker counts.
+
+Usage:
+  python -m scripts.bench_normalize_parallel
+  python -m scripts.bench_normalize_parallel --items 200000 --workers 1,2,4,8,16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from serp_adapter.parallel import normalize_parallel
+
+
+def _make_items(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "searchQuery": {"term": f"plumber keyword {i % 5000}", "countryCode": "US", "city": "San Jose"},
+            "device": "MOBILE",
+            "crawledAt": "2025-04-24T09:00:00.000Z",
+            "#runId": f"run-{i}",
+            "organicResults": [
+                {
+                    "position": r + 1,
+                    "title": f"Plumbing result {r}",
+                    "url": f"https://www.site{(i + r) % 700}.com/plumbing/{r}",
+                    "description": "Licensed local plumbers available 24/7.",
+                }
+                for r in range(20)
+            ],
+        }
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    items = _make_items(args.items)
+    report = []
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        started = time.perf_counter()
+        count = sum(1 for _ in normalize_parallel(items, workers=workers, chunk_size=args.chunk_size))
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed
+        baseline = baseline or rate
+        report.append(
+            {"workers": workers, "items_per_sec": round(rate), "speedup": round(rate / baseline, 2)}
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
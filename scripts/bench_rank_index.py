@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Compare "where does this domain rank" lookups: raw tables vs DomainRankIndex.
+
+Builds a local SQLite copy of the D1 SERP schema holding
+``keywords * days`` runs of ``--results`` rows each (default 2000 * 250 *
+20 = 10M ``serp_results`` rows), with a tenth of the results on a ``blog.``
+subdomain.  It then times:
+
+* building :class:`serp_adapter.rank_index.DomainRankIndex` from the tables;
+* saving it and loading it back through ``mmap``;
+* the per-root best-rank-per-series query on ``serp_results`` (via
+  ``idx_serp_results_root_domain``) against ``visibility()`` and
+  ``postings()`` on the index;
+* ``SerpStore.write`` batches with the index as a write hook.
+
+Usage:
+  python -m scripts.bench_rank_index
+  python -m scripts.bench_rank_index --keywords 200 --days 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from scripts.bench_serp_rollups import DAY0, MIGRATIONS, SCHEMA, _phrase, _serps
+from serp_adapter.keys import serp_day, serp_key
+from serp_adapter.rank_index import DomainRankIndex
+from serp_adapter.store import SerpStore
+
+DOMAINS = 5000
+
+LEGACY_VISIBILITY = """
+SELECT s.keyword_norm, s.region_key, s.device_key, MIN(r.rank), MAX(s.created_at), COUNT(DISTINCT s.created_at / 86400000)
+FROM serp_results r JOIN serp_runs s ON s.serp_id = r.serp_id
+WHERE r.root_domain = ? AND s.status = 'ok'
+GROUP BY s.keyword_norm, s.region_key, s.device_key
+"""
+
+
+def _seed(conn: sqlite3.Connection, keywords: int, days: int, results: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO serp_runs (serp_id, user_id, phrase, region_json, device, engine, provider, actor, status,
+                                   created_at, keyword_norm, region_key, device_key, serp_key)
+            VALUES (?, 'bench', ?, '{"country":"US"}', 'desktop', 'google', 'apify', 'apify/google-search-scraper',
+                    'ok', ?, ?, 'US-en', 'desktop', ?)
+            """,
+            (
+                (f"serp_{day}_{k}", _phrase(k), (DAY0 + day * 86400 + k) * 1000, _phrase(k),
+                 serp_key(_phrase(k), "US-en", "desktop", serp_day(DAY0 + day * 86400)))
+                for day in range(days)
+                for k in range(keywords)
+            ),
+        )
+
+        def rows():
+            for day in range(days):
+                for k in range(keywords):
+                    for rank in range(1, results + 1):
+                        root = f"site{rng.randrange(DOMAINS)}.com"
+                        host = f"blog.{root}" if rng.random() < 0.1 else root
+                        yield (f"serp_{day}_{k}", rank, f"https://{host}/p{rank}", host, root, f"Title {rank}")
+
+        conn.executemany(
+            "INSERT INTO serp_results (serp_id, rank, url, domain, root_domain, title) VALUES (?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=5, help="Domains timed per read path")
+    parser.add_argument("--batch-size", type=int, default=500, help="SERPs per timed write() call")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report: dict = {"serp_results": args.keywords * args.days * args.results}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "serp.sqlite")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-262144")
+        for name in SCHEMA:
+            conn.executescript((MIGRATIONS / name).read_text())
+        started = time.perf_counter()
+        _seed(conn, args.keywords, args.days, args.results, args.seed)
+        report["seed_seconds"] = round(time.perf_counter() - started, 1)
+
+        started = time.perf_counter()
+        index = DomainRankIndex.build(conn)
+        report["build_seconds"] = round(time.perf_counter() - started, 1)
+        report["postings"] = len(index)
+
+        path = Path(tmp) / "rank.idx"
+        started = time.perf_counter()
+        index.save(path)
+        report["save_seconds"] = round(time.perf_counter() - started, 2)
+        report["file_mb"] = round(path.stat().st_size / 1e6, 1)
+        started = time.perf_counter()
+        mapped = DomainRankIndex.load(path)
+        report["mmap_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        roots = [f"site{rng.randrange(DOMAINS)}.com" for _ in range(args.queries)]
+        for root in roots:
+            legacy = {row[:4] for row in conn.execute(LEGACY_VISIBILITY, (root,))}
+            indexed = {(v.keyword_norm, v.region_key, v.device_key, v.best_rank) for v in mapped.visibility(root)}
+            assert legacy == indexed, root
+        report["postings_per_root"] = statistics.median(len(mapped.postings(root)) for root in roots)
+        report["lookup_ms"] = {
+            "raw_tables": round(
+                statistics.median(_time_ms(lambda r=r: conn.execute(LEGACY_VISIBILITY, (r,)).fetchall(), 1) for r in roots), 2
+            ),
+            "visibility": round(statistics.median(_time_ms(lambda r=r: mapped.visibility(r), 3) for r in roots), 2),
+            "postings": round(statistics.median(_time_ms(lambda r=r: mapped.postings(r), 3) for r in roots), 2),
+            "hosts": round(statistics.median(_time_ms(lambda r=r: mapped.hosts(r), 3) for r in roots), 4),
+        }
+
+        next_day = DAY0 + args.days * 86400
+        plain, hooked = SerpStore(conn), SerpStore(conn, write_hooks=[index])
+        batch = _serps(args.batch_size, next_day, args.results)
+        report["write_batch_ms"] = {
+            "without_index": round(_time_ms(lambda: plain.write(batch, "bench"), 3), 1),
+            "with_index": round(_time_ms(lambda: hooked.write(batch, "bench"), 3), 1),
+        }
+        started = time.perf_counter()
+        index.compact()
+        report["compact_seconds"] = round(time.perf_counter() - started, 2)
+        conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Compare rank-history storage and reads: raw SERP tables vs serp_rank_series.
+
+Builds a local SQLite copy of the D1 SERP schema holding ``keywords *
+days`` runs of ``--results`` rows each (default 1000 * 365 * 20 = 7.3M
+``serp_results`` rows).  Each keyword's SERP drifts realistically: most
+days a couple of positions swap and occasionally a domain from a wider
+candidate pool enters.  It then reports:
+
+* bytes on disk (``dbstat``) of ``serp_runs`` + ``serp_results`` with their
+  indexes against ``serp_rank_series`` with its index;
+* a 365-day rank chart for one domain on one keyword from a window query
+  over the raw tables against :func:`serp_adapter.rank_series.rank_history`,
+  plus weekly downsampling;
+* ``SerpStore.write`` batches with and without the :class:`RankSeries` hook.
+
+Usage:
+  python -m scripts.bench_rank_series
+  python -m scripts.bench_rank_series --keywords 100 --days 120
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+from scripts.bench_serp_rollups import DAY0, MIGRATIONS, SCHEMA, _phrase, _serps
+from serp_adapter.keys import serp_day, serp_key
+from serp_adapter.rank_series import RankSeries, rank_history, weekly_ranks
+from serp_adapter.store import SerpStore
+
+LEGACY_HISTORY = """
+WITH runs AS (
+  SELECT serp_id, date(created_at / 1000, 'unixepoch') AS day,
+         ROW_NUMBER() OVER (PARTITION BY serp_key ORDER BY created_at DESC, serp_id DESC) AS rn
+  FROM serp_runs
+  WHERE keyword_norm = ? AND region_key = 'US-en' AND device_key = 'desktop' AND status = 'ok'
+)
+SELECT runs.day, MIN(r.rank)
+FROM runs JOIN serp_results r ON r.serp_id = runs.serp_id
+WHERE runs.rn = 1 AND COALESCE(NULLIF(r.root_domain, ''), r.domain) = ?
+GROUP BY runs.day
+ORDER BY runs.day
+"""
+
+
+def _drifting_serps(keywords: int, days: int, results: int, seed: int) -> Iterator[tuple]:
+    """Yield ``(day, keyword, [domains...])`` with a few changes per day."""
+    rng = random.Random(seed)
+    current: Dict[int, List[str]] = {
+        k: [f"site{rng.randrange(20000)}.com" for _ in range(results)] for k in range(keywords)
+    }
+    for day in range(days):
+        for k in range(keywords):
+            serp = current[k]
+            for _ in range(rng.choice((0, 1, 1, 2, 3))):
+                i, j = rng.randrange(results), rng.randrange(results)
+                serp[i], serp[j] = serp[j], serp[i]
+            if rng.random() < 0.3:
+                serp[rng.randrange(results // 2, results)] = f"site{rng.randrange(20000)}.com"
+            yield day, k, list(serp)
+
+
+def _seed(conn: sqlite3.Connection, keywords: int, days: int, results: int, seed: int) -> None:
+    serps = list(_drifting_serps(keywords, days, results, seed))
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO serp_runs (serp_id, user_id, phrase, region_json, device, engine, provider, actor, status,
+                                   created_at, keyword_norm, region_key, device_key, serp_key)
+            VALUES (?, 'bench', ?, '{"country":"US"}', 'desktop', 'google', 'apify', 'apify/google-search-scraper',
+                    'ok', ?, ?, 'US-en', 'desktop', ?)
+            """,
+            (
+                (f"serp_{day}_{k}", _phrase(k), (DAY0 + day * 86400 + k) * 1000, _phrase(k),
+                 serp_key(_phrase(k), "US-en", "desktop", serp_day(DAY0 + day * 86400)))
+                for day, k, _domains in serps
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO serp_results (serp_id, rank, url, domain, root_domain, title) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                (f"serp_{day}_{k}", rank, f"https://{domain}/p{rank}", domain, domain, f"Title {rank}")
+                for day, k, domains in serps
+                for rank, domain in enumerate(domains, start=1)
+            ),
+        )
+
+
+def _table_bytes(conn: sqlite3.Connection, tables: List[str]) -> int:
+    marks = ",".join("?" * len(tables))
+    return conn.execute(
+        f"""
+        SELECT COALESCE(SUM(d.pgsize), 0) FROM dbstat d
+        JOIN sqlite_master m ON m.name = d.name
+        WHERE m.tbl_name IN ({marks})
+        """,
+        tables,
+    ).fetchone()[0]
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=5, help="Keyword/domain charts timed")
+    parser.add_argument("--batch-size", type=int, default=500, help="SERPs per timed write() call")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report: dict = {"serp_results": args.keywords * args.days * args.results}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "serp.sqlite")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-262144")
+        for name in (*SCHEMA, "0033_serp_rank_series.sql"):
+            conn.executescript((MIGRATIONS / name).read_text())
+
+        started = time.perf_counter()
+        _seed(conn, args.keywords, args.days, args.results, args.seed)
+        report["seed_seconds"] = round(time.perf_counter() - started, 1)
+
+        series = RankSeries()
+        started = time.perf_counter()
+        report["series_rows"] = series.rebuild(conn)
+        report["rebuild_seconds"] = round(time.perf_counter() - started, 1)
+        conn.execute("ANALYZE")
+
+        raw = _table_bytes(conn, ["serp_runs", "serp_results"])
+        compressed = _table_bytes(conn, ["serp_rank_series"])
+        blob_bytes, points = conn.execute("SELECT SUM(length(points)), SUM(n_points) FROM serp_rank_series").fetchone()
+        report["storage_mb"] = {
+            "raw_tables": round(raw / 1e6, 1),
+            "rank_series": round(compressed / 1e6, 1),
+            "ratio": round(raw / compressed, 1),
+            "blob_bytes_per_point": round(blob_bytes / points, 2),
+        }
+
+        charts = []
+        for _ in range(args.queries):
+            phrase = _phrase(rng.randrange(args.keywords))
+            domain = conn.execute(
+                "SELECT root_domain FROM serp_rank_series WHERE keyword_norm = ? ORDER BY n_points DESC LIMIT 1",
+                (phrase,),
+            ).fetchone()[0]
+            legacy = conn.execute(LEGACY_HISTORY, (phrase, domain)).fetchall()
+            ranked = [(p.day, p.rank) for p in rank_history(conn, phrase, domain) if p.rank is not None]
+            assert legacy == ranked, (phrase, domain)
+            charts.append((phrase, domain))
+        report["chart_points"] = statistics.median(len(rank_history(conn, p, d)) for p, d in charts)
+        report["chart_ms"] = {
+            "raw_tables": round(
+                statistics.median(_time_ms(lambda p=p, d=d: conn.execute(LEGACY_HISTORY, (p, d)).fetchall(), 1) for p, d in charts), 2
+            ),
+            "rank_series": round(statistics.median(_time_ms(lambda p=p, d=d: rank_history(conn, p, d), 5) for p, d in charts), 3),
+            "rank_series_weekly": round(
+                statistics.median(_time_ms(lambda p=p, d=d: weekly_ranks(rank_history(conn, p, d)), 5) for p, d in charts), 3
+            ),
+        }
+
+        next_day = DAY0 + args.days * 86400
+        plain, hooked = SerpStore(conn), SerpStore(conn, write_hooks=[series])
+        report["write_batch_ms"] = {
+            "without_series": round(_time_ms(lambda: plain.write(_serps(args.batch_size, next_day, args.results), "bench"), 3), 1),
+            "with_series": round(
+                _time_ms(lambda: hooked.write(_serps(args.batch_size, next_day + 86400, args.results), "bench"), 3), 1
+            ),
+        }
+        conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
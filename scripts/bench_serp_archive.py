@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Measure how much the delta-encoded archive shrinks SERP history.
+
+Builds a local SQLite copy of the D1 SERP schema holding ``keywords *
+days`` runs of ``--results`` rows each (default 1000 * 180 * 20 = 3.6M
+``serp_results`` rows).  The SERPs drift the way real ones do: most days
+a couple of positions swap and now and then a new URL enters.  Titles and
+snippets belong to the URL.  It then runs
+:func:`scripts.compact_serp_archive.compact_serp_archive` over everything
+and reports:
+
+* ``serp_results`` bytes (``dbstat``) against the archive tables;
+* the whole file after ``VACUUM``, before and after compaction;
+* latency of reading one snapshot from the hot table against
+  :func:`serp_adapter.archive.load_archived_serp`.
+
+Usage:
+  python -m scripts.bench_serp_archive
+  python -m scripts.bench_serp_archive --keywords 100 --days 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from scripts.bench_rank_series import _drifting_serps
+from scripts.bench_serp_rollups import DAY0, MIGRATIONS, SCHEMA, _phrase
+from scripts.compact_serp_archive import compact_serp_archive
+from serp_adapter.archive import load_archived_serp
+from serp_adapter.keys import serp_day, serp_key, url_hash
+
+
+def _seed(conn: sqlite3.Connection, keywords: int, days: int, results: int, seed: int) -> None:
+    serps = list(_drifting_serps(keywords, days, results, seed))
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO serp_runs (serp_id, user_id, phrase, region_json, device, engine, provider, actor, status,
+                                   created_at, keyword_norm, region_key, device_key, serp_key)
+            VALUES (?, 'bench', ?, '{"country":"US"}', 'desktop', 'google', 'apify', 'apify/google-search-scraper',
+                    'ok', ?, ?, 'US-en', 'desktop', ?)
+            """,
+            (
+                (f"serp_{day}_{k}", _phrase(k), (DAY0 + day * 86400 + k) * 1000, _phrase(k),
+                 serp_key(_phrase(k), "US-en", "desktop", serp_day(DAY0 + day * 86400)))
+                for day, k, _domains in serps
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO serp_results (serp_id, rank, url, url_hash, domain, root_domain, title, snippet) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"serp_{day}_{k}", rank, f"https://{domain}/{k}/services", url_hash(f"https://{domain}/{k}/services"),
+                    domain, domain, f"{_phrase(k).title()} | Trusted Local Pros at {domain}",
+                    f"Looking for {_phrase(k)}? {domain} offers same-day service, upfront pricing and "
+                    "licensed technicians. Call today for a free estimate.",
+                )
+                for day, k, domains in serps
+                for rank, domain in enumerate(domains, start=1)
+            ),
+        )
+
+
+def _table_bytes(conn: sqlite3.Connection, tables: List[str]) -> int:
+    marks = ",".join("?" * len(tables))
+    return conn.execute(
+        f"""
+        SELECT COALESCE(SUM(d.pgsize), 0) FROM dbstat d
+        JOIN sqlite_master m ON m.name = d.name
+        WHERE m.tbl_name IN ({marks})
+        """,
+        tables,
+    ).fetchone()[0]
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=20, help="Snapshots timed per read path")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report: dict = {"serp_results": args.keywords * args.days * args.results}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "serp.sqlite"
+        conn = sqlite3.connect(path)
+        for name in (*SCHEMA, "0034_serp_archive.sql"):
+            conn.executescript((MIGRATIONS / name).read_text())
+        started = time.perf_counter()
+        _seed(conn, args.keywords, args.days, args.results, args.seed)
+        report["seed_seconds"] = round(time.perf_counter() - started, 1)
+        conn.execute("VACUUM")
+        file_before = path.stat().st_size
+        results_before = _table_bytes(conn, ["serp_results"])
+
+        sample = [f"serp_{rng.randrange(args.days)}_{rng.randrange(args.keywords)}" for _ in range(args.queries)]
+        hot_sql = "SELECT * FROM serp_results WHERE serp_id = ? ORDER BY rank"
+        hot = {serp_id: conn.execute(hot_sql, (serp_id,)).fetchall() for serp_id in sample}
+        hot_ms = statistics.median(_time_ms(lambda s=s: conn.execute(hot_sql, (s,)).fetchall(), 5) for s in sample)
+
+        now_ms = (DAY0 + args.days * 86400) * 1000
+        result = compact_serp_archive(conn, 0, sources=["serp_results"], now_ms=now_ms)
+        report["compaction"] = result.to_dict()
+        conn.execute("VACUUM")
+
+        for serp_id, rows in hot.items():
+            archived = [tuple(row.values()) for row in load_archived_serp(conn, serp_id)]
+            assert archived == rows, serp_id
+        archive_bytes = _table_bytes(conn, ["serp_archive_blocks", "serp_archive_snapshots"])
+        report["serp_results_mb"] = round(results_before / 1e6, 1)
+        report["archive_mb"] = round(archive_bytes / 1e6, 2)
+        report["results_to_archive_ratio"] = round(results_before / archive_bytes, 1)
+        report["file_mb"] = {
+            "before": round(file_before / 1e6, 1),
+            "after": round(path.stat().st_size / 1e6, 1),
+            "ratio": round(file_before / path.stat().st_size, 1),
+        }
+        report["read_one_snapshot_ms"] = {
+            "hot_table": round(hot_ms, 3),
+            "archive": round(statistics.median(_time_ms(lambda s=s: load_archived_serp(conn, s), 5) for s in sample), 3),
+        }
+        conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
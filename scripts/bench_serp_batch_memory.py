@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare memory per SERP result: dataclass lists vs SerpResultBatch.
+
+Usage:
+  python -m scripts.bench_serp_batch_memory
+  python -m scripts.bench_serp_batch_memory --serps 50000 --results 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Callable, List
+
+from serp_adapter.batch import SerpResultBatch
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+
+
+def _make_results(serps: int, per_serp: int) -> List[NormalizedSerpResult]:
+    location = Location(country="US", region="CA", city="San Jose")
+    out = []
+    for s in range(serps):
+        items = []
+        for r in range(per_serp):
+            domain = f"competitor{(s * 7 + r) % 400}.com"
+            items.append(
+                SerpResultItem(
+                    rank=r + 1,
+                    title=f"Emergency plumbing services in San Jose #{s}-{r}",
+                    url=f"https://www.{domain}/services/plumbing/{s}-{r}",
+                    domain=domain,
+                    snippet=f"Licensed local plumbers available 24/7. Call now for a free quote {s}-{r}.",
+                )
+            )
+        out.append(
+            NormalizedSerpResult(
+                query=f"plumber keyword {s % 1000}",
+                location=location,
+                device="mobile",
+                engine="google",
+                ts=1745485200 + s,
+                results=items,
+                source=SerpSource(provider="apify", actor="apify/google-search-scraper"),
+            )
+        )
+    return out
+
+
+def _measure(build: Callable[[], object]) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, obj
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serps", type=int, default=5000)
+    parser.add_argument("--results", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = args.serps * args.results
+    list_bytes, results = _measure(lambda: _make_results(args.serps, args.results))
+    batch_bytes, batch = _measure(lambda: SerpResultBatch.from_results(results))
+    assert batch.num_rows == rows  # type: ignore[attr-defined]
+
+    print(
+        json.dumps(
+            {
+                "serps": args.serps,
+                "rows": rows,
+                "dataclass_bytes_per_result": round(list_bytes / rows, 1),
+                "batch_bytes_per_result": round(batch_bytes / rows, 1),
+                "reduction": round(list_bytes / batch_bytes, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
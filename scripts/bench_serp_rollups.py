@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Compare trend-graph and domain-average reads with and without the daily rollups.
+
+Builds a local SQLite copy of the D1 SERP schema holding
+``keywords * days`` runs of ``--results`` rows each (default 2000 * 250 *
+20 = 10M ``serp_results`` rows).  It then times:
+
+* the worker's ``loadDailyLatestSerpRows`` window query against
+  :func:`serp_adapter.rollups.daily_latest_serp_rows`;
+* a window-query domain average against
+  :func:`serp_adapter.rollups.domain_average_rank`;
+* ``SerpStore.write`` batches with and without the rollup hook.
+
+Usage:
+  python -m scripts.bench_serp_rollups
+  python -m scripts.bench_serp_rollups --keywords 200 --days 100 --queries 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List
+
+from serp_adapter.keys import serp_day, serp_key
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.rollups import SerpRollups, daily_latest_serp_rows, domain_average_rank
+from serp_adapter.store import SerpStore
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+SCHEMA = (
+    "0002_serp.sql",
+    "0003_worker_endpoints.sql",
+    "0009_serp_canonicalization.sql",
+    "0015_unified_d1_step2_step3.sql",
+    "0022_keywords_serp_inspiration_hardening.sql",
+    "0032_serp_daily_rollups.sql",
+)
+DAY0 = 1735689600  # 2025-01-01 00:00 UTC
+DOMAINS = 5000
+
+LEGACY_GRAPH = """
+WITH runs AS (
+  SELECT serp_id, date(created_at / 1000, 'unixepoch') AS day, created_at,
+         ROW_NUMBER() OVER (PARTITION BY date(created_at / 1000, 'unixepoch') ORDER BY created_at DESC) AS rn
+  FROM serp_runs
+  WHERE phrase = ? AND status = 'ok' AND created_at >= ? AND (? = '' OR device = ?)
+)
+SELECT runs.day, r.rank, r.url, r.domain, r.title, r.snippet
+FROM runs JOIN serp_results r ON r.serp_id = runs.serp_id
+WHERE runs.rn = 1
+ORDER BY runs.day ASC, r.rank ASC
+"""
+
+LEGACY_DOMAIN_AVERAGE = """
+WITH runs AS (
+  SELECT serp_id, ROW_NUMBER() OVER (
+    PARTITION BY keyword_norm, region_key, device_key ORDER BY created_at DESC
+  ) AS rn
+  FROM serp_runs
+  WHERE keyword_norm IN ({marks}) AND status = 'ok'
+),
+best AS (
+  SELECT COALESCE(r.root_domain, r.domain) AS root, MIN(r.rank) AS best_rank
+  FROM runs JOIN serp_results r ON r.serp_id = runs.serp_id
+  WHERE runs.rn = 1
+  GROUP BY runs.serp_id, root
+)
+SELECT root, AVG(best_rank), COUNT(*) FROM best GROUP BY root ORDER BY AVG(best_rank), root
+"""
+
+
+def _phrase(k: int) -> str:
+    return f"plumber keyword {k}"
+
+
+def _seed(conn: sqlite3.Connection, keywords: int, days: int, results: int, seed: int) -> None:
+    rng = random.Random(seed)
+
+    def runs() -> Iterator[tuple]:
+        for day in range(days):
+            ts = DAY0 + day * 86400
+            for k in range(keywords):
+                phrase = _phrase(k)
+                yield (
+                    f"serp_{day}_{k}", "bench", phrase, '{"country":"US"}', "desktop", "google", "apify",
+                    "apify/google-search-scraper", "ok", (ts + k) * 1000, phrase, "US-en", "desktop",
+                    serp_key(phrase, "US-en", "desktop", serp_day(ts)),
+                )
+
+    def rows() -> Iterator[tuple]:
+        for day in range(days):
+            for k in range(keywords):
+                serp_id = f"serp_{day}_{k}"
+                for rank in range(1, results + 1):
+                    domain = f"site{rng.randrange(DOMAINS)}.com"
+                    yield (serp_id, rank, f"https://{domain}/p{rank}", domain, domain, f"Title {rank}")
+
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO serp_runs (serp_id, user_id, phrase, region_json, device, engine, provider, actor, status,
+                                   created_at, keyword_norm, region_key, device_key, serp_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            runs(),
+        )
+        conn.executemany(
+            "INSERT INTO serp_results (serp_id, rank, url, domain, root_domain, title) VALUES (?, ?, ?, ?, ?, ?)",
+            rows(),
+        )
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _serps(n: int, ts: int, results: int) -> List[NormalizedSerpResult]:
+    return [
+        NormalizedSerpResult(
+            query=_phrase(k),
+            location=Location(country="US"),
+            device="desktop",
+            engine="google",
+            ts=ts + k,
+            results=[
+                SerpResultItem(rank=r, title="t", url=f"https://site{(k + r) % DOMAINS}.com/", domain=f"site{(k + r) % DOMAINS}.com", snippet=None)
+                for r in range(1, results + 1)
+            ],
+            source=SerpSource(provider="apify"),
+        )
+        for k in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keywords", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=250)
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=5, help="Keywords timed per read path")
+    parser.add_argument("--graph-days", type=int, default=90, help="Window of the graph read")
+    parser.add_argument("--batch-size", type=int, default=500, help="SERPs per timed write() call")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report: dict = {"serp_runs": args.keywords * args.days, "serp_results": args.keywords * args.days * args.results}
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(Path(tmp) / "serp.sqlite")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-262144")
+        for name in SCHEMA:
+            conn.executescript((MIGRATIONS / name).read_text())
+
+        started = time.perf_counter()
+        _seed(conn, args.keywords, args.days, args.results, args.seed)
+        report["seed_seconds"] = round(time.perf_counter() - started, 1)
+
+        rollups = SerpRollups()
+        started = time.perf_counter()
+        rollups.rebuild(conn)
+        report["rebuild_seconds"] = round(time.perf_counter() - started, 1)
+
+        since_ms = (DAY0 + (args.days - args.graph_days) * 86400) * 1000
+        phrases = [_phrase(rng.randrange(args.keywords)) for _ in range(args.queries)]
+        for phrase in phrases:
+            legacy = [tuple(row) for row in conn.execute(LEGACY_GRAPH, (phrase, since_ms, "", ""))]
+            rolled = [tuple(row.values()) for row in daily_latest_serp_rows(conn, phrase, since_ms)]
+            assert legacy == rolled, phrase
+        report["graph_ms"] = {
+            "window_query": round(
+                statistics.median(_time_ms(lambda p=p: conn.execute(LEGACY_GRAPH, (p, since_ms, "", "")).fetchall(), 1) for p in phrases), 2
+            ),
+            "rollup": round(statistics.median(_time_ms(lambda p=p: daily_latest_serp_rows(conn, p, since_ms), 3) for p in phrases), 2),
+        }
+
+        keyword_set = sorted({_phrase(rng.randrange(args.keywords)) for _ in range(20)})
+        legacy_sql = LEGACY_DOMAIN_AVERAGE.format(marks=",".join("?" * len(keyword_set)))
+        legacy_avg = conn.execute(legacy_sql, keyword_set).fetchall()
+        rolled_avg = domain_average_rank(conn, keyword_set)
+        assert [(root, count) for root, _avg, count in legacy_avg] == [(a.root_domain, a.keywords) for a in rolled_avg]
+        report["domain_average_20_keywords_ms"] = {
+            "window_query": round(_time_ms(lambda: conn.execute(legacy_sql, keyword_set).fetchall(), 1), 2),
+            "rollup": round(_time_ms(lambda: domain_average_rank(conn, keyword_set), 3), 2),
+        }
+
+        next_day = DAY0 + args.days * 86400
+        plain, hooked = SerpStore(conn), SerpStore(conn, write_hooks=[rollups])
+        batch = _serps(args.batch_size, next_day, args.results)
+        report["write_batch_ms"] = {
+            "without_rollups": round(_time_ms(lambda: plain.write(batch, "bench"), 3), 1),
+            "with_rollups": round(_time_ms(lambda: hooked.write(batch, "bench"), 3), 1),
+        }
+        conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Measure SerpStore write throughput into a local SQLite copy of the D1 schema.
+
+Usage:
+  python -m scripts.bench_serp_store
+  python -m scripts.bench_serp_store --serps 20000 --batch-size 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.store import SerpStore
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+SCHEMA = (
+    "0002_serp.sql",
+    "0003_worker_endpoints.sql",
+    "0009_serp_canonicalization.sql",
+    "0015_unified_d1_step2_step3.sql",
+    "0022_keywords_serp_inspiration_hardening.sql",
+)
+
+
+def _make_serps(n: int, per_serp: int) -> List[NormalizedSerpResult]:
+    return [
+        NormalizedSerpResult(
+            query=f"plumber keyword {i % 5000}",
+            location=Location(country="US", city="San Jose"),
+            device="mobile" if i % 2 else "desktop",
+            engine="google",
+            ts=1745485200 + i,
+            results=[
+                SerpResultItem(
+                    rank=r + 1,
+                    title=f"Plumbing result {r}",
+                    url=f"https://www.site{(i + r) % 3000}.com/plumbing/{r}",
+                    domain=f"site{(i + r) % 3000}.com",
+                    snippet="Licensed local plumbers available 24/7.",
+                    root_domain=f"site{(i + r) % 3000}.com",
+                )
+                for r in range(per_serp)
+            ],
+            source=SerpSource(provider="apify", actor="apify/google-search-scraper", run_id=f"run-{i}"),
+        )
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serps", type=int, default=10000)
+    parser.add_argument("--results-per-serp", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=500, help="SERPs per write() call")
+    args = parser.parse_args()
+
+    serps = _make_serps(args.serps, args.results_per_serp)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Path(tmp) / "serp.sqlite"
+        conn = sqlite3.connect(db)
+        for name in SCHEMA:
+            conn.executescript((MIGRATIONS / name).read_text())
+        conn.close()
+
+        with SerpStore(db) as store:
+            started = time.perf_counter()
+            for start in range(0, len(serps), args.batch_size):
+                store.write(serps[start : start + args.batch_size], user_id="bench", parser_version="apify-google-v1")
+            elapsed = time.perf_counter() - started
+
+    rows = args.serps * args.results_per_serp
+    print(
+        json.dumps(
+            {
+                "serps": args.serps,
+                "result_rows": rows,
+                "seconds": round(elapsed, 3),
+                "result_rows_per_sec": round(rows / elapsed),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
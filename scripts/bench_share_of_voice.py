@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Time share-of-voice scoring for many sites' keyword sets.
+
+Generates ``--sites`` keyword sets of ``--keywords`` keywords, each with a
+``--results``-deep SERP drawn from a shared pool of domains (default 10k *
+20 * 20 = 4M rank entries).  It then times building the input arrays,
+scoring every set, and a day-over-day delta.  With ``--sqlite`` the rows are
+also written to the rollup tables and the load path from SQLite is timed.
+
+Usage:
+  python -m scripts.bench_share_of_voice
+  python -m scripts.bench_share_of_voice --sites 1000 --sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from serp_adapter.share_of_voice import build_sov_input, compute_share_of_voice, load_sov_input
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+SCHEMA = (
+    "0002_serp.sql",
+    "0003_worker_endpoints.sql",
+    "0009_serp_canonicalization.sql",
+    "0015_unified_d1_step2_step3.sql",
+    "0022_keywords_serp_inspiration_hardening.sql",
+    "0032_serp_daily_rollups.sql",
+)
+
+
+def _rows(
+    sites: int, keywords: int, results: int, domains: int, seed: int
+) -> Tuple[List[str], List[Tuple[str, str]], Dict[str, Optional[float]], List[Tuple[str, str, int]], List[Tuple[str, str, int]]]:
+    rng = random.Random(seed)
+    groups = [f"set_{s}" for s in range(sites)]
+    members: List[Tuple[str, str]] = []
+    volumes: Dict[str, Optional[float]] = {}
+    today: List[Tuple[str, str, int]] = []
+    before: List[Tuple[str, str, int]] = []
+    for s, group in enumerate(groups):
+        for k in range(keywords):
+            keyword = f"service {k} city {s}"
+            members.append((group, keyword))
+            volumes[keyword] = rng.choice((10, 50, 140, 480, 1900, 8100))
+            serp = rng.sample(range(domains), results)
+            today.extend((keyword, f"site{d}.com", rank) for rank, d in enumerate(serp, start=1))
+            # Yesterday: the top two swapped places.
+            serp[0], serp[1] = serp[1], serp[0]
+            before.extend((keyword, f"site{d}.com", rank) for rank, d in enumerate(serp, start=1))
+    return groups, members, volumes, today, before
+
+
+def _seed_sqlite(conn: sqlite3.Connection, members, volumes, ranks) -> None:
+    with conn:
+        conn.execute("INSERT INTO sites (site_id, user_id, production_url) VALUES ('bench', 'bench', 'https://bench')")
+        conn.executemany(
+            "INSERT INTO keyword_sets (id, site_id) VALUES (?, 'bench')", ((g,) for g in dict.fromkeys(g for g, _ in members))
+        )
+        conn.execute("DROP TRIGGER IF EXISTS trg_keywords_limit_20")
+        conn.executemany(
+            "INSERT INTO keywords (kw_id, user_id, phrase, region_json, created_at, keyword_set_id, keyword, keyword_norm) "
+            "VALUES (?, 'bench', ?, '{}', 0, ?, ?, ?)",
+            ((f"kw_{i}", kw, group, kw, kw) for i, (group, kw) in enumerate(members)),
+        )
+        conn.executemany(
+            "INSERT INTO keyword_metrics (keyword_id, volume_us) VALUES (?, ?)",
+            ((f"kw_{i}", volumes[kw]) for i, (_group, kw) in enumerate(members)),
+        )
+        conn.executemany(
+            "INSERT INTO serp_daily_latest VALUES (?, ?, 'US-en', 'desktop', '2025-01-02', ?, 0)",
+            ((f"key_{kw}", kw, f"serp_{kw}") for kw in volumes),
+        )
+        conn.executemany(
+            "INSERT INTO serp_daily_domain_best VALUES (?, 'US-en', 'desktop', '2025-01-02', ?, ?, 'serp')",
+            ranks,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=10000)
+    parser.add_argument("--keywords", type=int, default=20)
+    parser.add_argument("--results", type=int, default=20)
+    parser.add_argument("--domains", type=int, default=50000, help="Size of the shared domain pool")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--sqlite", action="store_true", help="Also time loading from the rollup tables")
+    args = parser.parse_args()
+
+    groups, members, volumes, today_rows, before_rows = _rows(
+        args.sites, args.keywords, args.results, args.domains, args.seed
+    )
+    report: dict = {"sites": args.sites, "rank_entries": len(today_rows)}
+
+    started = time.perf_counter()
+    today = build_sov_input(groups, members, volumes, today_rows)
+    before = build_sov_input(groups, members, volumes, before_rows, vocabulary=today.vocabulary)
+    report["build_inputs_seconds"] = round((time.perf_counter() - started) / 2, 3)
+
+    started = time.perf_counter()
+    sov = compute_share_of_voice(today)
+    report["compute_seconds"] = round(time.perf_counter() - started, 3)
+
+    previous = compute_share_of_voice(before)
+    started = time.perf_counter()
+    change = sov.delta(previous)
+    report["delta_seconds"] = round(time.perf_counter() - started, 3)
+    report["domain_rows"] = len(sov)
+    report["example_top3"] = sov.for_group(groups[0])[:3]
+    report["example_largest_move"] = change.for_group(groups[0])[0]
+
+    if args.sqlite:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(Path(tmp) / "sov.sqlite")
+            for name in SCHEMA:
+                conn.executescript((MIGRATIONS / name).read_text())
+            _seed_sqlite(conn, members, volumes, today_rows)
+            started = time.perf_counter()
+            loaded = load_sov_input(conn, groups)
+            report["load_from_sqlite_seconds"] = round(time.perf_counter() - started, 3)
+            assert len(loaded.rank) == len(today_rows)
+            conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Build a binary archetype KB file from plain-text domain lists.
+
+Each list has one root domain per line; blank lines and ``#`` comments are
+ignored.  The output is replaced atomically, so running workers pick it up on
+their next reload check.
+
+Usage:
+  python -m scripts.build_archetype_kb --out archetypes.kb --version 7 \\
+      --directory directories.txt --publisher publishers.txt --ecommerce marketplaces.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from serp_adapter.archetype_kb import ArchetypeKB, write_archetype_kb
+
+
+def _read_list(path: Path) -> List[str]:
+    out: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        value = line.split("#", 1)[0].strip()
+        if value:
+            out.append(value)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a binary archetype KB file.")
+    parser.add_argument("--out", required=True, help="Output KB path.")
+    parser.add_argument("--version", type=int, required=True, help="KB version number.")
+    parser.add_argument("--directory", type=Path, action="append", default=[])
+    parser.add_argument("--publisher", type=Path, action="append", default=[])
+    parser.add_argument("--ecommerce", type=Path, action="append", default=[])
+    args = parser.parse_args()
+
+    domains: Dict[str, List[str]] = {}
+    for archetype in ("directory", "publisher", "ecommerce"):
+        for path in getattr(args, archetype):
+            domains.setdefault(archetype, []).extend(_read_list(path))
+
+    write_archetype_kb(args.out, domains, version=args.version)
+    kb = ArchetypeKB(args.out)
+    try:
+        print(json.dumps({"ok": True, "out": args.out, "version": kb.version, "entries": len(kb)}, indent=2))
+    finally:
+        kb.close()
+
+
+if __name__ == "__main__":
+    main()
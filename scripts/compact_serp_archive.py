@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Move SERP result rows older than N days into the delta-encoded archive.
+
+Snapshots of ``serp_results`` (keyed by ``serp_runs.created_at``) and
+``step2_serp_results`` (keyed by ``step2_serp_snapshots.scraped_at``) older
+than ``--days`` are folded into ``serp_archive_blocks``.  That is one block
+per series and month: a keyframe plus per-snapshot edit scripts (see
+``serp_adapter.archive``).  Their hot rows are then deleted.
+
+Each chunk of snapshots is archived and deleted in one transaction, and
+archived snapshots drop out of the selection, so an interrupted job can
+simply be started again.  ``--vacuum`` rebuilds the file afterwards so
+the freed pages are returned to the filesystem.
+
+Usage:
+  python -m scripts.compact_serp_archive --db ./local.sqlite --days 90
+  python -m scripts.compact_serp_archive --db ./local.sqlite --days 90 --source serp_results --vacuum
+  python -m scripts.compact_serp_archive --db ./local.sqlite --days 90 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Dict, List, Optional, Sequence
+
+from serp_adapter.archive import SOURCES, Candidate, archive_candidates, archive_serps
+
+_MS_PER_DAY = 86_400_000
+
+
+@dataclass
+class CompactResult:
+    candidates: int = 0
+    snapshots: int = 0
+    rows: int = 0
+    blocks: int = 0
+    chunks: int = 0
+    skipped_sources: List[str] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "candidates": self.candidates,
+            "snapshots": self.snapshots,
+            "rows": self.rows,
+            "blocks": self.blocks,
+            "chunks": self.chunks,
+            "skipped_sources": self.skipped_sources,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def _chunks(candidates: Sequence[Candidate], chunk_size: int) -> List[List[Candidate]]:
+    """Split at series boundaries so a block is rewritten once per job."""
+    out: List[List[Candidate]] = []
+    current: List[Candidate] = []
+    for _series, group in groupby(candidates, key=lambda candidate: candidate[1]):
+        current.extend(group)
+        if len(current) >= chunk_size:
+            out.append(current)
+            current = []
+    if current:
+        out.append(current)
+    return out
+
+
+def _has_tables(conn: sqlite3.Connection, names: Sequence[str]) -> bool:
+    found = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    return set(names) <= found
+
+
+def compact_serp_archive(
+    conn: sqlite3.Connection,
+    older_than_days: int,
+    *,
+    sources: Sequence[str] = tuple(SOURCES),
+    chunk_size: int = 2000,
+    now_ms: Optional[int] = None,
+    dry_run: bool = False,
+) -> CompactResult:
+    """Archive snapshots older than *older_than_days* and delete their hot rows.
+
+    Sources whose tables are missing (e.g. a DB without Step 2) are skipped
+    and listed in the result.  With *dry_run* only candidates are counted.
+    """
+    if older_than_days < 0:
+        raise ValueError("older_than_days must be >= 0")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    if not _has_tables(conn, ("serp_archive_blocks", "serp_archive_snapshots")):
+        raise RuntimeError("Missing archive tables; apply migrations/0034_serp_archive.sql")
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    cutoff = now_ms - older_than_days * _MS_PER_DAY
+    needed = {
+        "serp_results": ("serp_runs", "serp_results"),
+        "step2_serp_results": ("step2_serp_snapshots", "step2_serp_results"),
+    }
+
+    result = CompactResult()
+    started = time.perf_counter()
+    for source in sources:
+        if not _has_tables(conn, needed[source]):
+            result.skipped_sources.append(source)
+            continue
+        candidates = archive_candidates(conn, source, cutoff)
+        result.candidates += len(candidates)
+        if dry_run:
+            continue
+        for chunk in _chunks(candidates, chunk_size):
+            with conn:
+                snapshots, rows, blocks = archive_serps(conn, source, chunk, now_ms=now_ms)
+            result.snapshots += snapshots
+            result.rows += rows
+            result.blocks += blocks
+            result.chunks += 1
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old SERP result rows into the delta-encoded archive.")
+    parser.add_argument("--db", required=True, help="SQLite DB path (e.g., local D1 export).")
+    parser.add_argument("--days", type=int, required=True, help="Archive snapshots older than this many days.")
+    parser.add_argument("--source", choices=sorted(SOURCES), action="append", help="Limit to one table (repeatable).")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Snapshots per transaction.")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file.")
+    parser.add_argument("--dry-run", action="store_true", help="Count candidates without writing.")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        result = compact_serp_archive(
+            conn,
+            args.days,
+            sources=args.source or tuple(SOURCES),
+            chunk_size=args.chunk_size,
+            dry_run=args.dry_run,
+        )
+        if args.vacuum and not args.dry_run:
+            conn.execute("VACUUM")
+        print(json.dumps({"ok": True, **result.to_dict(), "dry_run": args.dry_run}, indent=2))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""Re-normalize stored SERP runs after an adapter parser_version bump.
+
+Finds serp_runs whose parser_version differs from the adapter's current one
+and whose raw payload is archived in a NormalizationCache file (matched on
+serp_runs.raw_payload_sha256).  Payloads are re-parsed on a process pool
+and each chunk of runs is rewritten through SerpStore with replace=True,
+so a run's serp_results are swapped in one transaction.
+
+Runs are read in serp_id order with keyset pagination and the cursor is
+checkpointed after every chunk.  Rewritten runs carry the new
+parser_version and drop out of the selection, so an interrupted run can
+always be resumed or simply started again.
+
+Derived tables are kept current only through write hooks, so
+``--rebuild-derived`` rebuilds the daily rollups and rank series once the
+job finishes.  A saved DomainRankIndex file must be rebuilt by its owner.
+
+Usage:
+  python -m scripts.renormalize_serp_runs --db ./local.sqlite --raw-cache ./normalized.sqlite
+  python -m scripts.renormalize_serp_runs --db ./local.sqlite --raw-cache ./normalized.sqlite \
+      --workers 8 --max-runs-per-sec 500
+  python -m scripts.renormalize_serp_runs --db ./local.sqlite --raw-cache ./normalized.sqlite --dry-run
+  python -m scripts.renormalize_serp_runs --db ./local.sqlite --raw-cache ./normalized.sqlite --rebuild-derived
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.batch import SerpResultBatch
+from serp_adapter.keys import device_key, keyword_norm, region_key_from_json, serp_keys
+from serp_adapter.normalization_cache import NormalizationCache
+from serp_adapter.rank_series import RankSeries
+from serp_adapter.rollups import SerpRollups
+from serp_adapter.store import SerpStore, WriteHook
+
+JOB_ID_PREFIX = "renormalize:"
+
+# (serp_id, user_id, raw_payload_sha256, extractor_mode, (keyword_norm, region_key, device_key))
+_Run = Tuple[str, str, str, Optional[str], Tuple[str, str, str]]
+
+
+@dataclass
+class RenormalizeResult:
+    scanned: int = 0
+    rewritten: int = 0
+    missing_raw: int = 0
+    no_raw_hash: int = 0
+    failed: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    resumed_from: Optional[str] = None
+
+    @property
+    def runs_per_second(self) -> float:
+        return self.scanned / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "scanned": self.scanned,
+            "rewritten": self.rewritten,
+            "missing_raw": self.missing_raw,
+            "no_raw_hash": self.no_raw_hash,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "runs_per_second": round(self.runs_per_second, 1),
+            "resumed_from": self.resumed_from,
+        }
+
+
+def _fetch_runs(
+    conn: sqlite3.Connection, parser_version: str, provider_prefix: str, after: str, size: int
+) -> List[_Run]:
+    rows = conn.execute(
+        """
+        SELECT serp_id, user_id, raw_payload_sha256, extractor_mode,
+               keyword_norm, region_key, device_key, phrase, region_json, device
+        FROM serp_runs
+        WHERE serp_id > ?
+          AND raw_payload_sha256 IS NOT NULL
+          AND (parser_version IS NULL OR parser_version <> ?)
+          AND provider LIKE ? || '%'
+        ORDER BY serp_id
+        LIMIT ?
+        """,
+        (after, parser_version, provider_prefix, size),
+    ).fetchall()
+    # Runs written before the key columns existed: derive them as SerpStore does.
+    return [
+        (
+            serp_id, user_id, sha, mode,
+            (kw or keyword_norm(phrase), region or region_key_from_json(region_json), device or device_key(raw_device)),
+        )
+        for serp_id, user_id, sha, mode, kw, region, device, phrase, region_json, raw_device in rows
+    ]
+
+
+def _count_unhashed_runs(conn: sqlite3.Connection, parser_version: str, provider_prefix: str) -> int:
+    """Stale runs that recorded no payload digest and can never be re-parsed."""
+    return conn.execute(
+        """
+        SELECT COUNT(*) FROM serp_runs
+        WHERE raw_payload_sha256 IS NULL
+          AND (parser_version IS NULL OR parser_version <> ?)
+          AND provider LIKE ? || '%'
+        """,
+        (parser_version, provider_prefix),
+    ).fetchone()[0]
+
+
+def _parse_chunk(
+    adapter: BaseSerpAdapter, payloads: Sequence[bytes], keys: Sequence[Tuple[str, str, str]]
+) -> Tuple[SerpResultBatch, List[int]]:
+    """Worker entry point: normalize raw payloads into one batch.
+
+    Returns the batch and the positions (into *payloads*) it holds results
+    for.  A payload holding a whole dataset response (several queries, or
+    a batched run) contributes the first item whose keyword, region and
+    device match the run's *keys*; payloads that fail to decode or
+    normalize, or hold no matching item, are left out.
+    """
+    batch = SerpResultBatch()
+    ok: List[int] = []
+    for position, (payload, key) in enumerate(zip(payloads, keys)):
+        try:
+            items = json.loads(payload)
+        except ValueError:
+            continue
+        for item in items if isinstance(items, list) else [items]:
+            try:
+                result = adapter.normalize(item)
+            except Exception:  # noqa: BLE001 – counted as failed by the caller
+                continue
+            if serp_keys(result)[:3] == key:
+                batch.append(result)
+                ok.append(position)
+                break
+    return batch, ok
+
+
+def _write_chunk(
+    store: SerpStore,
+    runs: Sequence[_Run],
+    batch: SerpResultBatch,
+    ok: Sequence[int],
+    parser_version: str,
+) -> None:
+    # serp_runs.user_id is kept on conflict, but group by owner so the
+    # insert path would still be correct.
+    by_user: Dict[Tuple[str, Optional[str]], List[int]] = {}
+    for serp_index, position in enumerate(ok):
+        _serp_id, user_id, _sha, extractor_mode, _keys = runs[position]
+        by_user.setdefault((user_id, extractor_mode), []).append(serp_index)
+    for (user_id, extractor_mode), serp_indexes in by_user.items():
+        store.write(
+            [batch.serp(i) for i in serp_indexes],
+            user_id,
+            serp_ids=[runs[ok[i]][0] for i in serp_indexes],
+            parser_version=parser_version,
+            extractor_mode=extractor_mode,
+            raw_payload_sha256=[runs[ok[i]][2] for i in serp_indexes],
+            replace=True,
+        )
+
+
+def _save_checkpoint(
+    conn: sqlite3.Connection, job_id: str, cursor: str, scanned: int, written: int, now_epoch: int
+) -> None:
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO backfill_checkpoints
+              (job_id, cursor, rows_scanned, rows_written, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+              cursor = excluded.cursor,
+              rows_scanned = backfill_checkpoints.rows_scanned + excluded.rows_scanned,
+              rows_written = backfill_checkpoints.rows_written + excluded.rows_written,
+              updated_at = excluded.updated_at
+            """,
+            (job_id, cursor, scanned, written, now_epoch, now_epoch),
+        )
+
+
+def renormalize_serp_runs(
+    conn: sqlite3.Connection,
+    raw_cache: NormalizationCache,
+    *,
+    adapter: Optional[BaseSerpAdapter] = None,
+    provider_prefix: str = "apify",
+    chunk_size: int = 500,
+    workers: Optional[int] = 1,
+    max_runs_per_sec: Optional[float] = None,
+    limit: Optional[int] = None,
+    resume: bool = True,
+    dry_run: bool = False,
+    write_hooks: Sequence[WriteHook] = (),
+) -> RenormalizeResult:
+    """Re-parse runs with a stale parser_version and rewrite their results.
+
+    ``workers=None`` uses ``os.cpu_count()``; ``workers=1`` parses in this
+    process.  ``max_runs_per_sec`` throttles the scan rate (sleeping
+    between chunks) to leave headroom for other writers.  ``limit`` stops
+    after roughly that many scanned runs (whole chunks).  Runs whose raw
+    payload is not in *raw_cache*, or fails to parse, keep their rows.
+
+    Stale runs are reported in two separate counts when they cannot be
+    re-parsed: ``missing_raw`` for a recorded digest that *raw_cache* does
+    not hold (including payloads cached under a key other than the
+    worker's raw-text digest), and ``no_raw_hash`` for runs with no digest.
+    A payload with no item for the run's keyword, region and device counts
+    as ``failed``.
+
+    *write_hooks* are passed to :class:`SerpStore`, so derived tables
+    (e.g. :class:`~serp_adapter.rollups.SerpRollups`) follow the rewrites;
+    without them, rebuild those tables after the job.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    adapter = adapter or ApifyGoogleSearchAdapter()
+    parser_version = adapter.parser_version
+    job_id = JOB_ID_PREFIX + parser_version
+    workers = workers or os.cpu_count() or 1
+    now_epoch = int(datetime.now(tz=timezone.utc).timestamp())
+    store = SerpStore(conn, write_hooks=write_hooks)
+
+    result = RenormalizeResult()
+    result.no_raw_hash = _count_unhashed_runs(conn, parser_version, provider_prefix)
+    cursor = ""
+    if resume:
+        found = conn.execute(
+            "SELECT cursor FROM backfill_checkpoints WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if found:
+            cursor = result.resumed_from = found[0]
+
+    # (cursor after chunk, runs scanned, runs with payloads, parse future or result)
+    pending: Deque[Tuple[str, int, List[_Run], object]] = deque()
+
+    def _drain_one() -> None:
+        chunk_cursor, scanned, runs, parsed = pending.popleft()
+        batch, ok = parsed.result() if isinstance(parsed, Future) else parsed
+        result.failed += len(runs) - len(ok)
+        if not dry_run:
+            _write_chunk(store, runs, batch, ok, parser_version)
+            _save_checkpoint(conn, job_id, chunk_cursor, scanned, len(ok), now_epoch)
+        result.rewritten += len(ok)
+        result.chunks += 1
+
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    reached_end = False
+    try:
+        while limit is None or result.scanned < limit:
+            page = _fetch_runs(conn, parser_version, provider_prefix, cursor, chunk_size)
+            if not page:
+                reached_end = True
+                break
+            cursor = page[-1][0]
+            result.scanned += len(page)
+            raw = raw_cache.raw_payloads(run[2] for run in page)
+            runs = [run for run in page if run[2] in raw]
+            result.missing_raw += len(page) - len(runs)
+            payloads = [raw[run[2]] for run in runs]
+            keys = [run[4] for run in runs]
+
+            if pool is not None and payloads:
+                pending.append((cursor, len(page), runs, pool.submit(_parse_chunk, adapter, payloads, keys)))
+            else:
+                pending.append((cursor, len(page), runs, _parse_chunk(adapter, payloads, keys)))
+            while len(pending) > 2 * workers or (pool is None and pending):
+                _drain_one()
+
+            if max_runs_per_sec:
+                ahead = result.scanned / max_runs_per_sec - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        while pending:
+            _drain_one()
+    finally:
+        for _cursor, _scanned, _runs, parsed in pending:
+            if isinstance(parsed, Future):
+                parsed.cancel()
+        if pool is not None:
+            pool.shutdown()
+        result.elapsed_seconds = time.perf_counter() - started
+
+    if reached_end and not dry_run:
+        with conn:
+            conn.execute("DELETE FROM backfill_checkpoints WHERE job_id = ?", (job_id,))
+    return result
+
+
+def rebuild_derived(conn: sqlite3.Connection) -> List[str]:
+    """Rebuild the derived tables present in *conn*; returns their names."""
+    found = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    rebuilt = []
+    if {"serp_daily_latest", "serp_daily_domain_best"} <= found:
+        SerpRollups().rebuild(conn)
+        rebuilt.append("serp_daily_latest")
+    if "serp_rank_series" in found:
+        RankSeries().rebuild(conn)
+        rebuilt.append("serp_rank_series")
+    return rebuilt
+
+
+def _validate_required_tables(conn: sqlite3.Connection) -> None:
+    needed = {"serp_runs", "serp_results", "urls", "serp_result_url_map", "backfill_checkpoints"}
+    found = {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table'"
+        ).fetchall()
+    }
+    missing = sorted(needed - found)
+    if missing:
+        raise RuntimeError(f"Missing required table(s): {', '.join(missing)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-normalize SERP runs with a stale parser_version.")
+    parser.add_argument("--db", required=True, help="SQLite DB path (e.g., local D1 export).")
+    parser.add_argument("--raw-cache", required=True, help="NormalizationCache file holding raw payloads.")
+    parser.add_argument("--provider-prefix", default="apify", help="Only runs whose provider starts with this.")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Runs per page/transaction.")
+    parser.add_argument("--workers", type=int, default=None, help="Parsing processes (default: CPU count).")
+    parser.add_argument("--max-runs-per-sec", type=float, default=None, help="Throttle the scan rate.")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after about this many runs.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint.")
+    parser.add_argument("--dry-run", action="store_true", help="Parse but do not write changes.")
+    parser.add_argument(
+        "--rebuild-derived", action="store_true", help="Rebuild the daily rollups and rank series afterwards."
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    raw_cache = NormalizationCache(args.raw_cache)
+    try:
+        _validate_required_tables(conn)
+        result = renormalize_serp_runs(
+            conn,
+            raw_cache,
+            provider_prefix=args.provider_prefix,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            max_runs_per_sec=args.max_runs_per_sec,
+            limit=args.limit,
+            resume=not args.restart,
+            dry_run=args.dry_run,
+        )
+        rebuilt = rebuild_derived(conn) if args.rebuild_derived and not args.dry_run else []
+        print(json.dumps({"ok": True, **result.to_dict(), "dry_run": args.dry_run, "rebuilt": rebuilt}, indent=2))
+    finally:
+        raw_cache.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,90 @@ from serp_adapter.models import (
     KeywordUniverseRow,
     Location,
     NormalizedSerpResult,
+    SerpRequest,
     SerpResultItem,
     SerpSource,
 )
+from serp_adapter.batch import SerpResultBatch, SerpResultRow
 from serp_adapter.adapters.base import BaseSerpAdapter
-from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
-from serp_adapter.infer_intent import infer_intent
-from serp_adapter.serp_archetype import classify_domain, count_serp_archetypes
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter, SerpDemux
+from serp_adapter.actor_runs import ActorRunPlan, BatchingReport, batching_report, build_batch_runs
+from serp_adapter.apify_client import ApifyDatasetClient, ApifyDatasetError
+from serp_adapter.archive import (
+    ArchiveBlock,
+    ArchiveError,
+    archive_candidates,
+    archive_serps,
+    encode_block,
+    has_archive,
+    iter_archived_serps,
+    load_archived_serp,
+)
+from serp_adapter.coalesce import CoalescedSerp, SerpCoalescer, Watch, load_watches
+from serp_adapter.infer_intent import (
+    KeywordIntentBatch,
+    compile_intent_matcher,
+    infer_intent,
+    infer_intent_batch,
+)
+from serp_adapter.intent_features import (
+    IntentFeatureStore,
+    IntentFeatures,
+    extract_intent_features,
+    intent_weight_matrix,
+)
+from serp_adapter.keys import SerpKeys, keyword_norm, region_key, serp_key, serp_keys, serp_keys_batch, url_hash
+from serp_adapter.matcher import MultiPatternMatcher
+from serp_adapter.normalization_cache import NormalizationCache, payload_sha256
+from serp_adapter.parallel import normalize_parallel
+from serp_adapter.rank_index import DomainRankIndex, KeywordVisibility, Posting, RankIndexError
+from serp_adapter.rank_series import (
+    RankPoint,
+    RankSeries,
+    WeeklyRank,
+    decode_points,
+    encode_points,
+    rank_history,
+    weekly_ranks,
+)
+from serp_adapter.refresh import (
+    AdaptiveRefresh,
+    RefreshDecision,
+    RefreshPolicy,
+    due_step2_keywords,
+    load_serp_history,
+    plan_refresh,
+    rank_biased_overlap,
+    replay_refresh,
+)
+from serp_adapter.rollups import DomainAverage, SerpRollups, daily_latest_serp_rows, domain_average_rank
+from serp_adapter.router import (
+    AdapterProvider,
+    HedgedSerpRouter,
+    RoutedSerp,
+    SerpProvider,
+    SerpRoutingError,
+)
+from serp_adapter.scheduler import TokenBucket, WatchScheduler
+from serp_adapter.share_of_voice import (
+    DEFAULT_CTR_CURVE,
+    ShareOfVoice,
+    SovDelta,
+    SovInput,
+    build_sov_input,
+    compute_share_of_voice,
+    load_sov_input,
+)
+from serp_adapter.serp_archetype import (
+    ArchetypeIndex,
+    classify_domain,
+    count_serp_archetypes,
+    register_archetype_domains,
+    use_archetype_index,
+)
+from serp_adapter.archetype_kb import ArchetypeKB, ReloadingArchetypeKB, write_archetype_kb
+from serp_adapter.store import SerpStore
+from serp_adapter.streaming import ItemError, iter_json_items
 
 __all__ = [
     "Location",
@@ -20,9 +97,95 @@ __all__ = [
     "KeywordIntent",
     "SerpResultItem",
     "SerpSource",
+    "SerpRequest",
+    "SerpResultBatch",
+    "SerpResultRow",
     "BaseSerpAdapter",
     "ApifyGoogleSearchAdapter",
+    "ApifyDatasetClient",
+    "ApifyDatasetError",
+    "SerpDemux",
+    "ActorRunPlan",
+    "BatchingReport",
+    "batching_report",
+    "build_batch_runs",
     "classify_domain",
     "count_serp_archetypes",
+    "ArchetypeIndex",
+    "register_archetype_domains",
+    "use_archetype_index",
+    "ArchetypeKB",
+    "ReloadingArchetypeKB",
+    "write_archetype_kb",
     "infer_intent",
+    "infer_intent_batch",
+    "KeywordIntentBatch",
+    "compile_intent_matcher",
+    "MultiPatternMatcher",
+    "IntentFeatures",
+    "IntentFeatureStore",
+    "extract_intent_features",
+    "intent_weight_matrix",
+    "ItemError",
+    "iter_json_items",
+    "normalize_parallel",
+    "NormalizationCache",
+    "payload_sha256",
+    "SerpStore",
+    "SerpRollups",
+    "DomainAverage",
+    "daily_latest_serp_rows",
+    "domain_average_rank",
+    "DomainRankIndex",
+    "KeywordVisibility",
+    "Posting",
+    "RankIndexError",
+    "RankPoint",
+    "RankSeries",
+    "WeeklyRank",
+    "decode_points",
+    "encode_points",
+    "rank_history",
+    "weekly_ranks",
+    "ArchiveBlock",
+    "ArchiveError",
+    "archive_candidates",
+    "archive_serps",
+    "encode_block",
+    "has_archive",
+    "iter_archived_serps",
+    "load_archived_serp",
+    "DEFAULT_CTR_CURVE",
+    "ShareOfVoice",
+    "SovDelta",
+    "SovInput",
+    "build_sov_input",
+    "compute_share_of_voice",
+    "load_sov_input",
+    "HedgedSerpRouter",
+    "SerpProvider",
+    "AdapterProvider",
+    "RoutedSerp",
+    "SerpRoutingError",
+    "SerpCoalescer",
+    "CoalescedSerp",
+    "Watch",
+    "load_watches",
+    "WatchScheduler",
+    "TokenBucket",
+    "AdaptiveRefresh",
+    "RefreshDecision",
+    "RefreshPolicy",
+    "due_step2_keywords",
+    "load_serp_history",
+    "plan_refresh",
+    "rank_biased_overlap",
+    "replay_refresh",
+    "SerpKeys",
+    "keyword_norm",
+    "region_key",
+    "serp_key",
+    "serp_keys",
+    "serp_keys_batch",
+    "url_hash",
 ]
@@ -31,17 +31,21 @@ Example raw item (abbreviated)::
 from __future__ import annotations
 
 import time
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
-from urllib.parse import urlparse
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.domains import registrable_domain, split_url_host
+from serp_adapter.keys import clean_string, device_key, keyword_norm, region_key, serp_day, serp_key
 from serp_adapter.models import (
     Location,
     NormalizedSerpResult,
+    SerpRequest,
     SerpResultItem,
     SerpSource,
 )
+from serp_adapter.streaming import ItemError
 
 # Apify device strings → canonical device strings
 _DEVICE_MAP: Dict[str, str] = {
@@ -67,11 +71,30 @@ def _parse_ts(crawled_at: Optional[str]) -> int:
 
 def _extract_domain(url: str) -> str:
     """Return the hostname from *url*, stripping any leading ``www.``."""
-    try:
-        host = urlparse(url).hostname or ""
-        return host.removeprefix("www.")
-    except Exception:
-        return ""
+    return split_url_host(url)[0]
+
+
+def _match_key(phrase: str, location: Location, device: str) -> Tuple[str, str, str, str]:
+    return (
+        keyword_norm(phrase),
+        clean_string(location.country, 2).upper() or "US",
+        clean_string(location.city, 120).lower(),
+        device_key(device),
+    )
+
+
+@dataclass
+class SerpDemux:
+    """Dataset items of a batched run, matched back to their requests."""
+
+    #: Result per request, aligned with the requests passed in (None if missing)
+    by_request: List[Optional[NormalizedSerpResult]] = field(default_factory=list)
+    #: Result per requesting ``serp_key`` (fetch day taken from the result)
+    results: Dict[str, NormalizedSerpResult] = field(default_factory=dict)
+    #: Requests no dataset item answered
+    missing: List[SerpRequest] = field(default_factory=list)
+    #: Positions of dataset items that matched no request
+    unmatched: List[int] = field(default_factory=list)
 
 
 class ApifyGoogleSearchAdapter(BaseSerpAdapter):
@@ -81,6 +104,8 @@ class ApifyGoogleSearchAdapter(BaseSerpAdapter):
     (i.e. one search query / SERP page).
     """
 
+    parser_version = "apify-google-v1"
+
     def normalize(self, raw: Any) -> NormalizedSerpResult:
         """Convert an Apify actor dataset item to a :class:`NormalizedSerpResult`.
 
@@ -110,6 +135,7 @@ class ApifyGoogleSearchAdapter(BaseSerpAdapter):
             country=search_query.get("countryCode") or raw.get("country") or "",
             region=raw.get("region") or None,
             city=search_query.get("city") or raw.get("city") or None,
+            language=search_query.get("languageCode") or raw.get("languageCode") or None,
         )
 
         raw_device: str = (raw.get("device") or "DESKTOP").upper()
@@ -121,7 +147,11 @@ class ApifyGoogleSearchAdapter(BaseSerpAdapter):
         results = []
         for item in organic_results:
             url: str = item.get("url") or ""
-            domain: str = item.get("domain") or _extract_domain(url)
+            domain: str = item.get("domain") or ""
+            if domain:
+                root_domain = registrable_domain(domain)
+            else:
+                domain, root_domain = split_url_host(url)
             results.append(
                 SerpResultItem(
                     rank=item.get("position") or len(results) + 1,
@@ -129,6 +159,7 @@ class ApifyGoogleSearchAdapter(BaseSerpAdapter):
                     url=url,
                     domain=domain,
                     snippet=item.get("description") or item.get("snippet") or "",
+                    root_domain=root_domain,
                 )
             )
 
@@ -147,3 +178,70 @@ class ApifyGoogleSearchAdapter(BaseSerpAdapter):
             results=results,
             source=source,
         )
+
+    def demultiplex(
+        self,
+        items: Iterable[Any],
+        requests: Sequence[SerpRequest],
+        on_error: Optional[Callable[[ItemError], None]] = None,
+    ) -> SerpDemux:
+        """Match the dataset items of a batched run to *requests*.
+
+        Items are matched on ``searchQuery`` term, country, city and device.
+        When an item does not echo the city or device, it is matched on the
+        fields it does echo, but only if that leaves a single request key,
+        as within a run built by
+        :func:`~serp_adapter.actor_runs.build_batch_runs` (one city and
+        device per run); otherwise it is reported in ``unmatched``.  Every
+        request for the same query receives the same result; when a query
+        has several items (more than one page), the first wins.  Items that
+        fail to normalize go to *on_error*.
+        """
+        exact: Dict[Tuple[str, str, str, str], List[int]] = {}
+        loose: Dict[Tuple[str, str], Dict[Tuple[str, str, str, str], None]] = {}
+        for index, request in enumerate(requests):
+            key = _match_key(request.phrase, request.location, request.device)
+            exact.setdefault(key, []).append(index)
+            loose.setdefault(key[:2], {})[key] = None
+
+        demux = SerpDemux(by_request=[None] * len(requests))
+        for position, raw in enumerate(items):
+            try:
+                result = self.normalize(raw)
+            except Exception as exc:  # noqa: BLE001 – reported, demux continues
+                if on_error is not None:
+                    on_error(ItemError(position, f"{type(exc).__name__}: {exc}", raw))
+                continue
+            key = _match_key(result.query, result.location, result.device)
+            echoes_city, echoes_device = bool(result.location.city), bool(raw.get("device"))
+            if echoes_city and echoes_device:
+                targets = exact.get(key)
+            else:
+                # The missing fields were defaulted by normalize(); ignore them.
+                candidates = [
+                    candidate
+                    for candidate in loose.get(key[:2], ())
+                    if (not echoes_city or candidate[2] == key[2]) and (not echoes_device or candidate[3] == key[3])
+                ]
+                targets = exact[candidates[0]] if len(candidates) == 1 else None
+            if not targets:
+                demux.unmatched.append(position)
+                continue
+            day = serp_day(result.ts)
+            for index in targets:
+                if demux.by_request[index] is not None:
+                    continue
+                request = requests[index]
+                demux.by_request[index] = result
+                demux.results[
+                    serp_key(
+                        keyword_norm(request.phrase),
+                        region_key(request.location),
+                        device_key(request.device),
+                        day,
+                    )
+                ] = result
+        demux.missing = [
+            request for request, result in zip(requests, demux.by_request) if result is None
+        ]
+        return demux
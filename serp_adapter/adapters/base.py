@@ -3,9 +3,10 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Callable, Iterator, Optional
 
 from serp_adapter.models import NormalizedSerpResult
+from serp_adapter.streaming import ItemError, Source, iter_normalize
 
 
 class BaseSerpAdapter(ABC):
@@ -15,6 +16,10 @@ class BaseSerpAdapter(ABC):
     raw response into a :class:`~serp_adapter.models.NormalizedSerpResult`.
     """
 
+    #: Recorded as ``serp_runs.parser_version``; bump when normalization
+    #: output changes for the same raw input.
+    parser_version: str = "unversioned"
+
     @abstractmethod
     def normalize(self, raw: Any) -> NormalizedSerpResult:
         """Convert *raw* provider output to a :class:`NormalizedSerpResult`.
@@ -30,3 +35,26 @@ class BaseSerpAdapter(ABC):
         NormalizedSerpResult
             A fully populated normalized result.
         """
+
+    def iter_normalize(
+        self,
+        source: Source,
+        on_error: Optional[Callable[[ItemError], None]] = None,
+    ) -> Iterator[NormalizedSerpResult]:
+        """Lazily normalize every item of a JSON-array or JSON Lines dataset.
+
+        Parameters
+        ----------
+        source:
+            A file path (``.gz`` is decompressed transparently) or an open
+            text/binary stream.
+        on_error:
+            Called with an :class:`~serp_adapter.streaming.ItemError` for each
+            item that cannot be parsed or normalized.  Such items are skipped.
+
+        Yields
+        ------
+        NormalizedSerpResult
+            One result per good item, in source order.
+        """
+        return iter_normalize(self.normalize, source, on_error)
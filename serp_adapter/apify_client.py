@@ -0,0 +1,462 @@
+"""Asynchronous reader for Apify dataset items.
+
+:class:`ApifyDatasetClient` downloads an actor's dataset straight into
+normalization, so no export file is needed::
+
+    async with ApifyDatasetClient(token) as client:
+        async for result in client.iter_normalize(dataset_id):
+            ...
+
+Items are requested as JSON Lines (``format=jsonl``) in pages of
+*page_size*.  The first page reports the dataset size
+(``X-Apify-Pagination-Total``); the remaining pages are then fetched
+concurrently over a small pool of keep-alive connections.  Responses are
+requested gzip-encoded and decompressed as they stream in, and every line is
+decoded as soon as it is complete, so the first items reach the caller
+while later pages are still downloading.  Items are always yielded in
+dataset order.
+
+A page that fails part-way (connection reset, timeout, HTTP 429/5xx, a
+gzip stream cut short, or fewer items than ``X-Apify-Pagination-Count`` or
+the known total promise) is re-requested from the first item not yet
+delivered, with exponential backoff, up to *retries* times.
+
+Only the standard library is used: the HTTP/1.1 client is a minimal one
+built on :mod:`asyncio` streams, sufficient for the Apify API.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+import zlib
+from collections import deque
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode, urlsplit
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.models import NormalizedSerpResult
+from serp_adapter.streaming import ItemError
+
+DEFAULT_BASE_URL = "https://api.apify.com"
+
+_READ_SIZE = 64 * 1024
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+_END = object()
+
+
+class ApifyDatasetError(RuntimeError):
+    """The Apify API rejected a dataset request, or retries were exhausted."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _RetryableError(Exception):
+    pass
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class _ConnectionPool:
+    """At most *size* keep-alive connections to one origin."""
+
+    def __init__(self, scheme: str, host: str, port: int, size: int, timeout: float) -> None:
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: List[_Connection] = []
+        self._slots = asyncio.Semaphore(size)
+        self._ssl = ssl.create_default_context() if scheme == "https" else None
+
+    async def acquire(self) -> _Connection:
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port, ssl=self._ssl, limit=_READ_SIZE * 4),
+                self.timeout,
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    def release(self, conn: _Connection, reusable: bool) -> None:
+        if reusable and not conn.writer.is_closing():
+            self._idle.append(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self) -> None:
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed before response")
+    parts = status_line.decode("latin-1").split(" ", 2)
+    if len(parts) < 2 or not parts[1].isdigit():
+        raise ConnectionError(f"Malformed status line: {status_line!r}")
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+
+async def _iter_body(
+    reader: asyncio.StreamReader, headers: Dict[str, str], timeout: float
+) -> AsyncIterator[bytes]:
+    """Raw (still content-encoded) body chunks of one response."""
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), timeout)
+            if not size_line:
+                raise asyncio.IncompleteReadError(b"", None)
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                while (await asyncio.wait_for(reader.readline(), timeout)) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            data = await asyncio.wait_for(reader.readexactly(size + 2), timeout)
+            yield data[:-2]
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining:
+            data = await asyncio.wait_for(reader.read(min(_READ_SIZE, remaining)), timeout)
+            if not data:
+                raise asyncio.IncompleteReadError(b"", remaining)
+            remaining -= len(data)
+            yield data
+    else:
+        while True:
+            data = await asyncio.wait_for(reader.read(_READ_SIZE), timeout)
+            if not data:
+                return
+            yield data
+
+
+def _int_header(headers: Dict[str, str], name: str) -> Optional[int]:
+    value = headers.get(name)
+    return int(value) if value and value.isdigit() else None
+
+
+@dataclass
+class _Page:
+    offset: int
+    limit: int
+    queue: "asyncio.Queue[Any]" = field(default_factory=asyncio.Queue)
+    count: int = 0  # Lines delivered so far (items plus undecodable lines)
+
+
+class ApifyDatasetClient:
+    """Concurrent, streaming reader for ``GET /v2/datasets/{id}/items``.
+
+    Parameters
+    ----------
+    token:
+        Apify API token, sent as a bearer token (``None`` for public
+        datasets and test servers).
+    base_url:
+        API origin, e.g. a local stub server in tests.
+    connections:
+        Keep-alive connections in the pool, i.e. pages downloaded at once.
+    page_size:
+        Items per request.
+    timeout:
+        Seconds allowed for connecting and for each read.
+    retries:
+        Re-requests per page after a retryable failure.
+    backoff:
+        First retry delay in seconds; doubled on each further retry.
+    """
+
+    def __init__(
+        self,
+        token: Optional[str] = None,
+        *,
+        base_url: str = DEFAULT_BASE_URL,
+        connections: int = 4,
+        page_size: int = 1000,
+        timeout: float = 60.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+    ) -> None:
+        if connections < 1:
+            raise ValueError("connections must be >= 1")
+        if page_size < 1:
+            raise ValueError("page_size must be >= 1")
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported base_url: {base_url!r}")
+        self.token = token
+        self.connections = connections
+        self.page_size = page_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port or (443 if parts.scheme == "https" else 80)
+        self._path_prefix = parts.path.rstrip("/")
+        self._pool: Optional[_ConnectionPool] = None
+
+    @property
+    def connections_opened(self) -> int:
+        """TCP connections opened so far (fewer than requests when reused)."""
+        return self._pool.opened if self._pool else 0
+
+    def _get_pool(self) -> _ConnectionPool:
+        if self._pool is None:
+            self._pool = _ConnectionPool(self._scheme, self._host, self._port, self.connections, self.timeout)
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    async def __aenter__(self) -> "ApifyDatasetClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    def _request(self, dataset_id: str, offset: int, limit: int) -> bytes:
+        query = urlencode({"format": "jsonl", "clean": "1", "offset": offset, "limit": limit})
+        path = f"{self._path_prefix}/v2/datasets/{quote(dataset_id, safe='~')}/items?{query}"
+        host = self._host if self._port in (80, 443) else f"{self._host}:{self._port}"
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host}",
+            "Accept: application/jsonl",
+            "Accept-Encoding: gzip",
+            "Connection: keep-alive",
+        ]
+        if self.token:
+            lines.append(f"Authorization: Bearer {self.token}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _iter_lines(
+        self,
+        dataset_id: str,
+        offset: int,
+        limit: int,
+        on_headers: Callable[[Dict[str, str]], None],
+    ) -> AsyncIterator[bytes]:
+        pool = self._get_pool()
+        conn = await pool.acquire()
+        reusable = False
+        try:
+            conn.writer.write(self._request(dataset_id, offset, limit))
+            await conn.writer.drain()
+            status, headers = await asyncio.wait_for(_read_head(conn.reader), self.timeout)
+            keep_alive = headers.get("connection", "").lower() != "close" and (
+                "content-length" in headers or "transfer-encoding" in headers
+            )
+            if status != 200:
+                body = b"".join([chunk async for chunk in _iter_body(conn.reader, headers, self.timeout)])
+                reusable = keep_alive
+                message = f"Apify dataset request failed ({status}): {body[:400]!r}"
+                if status in _RETRYABLE_STATUS:
+                    raise _RetryableError(message)
+                raise ApifyDatasetError(message, status)
+            on_headers(headers)
+
+            gzipped = headers.get("content-encoding", "").lower() == "gzip"
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+            pending = b""
+            async for chunk in _iter_body(conn.reader, headers, self.timeout):
+                pending += inflater.decompress(chunk) if inflater else chunk
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield line
+            if inflater:
+                if not inflater.eof:
+                    raise _RetryableError("Gzip body ended before the end of its stream")
+                pending += inflater.flush()
+            if pending.strip():
+                yield pending
+            reusable = keep_alive
+        finally:
+            pool.release(conn, reusable)
+
+    async def _fetch_page(
+        self,
+        dataset_id: str,
+        page: _Page,
+        on_total: Callable[[Optional[int]], None],
+        on_error: Optional[Callable[[ItemError], None]],
+    ) -> None:
+        attempt = 0
+        expected: Optional[int] = None  # Items the current response should carry
+
+        def _headers(headers: Dict[str, str]) -> None:
+            nonlocal expected
+            total = _int_header(headers, "x-apify-pagination-total")
+            expected = _int_header(headers, "x-apify-pagination-count")
+            if expected is None and total is not None:
+                expected = max(0, min(page.limit - page.count, total - page.offset - page.count))
+            on_total(total)
+
+        try:
+            while page.count < page.limit:
+                requested_at = page.count
+                expected = None
+                lines = self._iter_lines(dataset_id, page.offset + page.count, page.limit - page.count, _headers)
+                try:
+                    async with aclosing(lines):
+                        async for line in lines:
+                            index = page.offset + page.count
+                            page.count += 1
+                            try:
+                                page.queue.put_nowait((index, json.loads(line)))
+                            except json.JSONDecodeError as exc:
+                                if on_error is not None:
+                                    on_error(
+                                        ItemError(
+                                            index, f"{type(exc).__name__}: {exc}", line.decode("utf-8", "replace")
+                                        )
+                                    )
+                    delivered = page.count - requested_at
+                    if expected is not None and delivered < expected:
+                        raise _RetryableError(f"Response ended after {delivered} of {expected} items")
+                    break
+                except (_RetryableError, OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as exc:
+                    attempt += 1
+                    if attempt > self.retries:
+                        raise ApifyDatasetError(
+                            f"Dataset page at offset {page.offset + page.count} failed "
+                            f"after {self.retries} retries: {exc}"
+                        ) from exc
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        except BaseException as exc:
+            page.queue.put_nowait((_END, exc))
+            raise
+        page.queue.put_nowait((_END, None))
+
+    async def iter_items(
+        self,
+        dataset_id: str,
+        *,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        on_error: Optional[Callable[[ItemError], None]] = None,
+    ) -> AsyncIterator[Any]:
+        """Yield the dataset's items in order.
+
+        Lines that are not valid JSON are reported to *on_error* (with
+        their dataset index) and skipped.  When the server does not report
+        the dataset size, pages are fetched one after another until a
+        short page.
+        """
+        async for _index, item in self._iter_indexed(dataset_id, offset, limit, on_error):
+            yield item
+
+    async def _iter_indexed(
+        self,
+        dataset_id: str,
+        offset: int,
+        limit: Optional[int],
+        on_error: Optional[Callable[[ItemError], None]],
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        first_limit = self.page_size if limit is None else min(self.page_size, limit)
+        if first_limit <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        total_known: "asyncio.Future[Optional[int]]" = loop.create_future()
+
+        def _on_total(total: Optional[int]) -> None:
+            if not total_known.done():
+                total_known.set_result(total)
+
+        def _start(start: int, size: int) -> Tuple[_Page, "asyncio.Task[None]"]:
+            page = _Page(start, size)
+            return page, asyncio.create_task(self._fetch_page(dataset_id, page, _on_total, on_error))
+
+        in_flight: Deque[Tuple[_Page, "asyncio.Task[None]"]] = deque([_start(offset, first_limit)])
+        try:
+            first_task = in_flight[0][1]
+            await asyncio.wait([total_known, first_task], return_when=asyncio.FIRST_COMPLETED)
+            total = total_known.result() if total_known.done() else None
+            end = None
+            if total is not None:
+                end = total if limit is None else min(total, offset + limit)
+            next_start = offset + first_limit
+            window = 2 * self.connections
+
+            while in_flight:
+                while end is not None and next_start < end and len(in_flight) < window:
+                    size = min(self.page_size, end - next_start)
+                    in_flight.append(_start(next_start, size))
+                    next_start += size
+                page, task = in_flight.popleft()
+                while True:
+                    index, item = await page.queue.get()
+                    if index is _END:
+                        if item is not None:
+                            raise item
+                        break
+                    yield index, item
+                await task
+                remaining = None if limit is None else offset + limit - next_start
+                if end is None and page.count == page.limit and (remaining is None or remaining > 0):
+                    size = self.page_size if remaining is None else min(self.page_size, remaining)
+                    in_flight.append(_start(next_start, size))
+                    next_start += size
+        finally:
+            for _page, task in in_flight:
+                task.cancel()
+            if in_flight:
+                await asyncio.gather(*(task for _page, task in in_flight), return_exceptions=True)
+
+    async def iter_normalize(
+        self,
+        dataset_id: str,
+        adapter: Optional[BaseSerpAdapter] = None,
+        *,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        on_error: Optional[Callable[[ItemError], None]] = None,
+    ) -> AsyncIterator[NormalizedSerpResult]:
+        """Normalize the dataset's items as they arrive, in dataset order.
+
+        Items that fail to decode or normalize are passed to *on_error*
+        (when given) and skipped.
+        """
+        adapter = adapter or ApifyGoogleSearchAdapter()
+        items = self._iter_indexed(dataset_id, offset, limit, on_error)
+        async with aclosing(items):
+            async for index, raw in items:
+                try:
+                    result = adapter.normalize(raw)
+                except Exception as exc:  # noqa: BLE001 – reported, stream continues
+                    if on_error is not None:
+                        on_error(ItemError(index, f"{type(exc).__name__}: {exc}", raw))
+                    continue
+                yield result
@@ -0,0 +1,256 @@
+"""File-backed archetype knowledge base.
+
+The archetype root-domain dictionaries can be shipped as a compact binary
+file instead of module constants.  Readers ``mmap`` the file read-only, so
+forked worker processes share the same page-cache pages, and
+:class:`ReloadingArchetypeKB` swaps in a new file atomically when it changes
+on disk::
+
+    write_archetype_kb("archetypes.kb", {"directory": [...], ...}, version=7)
+    use_archetype_index(ReloadingArchetypeKB("archetypes.kb"))
+
+File layout (little-endian)::
+
+    header   32 bytes   magic "SAKB", format version, KB version, counts,
+                        section offsets
+    slots    12 bytes × n_slots   open-addressing hash table:
+                        crc32(domain), string offset, string length,
+                        archetype rank, used flag
+    strings  UTF-8 root domains, concatenated
+
+A lookup hashes each label suffix of the hostname and probes the table, so
+its cost is independent of the number of stored domains.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Mapping, Optional, Tuple, Union
+
+from serp_adapter.serp_archetype import _INDEXED_ARCHETYPES, ArchetypeIndex
+
+MAGIC = b"SAKB"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIIIII")
+_SLOT = struct.Struct("<IIHBB")
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+class ArchetypeKBError(ValueError):
+    """The archetype KB file is missing, truncated or of an unknown format."""
+
+
+def _slot_count(entries: int) -> int:
+    slots = 8
+    while slots < entries * 2:
+        slots *= 2
+    return slots
+
+
+def write_archetype_kb(
+    path: PathLike,
+    domains_by_archetype: Mapping[str, Iterable[str]],
+    version: int,
+) -> None:
+    """Write a KB file atomically (temp file in the same directory + rename).
+
+    A domain listed under several archetypes keeps the highest-precedence
+    one, matching :class:`~serp_adapter.serp_archetype.ArchetypeIndex`.
+    """
+    index = ArchetypeIndex()
+    for archetype, domains in domains_by_archetype.items():
+        index.add(archetype, domains)
+    roots = sorted(index.items())
+
+    n_slots = _slot_count(len(roots))
+    mask = n_slots - 1
+    slots = bytearray(_SLOT.size * n_slots)
+    strings = bytearray()
+    for domain, archetype in roots:
+        rank = _INDEXED_ARCHETYPES.index(archetype)
+        encoded = domain.encode("utf-8")
+        if len(encoded) > 0xFFFF:
+            raise ArchetypeKBError(f"Domain too long for KB: {domain[:80]!r}")
+        digest = zlib.crc32(encoded)
+        slot = digest & mask
+        while slots[slot * _SLOT.size + _SLOT.size - 1]:
+            slot = (slot + 1) & mask
+        _SLOT.pack_into(slots, slot * _SLOT.size, digest, len(strings), len(encoded), rank, 1)
+        strings += encoded
+
+    slots_offset = _HEADER.size
+    strings_offset = slots_offset + len(slots)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        version,
+        len(roots),
+        n_slots,
+        slots_offset,
+        strings_offset,
+        len(strings),
+    )
+
+    target = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(header)
+            fh.write(slots)
+            fh.write(strings)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_name, target)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ArchetypeKB:
+    """Read-only, memory-mapped archetype KB.
+
+    Implements the same ``match(domain)`` contract as
+    :class:`~serp_adapter.serp_archetype.ArchetypeIndex`.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as fh:
+            try:
+                self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:  # empty file
+                raise ArchetypeKBError(f"Empty archetype KB: {self.path}") from exc
+        if len(self._mm) < _HEADER.size:
+            raise ArchetypeKBError(f"Truncated archetype KB: {self.path}")
+        (
+            magic,
+            fmt,
+            _reserved,
+            self.version,
+            self.entries,
+            self._n_slots,
+            self._slots_offset,
+            self._strings_offset,
+            strings_size,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ArchetypeKBError(f"Not an archetype KB (format {fmt}): {self.path}")
+        expected = self._strings_offset + strings_size
+        if (
+            len(self._mm) != expected
+            or not self._n_slots
+            or self._n_slots & (self._n_slots - 1)
+            or self.entries >= self._n_slots  # A full table has no empty slot to end a probe
+        ):
+            raise ArchetypeKBError(f"Corrupt archetype KB: {self.path}")
+        self._mask = self._n_slots - 1
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def _lookup(self, encoded: bytes) -> Optional[int]:
+        mm = self._mm
+        digest = zlib.crc32(encoded)
+        slot = digest & self._mask
+        for _ in range(self._n_slots):
+            slot_hash, offset, length, rank, used = _SLOT.unpack_from(
+                mm, self._slots_offset + slot * _SLOT.size
+            )
+            if not used:
+                return None
+            if slot_hash == digest and length == len(encoded):
+                start = self._strings_offset + offset
+                if mm[start : start + length] == encoded:
+                    return rank
+            slot = (slot + 1) & self._mask
+        return None
+
+    def match(self, domain: str) -> Optional[str]:
+        """Return the best archetype whose root equals or contains *domain*."""
+        encoded = domain.encode("utf-8")
+        best = len(_INDEXED_ARCHETYPES)
+        start = 0
+        while True:
+            rank = self._lookup(encoded[start:])
+            if rank is not None and rank < best:
+                best = rank
+                if best == 0:
+                    break
+            dot = encoded.find(b".", start)
+            if dot < 0:
+                break
+            start = dot + 1
+        return _INDEXED_ARCHETYPES[best] if best < len(_INDEXED_ARCHETYPES) else None
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def _file_identity(path: Path) -> Tuple[int, int, int]:
+    st = os.stat(path)
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class ReloadingArchetypeKB:
+    """An :class:`ArchetypeKB` that follows its file across atomic replacements.
+
+    At most every *check_interval* seconds a lookup ``stat``s the file; if it
+    was replaced, the new file is mapped and swapped in with a single
+    reference assignment.  In-flight lookups finish against the old mapping,
+    which is released once unreferenced.  An unreadable replacement is
+    ignored (see :attr:`last_error`) and the current KB keeps serving.
+    """
+
+    def __init__(self, path: PathLike, check_interval: float = 5.0) -> None:
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.last_error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._identity = _file_identity(self.path)
+        self._kb = ArchetypeKB(self.path)
+        self._next_check = time.monotonic() + check_interval
+
+    @property
+    def version(self) -> int:
+        return self._kb.version
+
+    def __len__(self) -> int:
+        return len(self._kb)
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the file if it changed since it was last mapped."""
+        if not self._lock.acquire(blocking=False):
+            return False  # Another thread is already reloading.
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                identity = _file_identity(self.path)
+                if identity == self._identity:
+                    return False
+                kb = ArchetypeKB(self.path)
+            except (OSError, ArchetypeKBError) as exc:
+                self.last_error = exc
+                return False
+            self._kb, self._identity, self.last_error = kb, identity, None
+            return True
+        finally:
+            self._lock.release()
+
+    def match(self, domain: str) -> Optional[str]:
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._kb.match(domain)
+
@@ -0,0 +1,395 @@
+"""Delta-encoded archive for cold SERP history.
+
+``serp_results`` and ``step2_serp_results`` keep every row of every
+snapshot, although from one day to the next a SERP usually only swaps a
+couple of positions.  The archive (migration 0034) stores one block per
+series and UTC month in ``serp_archive_blocks``::
+
+    records    each distinct result row (url, title, snippet, ...) once
+    snapshots  [serp_id, created_at, row_created_at,
+                entered [[rank, record]...],
+                dropped [[rank, record]...],
+                moved   [[from_rank, to_rank, record]...]]
+
+The first snapshot's edit script, taken against an empty SERP, is the
+keyframe.  Each later script holds only what changed since the snapshot
+before it.  A block is zlib-compressed JSON.  :func:`load_archived_serp`
+rebuilds a snapshot by replaying the edit scripts from the keyframe up to
+it.  Within a month that is the keyframe plus the changes, not 20 rows a
+day::
+
+    candidates = archive_candidates(conn, "serp_results", cutoff_ms)
+    with conn:
+        archive_serps(conn, "serp_results", candidates)
+    rows = load_archived_serp(conn, serp_id)
+
+``scripts/compact_serp_archive.py`` runs this as a job.  Runs keep their
+``serp_runs`` / ``step2_serp_snapshots`` rows; only result rows move.
+Readers that scan history (the rollup, rank series and rank index
+rebuilds, :func:`~serp_adapter.refresh.load_serp_history`) take the rows
+of archived runs from :func:`iter_archived_serps`; a run that has hot rows
+again after a rewrite is read from the hot table.
+Step 2 ``result_id`` values (random and never referenced) are not kept,
+and a snapshot's rows share the earliest row ``created_at``.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+FORMAT_VERSION = 1
+
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+
+# (serp_id, series_key, created_at)
+Candidate = Tuple[str, str, int]
+
+
+class ArchiveError(ValueError):
+    """An archive block is corrupt or of an unknown format."""
+
+
+@dataclass(frozen=True)
+class ArchiveSource:
+    """A hot result table the archive can take rows from."""
+
+    table: str
+    columns: Tuple[str, ...]
+    candidates_sql: str  # (serp_id, series_key, created_at) with hot rows, created before ?
+    row_time: Optional[str] = None  # Per-row timestamp column, if any
+
+
+SOURCES: Dict[str, ArchiveSource] = {
+    "serp_results": ArchiveSource(
+        table="serp_results",
+        columns=("url", "url_hash", "domain", "root_domain", "title", "snippet"),
+        candidates_sql="""
+            SELECT s.serp_id,
+                   COALESCE(s.keyword_norm, s.phrase) || '|' || COALESCE(s.region_key, '') || '|'
+                     || COALESCE(s.device_key, s.device),
+                   s.created_at
+            FROM serp_runs s
+            WHERE s.created_at < ?
+              AND EXISTS (SELECT 1 FROM serp_results r WHERE r.serp_id = s.serp_id)
+        """,
+    ),
+    "step2_serp_results": ArchiveSource(
+        table="step2_serp_results",
+        columns=("url", "url_hash", "domain", "page_type", "title_snippet", "desc_snippet"),
+        candidates_sql="""
+            SELECT s.serp_id, s.site_id || '|' || s.keyword || '|' || s.geo, s.scraped_at
+            FROM step2_serp_snapshots s
+            WHERE s.scraped_at < ?
+              AND EXISTS (SELECT 1 FROM step2_serp_results r WHERE r.serp_id = s.serp_id)
+        """,
+        row_time="created_at",
+    ),
+}
+
+
+@dataclass
+class Snapshot:
+    """One stored SERP: ``(rank, record values)`` rows."""
+
+    serp_id: str
+    created_at: int
+    rows: List[Tuple[int, tuple]] = field(default_factory=list)
+    row_created_at: Optional[int] = None
+
+
+# Multiset of (rank, record id) -> count; duplicate ranks are legal in step 2.
+_State = Dict[Tuple[int, int], int]
+
+
+def _diff(old: _State, new: _State) -> Tuple[list, list, list]:
+    """Edit script turning *old* into *new*: entered, dropped, moved."""
+    vacated: Dict[int, List[int]] = {}
+    for (rank, record), count in old.items():
+        for _ in range(count - new.get((rank, record), 0)):
+            vacated.setdefault(record, []).append(rank)
+    entered: list = []
+    moved: list = []
+    for (rank, record), count in sorted(new.items()):
+        for _ in range(count - old.get((rank, record), 0)):
+            ranks = vacated.get(record)
+            if ranks:
+                moved.append([ranks.pop(0), rank, record])
+            else:
+                entered.append([rank, record])
+    dropped = sorted([rank, record] for record, ranks in vacated.items() for rank in ranks)
+    return entered, dropped, moved
+
+
+def _take(state: _State, key: Tuple[int, int]) -> None:
+    count = state.get(key, 0)
+    if count <= 0:
+        raise ArchiveError(f"Edit script removes a missing row: {key}")
+    if count == 1:
+        del state[key]
+    else:
+        state[key] = count - 1
+
+
+def _apply(state: _State, entered: list, dropped: list, moved: list) -> None:
+    for rank, record in dropped:
+        _take(state, (rank, record))
+    for old_rank, _new_rank, record in moved:
+        _take(state, (old_rank, record))
+    for _old_rank, rank, record in moved:
+        state[(rank, record)] = state.get((rank, record), 0) + 1
+    for rank, record in entered:
+        state[(rank, record)] = state.get((rank, record), 0) + 1
+
+
+def encode_block(columns: Sequence[str], snapshots: Iterable[Snapshot]) -> bytes:
+    """Encode snapshots (oldest first) as a keyframe plus edit scripts."""
+    records: List[tuple] = []
+    record_ids: Dict[tuple, int] = {}
+    entries: list = []
+    state: _State = {}
+    for snapshot in snapshots:
+        new: _State = {}
+        for rank, values in snapshot.rows:
+            record = record_ids.get(values)
+            if record is None:
+                record = record_ids[values] = len(records)
+                records.append(values)
+            new[(rank, record)] = new.get((rank, record), 0) + 1
+        entries.append([snapshot.serp_id, snapshot.created_at, snapshot.row_created_at, *_diff(state, new)])
+        state = new
+    payload = {"v": FORMAT_VERSION, "columns": list(columns), "records": records, "snapshots": entries}
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+
+
+class ArchiveBlock:
+    """A decoded block; snapshots are rebuilt on demand."""
+
+    def __init__(self, data: bytes) -> None:
+        try:
+            payload = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError) as exc:
+            raise ArchiveError("Corrupt archive block") from exc
+        if not isinstance(payload, dict) or payload.get("v") != FORMAT_VERSION:
+            raise ArchiveError("Unknown archive block format")
+        self.columns: Tuple[str, ...] = tuple(payload["columns"])
+        self._records: List[tuple] = [tuple(record) for record in payload["records"]]
+        self._entries: list = payload["snapshots"]
+        self._positions = {entry[0]: i for i, entry in enumerate(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, serp_id: str) -> bool:
+        return serp_id in self._positions
+
+    def _snapshot(self, entry: list, state: _State) -> Snapshot:
+        rows = [
+            (rank, self._records[record])
+            for (rank, record), count in sorted(state.items())
+            for _ in range(count)
+        ]
+        return Snapshot(entry[0], entry[1], rows, entry[2])
+
+    def snapshot(self, serp_id: str) -> Snapshot:
+        """Replay the keyframe and edit scripts up to *serp_id*."""
+        position = self._positions.get(serp_id)
+        if position is None:
+            raise KeyError(serp_id)
+        state: _State = {}
+        for entry in self._entries[: position + 1]:
+            _apply(state, *entry[3:6])
+        return self._snapshot(self._entries[position], state)
+
+    def snapshots(self) -> List[Snapshot]:
+        """Every snapshot, oldest first."""
+        state: _State = {}
+        out = []
+        for entry in self._entries:
+            _apply(state, *entry[3:6])
+            out.append(self._snapshot(entry, state))
+        return out
+
+
+def _period(created_at: int) -> str:
+    return datetime.fromtimestamp(created_at // 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def archive_candidates(conn: sqlite3.Connection, source: str, before_ms: int) -> List[Candidate]:
+    """Snapshots of *source* created before *before_ms* that still have hot rows.
+
+    Sorted by series and time, so consecutive candidates share blocks.
+    """
+    rows = conn.execute(SOURCES[source].candidates_sql, (before_ms,)).fetchall()
+    rows.sort(key=lambda row: (row[1], row[2], row[0]))
+    return rows
+
+
+def _hot_rows(conn: sqlite3.Connection, spec: ArchiveSource, serp_ids: Sequence[str]) -> Dict[str, list]:
+    select = ", ".join(("serp_id", "rank", *spec.columns, spec.row_time or "NULL"))
+    found: Dict[str, list] = {}
+    for start in range(0, len(serp_ids), _SQL_CHUNK):
+        chunk = list(serp_ids[start : start + _SQL_CHUNK])
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT {select} FROM {spec.table} WHERE serp_id IN ({marks})", chunk):
+            found.setdefault(row[0], []).append(row[1:])
+    return found
+
+
+def archive_serps(
+    conn: sqlite3.Connection,
+    source: str,
+    candidates: Sequence[Candidate],
+    *,
+    now_ms: Optional[int] = None,
+) -> Tuple[int, int, int]:
+    """Move the result rows of *candidates* into their archive blocks.
+
+    Runs inside the caller's transaction.  A snapshot already in a block is
+    replaced.  Returns ``(snapshots, rows, blocks)`` written.
+    """
+    spec = SOURCES[source]
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    hot = _hot_rows(conn, spec, [serp_id for serp_id, _series, _at in candidates])
+    groups: Dict[Tuple[str, str], List[Snapshot]] = {}
+    for serp_id, series, created_at in candidates:
+        rows = hot.get(serp_id)
+        if not rows:
+            continue
+        row_times = [row[-1] for row in rows if row[-1] is not None]
+        snapshot = Snapshot(
+            serp_id,
+            created_at,
+            sorted((row[0], tuple(row[1:-1])) for row in rows),
+            min(row_times) if row_times else None,
+        )
+        groups.setdefault((series, _period(created_at)), []).append(snapshot)
+
+    archived_rows = 0
+    index_rows = []
+    for (series, period), snapshots in groups.items():
+        found = conn.execute(
+            "SELECT data FROM serp_archive_blocks WHERE source = ? AND series_key = ? AND period = ?",
+            (source, series, period),
+        ).fetchone()
+        merged: Dict[str, Snapshot] = {}
+        if found is not None:
+            merged = {snapshot.serp_id: snapshot for snapshot in ArchiveBlock(found[0]).snapshots()}
+        merged.update((snapshot.serp_id, snapshot) for snapshot in snapshots)
+        ordered = sorted(merged.values(), key=lambda snapshot: (snapshot.created_at, snapshot.serp_id))
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO serp_archive_blocks
+              (source, series_key, period, n_snapshots, n_rows, data, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                source, series, period, len(ordered), sum(len(snapshot.rows) for snapshot in ordered),
+                encode_block(spec.columns, ordered), now_ms,
+            ),
+        )
+        for snapshot in snapshots:
+            archived_rows += len(snapshot.rows)
+            index_rows.append((source, snapshot.serp_id, series, period, snapshot.created_at))
+
+    conn.executemany(
+        "INSERT OR REPLACE INTO serp_archive_snapshots (source, serp_id, series_key, period, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        index_rows,
+    )
+    conn.executemany(f"DELETE FROM {spec.table} WHERE serp_id = ?", [(row[1],) for row in index_rows])
+    return len(index_rows), archived_rows, len(groups)
+
+
+def load_archived_serp(
+    conn: sqlite3.Connection, serp_id: str, source: str = "serp_results"
+) -> List[Dict[str, object]]:
+    """Result rows of an archived snapshot, shaped like the hot table's rows.
+
+    Returns ``[]`` when *serp_id* is not archived.
+    """
+    found = conn.execute(
+        """
+        SELECT b.data FROM serp_archive_snapshots s
+        JOIN serp_archive_blocks b
+          ON b.source = s.source AND b.series_key = s.series_key AND b.period = s.period
+        WHERE s.source = ? AND s.serp_id = ?
+        """,
+        (source, serp_id),
+    ).fetchone()
+    if found is None:
+        return []
+    block = ArchiveBlock(found[0])
+    return _row_dicts(block.columns, block.snapshot(serp_id), SOURCES[source].row_time)
+
+
+def _row_dicts(columns: Sequence[str], snapshot: Snapshot, row_time: Optional[str]) -> List[Dict[str, object]]:
+    out = []
+    for rank, values in snapshot.rows:
+        row: Dict[str, object] = {"serp_id": snapshot.serp_id, "rank": rank, **dict(zip(columns, values))}
+        if row_time:
+            row[row_time] = snapshot.row_created_at
+        out.append(row)
+    return out
+
+
+def has_archive(conn: sqlite3.Connection) -> bool:
+    """Whether migration 0034 has been applied to *conn*."""
+    found = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'serp_archive_snapshots'"
+    ).fetchone()
+    return found is not None
+
+
+def iter_archived_serps(
+    conn: sqlite3.Connection, serp_ids: Iterable[str], source: str = "serp_results"
+) -> Iterator[Tuple[str, List[Dict[str, object]]]]:
+    """``(serp_id, rows)`` for each archived snapshot in *serp_ids*, in order.
+
+    The bulk form of :func:`load_archived_serp`, for readers that scan
+    history: ids that are not archived are skipped, and a block is decoded
+    once per run of consecutive ids stored in it, so pass ids ordered by
+    series and time.
+    """
+    row_time = SOURCES[source].row_time
+    ids = iter(serp_ids)
+    current: Optional[Tuple[str, str]] = None
+    columns: Tuple[str, ...] = ()
+    snapshots: Dict[str, Snapshot] = {}
+    while True:
+        chunk = list(islice(ids, _SQL_CHUNK))
+        if not chunk:
+            return
+        marks = ",".join("?" * len(chunk))
+        located = {
+            serp_id: (series, period)
+            for serp_id, series, period in conn.execute(
+                "SELECT serp_id, series_key, period FROM serp_archive_snapshots "
+                f"WHERE source = ? AND serp_id IN ({marks})",
+                [source, *chunk],
+            )
+        }
+        for serp_id in chunk:
+            key = located.get(serp_id)
+            if key is None:
+                continue
+            if key != current:
+                found = conn.execute(
+                    "SELECT data FROM serp_archive_blocks WHERE source = ? AND series_key = ? AND period = ?",
+                    (source, *key),
+                ).fetchone()
+                if found is None:
+                    raise ArchiveError(f"Archive block missing for {serp_id}")
+                block = ArchiveBlock(found[0])
+                current, columns = key, block.columns
+                snapshots = {snapshot.serp_id: snapshot for snapshot in block.snapshots()}
+            snapshot = snapshots.get(serp_id)
+            if snapshot is None:
+                raise ArchiveError(f"Archive block does not hold {serp_id}")
+            yield serp_id, _row_dicts(columns, snapshot, row_time)
@@ -0,0 +1,279 @@
+"""Columnar container for many normalized SERPs.
+
+:class:`SerpResultBatch` stores the organic results of many
+:class:`~serp_adapter.models.NormalizedSerpResult` objects as parallel arrays
+instead of one :class:`~serp_adapter.models.SerpResultItem` per row:
+
+* ``rank`` – ``array('i')``
+* ``domain`` / ``root_domain`` – ``array('I')`` of ids into one interned
+  domain table
+* ``url`` / ``title`` / ``snippet`` – ``array('Q')`` offsets into one shared
+  UTF-8 ``bytearray`` per column
+
+SERP-level metadata (query, location, device, …) is kept once per SERP.
+Conversion in both directions is lossless::
+
+    batch = SerpResultBatch.from_results(results)
+    assert batch.to_results() == results
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from serp_adapter.models import (
+    Location,
+    NormalizedSerpResult,
+    SerpResultItem,
+    SerpSource,
+)
+
+_LocationKey = Tuple[str, Optional[str], Optional[str], Optional[str]]
+_SourceKey = Optional[Tuple[str, Optional[str], Optional[str]]]
+_SerpMeta = Tuple[str, _LocationKey, str, str, int, _SourceKey]
+
+
+class _StringColumn:
+    """Append-only UTF-8 string column backed by one shared buffer."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+        self.offsets = array("Q", [0])
+
+    def append(self, value: str) -> None:
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def get(self, index: int) -> str:
+        return self.data[self.offsets[index] : self.offsets[index + 1]].decode("utf-8")
+
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class SerpResultRow:
+    """Read-only view of one row of a :class:`SerpResultBatch`.
+
+    A view holds only a reference to the batch and a row index; field values
+    are read from the batch columns on access.
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: "SerpResultBatch", index: int) -> None:
+        self._batch = batch
+        self._index = index
+
+    @property
+    def rank(self) -> int:
+        return self._batch.ranks[self._index]
+
+    @property
+    def domain(self) -> str:
+        return self._batch.domains[self._batch.domain_ids[self._index]]
+
+    @property
+    def root_domain(self) -> str:
+        return self._batch.domains[self._batch.root_domain_ids[self._index]]
+
+    @property
+    def url(self) -> str:
+        return self._batch.urls.get(self._index)
+
+    @property
+    def title(self) -> str:
+        return self._batch.titles.get(self._index)
+
+    @property
+    def snippet(self) -> str:
+        return self._batch.snippets.get(self._index)
+
+    def to_item(self) -> SerpResultItem:
+        """Materialize this row as a :class:`SerpResultItem`."""
+        return SerpResultItem(
+            rank=self.rank,
+            title=self.title,
+            url=self.url,
+            domain=self.domain,
+            snippet=self.snippet,
+            root_domain=self.root_domain,
+        )
+
+    def __repr__(self) -> str:
+        return f"SerpResultRow(rank={self.rank!r}, domain={self.domain!r}, url={self.url!r})"
+
+
+class SerpResultBatch:
+    """Columnar storage for the results of many SERPs.
+
+    ``len(batch)`` is the number of SERPs; :attr:`num_rows` is the total
+    number of organic results across all of them.
+    """
+
+    __slots__ = (
+        "ranks",
+        "domain_ids",
+        "root_domain_ids",
+        "domains",
+        "_domain_ids_by_name",
+        "urls",
+        "titles",
+        "snippets",
+        "serp_offsets",
+        "_meta",
+        "_locations",
+    )
+
+    def __init__(self) -> None:
+        self.ranks = array("i")
+        self.domain_ids = array("I")
+        self.root_domain_ids = array("I")
+        self.domains: List[str] = []
+        self._domain_ids_by_name: Dict[str, int] = {}
+        self.urls = _StringColumn()
+        self.titles = _StringColumn()
+        self.snippets = _StringColumn()
+        self.serp_offsets = array("Q", [0])
+        self._meta: List[_SerpMeta] = []
+        self._locations: Dict[_LocationKey, _LocationKey] = {}
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_results(cls, results: Iterable[NormalizedSerpResult]) -> "SerpResultBatch":
+        """Build a batch from normalized results (consumed lazily)."""
+        batch = cls()
+        batch.extend(results)
+        return batch
+
+    def _intern_domain(self, domain: str) -> int:
+        domain_id = self._domain_ids_by_name.get(domain)
+        if domain_id is None:
+            domain_id = len(self.domains)
+            self.domains.append(domain)
+            self._domain_ids_by_name[domain] = domain_id
+        return domain_id
+
+    def append(self, result: NormalizedSerpResult) -> None:
+        """Append one SERP and all of its result rows."""
+        for item in result.results:
+            self.ranks.append(item.rank)
+            self.domain_ids.append(self._intern_domain(item.domain))
+            self.root_domain_ids.append(self._intern_domain(item.root_domain))
+            self.urls.append(item.url)
+            self.titles.append(item.title)
+            self.snippets.append(item.snippet)
+        self.serp_offsets.append(len(self.ranks))
+
+        loc = result.location
+        loc_key = (loc.country, loc.region, loc.city, loc.language)
+        loc_key = self._locations.setdefault(loc_key, loc_key)
+        src = result.source
+        src_key = None if src is None else (src.provider, src.actor, src.run_id)
+        self._meta.append(
+            (result.query, loc_key, result.device, result.engine, result.ts, src_key)
+        )
+
+    def extend(self, results: Iterable[NormalizedSerpResult]) -> None:
+        for result in results:
+            self.append(result)
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._meta)
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.ranks)
+
+    def row(self, index: int) -> SerpResultRow:
+        """Return a view of result row *index* (batch-wide numbering)."""
+        if not 0 <= index < len(self.ranks):
+            raise IndexError("row index out of range")
+        return SerpResultRow(self, index)
+
+    def row_range(self, serp_index: int) -> range:
+        """Batch-wide row indices belonging to SERP *serp_index*."""
+        return range(self.serp_offsets[serp_index], self.serp_offsets[serp_index + 1])
+
+    def rows(self, serp_index: int) -> List[SerpResultRow]:
+        """Views of the result rows of SERP *serp_index*, in stored order."""
+        return [SerpResultRow(self, i) for i in self.row_range(serp_index)]
+
+    def serp(self, serp_index: int) -> NormalizedSerpResult:
+        """Materialize SERP *serp_index* as a :class:`NormalizedSerpResult`."""
+        query, loc, device, engine, ts, src = self._meta[serp_index]
+        return NormalizedSerpResult(
+            query=query,
+            location=Location(country=loc[0], region=loc[1], city=loc[2], language=loc[3]),
+            device=device,
+            engine=engine,
+            ts=ts,
+            results=[row.to_item() for row in self.rows(serp_index)],
+            source=None if src is None else SerpSource(provider=src[0], actor=src[1], run_id=src[2]),
+        )
+
+    def __iter__(self) -> Iterator[NormalizedSerpResult]:
+        for serp_index in range(len(self)):
+            yield self.serp(serp_index)
+
+    def to_results(self) -> List[NormalizedSerpResult]:
+        return list(self)
+
+    def nbytes(self) -> int:
+        """Approximate size of the column buffers (excluding SERP metadata)."""
+        return (
+            self.ranks.itemsize * len(self.ranks)
+            + self.domain_ids.itemsize * len(self.domain_ids)
+            + self.root_domain_ids.itemsize * len(self.root_domain_ids)
+            + sum(len(d) for d in self.domains)
+            + self.urls.nbytes()
+            + self.titles.nbytes()
+            + self.snippets.nbytes()
+            + self.serp_offsets.itemsize * len(self.serp_offsets)
+        )
+
+    # Pickle only the columns; the lookup dicts are rebuilt on load.
+    def __getstate__(self) -> tuple:
+        return (
+            self.ranks,
+            self.domain_ids,
+            self.root_domain_ids,
+            self.domains,
+            self.urls.data,
+            self.urls.offsets,
+            self.titles.data,
+            self.titles.offsets,
+            self.snippets.data,
+            self.snippets.offsets,
+            self.serp_offsets,
+            self._meta,
+        )
+
+    def __setstate__(self, state: tuple) -> None:
+        self.__init__()
+        (
+            self.ranks,
+            self.domain_ids,
+            self.root_domain_ids,
+            self.domains,
+            self.urls.data,
+            self.urls.offsets,
+            self.titles.data,
+            self.titles.offsets,
+            self.snippets.data,
+            self.snippets.offsets,
+            self.serp_offsets,
+            self._meta,
+        ) = state
+        self._domain_ids_by_name = {d: i for i, d in enumerate(self.domains)}
+        for meta in self._meta:
+            self._locations.setdefault(meta[1], meta[1])
@@ -0,0 +1,245 @@
+"""Cross-user coalescing of identical SERP fetches.
+
+``serp_watchlist`` is unique per user, so many users can watch the same
+phrase, region and device.  Their fetches share a series (``serp_key``
+without the day), and :class:`SerpCoalescer` makes them share the work
+too::
+
+    coalescer = SerpCoalescer(conn, router.fetch, freshness_seconds=6 * 3600)
+    outcomes = await coalescer.refresh_watches(load_watches(conn))
+
+For each request:
+
+1. if a fetch for the same series is already in flight, wait for it
+   (single-flight);
+2. otherwise, if an ``ok`` ``serp_runs`` row of that series was created
+   inside the freshness window, reuse it;
+3. otherwise fetch, and store the result as a new run owned by the
+   requesting user.
+
+The day is left out of the match because the stored ``serp_key`` takes it
+from the result's ``ts``, which can fall on the other side of UTC midnight
+from the request.  Outcomes report the stored run's ``serp_key``.
+
+Whichever way it was answered, the watch row gets its own
+``last_serp_id`` / ``last_status`` update, as the worker's
+``updateSerpWatchlistRunStatus`` does.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from serp_adapter.keys import clean_string, device_key, keyword_norm, region_key, serp_day, serp_key, serp_keys
+from serp_adapter.models import Location, NormalizedSerpResult, SerpRequest
+from serp_adapter.router import RoutedSerp
+from serp_adapter.store import SerpStore
+
+Fetch = Callable[[SerpRequest], Awaitable[Union[NormalizedSerpResult, RoutedSerp]]]
+
+#: How a request was answered.
+FETCHED = "fetched"
+IN_FLIGHT = "in_flight"
+FRESH = "fresh"
+
+_ERROR_MAX = 300
+
+# (keyword_norm, region_key, device_key): a serp_key without its day
+_Series = Tuple[str, str, str]
+
+
+@dataclass
+class Watch:
+    """An active ``serp_watchlist`` row as a request."""
+
+    watch_id: str
+    user_id: str
+    request: SerpRequest
+
+
+@dataclass
+class CoalescedSerp:
+    """Outcome of one coalesced request."""
+
+    serp_key: str
+    serp_id: Optional[str]
+    source: Optional[str]  # FETCHED, IN_FLIGHT, FRESH; None on error
+    error: Optional[str] = None
+
+
+@dataclass
+class CoalescerStats:
+    fetched: int = 0
+    in_flight: int = 0
+    fresh: int = 0
+    errors: int = 0
+
+
+def _location_from_region_json(region_json: Optional[str]) -> Location:
+    try:
+        region = json.loads(region_json or "")
+    except json.JSONDecodeError:
+        region = None
+    if not isinstance(region, dict):
+        region = {}
+
+    def _field(name: str) -> Optional[str]:
+        value = region.get(name)
+        return value if isinstance(value, str) and value else None
+
+    return Location(
+        country=_field("country") or "US",
+        region=_field("region"),
+        city=_field("city"),
+        language=_field("language"),
+    )
+
+
+def load_watches(conn: sqlite3.Connection, due_before_ms: Optional[int] = None) -> List[Watch]:
+    """Active watchlist rows, optionally only those last run before a time."""
+    sql = "SELECT watch_id, user_id, phrase, region_json, device FROM serp_watchlist WHERE active = 1"
+    params: Tuple[object, ...] = ()
+    if due_before_ms is not None:
+        sql += " AND (last_run_at IS NULL OR last_run_at < ?)"
+        params = (due_before_ms,)
+    return [
+        Watch(watch_id, user_id, SerpRequest(phrase, _location_from_region_json(region_json), device))
+        for watch_id, user_id, phrase, region_json, device in conn.execute(sql + " ORDER BY watch_id", params)
+    ]
+
+
+class SerpCoalescer:
+    """Single-flight, freshness-windowed SERP fetching per ``serp_key`` series.
+
+    Parameters
+    ----------
+    conn:
+        D1-schema SQLite connection (``serp_runs`` with ``serp_key``,
+        ``serp_watchlist``).
+    fetch:
+        Fetches one request; may return a
+        :class:`~serp_adapter.router.RoutedSerp` to record its
+        ``fallback_reason``.
+    freshness_seconds:
+        How old a stored run may be and still answer a request.
+    clock:
+        Current Unix time in seconds (for tests).
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        fetch: Fetch,
+        *,
+        freshness_seconds: float = 6 * 3600,
+        store: Optional[SerpStore] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.conn = conn
+        self.fetch = fetch
+        self.freshness_seconds = freshness_seconds
+        self.store = store or SerpStore(conn)
+        self.clock = clock
+        self.stats = CoalescerStats()
+        self._in_flight: Dict[_Series, "asyncio.Future[Tuple[str, str]]"] = {}
+
+    def request_key(self, request: SerpRequest) -> str:
+        """``serp_key`` of *request* for today's (UTC) fetch."""
+        return serp_key(*self._series(request), serp_day(int(self.clock())))
+
+    def _series(self, request: SerpRequest) -> _Series:
+        return keyword_norm(request.phrase), region_key(request.location), device_key(request.device)
+
+    def _fresh_run(self, series: _Series) -> Optional[Tuple[str, str]]:
+        cutoff_ms = int((self.clock() - self.freshness_seconds) * 1000)
+        row = self.conn.execute(
+            """
+            SELECT serp_id, serp_key FROM serp_runs
+            WHERE keyword_norm = ? AND region_key = ? AND device_key = ?
+              AND status = 'ok' AND created_at >= ?
+            ORDER BY created_at DESC
+            LIMIT 1
+            """,
+            (*series, cutoff_ms),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    async def _fetch_and_store(self, user_id: str, request: SerpRequest) -> Tuple[str, str]:
+        """Fetch and write *request*; returns the run's ``serp_id`` and stored ``serp_key``."""
+        fetched = await self.fetch(request)
+        if isinstance(fetched, RoutedSerp):
+            result, reason = fetched.result, fetched.fallback_reason
+        else:
+            result, reason = fetched, None
+        [serp_id] = self.store.write([result], user_id, fallback_reason=[reason])
+        return serp_id, serp_keys(result).serp_key
+
+    async def get(self, user_id: str, request: SerpRequest) -> CoalescedSerp:
+        """Answer *request* for *user_id* without touching the watchlist."""
+        series = self._series(request)
+        shared = self._in_flight.get(series)
+        if shared is not None:
+            self.stats.in_flight += 1
+            serp_id, key = await asyncio.shield(shared)
+            return CoalescedSerp(key, serp_id, IN_FLIGHT)
+
+        fresh = self._fresh_run(series)
+        if fresh is not None:
+            self.stats.fresh += 1
+            return CoalescedSerp(fresh[1], fresh[0], FRESH)
+
+        future: "asyncio.Future[Tuple[str, str]]" = asyncio.get_running_loop().create_future()
+        self._in_flight[series] = future
+        try:
+            serp_id, key = await self._fetch_and_store(user_id, request)
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Waiters re-raise it; mark it retrieved for the no-waiter case.
+            future.exception()
+            raise
+        else:
+            future.set_result((serp_id, key))
+        finally:
+            del self._in_flight[series]
+        self.stats.fetched += 1
+        return CoalescedSerp(key, serp_id, FETCHED)
+
+    async def refresh_watch(self, watch: Watch) -> CoalescedSerp:
+        """Answer one watch and record the outcome on its watchlist row."""
+        try:
+            outcome = await self.get(watch.user_id, watch.request)
+        except Exception as exc:  # noqa: BLE001 – recorded on the watch row
+            self.stats.errors += 1
+            message = clean_string(f"{type(exc).__name__}: {exc}", _ERROR_MAX)
+            outcome = CoalescedSerp(self.request_key(watch.request), None, None, message)
+        now_ms = int(self.clock() * 1000)
+        with self.conn:
+            self.conn.execute(
+                """
+                UPDATE serp_watchlist
+                SET last_run_at = ?,
+                    last_serp_id = ?,
+                    last_status = ?,
+                    last_error = ?,
+                    updated_at = ?
+                WHERE watch_id = ?
+                """,
+                (
+                    now_ms,
+                    outcome.serp_id,
+                    "ok" if outcome.error is None else "error",
+                    outcome.error,
+                    now_ms,
+                    watch.watch_id,
+                ),
+            )
+        return outcome
+
+    async def refresh_watches(self, watches: Iterable[Watch]) -> List[CoalescedSerp]:
+        """Refresh many watches concurrently; identical keys share one fetch."""
+        return list(await asyncio.gather(*(self.refresh_watch(watch) for watch in watches)))
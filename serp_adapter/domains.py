@@ -0,0 +1,180 @@
+"""Registrable-domain (eTLD+1) resolution.
+
+Backed by the bundled Mozilla Public Suffix List
+(``serp_adapter/data/public_suffix_list.dat``), compiled once into a trie of
+reversed labels.  Lookups walk at most one trie node per hostname label and
+are memoized by a bounded LRU cache::
+
+    >>> registrable_domain("plumbing.sj.com")
+    'sj.com'
+    >>> registrable_domain("www.bbc.co.uk")
+    'bbc.co.uk'
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+PUBLIC_SUFFIX_LIST_PATH = Path(__file__).with_name("data") / "public_suffix_list.dat"
+
+_TERMINAL = ""  # Trie key marking "a rule ends at this node"
+_WILDCARD = "*"
+_EXCEPTION_PREFIX = "!"
+
+_Node = Dict[str, "_Node"]
+
+
+def _parse_rules(text: str, include_private: bool) -> Iterable[str]:
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("// ===BEGIN PRIVATE DOMAINS===") and not include_private:
+            return
+        if not line or line.startswith("//"):
+            continue
+        yield line.split()[0].lower()
+
+
+def _idna_variant(rule: str) -> Optional[str]:
+    """Return the punycode spelling of a non-ASCII *rule*, if it has one."""
+    if rule.isascii():
+        return None
+    labels = []
+    for label in rule.split("."):
+        if label.isascii():
+            labels.append(label)
+            continue
+        try:
+            labels.append(label.encode("idna").decode("ascii"))
+        except UnicodeError:
+            return None
+    return ".".join(labels)
+
+
+class PublicSuffixTrie:
+    """Public suffix rules compiled into a reversed-label trie.
+
+    ``example.co.uk`` is stored as ``uk → co`` (a rule ends at ``co``);
+    wildcard rules use a ``*`` child and exception rules a ``!label`` child.
+    """
+
+    def __init__(self, rules: Iterable[str]) -> None:
+        self._root: _Node = {}
+        for rule in rules:
+            self.add_rule(rule)
+            alt = _idna_variant(rule)
+            if alt:
+                self.add_rule(alt)
+
+    @classmethod
+    def from_file(
+        cls, path: Path = PUBLIC_SUFFIX_LIST_PATH, include_private: bool = True
+    ) -> "PublicSuffixTrie":
+        """Compile a ``public_suffix_list.dat`` file.
+
+        ``include_private=False`` stops at the private-domains section
+        (``github.io``, ``blogspot.com``, …), keeping ICANN suffixes only.
+        """
+        return cls(_parse_rules(path.read_text(encoding="utf-8"), include_private))
+
+    def add_rule(self, rule: str) -> None:
+        exception = rule.startswith(_EXCEPTION_PREFIX)
+        labels = rule.lstrip(_EXCEPTION_PREFIX).split(".")
+        node = self._root
+        if exception:
+            # "!www.ck" is stored as ck → "!www"
+            for label in reversed(labels[1:]):
+                node = node.setdefault(label, {})
+            node[_EXCEPTION_PREFIX + labels[0]] = {}
+            return
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        node[_TERMINAL] = {}
+
+    def public_suffix_length(self, labels: List[str]) -> int:
+        """Number of trailing *labels* that form the public suffix.
+
+        Unlisted TLDs fall back to the implicit ``*`` rule (length 1).
+        """
+        node = self._root
+        length = 1
+        depth = 0
+        for label in reversed(labels):
+            if _EXCEPTION_PREFIX + label in node:
+                return depth
+            child = node.get(label)
+            if child is None:
+                child = node.get(_WILDCARD)
+                if child is None:
+                    break
+            node = child
+            depth += 1
+            if _TERMINAL in node:
+                length = depth
+        return length
+
+    def split(self, host: str) -> Tuple[str, str]:
+        """Return ``(registrable_domain, public_suffix)`` for *host*.
+
+        A host that is itself a public suffix (or an IP address) is returned
+        unchanged as its own registrable domain.
+        """
+        if not host or _is_ip(host):
+            return host, ""
+        labels = host.split(".")
+        suffix_len = self.public_suffix_length(labels)
+        suffix = ".".join(labels[-suffix_len:]) if suffix_len else ""
+        if len(labels) <= suffix_len:
+            return host, suffix
+        return ".".join(labels[-(suffix_len + 1):]), suffix
+
+
+def _is_ip(host: str) -> bool:
+    return ":" in host or host.replace(".", "").isdigit()
+
+
+_DEFAULT_TRIE: Optional[PublicSuffixTrie] = None
+
+
+def default_trie() -> PublicSuffixTrie:
+    """The trie compiled from the bundled list (built on first use)."""
+    global _DEFAULT_TRIE
+    if _DEFAULT_TRIE is None:
+        _DEFAULT_TRIE = PublicSuffixTrie.from_file()
+    return _DEFAULT_TRIE
+
+
+def normalize_host(host: str) -> str:
+    """Lowercase *host* and drop surrounding whitespace and a trailing dot."""
+    return (host or "").strip().lower().rstrip(".")
+
+
+@lru_cache(maxsize=262_144)
+def _registrable_domain_cached(host: str) -> str:
+    return default_trie().split(host)[0]
+
+
+def registrable_domain(host: str) -> str:
+    """Return the registrable domain (eTLD+1) of *host*.
+
+    ``"plumbing.sj.com"`` → ``"sj.com"``; ``"www.bbc.co.uk"`` → ``"bbc.co.uk"``.
+    Results are memoized in a bounded LRU cache.
+    """
+    return _registrable_domain_cached(normalize_host(host))
+
+
+def split_url_host(url: str) -> Tuple[str, str]:
+    """Return ``(domain, root_domain)`` for *url* from a single parse.
+
+    ``domain`` is the lowercase hostname without a leading ``www.``;
+    ``root_domain`` is its registrable domain.  Unparsable URLs give
+    ``("", "")``.
+    """
+    try:
+        host = urlparse(url).hostname or ""
+    except Exception:
+        return "", ""
+    host = host.rstrip(".")
+    return host.removeprefix("www."), _registrable_domain_cached(host) if host else ""
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
-from typing import Iterable, Mapping
+import hashlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
+from serp_adapter.matcher import MultiPatternMatcher
 from serp_adapter.models import KeywordIntent, KeywordUniverseRow
-from serp_adapter.serp_archetype import count_serp_archetypes
+from serp_adapter.serp_archetype import _ARCHETYPES, classify_domain, count_serp_archetypes
 
 DIY_MODIFIERS = (
     "how to",
@@ -35,10 +37,73 @@ LOCAL_WEIGHTS = {"modifier": 0.55, "local_service": 0.25, "directory": 0.2}
 COMPARISON_WEIGHTS = {"modifier": 0.65, "serp_review_like": 0.35}
 BRAND_WEIGHTS = {"modifier": 0.8, "directory": 0.2}
 
+INTENT_BUCKETS = (
+    "commercial_hire",
+    "DIY_research",
+    "local_immediate",
+    "comparison",
+    "brand_navigational",
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+_MATCHER_CATEGORIES = ("hire", "diy", "local", "comparison", "brand")
+
+BrandTerms = Union[Iterable[str], MultiPatternMatcher]
+
+
+def compile_intent_matcher(
+    brand_terms: Iterable[str] = (), word_boundary: bool = False
+) -> MultiPatternMatcher:
+    """Compile the modifier sets and a brand dictionary into one matcher.
+
+    Pass the result as ``brand_terms`` to :func:`infer_intent` /
+    :func:`infer_intent_batch` to reuse it across calls.  A plain list of
+    terms is looked up by value on every call, so per-row callers with a
+    large brand dictionary should compile it once and pass the matcher.
+
+    Keywords are lowercased before matching and brand terms are compared as
+    given, so a term with capitals (``"HomeDepot"``) never matches.
+    """
+    return MultiPatternMatcher(
+        {
+            "hire": HIRE_MODIFIERS,
+            "diy": DIY_MODIFIERS,
+            "local": LOCAL_MODIFIERS,
+            "comparison": COMPARISON_MODIFIERS,
+            # The matcher lowercases patterns; drop the terms that could not
+            # occur in a lowercased keyword instead of letting them match.
+            "brand": [term for term in brand_terms if term == term.lower()],
+        },
+        word_boundary=word_boundary,
+    )
+
+
+_MATCHER_CACHE_SIZE = 4  # A large brand dictionary compiles to a large automaton
+_matcher_cache: Dict[Tuple[str, ...], MultiPatternMatcher] = {}
+
+
+def brand_terms_version(brand_terms: Iterable[str]) -> str:
+    """Short, order-independent fingerprint of a brand-term set."""
+    terms = sorted(set(brand_terms))
+    return hashlib.sha256("\n".join(terms).encode("utf-8")).hexdigest()[:16]
 
-def _contains_any(text: str, terms: Iterable[str]) -> bool:
-    lowered = text.lower()
-    return any(term in lowered for term in terms)
+
+def _intent_matcher(brand_terms: BrandTerms) -> MultiPatternMatcher:
+    if isinstance(brand_terms, MultiPatternMatcher):
+        if brand_terms.categories != _MATCHER_CATEGORIES:
+            raise ValueError("Matcher must come from compile_intent_matcher()")
+        return brand_terms
+    terms = tuple(brand_terms)  # Hashing reuses each string's cached hash
+    matcher = _matcher_cache.pop(terms, None)
+    if matcher is None:
+        matcher = compile_intent_matcher(terms)
+        if len(_matcher_cache) >= _MATCHER_CACHE_SIZE:
+            del _matcher_cache[next(iter(_matcher_cache))]
+    _matcher_cache[terms] = matcher  # Re-insert as most recently used
+    return matcher
 
 
 def _normalize_cpc(cpc: float | None, max_cpc: float = 50.0) -> float:
@@ -57,17 +122,17 @@ def _ratio(counts: Mapping[str, int], key: str) -> float:
 def infer_intent(
     row: KeywordUniverseRow,
     archetype_counts: Mapping[str, int] | None = None,
-    brand_terms: Iterable[str] = (),
+    brand_terms: BrandTerms = (),
 ) -> KeywordIntent:
-    """Infer keyword intent bucket with explainable deterministic scoring."""
-    archetypes = archetype_counts or count_serp_archetypes(row.serp_top_domains)
-    kw = row.kw.lower()
+    """Infer keyword intent bucket with explainable deterministic scoring.
 
-    has_diy = _contains_any(kw, DIY_MODIFIERS)
-    has_hire = _contains_any(kw, HIRE_MODIFIERS)
-    has_local = _contains_any(kw, LOCAL_MODIFIERS)
-    has_comparison = _contains_any(kw, COMPARISON_MODIFIERS)
-    has_brand = _contains_any(kw, brand_terms)
+    *brand_terms* are matched against the lowercased keyword as given (see
+    :func:`compile_intent_matcher`); pass a compiled matcher to reuse it.
+    """
+    archetypes = archetype_counts or count_serp_archetypes(row.serp_top_domains)
+    has_hire, has_diy, has_local, has_comparison, has_brand = _intent_matcher(
+        brand_terms
+    ).match_flags(row.kw)
 
     cpc_norm = _normalize_cpc(row.cpc)
     directory_ratio = _ratio(archetypes, "directory")
@@ -96,10 +161,11 @@ def infer_intent(
     second_score = ranking[1][1] if len(ranking) > 1 else 0.0
     confidence = max(0.0, min(1.0, top_score - second_score + 0.5))
 
-    explanation = (
-        f"cpc={row.cpc or 0}, modifiers="
-        f"{{hire:{has_hire}, diy:{has_diy}, local:{has_local}, comparison:{has_comparison}, brand:{has_brand}}}, "
-        f"serp={dict(archetypes)}, top={intent_bucket}"
+    explanation = _explain(
+        row.cpc,
+        (has_hire, has_diy, has_local, has_comparison, has_brand),
+        archetypes,
+        intent_bucket,
     )
 
     return KeywordIntent(
@@ -108,3 +174,198 @@ def infer_intent(
         scores=scores,
         explanation=explanation,
     )
+
+
+def _explain(
+    cpc: float | None,
+    flags: Sequence[bool],
+    archetypes: Mapping[str, int],
+    intent_bucket: str,
+) -> str:
+    has_hire, has_diy, has_local, has_comparison, has_brand = flags
+    return (
+        f"cpc={cpc or 0}, modifiers="
+        f"{{hire:{has_hire}, diy:{has_diy}, local:{has_local}, comparison:{has_comparison}, brand:{has_brand}}}, "
+        f"serp={dict(archetypes)}, top={intent_bucket}"
+    )
+
+
+def _require_numpy(feature: str = "infer_intent_batch") -> Any:
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - exercised without numpy
+        raise ImportError(
+            f"{feature} requires numpy; install serp-adapter[vector]"
+        ) from exc
+    return numpy
+
+
+class KeywordIntentBatch(Sequence[KeywordIntent]):
+    """Column-oriented result of :func:`infer_intent_batch`.
+
+    ``scores`` is an ``(n, 5)`` float64 matrix with columns in
+    :data:`INTENT_BUCKETS` order.  Indexing returns a :class:`KeywordIntent`
+    identical to what :func:`infer_intent` returns for that row; its
+    explanation string is only rendered at that point.
+    """
+
+    def __init__(
+        self,
+        cpcs: Sequence[Optional[float]],
+        archetypes: Sequence[Mapping[str, int]],
+        flags: "np.ndarray",
+        scores: "np.ndarray",
+        bucket_index: "np.ndarray",
+        confidence: "np.ndarray",
+    ) -> None:
+        self._cpcs = cpcs
+        self._archetypes = archetypes
+        self.flags = flags
+        self.scores = scores
+        self.bucket_index = bucket_index
+        self.confidence = confidence
+
+    def __len__(self) -> int:
+        return len(self._cpcs)
+
+    def intent_bucket(self, index: int) -> str:
+        return INTENT_BUCKETS[int(self.bucket_index[index])]
+
+    def explanation(self, index: int) -> str:
+        return _explain(
+            self._cpcs[index],
+            self.flags[index].tolist(),
+            self._archetypes[index],
+            self.intent_bucket(index),
+        )
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return KeywordIntent(
+            intent_bucket=self.intent_bucket(index),
+            confidence=float(self.confidence[index]),
+            scores=dict(zip(INTENT_BUCKETS, self.scores[index].tolist())),
+            explanation=self.explanation(index),
+        )
+
+
+def _intent_feature_columns(
+    np: Any,
+    rows: Sequence[KeywordUniverseRow],
+    archetype_counts: Optional[Sequence[Mapping[str, int] | None]],
+    matcher: MultiPatternMatcher,
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray", List[Mapping[str, int]]]:
+    """Build ``(flags, cpc_norm, ratios, archetypes)`` for *rows*.
+
+    ``flags`` is ``(n, 5)`` bool in matcher category order; ``ratios`` is
+    ``(n, 3)`` float64 with directory, local_service, publisher columns.
+    """
+    n = len(rows)
+    flag_rows: List[tuple] = []
+    cpc_values: List[float] = []
+    cpc_mask: List[bool] = []
+    count_rows: List[tuple] = []  # directory, local_service, publisher, total
+    archetypes: List[Mapping[str, int]] = []
+    # SERP domains repeat heavily across a universe: classify each once.
+    archetype_of: dict[str, str] = {}
+    for i, row in enumerate(rows):
+        row_archetypes = archetype_counts[i] if archetype_counts is not None else None
+        if not row_archetypes:
+            row_archetypes = {k: 0 for k in _ARCHETYPES}
+            for domain in row.serp_top_domains:
+                archetype = archetype_of.get(domain)
+                if archetype is None:
+                    archetype = archetype_of[domain] = classify_domain(domain)
+                row_archetypes[archetype] += 1
+        archetypes.append(row_archetypes)
+        flag_rows.append(matcher.match_flags(row.kw))
+        positive = row.cpc is not None and not row.cpc <= 0
+        cpc_values.append(row.cpc if positive else 0.0)
+        cpc_mask.append(positive)
+        count_rows.append(
+            (
+                row_archetypes.get("directory", 0),
+                row_archetypes.get("local_service", 0),
+                row_archetypes.get("publisher", 0),
+                sum(row_archetypes.values()),
+            )
+        )
+
+    flags = np.array(flag_rows, dtype=bool).reshape(n, 5)
+    cpc = np.array(cpc_values, dtype=np.float64)
+    has_cpc = np.array(cpc_mask, dtype=bool)
+    counts = np.array(count_rows, dtype=np.int64).reshape(n, 4)
+    cpc_norm = np.where(has_cpc, np.minimum(cpc / 50.0, 1.0), 0.0)
+    total = counts[:, 3]
+    ratios = np.zeros((n, 3), dtype=np.float64)
+    np.divide(counts[:, :3], total[:, None], out=ratios, where=total[:, None] > 0)
+    return flags, cpc_norm, ratios, archetypes
+
+
+def _rank_scores(np: Any, scores: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Return ``(bucket_index, confidence)`` for an ``(n, 5)`` score matrix."""
+    # argmax takes the first maximum, matching the stable descending sort.
+    if not len(scores):
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float64)
+    bucket_index = np.argmax(scores, axis=1)
+    ordered = np.sort(scores, axis=1)
+    top_score = ordered[:, -1]
+    second_score = ordered[:, -2]
+    confidence = np.maximum(0.0, np.minimum(1.0, top_score - second_score + 0.5))
+    return bucket_index, confidence
+
+
+def infer_intent_batch(
+    rows: Sequence[KeywordUniverseRow],
+    archetype_counts: Optional[Sequence[Mapping[str, int] | None]] = None,
+    brand_terms: BrandTerms = (),
+) -> KeywordIntentBatch:
+    """Score many keyword rows at once; row *i* matches ``infer_intent(rows[i])``.
+
+    Feature columns (modifier flags, normalized CPC, archetype ratios) are
+    built in one pass, then all five bucket scores are computed as
+    element-wise NumPy column arithmetic in the same operation order as
+    :func:`infer_intent`, so results are bit-for-bit identical.  Requires
+    the optional ``numpy`` dependency.
+    """
+    np = _require_numpy()
+    flags, cpc_norm, ratios, archetypes = _intent_feature_columns(
+        np, rows, archetype_counts, _intent_matcher(brand_terms)
+    )
+    n = len(rows)
+    directory_ratio = ratios[:, 0]
+    local_service_ratio = ratios[:, 1]
+    publisher_ratio = ratios[:, 2]
+    has_hire, has_diy, has_local, has_comparison, has_brand = (
+        flags[:, j].astype(np.float64) for j in range(5)
+    )
+
+    scores = np.empty((n, 5), dtype=np.float64)
+    scores[:, 0] = (
+        HIRE_WEIGHTS["cpc"] * cpc_norm
+        + HIRE_WEIGHTS["modifier"] * has_hire
+        + HIRE_WEIGHTS["local_service"] * local_service_ratio
+        + HIRE_WEIGHTS["directory"] * directory_ratio
+    )
+    scores[:, 1] = (
+        DIY_WEIGHTS["inverse_cpc"] * (1.0 - cpc_norm)
+        + DIY_WEIGHTS["modifier"] * has_diy
+        + DIY_WEIGHTS["publisher"] * publisher_ratio
+    )
+    scores[:, 2] = (
+        LOCAL_WEIGHTS["modifier"] * has_local
+        + LOCAL_WEIGHTS["local_service"] * local_service_ratio
+        + LOCAL_WEIGHTS["directory"] * directory_ratio
+    )
+    scores[:, 3] = COMPARISON_WEIGHTS["modifier"] * has_comparison + COMPARISON_WEIGHTS[
+        "serp_review_like"
+    ] * (directory_ratio + publisher_ratio)
+    scores[:, 4] = BRAND_WEIGHTS["modifier"] * has_brand + BRAND_WEIGHTS["directory"] * directory_ratio
+
+    bucket_index, confidence = _rank_scores(np, scores)
+    return KeywordIntentBatch(
+        [row.cpc for row in rows], archetypes, flags, scores, bucket_index, confidence
+    )
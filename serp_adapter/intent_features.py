@@ -0,0 +1,368 @@
+"""Persistent intent feature vectors for instant re-weighting.
+
+:func:`~serp_adapter.infer_intent.infer_intent` spends nearly all of its time
+building features (modifier matching, SERP archetype counting); the bucket
+scores are a linear function of those features.  :class:`IntentFeatureStore`
+keeps one feature row per keyword in ``kw_intent_features`` (migration
+0030) so that tuning the weights only needs a matrix multiply and an argmax::
+
+    store = IntentFeatureStore(conn)
+    store.refresh(rows_by_kw_id)  # recomputes new/changed keywords only
+    batch = store.reweight(intent_weight_matrix(hire={**HIRE_WEIGHTS, "cpc": 0.5}))
+
+A stored row is recomputed only when the keyword's inputs hash (keyword,
+CPC, ``serp_top_domains``, brand-term set version) changes; it is the same
+hash ``scripts/backfill_kw_intent.py`` stores.  Editing the modifier lists
+changes the features without changing that hash; pass ``force=True`` to
+:meth:`IntentFeatureStore.refresh` after doing so.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from serp_adapter.infer_intent import (
+    BRAND_WEIGHTS,
+    COMPARISON_WEIGHTS,
+    DIY_WEIGHTS,
+    HIRE_WEIGHTS,
+    INTENT_BUCKETS,
+    LOCAL_WEIGHTS,
+    BrandTerms,
+    KeywordIntentBatch,
+    _intent_feature_columns,
+    _intent_matcher,
+    _rank_scores,
+    _require_numpy,
+    brand_terms_version,
+)
+from serp_adapter.matcher import MultiPatternMatcher
+from serp_adapter.models import KeywordUniverseRow
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FEATURE_NAMES = (
+    "has_hire",
+    "has_diy",
+    "has_local",
+    "has_comparison",
+    "has_brand",
+    "cpc_norm",
+    "directory_ratio",
+    "local_service_ratio",
+    "publisher_ratio",
+)
+
+_BIAS = len(FEATURE_NAMES)  # Row of the constant term in the weight matrix
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+
+
+def intent_inputs_hash(row: KeywordUniverseRow, brand_version: str = "") -> str:
+    """SHA-256 over the inputs a stored row was computed from.
+
+    *brand_version* identifies the brand-term set used for scoring (see
+    :func:`brand_terms_version`), so changing the brand list invalidates
+    rows whose keyword data did not change.
+    """
+    payload = json.dumps(
+        [row.kw, row.cpc, list(row.serp_top_domains), brand_version],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def intent_weight_matrix(
+    hire: Optional[Mapping[str, float]] = None,
+    diy: Optional[Mapping[str, float]] = None,
+    local: Optional[Mapping[str, float]] = None,
+    comparison: Optional[Mapping[str, float]] = None,
+    brand: Optional[Mapping[str, float]] = None,
+) -> "np.ndarray":
+    """Express the bucket weight dicts as a ``(10, 5)`` matrix.
+
+    Rows are :data:`FEATURE_NAMES` plus a trailing constant term, columns
+    are :data:`~serp_adapter.infer_intent.INTENT_BUCKETS`.  Omitted
+    arguments default to the module weights in ``infer_intent``.
+    """
+    np = _require_numpy("intent_weight_matrix")
+    hire = HIRE_WEIGHTS if hire is None else hire
+    diy = DIY_WEIGHTS if diy is None else diy
+    local = LOCAL_WEIGHTS if local is None else local
+    comparison = COMPARISON_WEIGHTS if comparison is None else comparison
+    brand = BRAND_WEIGHTS if brand is None else brand
+
+    f = {name: i for i, name in enumerate(FEATURE_NAMES)}
+    w = np.zeros((len(FEATURE_NAMES) + 1, len(INTENT_BUCKETS)), dtype=np.float64)
+    w[f["cpc_norm"], 0] = hire["cpc"]
+    w[f["has_hire"], 0] = hire["modifier"]
+    w[f["local_service_ratio"], 0] = hire["local_service"]
+    w[f["directory_ratio"], 0] = hire["directory"]
+    # inverse_cpc * (1 - cpc_norm) == inverse_cpc - inverse_cpc * cpc_norm
+    w[_BIAS, 1] = diy["inverse_cpc"]
+    w[f["cpc_norm"], 1] = -diy["inverse_cpc"]
+    w[f["has_diy"], 1] = diy["modifier"]
+    w[f["publisher_ratio"], 1] = diy["publisher"]
+    w[f["has_local"], 2] = local["modifier"]
+    w[f["local_service_ratio"], 2] = local["local_service"]
+    w[f["directory_ratio"], 2] = local["directory"]
+    w[f["has_comparison"], 3] = comparison["modifier"]
+    w[f["directory_ratio"], 3] = comparison["serp_review_like"]
+    w[f["publisher_ratio"], 3] = comparison["serp_review_like"]
+    w[f["has_brand"], 4] = brand["modifier"]
+    w[f["directory_ratio"], 4] = brand["directory"]
+    return w
+
+
+class IntentFeatures:
+    """Feature matrix for a set of keywords.
+
+    ``matrix`` is ``(n, 9)`` float64 with columns in :data:`FEATURE_NAMES`
+    order.  ``cpcs`` and ``archetypes`` are only kept to render
+    explanations.
+    """
+
+    def __init__(
+        self,
+        kw_ids: Sequence[str],
+        matrix: "np.ndarray",
+        cpcs: Sequence[Optional[float]],
+        archetypes: Sequence[Mapping[str, int]],
+    ) -> None:
+        self.kw_ids = list(kw_ids)
+        self.matrix = matrix
+        self.cpcs = list(cpcs)
+        self.archetypes = list(archetypes)
+
+    def __len__(self) -> int:
+        return len(self.kw_ids)
+
+    def score(self, weights: Optional["np.ndarray"] = None) -> KeywordIntentBatch:
+        """Score all keywords with one matrix multiply.
+
+        *weights* comes from :func:`intent_weight_matrix` (default weights
+        when omitted).  Scores equal :func:`infer_intent`'s up to
+        floating-point rounding of the summation order.
+        """
+        np = _require_numpy("IntentFeatures.score")
+        if weights is None:
+            weights = intent_weight_matrix()
+        n = len(self.kw_ids)
+        scores = self.matrix @ weights[:_BIAS] + weights[_BIAS]
+        scores = scores.reshape(n, len(INTENT_BUCKETS))
+        bucket_index, confidence = _rank_scores(np, scores)
+        flags = self.matrix[:, :5] > 0.5
+        return KeywordIntentBatch(
+            self.cpcs, self.archetypes, flags, scores, bucket_index, confidence
+        )
+
+
+def extract_intent_features(
+    kw_ids: Sequence[str],
+    rows: Sequence[KeywordUniverseRow],
+    archetype_counts: Optional[Sequence[Mapping[str, int] | None]] = None,
+    brand_terms: BrandTerms = (),
+) -> IntentFeatures:
+    """Compute the feature rows for *rows* (``kw_ids[i]`` names ``rows[i]``)."""
+    np = _require_numpy("extract_intent_features")
+    if len(kw_ids) != len(rows):
+        raise ValueError("kw_ids and rows must have the same length")
+    flags, cpc_norm, ratios, archetypes = _intent_feature_columns(
+        np, rows, archetype_counts, _intent_matcher(brand_terms)
+    )
+    matrix = np.column_stack([flags.astype(np.float64), cpc_norm, ratios])
+    matrix = matrix.reshape(len(rows), len(FEATURE_NAMES))
+    return IntentFeatures(kw_ids, matrix, [row.cpc for row in rows], archetypes)
+
+
+def _chunks(values: Sequence[str], size: int = _SQL_CHUNK) -> Iterator[Sequence[str]]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+class IntentFeatureStore:
+    """``kw_intent_features`` rows on a SQLite connection.
+
+    Writes happen inside ``with conn:`` blocks, so each call commits once.
+    """
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+    def stored_hashes(self, kw_ids: Sequence[str]) -> dict[str, str]:
+        hashes: dict[str, str] = {}
+        for chunk in _chunks(kw_ids):
+            marks = ",".join("?" * len(chunk))
+            hashes.update(
+                self.conn.execute(
+                    f"SELECT kw_id, inputs_hash FROM kw_intent_features WHERE kw_id IN ({marks})",
+                    list(chunk),
+                ).fetchall()
+            )
+        return hashes
+
+    def stale(
+        self,
+        rows_by_kw_id: Mapping[str, KeywordUniverseRow],
+        brand_version: Optional[str] = None,
+    ) -> List[str]:
+        """kw_ids whose features are missing or were built from other inputs.
+
+        *brand_version* defaults to the version of an empty brand-term set.
+        """
+        if brand_version is None:
+            brand_version = brand_terms_version(())
+        stored = self.stored_hashes(list(rows_by_kw_id))
+        return [
+            kw_id
+            for kw_id, row in rows_by_kw_id.items()
+            if stored.get(kw_id) != intent_inputs_hash(row, brand_version)
+        ]
+
+    def refresh(
+        self,
+        rows_by_kw_id: Mapping[str, KeywordUniverseRow],
+        brand_terms: BrandTerms = (),
+        force: bool = False,
+        now: Optional[int] = None,
+        brand_version: Optional[str] = None,
+    ) -> int:
+        """Recompute and store features for stale keywords; return how many.
+
+        *brand_version* is derived from *brand_terms* when omitted; it must
+        be given when *brand_terms* is an already compiled matcher.
+        """
+        if brand_version is None:
+            if isinstance(brand_terms, MultiPatternMatcher):
+                raise ValueError("brand_version is required with a compiled matcher")
+            brand_terms = list(brand_terms)
+            brand_version = brand_terms_version(brand_terms)
+        kw_ids = list(rows_by_kw_id) if force else self.stale(rows_by_kw_id, brand_version)
+        if not kw_ids:
+            return 0
+        rows = [rows_by_kw_id[kw_id] for kw_id in kw_ids]
+        features = extract_intent_features(kw_ids, rows, brand_terms=brand_terms)
+        self.write(features, [intent_inputs_hash(row, brand_version) for row in rows], now=now)
+        return len(kw_ids)
+
+    def write(
+        self,
+        features: IntentFeatures,
+        inputs_hashes: Sequence[str],
+        now: Optional[int] = None,
+    ) -> None:
+        updated_at = int(time.time()) if now is None else now
+        columns = ", ".join(FEATURE_NAMES)
+        marks = ", ".join("?" * (len(FEATURE_NAMES) + 5))
+        updates = ", ".join(
+            f"{name} = excluded.{name}"
+            for name in ("inputs_hash", *FEATURE_NAMES, "cpc", "archetypes_json", "updated_at")
+        )
+        params = (
+            (
+                kw_id,
+                inputs_hash,
+                *[int(v) for v in vector[:5]],
+                *vector[5:],
+                cpc,
+                json.dumps(dict(archetypes), separators=(",", ":")),
+                updated_at,
+            )
+            for kw_id, inputs_hash, vector, cpc, archetypes in zip(
+                features.kw_ids,
+                inputs_hashes,
+                features.matrix.tolist(),
+                features.cpcs,
+                features.archetypes,
+            )
+        )
+        with self.conn:
+            self.conn.executemany(
+                f"""
+                INSERT INTO kw_intent_features
+                  (kw_id, inputs_hash, {columns}, cpc, archetypes_json, updated_at)
+                VALUES ({marks})
+                ON CONFLICT(kw_id) DO UPDATE SET {updates}
+                """,
+                params,
+            )
+
+    def load(self, kw_ids: Optional[Iterable[str]] = None) -> IntentFeatures:
+        """Load stored features (all rows, ordered by kw_id, by default)."""
+        np = _require_numpy("IntentFeatureStore.load")
+        select = f"SELECT kw_id, {', '.join(FEATURE_NAMES)}, cpc, archetypes_json FROM kw_intent_features"
+        if kw_ids is None:
+            records = self.conn.execute(select + " ORDER BY kw_id").fetchall()
+        else:
+            wanted = list(kw_ids)
+            by_id = {}
+            for chunk in _chunks(wanted):
+                marks = ",".join("?" * len(chunk))
+                for record in self.conn.execute(f"{select} WHERE kw_id IN ({marks})", list(chunk)):
+                    by_id[record[0]] = record
+            missing = [kw_id for kw_id in wanted if kw_id not in by_id]
+            if missing:
+                raise KeyError(f"No stored intent features for {missing[:5]}")
+            records = [by_id[kw_id] for kw_id in wanted]
+
+        width = len(FEATURE_NAMES)
+        matrix = np.array([r[1 : 1 + width] for r in records], dtype=np.float64)
+        return IntentFeatures(
+            [r[0] for r in records],
+            matrix.reshape(len(records), width),
+            [r[1 + width] for r in records],
+            [json.loads(r[2 + width]) for r in records],
+        )
+
+    def reweight(
+        self,
+        weights: Optional["np.ndarray"] = None,
+        kw_ids: Optional[Iterable[str]] = None,
+        write: bool = True,
+        now: Optional[int] = None,
+    ) -> KeywordIntentBatch:
+        """Re-score stored features with *weights* and upsert ``kw_intent``."""
+        features = self.load(kw_ids)
+        batch = features.score(weights)
+        if write:
+            self.write_intents(features.kw_ids, batch, now=now)
+        return batch
+
+    def write_intents(
+        self,
+        kw_ids: Sequence[str],
+        batch: KeywordIntentBatch,
+        now: Optional[int] = None,
+    ) -> None:
+        updated_at = int(time.time()) if now is None else now
+        params = (
+            (
+                kw_id,
+                intent.intent_bucket,
+                intent.confidence,
+                json.dumps(intent.scores, sort_keys=True),
+                intent.explanation,
+                updated_at,
+            )
+            for kw_id, intent in zip(kw_ids, batch)
+        )
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO kw_intent
+                  (kw_id, intent_bucket, confidence, scores_json, explanation, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(kw_id) DO UPDATE SET
+                  intent_bucket = excluded.intent_bucket,
+                  confidence = excluded.confidence,
+                  scores_json = excluded.scores_json,
+                  explanation = excluded.explanation,
+                  updated_at = excluded.updated_at
+                """,
+                params,
+            )
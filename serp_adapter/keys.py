@@ -0,0 +1,173 @@
+"""Canonical SERP keys, byte-compatible with ``src/worker.ts``.
+
+``serp_runs`` rows are keyed by ``keyword_norm``, ``region_key``,
+``device_key`` and ``serp_key`` (migration 0009), and ``urls`` by
+``url_hash``.  The worker derives them as follows, and this module derives
+them identically::
+
+    keyword_norm = cleanString(phrase, 300).toLowerCase().replace(/\\s+/g, " ").trim()
+    region_key   = `${COUNTRY or "US"}-${language or "en"}`
+    serp_key     = sha256(`${keyword_norm}|${region_key}|${device}|${YYYY-MM-DD UTC}`)
+    url_hash     = sha256(cleanString(url, 2000).toLowerCase())
+
+``cleanString`` trims JavaScript whitespace and truncates in UTF-16 code
+units; both are reproduced here.  ``tests/data/serp_keys_golden.json``
+pins the output against the worker implementation.
+
+Keyword and region normalization are memoized with bounded LRU caches and
+return interned strings, since a keyword universe repeats the same phrases
+and locations across days and devices.  :func:`serp_keys_batch` keys
+millions of ``(phrase, country, language, device, ts)`` rows for re-key
+backfills.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sys
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from serp_adapter.models import Location, NormalizedSerpResult
+
+# Characters matched by JavaScript's \s and stripped by String.prototype.trim.
+_JS_WHITESPACE = (
+    "\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+_JS_WHITESPACE_RUN = re.compile(f"[{re.escape(_JS_WHITESPACE)}]+")
+_SECONDS_PER_DAY = 86_400
+
+
+class SerpKeys(NamedTuple):
+    keyword_norm: str
+    region_key: str
+    device_key: str
+    serp_key: str
+
+
+def _js_slice(value: str, max_len: int) -> str:
+    """``value.slice(0, max_len)`` with JavaScript's UTF-16 indexing."""
+    if len(value) <= max_len // 2 or value.isascii():
+        return value[:max_len]
+    if max(value) < "\U00010000":
+        return value[:max_len]
+    units = value.encode("utf-16-le", "surrogatepass")[: 2 * max_len]
+    # A split surrogate pair becomes U+FFFD, as TextEncoder does before hashing.
+    return units.decode("utf-16-le", "replace")
+
+
+def clean_string(value: Optional[str], max_len: int = 4000) -> str:
+    """Port of the worker's ``cleanString``: trim, then truncate."""
+    text = (value or "").strip(_JS_WHITESPACE)
+    if not text:
+        return ""
+    return _js_slice(text, max_len)
+
+
+@lru_cache(maxsize=262_144)
+def keyword_norm(phrase: str) -> str:
+    """Normalized keyword used in ``serp_runs.keyword_norm``."""
+    cleaned = clean_string(phrase, 300).lower()
+    return sys.intern(_JS_WHITESPACE_RUN.sub(" ", cleaned).strip(_JS_WHITESPACE))
+
+
+@lru_cache(maxsize=4_096)
+def _region_key(country: Optional[str], language: Optional[str]) -> str:
+    country_code = clean_string(country, 2).upper() or "US"
+    language_code = clean_string(language, 2).lower() or "en"
+    return sys.intern(f"{country_code}-{language_code}")
+
+
+def region_key(location: Location, language: Optional[str] = None) -> str:
+    """``serp_runs.region_key`` for *location*.
+
+    *language* is used when the location itself has none.
+    """
+    return _region_key(location.country, location.language or language)
+
+
+def region_key_from_json(region_json: Optional[str]) -> str:
+    """``region_key`` for a stored ``serp_runs.region_json`` value."""
+    try:
+        region = json.loads(region_json or "")
+    except json.JSONDecodeError:
+        region = None
+    if not isinstance(region, dict):
+        return _region_key(None, None)
+    country, language = region.get("country"), region.get("language")
+    return _region_key(
+        country if isinstance(country, str) else None,
+        language if isinstance(language, str) else None,
+    )
+
+
+def device_key(device: str) -> str:
+    return device.strip().lower()
+
+
+@lru_cache(maxsize=4_096)
+def _day_of(day_index: int) -> str:
+    return datetime.fromtimestamp(day_index * _SECONDS_PER_DAY, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def serp_day(ts: int) -> str:
+    """UTC ``YYYY-MM-DD`` of a Unix timestamp in seconds."""
+    return _day_of(ts // _SECONDS_PER_DAY)
+
+
+def serp_key(keyword_norm: str, region_key: str, device_key: str, day: str) -> str:
+    return hashlib.sha256(
+        f"{keyword_norm}|{region_key}|{device_key}|{day}".encode("utf-8")
+    ).hexdigest()
+
+
+def url_hash(url: str) -> str:
+    """``urls.url_hash`` / ``serp_results.url_hash`` of *url*."""
+    return hashlib.sha256(clean_string(url, 2000).lower().encode("utf-8")).hexdigest()
+
+
+def serp_keys(result: NormalizedSerpResult, language: Optional[str] = None) -> SerpKeys:
+    """All ``serp_runs`` keys for one normalized SERP."""
+    kw = keyword_norm(result.query)
+    region = region_key(result.location, language)
+    device = device_key(result.device)
+    return SerpKeys(kw, region, device, serp_key(kw, region, device, serp_day(result.ts)))
+
+
+def serp_keys_batch(
+    rows: Iterable[Tuple[str, Optional[str], Optional[str], str, int]],
+) -> List[SerpKeys]:
+    """Key many ``(phrase, country, language, device, ts)`` rows.
+
+    Every distinct phrase, region and ``serp_key`` input is computed once
+    per call, so the cost is dominated by the number of distinct
+    keyword/region/device/day combinations rather than rows.
+    """
+    keyword_norms: Dict[str, str] = {}
+    region_keys: Dict[Tuple[Optional[str], Optional[str]], str] = {}
+    days: Dict[int, str] = {}
+    digests: Dict[Tuple[str, str, str, str], SerpKeys] = {}
+    out: List[SerpKeys] = []
+    append = out.append
+    for phrase, country, language, device, ts in rows:
+        kw = keyword_norms.get(phrase)
+        if kw is None:
+            kw = keyword_norms[phrase] = keyword_norm(phrase)
+        region = region_keys.get((country, language))
+        if region is None:
+            region = region_keys[(country, language)] = _region_key(country, language)
+        day_index = ts // _SECONDS_PER_DAY
+        day = days.get(day_index)
+        if day is None:
+            day = days[day_index] = _day_of(day_index)
+        dev = device if device in ("mobile", "desktop") else device_key(device)
+        combo = (kw, region, dev, day)
+        keys = digests.get(combo)
+        if keys is None:
+            keys = digests[combo] = SerpKeys(kw, region, dev, serp_key(*combo))
+        append(keys)
+    return out
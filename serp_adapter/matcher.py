@@ -0,0 +1,159 @@
+"""Single-pass multi-pattern keyword matcher (Aho-Corasick).
+
+A :class:`MultiPatternMatcher` is compiled once from named pattern sets and
+then reports every category with at least one pattern inside a text in a
+single left-to-right scan, however many patterns there are::
+
+    matcher = MultiPatternMatcher({"hire": ["near me", "quote"], "brand": brands})
+    matcher.match("Plumbing quote near me")   # {"hire"}
+
+Matching is case-insensitive (patterns and text are lowercased).  By default
+a pattern matches anywhere, like ``pattern in text``; with
+``word_boundary=True`` it must not be preceded or followed by a word
+character.
+"""
+
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
+
+_SHIFT = 21  # Bits reserved for the character in a transition key
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class MultiPatternMatcher:
+    """Aho-Corasick automaton over one or more named pattern categories.
+
+    Transitions live in one flat ``dict`` keyed by ``state << 21 | ord(ch)``
+    (21 bits cover every code point), which keeps dictionaries of 100k+
+    patterns compact.
+    """
+
+    def __init__(
+        self,
+        patterns_by_category: Mapping[str, Iterable[str]],
+        word_boundary: bool = False,
+    ) -> None:
+        self.categories: Tuple[str, ...] = tuple(patterns_by_category)
+        self.word_boundary = word_boundary
+        self._all_mask = (1 << len(self.categories)) - 1
+        self._always_mask = 0  # Categories containing the empty pattern
+
+        # State 0 is the root; parent/char/depth describe the trie edge into
+        # each state and drive the breadth-first failure-link pass below.
+        trans: Dict[int, int] = {}
+        parent = array("l", [0])
+        chars = array("l", [0])
+        depth = array("l", [0])
+        own_ends: Dict[int, List[Tuple[int, int]]] = {}
+        self.pattern_count = 0
+        for bit_index, category in enumerate(self.categories):
+            bit = 1 << bit_index
+            for pattern in patterns_by_category[category]:
+                pattern = pattern.lower()
+                self.pattern_count += 1
+                if not pattern:
+                    self._always_mask |= bit
+                    continue
+                state = 0
+                for ch in pattern:
+                    key = state << _SHIFT | ord(ch)
+                    nxt = trans.get(key)
+                    if nxt is None:
+                        nxt = trans[key] = len(parent)
+                        parent.append(state)
+                        chars.append(ord(ch))
+                        depth.append(depth[state] + 1)
+                    state = nxt
+                state_ends = own_ends.setdefault(state, [])
+                if (len(pattern), bit) not in state_ends:
+                    state_ends.append((len(pattern), bit))
+
+        n_states = len(parent)
+        fail = array("l", [0]) * n_states
+        out = [0] * n_states
+        ends: Dict[int, Tuple[Tuple[int, int], ...]] = {}
+        by_depth = sorted(range(1, n_states), key=depth.__getitem__)
+        for state in by_depth:
+            if depth[state] > 1:
+                ch = chars[state]
+                fallback = fail[parent[state]]
+                while fallback and (fallback << _SHIFT | ch) not in trans:
+                    fallback = fail[fallback]
+                fail[state] = trans.get(fallback << _SHIFT | ch, 0)
+            inherited = ends.get(fail[state], ())
+            state_ends = tuple(own_ends.get(state, ())) + inherited
+            if state_ends:
+                ends[state] = state_ends
+                mask = 0
+                for _length, bit in state_ends:
+                    mask |= bit
+                out[state] = mask
+
+        self._trans = trans
+        self._fail = fail
+        self._out = out
+        self._ends = ends
+        self.state_count = n_states
+
+    def __len__(self) -> int:
+        return self.pattern_count
+
+    def match_mask(self, text: str) -> int:
+        """Bit mask of matched categories (bit *i* ↔ ``categories[i]``)."""
+        mask = self._always_mask
+        all_mask = self._all_mask
+        if mask == all_mask:
+            return mask
+        text = text.lower()
+        get = self._trans.get
+        fail = self._fail
+        out = self._out
+        state = 0
+        if not self.word_boundary:
+            for code in map(ord, text):
+                if state:
+                    nxt = get(state << _SHIFT | code)
+                    while nxt is None and state:
+                        state = fail[state]
+                        nxt = get(state << _SHIFT | code)
+                    state = nxt or 0
+                else:
+                    # Root transitions are keyed by the bare code point.
+                    state = get(code, 0)
+                if out[state]:
+                    mask |= out[state]
+                    if mask == all_mask:
+                        break
+            return mask
+
+        last = len(text) - 1
+        for i, code in enumerate(map(ord, text)):
+            nxt = get(state << _SHIFT | code)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = get(state << _SHIFT | code)
+            state = nxt or 0
+            if not out[state] or (i < last and _is_word_char(text[i + 1])):
+                continue
+            for length, bit in self._ends[state]:
+                start = i - length + 1
+                if start == 0 or not _is_word_char(text[start - 1]):
+                    mask |= bit
+            if mask == all_mask:
+                break
+        return mask
+
+    def match_flags(self, text: str) -> Tuple[bool, ...]:
+        """One boolean per category, in :attr:`categories` order."""
+        mask = self.match_mask(text)
+        return tuple(bool(mask >> i & 1) for i in range(len(self.categories)))
+
+    def match(self, text: str) -> Set[str]:
+        """Names of the categories with at least one pattern in *text*."""
+        mask = self.match_mask(text)
+        return {c for i, c in enumerate(self.categories) if mask >> i & 1}
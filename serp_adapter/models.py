@@ -18,6 +18,7 @@ class Location:
     country: str  # ISO 3166-1 alpha-2, e.g. "US"
     region: Optional[str] = None  # State / province code, e.g. "CA"
     city: Optional[str] = None  # City name, e.g. "San Jose"
+    language: Optional[str] = None  # ISO 639-1 result language, e.g. "en"
 
 
 @dataclass
@@ -29,6 +30,7 @@ class SerpResultItem:
     url: str
     domain: str
     snippet: str
+    root_domain: str = ""  # Registrable domain (eTLD+1), e.g. "sj.com"
 
 
 @dataclass
@@ -76,6 +78,16 @@ class NormalizedSerpResult:
     source: Optional[SerpSource] = None
 
 
+@dataclass
+class SerpRequest:
+    """One SERP to fetch from a provider."""
+
+    phrase: str
+    location: Location
+    device: str = "desktop"  # "desktop" | "mobile" | "tablet"
+    engine: str = "google"
+
+
 @dataclass
 class KeywordUniverseRow:
     """Canonical keyword universe row for a vertical + geo cohort."""
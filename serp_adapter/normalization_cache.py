@@ -0,0 +1,375 @@
+"""Content-addressed cache of normalized SERPs.
+
+Normalizing the same raw provider item twice with the same parser gives the
+same :class:`~serp_adapter.models.NormalizedSerpResult`, so results are
+cached on disk under ``(raw payload sha256, parser_version)`` – the pair
+``serp_runs`` already records.  Re-ingesting a dataset, or retrying a
+partially failed import, then skips parsing for every item seen before::
+
+    cache = NormalizationCache("normalized.sqlite", max_bytes=512 << 20)
+    for result in cache.iter_normalize(ApifyGoogleSearchAdapter(), items):
+        ...
+    print(cache.hits, cache.misses)
+
+Raw payloads are stored once per hash (zlib-compressed) no matter how many
+parser versions reference them, so a re-normalization with a new parser can
+run from the cache alone.  When the stored bytes exceed *max_bytes*, the
+least recently used normalized entries are evicted, together with raw
+payloads no entry references any more.
+
+Keys must match ``serp_runs.raw_payload_sha256``, which the worker computes
+as ``sha256Hex(rawPayload)`` over the text it received.  Payloads are
+therefore hashed as the ``str``/``bytes`` given; a decoded dict cannot be
+re-encoded to the same bytes, so it is only accepted together with the
+digest of its original text.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import zlib
+from os import PathLike
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.streaming import ItemError
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_payloads (
+  sha256 TEXT PRIMARY KEY,
+  payload BLOB NOT NULL,
+  size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS normalized (
+  sha256 TEXT NOT NULL,
+  parser_version TEXT NOT NULL,
+  result BLOB NOT NULL,
+  size INTEGER NOT NULL,
+  last_used INTEGER NOT NULL,
+  PRIMARY KEY (sha256, parser_version)
+);
+CREATE INDEX IF NOT EXISTS idx_normalized_last_used ON normalized(last_used);
+"""
+
+_EVICT_BATCH = 256
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+_TOUCH_FLUSH = 1024  # Buffered LRU updates written per transaction
+
+
+def payload_sha256(raw: Union[str, bytes]) -> str:
+    """Hex sha256 of a raw provider payload, as received (str or bytes)."""
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    elif not isinstance(raw, bytes):
+        raise TypeError(
+            f"payload_sha256 needs the raw str/bytes payload, not {type(raw).__name__}; "
+            "pass the digest of the original text instead"
+        )
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _payload_bytes(raw: Any) -> bytes:
+    if isinstance(raw, bytes):
+        return raw
+    if isinstance(raw, str):
+        return raw.encode("utf-8")
+    # Stored for re-parsing only; the key is the caller's digest.
+    return json.dumps(raw, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _decode_payload(raw: Any) -> Any:
+    return json.loads(raw) if isinstance(raw, (str, bytes)) else raw
+
+
+def _encode_result(result: NormalizedSerpResult) -> bytes:
+    loc = result.location
+    source = result.source
+    packed = [
+        result.query,
+        [loc.country, loc.region, loc.city, loc.language],
+        result.device,
+        result.engine,
+        result.ts,
+        [[r.rank, r.title, r.url, r.domain, r.snippet, r.root_domain] for r in result.results],
+        [source.provider, source.actor, source.run_id] if source else None,
+    ]
+    return zlib.compress(json.dumps(packed, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def _decode_result(blob: bytes) -> NormalizedSerpResult:
+    query, loc, device, engine, ts, items, source = json.loads(zlib.decompress(blob))
+    return NormalizedSerpResult(
+        query=query,
+        location=Location(*loc),
+        device=device,
+        engine=engine,
+        ts=ts,
+        results=[SerpResultItem(*item) for item in items],
+        source=SerpSource(*source) if source else None,
+    )
+
+
+class NormalizationCache:
+    """On-disk normalization cache keyed by ``(sha256, parser_version)``.
+
+    Parameters
+    ----------
+    path:
+        SQLite file holding the cache (``":memory:"`` for a throwaway one).
+    max_bytes:
+        Bound on stored (compressed) normalized results plus raw payloads.
+    store_raw:
+        Keep raw payloads so they can be re-parsed later without the
+        original dataset.
+
+    ``hits``, ``misses`` and ``evictions`` count lookups and evicted entries
+    since the cache was opened.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, "PathLike[str]"],
+        max_bytes: int = 1 << 30,
+        store_raw: bool = True,
+    ) -> None:
+        if max_bytes < 1:
+            raise ValueError("max_bytes must be >= 1")
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.max_bytes = max_bytes
+        self.store_raw = store_raw
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched: Dict[Tuple[str, str], int] = {}
+        self._clock = self.conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM normalized").fetchone()[0]
+        self._bytes = self._stored_bytes()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "NormalizationCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM normalized").fetchone()[0]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes currently accounted against *max_bytes*."""
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "bytes": self._bytes,
+        }
+
+    def _stored_bytes(self) -> int:
+        return self.conn.execute(
+            "SELECT (SELECT COALESCE(SUM(size), 0) FROM normalized)"
+            " + (SELECT COALESCE(SUM(size), 0) FROM raw_payloads)"
+        ).fetchone()[0]
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def get(self, sha256: str, parser_version: str) -> Optional[NormalizedSerpResult]:
+        """Cached result for a payload hash and parser version, if any."""
+        row = self.conn.execute(
+            "SELECT result FROM normalized WHERE sha256 = ? AND parser_version = ?",
+            (sha256, parser_version),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[(sha256, parser_version)] = self._tick()
+        if len(self._touched) >= _TOUCH_FLUSH:
+            self.flush()
+        return _decode_result(row[0])
+
+    def raw_payload(self, sha256: str) -> Optional[bytes]:
+        """Stored raw payload bytes for *sha256* (``None`` if not kept)."""
+        row = self.conn.execute("SELECT payload FROM raw_payloads WHERE sha256 = ?", (sha256,)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def raw_payloads(self, sha256s: Iterable[str]) -> Dict[str, bytes]:
+        """Bulk :meth:`raw_payload`; hashes without a stored payload are omitted."""
+        wanted = list(dict.fromkeys(sha256s))
+        found: Dict[str, bytes] = {}
+        for start in range(0, len(wanted), _SQL_CHUNK):
+            chunk = wanted[start : start + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for sha, payload in self.conn.execute(
+                f"SELECT sha256, payload FROM raw_payloads WHERE sha256 IN ({marks})", chunk
+            ):
+                found[sha] = zlib.decompress(payload)
+        return found
+
+    def put(
+        self,
+        sha256: str,
+        parser_version: str,
+        result: NormalizedSerpResult,
+        raw: Any = None,
+    ) -> None:
+        """Store *result* (and *raw*, once per hash) under the cache key."""
+        self.put_many([(sha256, parser_version, result, raw)])
+
+    def put_many(self, entries: Iterable[Tuple[str, str, NormalizedSerpResult, Any]]) -> None:
+        """:meth:`put` several ``(sha256, parser_version, result, raw)`` in one transaction."""
+        with self.conn:
+            for sha256, parser_version, result, raw in entries:
+                blob = _encode_result(result)
+                previous = self.conn.execute(
+                    "SELECT size FROM normalized WHERE sha256 = ? AND parser_version = ?",
+                    (sha256, parser_version),
+                ).fetchone()
+                self.conn.execute(
+                    """
+                    INSERT INTO normalized (sha256, parser_version, result, size, last_used)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(sha256, parser_version) DO UPDATE SET
+                      result = excluded.result,
+                      size = excluded.size,
+                      last_used = excluded.last_used
+                    """,
+                    (sha256, parser_version, blob, len(blob), self._tick()),
+                )
+                self._bytes += len(blob) - (previous[0] if previous else 0)
+                if raw is not None and self.store_raw:
+                    payload = zlib.compress(_payload_bytes(raw))
+                    inserted = self.conn.execute(
+                        "INSERT INTO raw_payloads (sha256, payload, size) VALUES (?, ?, ?)"
+                        " ON CONFLICT(sha256) DO NOTHING",
+                        (sha256, payload, len(payload)),
+                    ).rowcount
+                    if inserted:
+                        self._bytes += len(payload)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    def flush(self) -> None:
+        """Write buffered LRU recency updates."""
+        if not self._touched:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE normalized SET last_used = ? WHERE sha256 = ? AND parser_version = ?",
+                [(tick, sha, version) for (sha, version), tick in self._touched.items()],
+            )
+        self._touched.clear()
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """Drop least recently used entries until at most *target_bytes* remain.
+
+        Defaults to 90% of *max_bytes*, so a full cache does not evict on
+        every insert.  Returns the number of normalized entries removed.
+        """
+        target = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        self.flush()
+        removed = 0
+        while self._bytes > target:
+            candidates = self.conn.execute(
+                """
+                SELECT n.sha256, n.parser_version, n.size + COALESCE(r.size, 0)
+                FROM normalized n LEFT JOIN raw_payloads r ON r.sha256 = n.sha256
+                ORDER BY n.last_used
+                LIMIT ?
+                """,
+                (_EVICT_BATCH,),
+            ).fetchall()
+            if not candidates:
+                break
+            # Raw sizes are counted as freed optimistically; the loop re-checks.
+            victims = []
+            freed = 0
+            for sha, version, size in candidates:
+                victims.append((sha, version))
+                freed += size
+                if self._bytes - freed <= target:
+                    break
+            with self.conn:
+                self.conn.executemany(
+                    "DELETE FROM normalized WHERE sha256 = ? AND parser_version = ?", victims
+                )
+                self.conn.executemany(
+                    "DELETE FROM raw_payloads WHERE sha256 = ?"
+                    " AND NOT EXISTS (SELECT 1 FROM normalized n WHERE n.sha256 = raw_payloads.sha256)",
+                    [(sha,) for sha, _version in victims],
+                )
+            removed += len(victims)
+            self._bytes = self._stored_bytes()
+        self.evictions += removed
+        return removed
+
+    def normalize(
+        self, adapter: BaseSerpAdapter, raw: Any, sha256: Optional[str] = None
+    ) -> NormalizedSerpResult:
+        """``adapter.normalize(raw)``, served from the cache when possible.
+
+        ``str``/``bytes`` payloads are hashed as given and decoded as JSON
+        before a miss is normalized.  An already decoded item needs the
+        *sha256* of its original text (e.g. ``serp_runs.raw_payload_sha256``).
+        Adapter errors propagate and nothing is cached.
+        """
+        sha = sha256 or payload_sha256(raw)
+        cached = self.get(sha, adapter.parser_version)
+        if cached is not None:
+            return cached
+        result = adapter.normalize(_decode_payload(raw))
+        self.put(sha, adapter.parser_version, result, raw)
+        return result
+
+    def iter_normalize(
+        self,
+        adapter: BaseSerpAdapter,
+        items: Iterable[Any],
+        on_error: Optional[Callable[[ItemError], None]] = None,
+        write_batch: int = 256,
+    ) -> Iterator[NormalizedSerpResult]:
+        """Normalize raw *items* through the cache, in order.
+
+        *items* are raw JSON texts (e.g. the lines of a JSON Lines dataset),
+        hashed as given; a hit never decodes them.  Decoded items raise
+        :class:`TypeError` (see :func:`payload_sha256`).  New entries are
+        written *write_batch* at a time.  Items
+        that fail to normalize are reported to *on_error* (when given) and
+        skipped, as in :func:`~serp_adapter.streaming.iter_normalize`.
+        """
+        version = adapter.parser_version
+        pending: List[Tuple[str, str, NormalizedSerpResult, Any]] = []
+        try:
+            for index, raw in enumerate(items):
+                sha = payload_sha256(raw)
+                result = self.get(sha, version)
+                if result is None:
+                    try:
+                        result = adapter.normalize(_decode_payload(raw))
+                    except Exception as exc:  # noqa: BLE001 – reported per item
+                        if on_error is not None:
+                            on_error(ItemError(index, f"{type(exc).__name__}: {exc}", raw))
+                        continue
+                    pending.append((sha, version, result, raw))
+                    if len(pending) >= write_batch:
+                        self.put_many(pending)
+                        pending = []
+                yield result
+        finally:
+            if pending:
+                self.put_many(pending)
+            self.flush()
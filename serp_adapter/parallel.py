@@ -0,0 +1,125 @@
+"""Process-pool normalization of raw provider items.
+
+Normalization is pure CPU work (URL parsing, timestamp parsing, object
+construction), so large imports shard the raw items across processes::
+
+    for result in normalize_parallel(iter_json_items(path), workers=16):
+        ...
+
+Each worker normalizes a chunk of items and sends back one compact
+:class:`~serp_adapter.batch.SerpResultBatch` plus its per-item errors.
+Results are yielded in input order.
+"""
+
+from __future__ import annotations
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.batch import SerpResultBatch
+from serp_adapter.models import NormalizedSerpResult
+from serp_adapter.streaming import ItemError
+
+_ChunkResult = Tuple[SerpResultBatch, List[ItemError]]
+
+
+def _normalize_chunk(
+    adapter: BaseSerpAdapter, start: int, items: List[Any]
+) -> _ChunkResult:
+    """Worker entry point: normalize *items* into one batch."""
+    pid = os.getpid()
+    batch = SerpResultBatch()
+    errors: List[ItemError] = []
+    for offset, raw in enumerate(items):
+        try:
+            batch.append(adapter.normalize(raw))
+        except Exception as exc:  # noqa: BLE001 – reported per item
+            errors.append(ItemError(start + offset, f"{type(exc).__name__}: {exc}", raw, pid))
+    return batch, errors
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[Tuple[int, List[Any]]]:
+    iterator = iter(items)
+    start = 0
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _emit(
+    chunk: _ChunkResult, on_error: Optional[Callable[[ItemError], None]]
+) -> Iterator[NormalizedSerpResult]:
+    batch, errors = chunk
+    if on_error is not None:
+        for err in errors:
+            on_error(err)
+    yield from batch
+
+
+def normalize_parallel(
+    items: Iterable[Any],
+    workers: Optional[int] = None,
+    chunk_size: int = 256,
+    adapter: Optional[BaseSerpAdapter] = None,
+    on_error: Optional[Callable[[ItemError], None]] = None,
+) -> Iterator[NormalizedSerpResult]:
+    """Normalize *items* on a process pool, yielding results in input order.
+
+    Parameters
+    ----------
+    items:
+        Raw provider items; any iterable, consumed lazily.  Only about
+        ``2 * workers`` chunks are in flight at once.
+    workers:
+        Number of worker processes (default: ``os.cpu_count()``).  With one
+        worker everything runs in the calling process.
+    chunk_size:
+        Raw items per task sent to a worker.
+    adapter:
+        Picklable adapter instance (default :class:`ApifyGoogleSearchAdapter`).
+    on_error:
+        Receives an :class:`~serp_adapter.streaming.ItemError` (with the
+        worker PID set) for each item that fails; such items are skipped.
+        If a whole task fails, every item of its chunk is reported.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    adapter = adapter or ApifyGoogleSearchAdapter()
+    workers = workers or os.cpu_count() or 1
+
+    if workers <= 1:
+        for start, chunk in _chunked(items, chunk_size):
+            yield from _emit(_normalize_chunk(adapter, start, chunk), on_error)
+        return
+
+    pending: Deque[Tuple[int, List[Any], Future]] = deque()
+
+    def _collect() -> _ChunkResult:
+        start, chunk, future = pending.popleft()
+        try:
+            return future.result()
+        except Exception as exc:  # noqa: BLE001 – e.g. BrokenProcessPool
+            message = f"{type(exc).__name__}: {exc}"
+            return SerpResultBatch(), [
+                ItemError(start + offset, message, raw) for offset, raw in enumerate(chunk)
+            ]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            for start, chunk in _chunked(items, chunk_size):
+                pending.append((start, chunk, pool.submit(_normalize_chunk, adapter, start, chunk)))
+                if len(pending) >= 2 * workers:
+                    yield from _emit(_collect(), on_error)
+            while pending:
+                yield from _emit(_collect(), on_error)
+        finally:
+            for _start, _chunk, future in pending:
+                future.cancel()
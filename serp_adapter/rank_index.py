@@ -0,0 +1,470 @@
+"""In-memory domain → ranking inverted index.
+
+"Every keyword and geo where ``callbighorn.com`` (or a subdomain) ranks"
+otherwise means scanning ``serp_results`` by domain and joining every run.
+:class:`DomainRankIndex` answers it from memory::
+
+    index = DomainRankIndex.build(conn)
+    store = SerpStore(conn, write_hooks=[index])      # keep it current
+    for row in index.visibility("callbighorn.com"):
+        print(row.keyword_norm, row.region_key, row.best_rank, row.latest_day)
+    index.save("rank.idx")
+    index = DomainRankIndex.load("rank.idx")          # mmap, no parsing
+
+A posting is one (series, day, rank) triple, where a series is the
+``keyword_norm`` / ``region_key`` / ``device_key`` part of ``serp_key``
+and the day is stored separately as days since the epoch.  Each posting is
+packed into a single unsigned 64-bit int, ``series << 32 | day << 8 |
+rank``, so sorting a host's postings orders them by series and then day.
+Same-day duplicates keep the best rank.  Postings are grouped per host
+(``serp_results.domain``) in CSR form: one flat ``postings`` array plus an
+``offsets`` array per host id.  Hosts are grouped under their
+``root_domain``, and a root lookup merges all of them (subdomain roll-up).
+
+New runs go into a per-host pending buffer.  Lookups read the buffer
+together with the packed arrays, and :meth:`DomainRankIndex.compact`
+merges it in.  Runs rewritten with fewer results, and writes whose
+transaction rolls back after the hook ran, can leave stale postings.
+:meth:`DomainRankIndex.build` starts from scratch.
+
+File layout (little-endian)::
+
+    header   48 bytes   magic "SDRI", format version, host and series
+                        counts, posting count, section offsets
+    offsets  8 bytes × (n_hosts + 1)
+    postings 8 bytes × n_postings
+    strings  UTF-8, "\\n"-separated: "host\\troot" per host, then
+             "keyword\\tregion\\tdevice" per series
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from serp_adapter.archive import has_archive, iter_archived_serps
+from serp_adapter.domains import normalize_host, registrable_domain
+from serp_adapter.keys import serp_day
+
+MAGIC = b"SDRI"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIQQQQQ")
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+_MS_PER_DAY = 86_400_000
+_DAY_MASK = (1 << 24) - 1
+_RANK_MASK = 0xFF
+
+_POSTINGS_SQL = """
+SELECT r.domain, COALESCE(NULLIF(r.root_domain, ''), r.domain), s.keyword_norm, s.region_key, s.device_key,
+       s.created_at, r.rank
+FROM serp_runs s JOIN serp_results r ON r.serp_id = s.serp_id
+WHERE s.status = 'ok' AND s.serp_key IS NOT NULL
+"""
+
+# Runs whose result rows only exist in the archive.
+_ARCHIVED_RUNS_SQL = """
+SELECT s.serp_id, s.keyword_norm, s.region_key, s.device_key, s.created_at
+FROM serp_runs s
+JOIN serp_archive_snapshots a ON a.source = 'serp_results' AND a.serp_id = s.serp_id
+WHERE s.status = 'ok' AND s.serp_key IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM serp_results r WHERE r.serp_id = s.serp_id)
+"""
+
+PathLike = Union[str, "os.PathLike[str]"]
+Series = Tuple[str, str, str]
+
+
+def _archived_postings(conn, since_ms: Optional[int]) -> Iterator[tuple]:
+    """:data:`_POSTINGS_SQL` rows for runs read back from the archive."""
+    sql, params = _ARCHIVED_RUNS_SQL, []
+    if since_ms is not None:
+        sql += " AND s.created_at >= ?"
+        params.append(since_ms)
+    sql += " ORDER BY s.keyword_norm, s.region_key, s.device_key, s.created_at"
+    runs = {run[0]: run[1:] for run in conn.execute(sql, params)}
+    for serp_id, rows in iter_archived_serps(conn, list(runs)):
+        for row in rows:
+            yield (row["domain"], row["root_domain"] or row["domain"], *runs[serp_id], row["rank"])
+
+
+class RankIndexError(ValueError):
+    """The rank index file is missing, truncated or of an unknown format."""
+
+
+class Posting(NamedTuple):
+    host: str
+    keyword_norm: str
+    region_key: str
+    device_key: str
+    day: str
+    rank: int
+
+
+@dataclass
+class KeywordVisibility:
+    """Where a domain ranks for one keyword/region/device series."""
+
+    keyword_norm: str
+    region_key: str
+    device_key: str
+    best_rank: int
+    best_day: str
+    latest_rank: int
+    latest_day: str
+    days: int
+    host: str  # Host holding the latest rank
+
+
+def _pack(series: int, day: int, rank: int) -> int:
+    return series << 32 | (day & _DAY_MASK) << 8 | min(max(rank, 0), _RANK_MASK)
+
+
+def _dedupe(packed: List[int]) -> List[int]:
+    """Sort and keep the best (lowest) rank per series and day."""
+    packed.sort()
+    out: List[int] = []
+    last = -1
+    for value in packed:
+        key = value >> 8
+        if key != last:
+            out.append(value)
+            last = key
+    return out
+
+
+def _ms_of(day: str) -> int:
+    return int(datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()) * 1000
+
+
+def _day_index(day: str) -> int:
+    return _ms_of(day) // _MS_PER_DAY
+
+
+class DomainRankIndex:
+    """Root domain / host → packed ``(series, day, rank)`` postings.
+
+    Instances are :class:`~serp_adapter.store.SerpStore` write hooks.
+    *compact_every* pending postings trigger an automatic :meth:`compact`.
+    """
+
+    def __init__(self, compact_every: int = 1_000_000) -> None:
+        self.compact_every = compact_every
+        self._hosts: List[str] = []
+        self._host_ids: Dict[str, int] = {}
+        self._host_roots: List[str] = []
+        self._roots: Dict[str, List[int]] = {}
+        self._series: List[Series] = []
+        self._series_ids: Dict[Series, int] = {}
+        self._offsets: Sequence[int] = array("Q", [0])
+        self._postings: Sequence[int] = array("Q")
+        self._pending: Dict[int, List[int]] = {}
+        self._pending_count = 0
+        self._mm: Optional[mmap.mmap] = None
+
+    # Construction
+
+    @classmethod
+    def build(cls, conn, *, since_ms: Optional[int] = None, compact_every: int = 1_000_000) -> "DomainRankIndex":
+        """Index every ``ok`` run in ``serp_runs`` (optionally from *since_ms*).
+
+        Runs whose result rows were moved to the archive are read from it.
+        """
+        index = cls(compact_every=compact_every)
+        sql, params = _POSTINGS_SQL, []
+        if since_ms is not None:
+            sql += " AND s.created_at >= ?"
+            params.append(since_ms)
+        index._add_rows(conn.execute(sql, params), auto_compact=False)
+        if has_archive(conn):
+            index._add_rows(_archived_postings(conn, since_ms), auto_compact=False)
+        index.compact()
+        return index
+
+    def __call__(self, conn, serp_ids: Sequence[str]) -> None:
+        self.apply(conn, serp_ids)
+
+    def apply(self, conn, serp_ids: Sequence[str]) -> int:
+        """Index newly written runs; returns the number of postings added."""
+        added = 0
+        for start in range(0, len(serp_ids), _SQL_CHUNK):
+            chunk = list(serp_ids[start : start + _SQL_CHUNK])
+            marks = ",".join("?" * len(chunk))
+            added += self._add_rows(
+                conn.execute(_POSTINGS_SQL + f" AND s.serp_id IN ({marks})", chunk), auto_compact=True
+            )
+        return added
+
+    def add(self, host: str, keyword_norm: str, region_key: str, device_key: str, day: str, rank: int) -> None:
+        """Add one posting (``day`` as ``YYYY-MM-DD``)."""
+        host = normalize_host(host).removeprefix("www.")
+        root = registrable_domain(host) or host
+        self._add_rows([(host, root, keyword_norm, region_key, device_key, _ms_of(day), rank)], auto_compact=True)
+
+    def _host_id(self, host: str, root: str) -> int:
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            host_id = self._host_ids[host] = len(self._hosts)
+            self._hosts.append(host)
+            self._host_roots.append(root)
+            self._roots.setdefault(root, []).append(host_id)
+        return host_id
+
+    def _add_rows(self, rows: Iterable[tuple], auto_compact: bool) -> int:
+        host_ids, series_ids, pending = self._host_ids, self._series_ids, self._pending
+        added = 0
+        for host, root, kw, region, device, created_at, rank in rows:
+            host_id = host_ids.get(host)
+            if host_id is None:
+                host_id = self._host_id(host, root or host)
+            series = (kw, region, device)
+            series_id = series_ids.get(series)
+            if series_id is None:
+                series_id = series_ids[series] = len(self._series)
+                self._series.append(series)
+            bucket = pending.get(host_id)
+            if bucket is None:
+                bucket = pending[host_id] = []
+            bucket.append(_pack(series_id, created_at // _MS_PER_DAY, rank))
+            added += 1
+        self._pending_count += added
+        if auto_compact and self._pending_count >= self.compact_every:
+            self.compact()
+        return added
+
+    def compact(self) -> None:
+        """Merge pending postings into the packed arrays."""
+        if not self._pending and len(self._offsets) == len(self._hosts) + 1:
+            return
+        old_offsets, old_postings, pending = self._offsets, self._postings, self._pending
+        offsets = array("Q", [0])
+        postings = array("Q")
+        indexed = len(old_offsets) - 1
+        for host_id in range(len(self._hosts)):
+            extra = pending.get(host_id)
+            if host_id < indexed:
+                start, end = old_offsets[host_id], old_offsets[host_id + 1]
+                if extra:
+                    postings.extend(_dedupe(list(old_postings[start:end]) + extra))
+                else:
+                    postings.extend(old_postings[start:end])
+            elif extra:
+                postings.extend(_dedupe(extra))
+            offsets.append(len(postings))
+        self._offsets, self._postings = offsets, postings
+        self._pending, self._pending_count = {}, 0
+        if self._mm is not None:
+            # The mapped views must be released before the mapping closes.
+            for view in (old_offsets, old_postings):
+                if isinstance(view, memoryview):
+                    view.release()
+            self._mm.close()
+            self._mm = None
+
+    # Lookups
+
+    def __len__(self) -> int:
+        return len(self._postings) + self._pending_count
+
+    def hosts(self, domain: str, *, subdomains: bool = True) -> List[str]:
+        """Indexed hosts matching *domain* (and, by default, its subdomains)."""
+        domain = normalize_host(domain).removeprefix("www.")
+        if not subdomains:
+            return [domain] if domain in self._host_ids else []
+        # Hosts are grouped by their stored root_domain, which need not be the
+        # PSL registrable domain (e.g. "foo.github.io" stored under "github.io").
+        host_id = self._host_ids.get(domain)
+        if host_id is not None:
+            root = self._host_roots[host_id]
+        else:
+            root = registrable_domain(domain) or domain
+        suffix = "." + domain
+        return [
+            self._hosts[host_id]
+            for host_id in self._roots.get(root, ())
+            if self._hosts[host_id] == domain or self._hosts[host_id].endswith(suffix)
+        ]
+
+    def _packed(self, host_id: int) -> List[int]:
+        packed: List[int] = []
+        if host_id < len(self._offsets) - 1:
+            packed = list(self._postings[self._offsets[host_id] : self._offsets[host_id + 1]])
+        extra = self._pending.get(host_id)
+        if extra:
+            packed = _dedupe(packed + extra)
+        return packed
+
+    def postings(
+        self,
+        domain: str,
+        *,
+        subdomains: bool = True,
+        since_day: Optional[str] = None,
+        until_day: Optional[str] = None,
+    ) -> List[Posting]:
+        """Every posting of *domain*, ordered by host, series and day."""
+        low = _day_index(since_day) if since_day else 0
+        high = _day_index(until_day) if until_day else _DAY_MASK
+        out: List[Posting] = []
+        for host in self.hosts(domain, subdomains=subdomains):
+            for value in self._packed(self._host_ids[host]):
+                day = value >> 8 & _DAY_MASK
+                if low <= day <= high:
+                    kw, region, device = self._series[value >> 32]
+                    out.append(Posting(host, kw, region, device, serp_day(day * 86_400), value & _RANK_MASK))
+        return out
+
+    def visibility(
+        self,
+        domain: str,
+        *,
+        subdomains: bool = True,
+        since_day: Optional[str] = None,
+        until_day: Optional[str] = None,
+    ) -> List[KeywordVisibility]:
+        """Best and latest rank per series for *domain*, best first.
+
+        With *subdomains*, a day on which several hosts rank counts the best
+        of them.
+        """
+        low = _day_index(since_day) if since_day else 0
+        high = _day_index(until_day) if until_day else _DAY_MASK
+        # series id -> [best_rank, best_day, latest_day, latest_rank, days, host id]
+        stats: Dict[int, List[int]] = {}
+        seen_days: Dict[int, set] = {}
+        for host in self.hosts(domain, subdomains=subdomains):
+            host_id = self._host_ids[host]
+            for value in self._packed(host_id):
+                day = value >> 8 & _DAY_MASK
+                if day < low or day > high:
+                    continue
+                series_id, rank = value >> 32, value & _RANK_MASK
+                entry = stats.get(series_id)
+                if entry is None:
+                    stats[series_id] = [rank, day, day, rank, 1, host_id]
+                    seen_days[series_id] = {day}
+                    continue
+                if rank < entry[0] or (rank == entry[0] and day > entry[1]):
+                    entry[0], entry[1] = rank, day
+                if day > entry[2] or (day == entry[2] and rank < entry[3]):
+                    entry[2], entry[3], entry[5] = day, rank, host_id
+                days = seen_days[series_id]
+                if day not in days:
+                    days.add(day)
+                    entry[4] += 1
+        out = []
+        for series_id, (best, best_day, latest_day, latest, days, host_id) in stats.items():
+            kw, region, device = self._series[series_id]
+            out.append(
+                KeywordVisibility(
+                    kw, region, device, best, serp_day(best_day * 86_400), latest,
+                    serp_day(latest_day * 86_400), days, self._hosts[host_id],
+                )
+            )
+        out.sort(key=lambda row: (row.best_rank, row.keyword_norm, row.region_key, row.device_key))
+        return out
+
+    # Persistence
+
+    def save(self, path: PathLike) -> None:
+        """Compact and write the index atomically (temp file + rename)."""
+        self.compact()
+        strings = "\n".join(
+            [f"{host}\t{root}" for host, root in zip(self._hosts, self._host_roots)]
+            + ["\t".join(series) for series in self._series]
+        ).encode("utf-8")
+        offsets, postings = array("Q", self._offsets), array("Q", self._postings)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            postings.byteswap()
+        offsets_offset = _HEADER.size
+        postings_offset = offsets_offset + len(offsets) * 8
+        strings_offset = postings_offset + len(postings) * 8
+        header = _HEADER.pack(
+            MAGIC, FORMAT_VERSION, 0, len(self._hosts), len(self._series), len(postings),
+            offsets_offset, postings_offset, strings_offset, len(strings),
+        )
+        target = Path(path)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", dir=target.parent)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(header)
+                offsets.tofile(fh)
+                postings.tofile(fh)
+                fh.write(strings)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp_name, target)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: PathLike, *, use_mmap: bool = True, compact_every: int = 1_000_000) -> "DomainRankIndex":
+        """Open a saved index.
+
+        With *use_mmap* the packed arrays are read in place from a read-only
+        mapping (shared between processes via the page cache) until the
+        next :meth:`compact` copies them.
+        """
+        path = Path(path)
+        with open(path, "rb") as fh:
+            try:
+                buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:  # empty file
+                raise RankIndexError(f"Empty rank index: {path}") from exc
+        if len(buf) < _HEADER.size:
+            buf.close()
+            raise RankIndexError(f"Truncated rank index: {path}")
+        (
+            magic, fmt, _reserved, n_hosts, n_series, n_postings,
+            offsets_offset, postings_offset, strings_offset, strings_size,
+        ) = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            buf.close()
+            raise RankIndexError(f"Not a rank index (format {fmt}): {path}")
+        if (
+            len(buf) != strings_offset + strings_size
+            or postings_offset != offsets_offset + (n_hosts + 1) * 8
+            or strings_offset != postings_offset + n_postings * 8
+        ):
+            buf.close()
+            raise RankIndexError(f"Corrupt rank index: {path}")
+
+        index = cls(compact_every=compact_every)
+        lines = buf[strings_offset : strings_offset + strings_size].decode("utf-8").split("\n") if strings_size else []
+        if len(lines) != n_hosts + n_series:
+            buf.close()
+            raise RankIndexError(f"Corrupt rank index: {path}")
+        for line in lines[:n_hosts]:
+            host, _, root = line.partition("\t")
+            index._host_id(host, root)
+        index._series = [tuple(line.split("\t")) for line in lines[n_hosts:]]  # type: ignore[misc]
+        index._series_ids = {series: series_id for series_id, series in enumerate(index._series)}
+
+        if use_mmap and sys.byteorder == "little":
+            view = memoryview(buf)
+            index._offsets = view[offsets_offset:postings_offset].cast("Q")
+            index._postings = view[postings_offset:strings_offset].cast("Q")
+            index._mm = buf
+        else:
+            offsets, postings = array("Q"), array("Q")
+            offsets.frombytes(buf[offsets_offset:postings_offset])
+            postings.frombytes(buf[postings_offset:strings_offset])
+            if sys.byteorder != "little":
+                offsets.byteswap()
+                postings.byteswap()
+            index._offsets, index._postings = offsets, postings
+            buf.close()
+        return index
@@ -0,0 +1,397 @@
+"""Compressed per-(keyword, domain) rank time-series.
+
+A year of rank history for one domain on one keyword is otherwise several
+hundred ``serp_results`` rows plus their ``serp_runs`` joins.
+``serp_rank_series`` (migration 0033) keeps it as one row per
+keyword/region/device series and root domain.  Its ``points`` blob holds
+``(day delta, rank)`` pairs as unsigned LEB128 varints, so a daily point
+usually takes two bytes::
+
+    store = SerpStore(conn, write_hooks=[RankSeries()])
+    store.write(results, user_id)
+    points = rank_history(conn, "plumber san jose", "callbighorn.com", since_day="2025-01-01")
+    weeks = weekly_ranks(points)
+
+A rank of 0 (``None`` in :class:`RankPoint`) records a fetched day on which
+the domain was not in the results.  It is written once when a domain drops
+out, so a chart can tell a drop-out from a gap in fetching.  Each day keeps
+its latest run, as in ``serp_daily_latest``; a run written after a newer
+one for the same day is ignored.  Runs for the newest day
+append or rewrite the last point in place.  Backfilled older days
+re-encode the row (without drop-out markers).
+
+Existing history is loaded once with :meth:`RankSeries.rebuild`, which
+also reads runs whose result rows were moved to the archive.
+"""
+
+from __future__ import annotations
+
+import heapq
+import sqlite3
+import statistics
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from serp_adapter.archive import has_archive, iter_archived_serps
+from serp_adapter.keys import device_key, keyword_norm, serp_day
+
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+_MS_PER_DAY = 86_400_000
+_SECONDS_PER_DAY = 86_400
+
+_BEST_RANKS = """
+SELECT serp_id, COALESCE(NULLIF(root_domain, ''), domain), MIN(rank)
+FROM serp_results
+WHERE serp_id IN ({marks})
+GROUP BY serp_id, COALESCE(NULLIF(root_domain, ''), domain)
+"""
+
+# Latest ok run per serp_key, i.e. per series and day (the serp_daily_latest rule).
+_DAY_WINNERS = """
+SELECT serp_id FROM (
+  SELECT serp_id, ROW_NUMBER() OVER (
+    PARTITION BY serp_key ORDER BY created_at DESC, serp_id DESC
+  ) AS rn
+  FROM serp_runs
+  WHERE serp_key IN ({marks}) AND status = 'ok'
+)
+WHERE rn = 1
+"""
+
+_REBUILD_WINNERS = """
+WITH winners AS (
+  SELECT serp_id, keyword_norm, region_key, device_key, created_at
+  FROM (
+    SELECT *, ROW_NUMBER() OVER (
+      PARTITION BY serp_key ORDER BY created_at DESC, serp_id DESC
+    ) AS rn
+    FROM serp_runs
+    WHERE status = 'ok' AND serp_key IS NOT NULL
+  )
+  WHERE rn = 1
+)
+"""
+
+_SERIES_ROWS = """
+SELECT root_domain, first_day, last_day, last_rank, last_run_at, tail, n_points, points
+FROM serp_rank_series
+WHERE keyword_norm = ? AND region_key = ? AND device_key = ?
+"""
+
+_UPDATE = """
+UPDATE serp_rank_series
+SET first_day = ?, last_day = ?, last_rank = ?, last_run_at = ?, tail = ?, n_points = ?, points = ?
+WHERE keyword_norm = ? AND region_key = ? AND device_key = ? AND root_domain = ?
+"""
+
+_INSERT = """
+INSERT INTO serp_rank_series (
+  keyword_norm, region_key, device_key, root_domain,
+  first_day, last_day, last_rank, last_run_at, tail, n_points, points
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Per-domain state while writing:
+# [first_day, last_day, last_rank, last_run_at, tail, n_points, points]
+_State = list
+
+
+class RankPoint(NamedTuple):
+    day: str
+    rank: Optional[int]  # None: fetched, not in the results
+
+
+@dataclass
+class WeeklyRank:
+    """One ISO week (Monday start) of a rank series."""
+
+    week: str
+    best_rank: Optional[int]
+    median_rank: Optional[float]
+    days_ranked: int
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_points(points: Sequence[Tuple[int, int]]) -> bytes:
+    """Encode ascending ``(day index, rank)`` pairs; the first delta is 0."""
+    out = bytearray()
+    previous = points[0][0] if points else 0
+    for day, rank in points:
+        out += _varint(day - previous)
+        out += _varint(rank)
+        previous = day
+    return bytes(out)
+
+
+def decode_points(data: bytes, first_day: int) -> List[Tuple[int, int]]:
+    """Inverse of :func:`encode_points`."""
+    out: List[Tuple[int, int]] = []
+    day, pos, end = first_day, 0, len(data)
+    while pos < end:
+        # One-byte values are the common case; skip the loop for them.
+        delta = data[pos]
+        if delta < 0x80:
+            pos += 1
+        else:
+            delta, pos = _read_varint(data, pos)
+        rank = data[pos]
+        if rank < 0x80:
+            pos += 1
+        else:
+            rank, pos = _read_varint(data, pos)
+        day += delta
+        out.append((day, rank))
+    return out
+
+
+def _new_state(day: int, rank: int, created_at: int) -> _State:
+    return [day, day, rank, created_at, 0, 1, bytearray(_varint(0) + _varint(rank))]
+
+
+def _merge(state: _State, day: int, rank: int, created_at: int, backfill: bool = True) -> bool:
+    """Fold one day's rank into *state*; returns whether it changed."""
+    first_day, last_day, last_rank, last_run_at, tail, n_points, points = state
+    if day > last_day:
+        if rank == 0 and last_rank == 0:
+            return False
+        state[4] = len(points)
+        points += _varint(day - last_day)
+        points += _varint(rank)
+        state[1], state[2], state[3], state[5] = day, rank, created_at, n_points + 1
+        return True
+    if day == last_day:
+        if created_at < last_run_at:
+            return False
+        state[3] = created_at
+        if rank != last_rank:
+            delta, _ = _read_varint(points, tail)
+            del points[tail:]
+            points += _varint(delta)
+            points += _varint(rank)
+            state[2] = rank
+        return True
+    if not backfill:
+        return False
+    # An older day: re-encode the row with the point inserted or replaced.
+    decoded = dict(decode_points(bytes(points), first_day))
+    if rank == 0 and day not in decoded:
+        return False
+    decoded[day] = rank
+    ordered = sorted(decoded.items())
+    encoded = encode_points(ordered)
+    tail = len(encode_points(ordered[:-1])) if len(ordered) > 1 else 0
+    state[0], state[4], state[5], state[6] = ordered[0][0], tail, len(ordered), bytearray(encoded)
+    return True
+
+
+class RankSeries:
+    """Maintains ``serp_rank_series``.
+
+    Instances are :class:`~serp_adapter.store.SerpStore` write hooks:
+    calling one with a connection and the written ``serp_id`` values
+    appends their ranks inside the caller's transaction.
+    """
+
+    def __call__(self, conn: sqlite3.Connection, serp_ids: Sequence[str]) -> None:
+        self.apply(conn, serp_ids)
+
+    def apply(self, conn: sqlite3.Connection, serp_ids: Sequence[str]) -> int:
+        """Fold newly written runs in; returns the number of rows written.
+
+        Runs that are not their day's latest run (a late-arriving older
+        fetch) are skipped, so a backfill never overwrites the winner.
+        """
+        runs: List[tuple] = []
+        serp_keys = set()
+        for start in range(0, len(serp_ids), _SQL_CHUNK):
+            chunk = list(serp_ids[start : start + _SQL_CHUNK])
+            marks = ",".join("?" * len(chunk))
+            for *run, serp_key in conn.execute(
+                "SELECT keyword_norm, region_key, device_key, created_at, serp_id, serp_key FROM serp_runs "
+                f"WHERE serp_id IN ({marks}) AND status = 'ok' AND serp_key IS NOT NULL",
+                chunk,
+            ):
+                runs.append(tuple(run))
+                serp_keys.add(serp_key)
+        keys = list(serp_keys)
+        winners = set()
+        for start in range(0, len(keys), _SQL_CHUNK):
+            chunk = keys[start : start + _SQL_CHUNK]
+            winners.update(row[0] for row in conn.execute(_DAY_WINNERS.format(marks=",".join("?" * len(chunk))), chunk))
+        runs = sorted(run for run in runs if run[4] in winners)
+        best: Dict[str, List[Tuple[str, int]]] = {}
+        ids = [run[4] for run in runs]
+        for start in range(0, len(ids), _SQL_CHUNK):
+            chunk = ids[start : start + _SQL_CHUNK]
+            for serp_id, root, rank in conn.execute(_BEST_RANKS.format(marks=",".join("?" * len(chunk))), chunk):
+                best.setdefault(serp_id, []).append((root, rank))
+        written = 0
+        for series, series_runs in groupby(runs, key=lambda run: run[:3]):
+            states: Dict[str, _State] = {
+                root: list(state) for root, *state in conn.execute(_SERIES_ROWS, series)
+            }
+            for state in states.values():
+                state[6] = bytearray(state[6])
+            stored = set(states)
+            changed = set()
+            for _kw, _region, _device, created_at, serp_id in series_runs:
+                changed |= _fold_run(states, created_at, best.get(serp_id, ()))
+            # Updates leave the key columns, and so the domain index, alone.
+            conn.executemany(_UPDATE, [(*_row(states[root]), *series, root) for root in changed & stored])
+            conn.executemany(_INSERT, [(*series, root, *_row(states[root])) for root in changed - stored])
+            written += len(changed)
+        return written
+
+    def rebuild(self, conn: sqlite3.Connection) -> int:
+        """Recompute ``serp_rank_series`` from ``serp_runs`` / ``serp_results`` and the archive."""
+        hot = conn.execute(
+            _REBUILD_WINNERS
+            + """
+            SELECT w.keyword_norm, w.region_key, w.device_key, w.created_at, w.serp_id,
+                   COALESCE(NULLIF(r.root_domain, ''), r.domain), MIN(r.rank)
+            FROM winners w JOIN serp_results r ON r.serp_id = w.serp_id
+            GROUP BY w.serp_id, COALESCE(NULLIF(r.root_domain, ''), r.domain)
+            ORDER BY w.keyword_norm, w.region_key, w.device_key, w.created_at, w.serp_id
+            """
+        )
+        rows: Iterable[tuple] = hot
+        if has_archive(conn):
+            rows = heapq.merge(hot, _archived_best_ranks(conn), key=lambda row: row[:5])
+        written = 0
+        with conn:
+            conn.execute("DELETE FROM serp_rank_series")
+            for series, series_rows in groupby(rows, key=lambda row: row[:3]):
+                states: Dict[str, _State] = {}
+                for (created_at, _serp_id), run_rows in groupby(series_rows, key=lambda row: row[3:5]):
+                    _fold_run(states, created_at, (row[5:] for row in run_rows))
+                conn.executemany(_INSERT, [(*series, root, *_row(state)) for root, state in states.items()])
+                written += len(states)
+        return written
+
+
+def _archived_best_ranks(conn: sqlite3.Connection) -> Iterator[tuple]:
+    """Rebuild rows for winners whose result rows only exist in the archive."""
+    runs = {
+        run[4]: run
+        for run in conn.execute(
+            _REBUILD_WINNERS
+            + """
+            SELECT w.keyword_norm, w.region_key, w.device_key, w.created_at, w.serp_id
+            FROM winners w
+            JOIN serp_archive_snapshots a ON a.source = 'serp_results' AND a.serp_id = w.serp_id
+            WHERE NOT EXISTS (SELECT 1 FROM serp_results r WHERE r.serp_id = w.serp_id)
+            ORDER BY w.keyword_norm, w.region_key, w.device_key, w.created_at, w.serp_id
+            """
+        )
+    }
+    for serp_id, rows in iter_archived_serps(conn, list(runs)):
+        best: Dict[str, int] = {}
+        for row in rows:
+            root = row["root_domain"] or row["domain"]
+            best[root] = min(row["rank"], best.get(root, row["rank"]))
+        for root, rank in best.items():
+            yield (*runs[serp_id], root, rank)
+
+
+def _fold_run(states: Dict[str, _State], created_at: int, ranks: Iterable[Tuple[str, int]]) -> set:
+    """Apply one run's best rank per root domain, plus drop-out markers."""
+    day = created_at // _MS_PER_DAY
+    changed: set = set()
+    if any(state[1] == day and state[3] > created_at for state in states.values()):
+        return changed  # A newer run already won this day.
+    seen = set()
+    for root, rank in ranks:
+        seen.add(root)
+        state = states.get(root)
+        if state is None:
+            states[root] = _new_state(day, rank, created_at)
+            changed.add(root)
+        elif _merge(state, day, rank, created_at):
+            changed.add(root)
+    for root, state in states.items():
+        if root not in seen and _merge(state, day, 0, created_at, backfill=False):
+            changed.add(root)
+    return changed
+
+
+def _row(state: _State) -> tuple:
+    return (*state[:6], bytes(state[6]))
+
+
+def _day_index(day: str) -> int:
+    moment = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) // _SECONDS_PER_DAY
+
+
+def rank_history(
+    conn: sqlite3.Connection,
+    keyword: str,
+    root_domain: str,
+    *,
+    region_key: str = "US-en",
+    device: str = "desktop",
+    since_day: Optional[str] = None,
+    until_day: Optional[str] = None,
+) -> List[RankPoint]:
+    """Daily ranks of *root_domain* for *keyword* in ``[since_day, until_day]``."""
+    row = conn.execute(
+        "SELECT first_day, last_day, points FROM serp_rank_series "
+        "WHERE keyword_norm = ? AND region_key = ? AND device_key = ? AND root_domain = ?",
+        (keyword_norm(keyword), region_key, device_key(device), root_domain),
+    ).fetchone()
+    if row is None:
+        return []
+    first_day, last_day, points = row
+    low = _day_index(since_day) if since_day else first_day
+    high = _day_index(until_day) if until_day else last_day
+    if low > last_day or high < first_day:
+        return []
+    return [
+        RankPoint(serp_day(day * _SECONDS_PER_DAY), rank or None)
+        for day, rank in decode_points(points, first_day)
+        if low <= day <= high
+    ]
+
+
+def weekly_ranks(points: Iterable[RankPoint]) -> List[WeeklyRank]:
+    """Downsample daily points to ISO weeks: best and median rank per week.
+
+    Weeks holding only drop-out points have ``None`` ranks.
+    """
+    weeks: Dict[int, List[Optional[int]]] = {}
+    for point in points:
+        day = date.fromisoformat(point.day)
+        weeks.setdefault(day.toordinal() - day.weekday(), []).append(point.rank)
+    out = []
+    for monday in sorted(weeks):
+        ranks = [rank for rank in weeks[monday] if rank is not None]
+        out.append(
+            WeeklyRank(
+                week=date.fromordinal(monday).isoformat(),
+                best_rank=min(ranks) if ranks else None,
+                median_rank=statistics.median(ranks) if ranks else None,
+                days_ranked=len(ranks),
+            )
+        )
+    return out
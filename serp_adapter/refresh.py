@@ -0,0 +1,484 @@
+"""Volatility-adaptive refresh intervals for tracked SERPs.
+
+Most tracked SERPs barely move from one day to the next, so fetching every
+keyword daily spends most of the provider budget on no news.  This module
+scores how stable each (keyword, region, device) series has been and
+stretches or shrinks its refresh interval to match::
+
+    policy = RefreshPolicy(min_days=1, max_days=14)
+    history = load_serp_history(conn, since_ts=now - policy.history_days * 86400)
+    decisions = plan_refresh(history, policy)
+
+    refresher = AdaptiveRefresh(conn, policy)
+    scheduler = WatchScheduler(conn, coalescer.get, interval_for=refresher.interval_seconds)
+
+Consecutive snapshots of a series are compared with rank-biased overlap
+(RBO), which weights agreement near the top of the list most.  A
+comparison across a gap of *g* days is turned into a per-day similarity
+``rbo ** (1 / g)``, so series that are already fetched less often score
+the same as daily ones.  The stability score is a recency-weighted mean
+of those similarities.  The interval grows with the score, but at most
+doubles from the last observed gap.  When the latest comparison shows a
+real change, it drops back to *min_days*.
+
+:func:`replay_refresh` replays a policy over full daily history.  It
+reports fetches saved and how many days late changes were noticed
+(``python -m scripts.bench_adaptive_refresh``).
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from serp_adapter.archive import has_archive, iter_archived_serps
+from serp_adapter.coalesce import Watch
+from serp_adapter.keys import device_key, keyword_norm, region_key
+
+_SECONDS_PER_DAY = 86_400
+
+#: (keyword_norm, region_key, device_key) for ``serp_runs``; (keyword_norm, geo) for step2.
+SeriesKey = Tuple[str, ...]
+#: (UTC day index, result identities in rank order)
+Snapshot = Tuple[int, Sequence[str]]
+
+
+def rank_biased_overlap(a: Sequence[str], b: Sequence[str], p: float = 0.9) -> float:
+    """Extrapolated rank-biased overlap of two rankings (1 = identical).
+
+    Follows Webber, Moffat & Zobel (2010), eq. 32, which also handles
+    lists of different lengths.  Repeated items count once, at their first
+    rank.
+    """
+    if not 0 < p < 1:
+        raise ValueError("p must be in (0, 1)")
+    a = list(dict.fromkeys(a))
+    b = list(dict.fromkeys(b))
+    if not a and not b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    short, long_ = (a, b) if len(a) <= len(b) else (b, a)
+    s, l = len(short), len(long_)
+    seen_short: set = set()
+    seen_long: set = set()
+    overlap = 0
+    total = 0.0
+    weight = 1.0
+    x_s = 0
+    for d in range(1, l + 1):
+        weight *= p
+        item = long_[d - 1]
+        if d <= s:
+            other = short[d - 1]
+            if item == other:
+                overlap += 1
+            else:
+                overlap += (item in seen_short) + (other in seen_long)
+            seen_short.add(other)
+            seen_long.add(item)
+            if d == s:
+                x_s = overlap
+        elif item in seen_short:
+            overlap += 1
+        total += overlap / d * weight
+        if d > s:
+            total += x_s * (d - s) / (s * d) * weight
+    return (1 - p) / p * total + ((overlap - x_s) / l + x_s / s) * weight
+
+
+@dataclass
+class RefreshDecision:
+    """Next refresh of one series."""
+
+    stability: Optional[float]  # Recency-weighted per-day RBO; None with < 2 snapshots
+    interval_days: int
+    last_day: int  # UTC day index of the latest snapshot
+    changed: bool  # Whether the latest comparison counted as a change
+
+    @property
+    def next_due_day(self) -> int:
+        return self.last_day + self.interval_days
+
+    @property
+    def next_due_ts(self) -> int:
+        """Unix second at which the series is due (midnight UTC)."""
+        return self.next_due_day * _SECONDS_PER_DAY
+
+
+@dataclass
+class RefreshPolicy:
+    """How stability maps to a refresh interval.
+
+    Parameters
+    ----------
+    min_days, max_days:
+        Bounds on the interval.
+    p:
+        RBO persistence; 0.9 puts ~86% of the weight on the top 10.
+    change_threshold:
+        RBO below which the latest comparison (however many days apart)
+        is a change and the interval drops to *min_days*.  Also used by
+        :func:`replay_refresh` to decide which days changed.
+    volatile_score, stable_score:
+        Stability at or below *volatile_score* gets *min_days*; at or
+        above *stable_score*, *max_days*; linear in between.
+    half_life:
+        Comparisons after which a comparison's weight halves.
+    history_days:
+        Days of history considered.
+    """
+
+    min_days: int = 1
+    max_days: int = 14
+    p: float = 0.9
+    change_threshold: float = 0.8
+    volatile_score: float = 0.85
+    stable_score: float = 0.98
+    half_life: float = 3.0
+    history_days: int = 28
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.min_days <= self.max_days:
+            raise ValueError("need 1 <= min_days <= max_days")
+        if self.volatile_score >= self.stable_score:
+            raise ValueError("volatile_score must be < stable_score")
+
+    def decide(self, snapshots: Sequence[Snapshot]) -> RefreshDecision:
+        """Interval for a series from its snapshots, oldest first."""
+        if not snapshots:
+            raise ValueError("no snapshots")
+        last_day = snapshots[-1][0]
+        recent = [snap for snap in snapshots if snap[0] > last_day - self.history_days]
+        if len(recent) < 2:
+            return RefreshDecision(None, self.min_days, last_day, False)
+
+        decay = 0.5 ** (1 / self.half_life)
+        weighted = 0.0
+        weights = 0.0
+        weight = 1.0
+        latest: Optional[float] = None
+        for (day_a, urls_a), (day_b, urls_b) in zip(reversed(recent[:-1]), reversed(recent[1:])):
+            overlap = rank_biased_overlap(urls_a, urls_b, self.p)
+            if latest is None:
+                latest = overlap
+            similarity = overlap ** (1 / max(1, day_b - day_a))
+            weighted += weight * similarity
+            weights += weight
+            weight *= decay
+        stability = weighted / weights
+        assert latest is not None
+
+        if latest < self.change_threshold:
+            return RefreshDecision(stability, self.min_days, last_day, True)
+        span = self.stable_score - self.volatile_score
+        fraction = min(1.0, max(0.0, (stability - self.volatile_score) / span))
+        interval = self.min_days + round(fraction * (self.max_days - self.min_days))
+        last_gap = recent[-1][0] - recent[-2][0]
+        interval = min(interval, max(self.min_days, 2 * last_gap))
+        return RefreshDecision(stability, interval, last_day, False)
+
+
+def plan_refresh(history: Dict[SeriesKey, List[Snapshot]], policy: Optional[RefreshPolicy] = None) -> Dict[SeriesKey, RefreshDecision]:
+    """:meth:`RefreshPolicy.decide` for every series with history."""
+    policy = policy or RefreshPolicy()
+    return {key: policy.decide(snapshots) for key, snapshots in history.items() if snapshots}
+
+
+def _group_daily(rows: Iterable[Tuple[SeriesKey, int, str, str]]) -> Dict[SeriesKey, List[Snapshot]]:
+    """Latest run per (series, day) from (key, day, run_id, identity) rows.
+
+    Rows must be ordered by series, then fetch time, then rank.
+    """
+    history: Dict[SeriesKey, List[Snapshot]] = {}
+    current_run: Optional[str] = None
+    urls: List[str] = []
+    for key, day, run_id, identity in rows:
+        if run_id != current_run:
+            current_run = run_id
+            urls = []
+            snapshots = history.setdefault(key, [])
+            if snapshots and snapshots[-1][0] == day:
+                snapshots[-1] = (day, urls)  # A later run the same day wins
+            else:
+                snapshots.append((day, urls))
+        urls.append(identity)
+    return history
+
+
+def load_serp_history(
+    conn: sqlite3.Connection,
+    *,
+    since_ts: int,
+    until_ts: Optional[int] = None,
+    depth: int = 20,
+) -> Dict[SeriesKey, List[Snapshot]]:
+    """Daily snapshots per (keyword_norm, region_key, device_key) from ``serp_runs``.
+
+    The latest ``ok`` run of each UTC day is used; results are identified by
+    ``url_hash`` (``url`` for rows written before it existed).  Runs whose
+    result rows were moved to the archive are read from it.
+    """
+    where = "r.status = 'ok' AND r.created_at >= ?"
+    params: List[object] = [since_ts * 1000]
+    if until_ts is not None:
+        where += " AND r.created_at < ?"
+        params.append(until_ts * 1000)
+    order = " ORDER BY r.keyword_norm, r.region_key, r.device_key, r.created_at, r.serp_id"
+    rows: Iterable[tuple] = conn.execute(
+        f"""
+        SELECT r.keyword_norm, r.region_key, r.device_key, r.created_at, r.serp_id,
+               COALESCE(s.url_hash, s.url)
+        FROM serp_runs r
+        JOIN serp_results s ON s.serp_id = r.serp_id
+        WHERE {where} AND s.rank <= ?
+        """
+        + order
+        + ", s.rank",
+        [*params, depth],
+    )
+    if has_archive(conn):
+        runs = {
+            run[4]: run
+            for run in conn.execute(
+                f"""
+                SELECT r.keyword_norm, r.region_key, r.device_key, r.created_at, r.serp_id
+                FROM serp_runs r
+                JOIN serp_archive_snapshots a ON a.source = 'serp_results' AND a.serp_id = r.serp_id
+                WHERE {where} AND NOT EXISTS (SELECT 1 FROM serp_results s WHERE s.serp_id = r.serp_id)
+                """
+                + order,
+                params,
+            )
+        }
+        archived = (
+            (*runs[serp_id], row["url"] if row["url_hash"] is None else row["url_hash"])
+            for serp_id, archived_rows in iter_archived_serps(conn, list(runs))
+            for row in archived_rows
+            if row["rank"] <= depth
+        )
+        rows = heapq.merge(rows, archived, key=_run_order)
+    return _group_daily(
+        ((kw, region, device), created_at // 1000 // _SECONDS_PER_DAY, serp_id, identity)
+        for kw, region, device, created_at, serp_id, identity in rows
+    )
+
+
+def _run_order(row: tuple) -> tuple:
+    """Sort key matching SQLite's ORDER BY over the series columns (NULL first)."""
+    return (*((value is not None, value or "") for value in row[:3]), row[3], row[4])
+
+
+def _step2_day(date_yyyymmdd: str) -> int:
+    parsed = datetime.strptime(date_yyyymmdd, "%Y%m%d").replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) // _SECONDS_PER_DAY
+
+
+def load_step2_history(
+    conn: sqlite3.Connection,
+    site_id: str,
+    *,
+    since_day: int,
+    depth: int = 20,
+) -> Dict[SeriesKey, List[Snapshot]]:
+    """Daily snapshots per (keyword_norm, geo) from the step2 harvest tables."""
+    since = datetime.fromtimestamp(since_day * _SECONDS_PER_DAY, tz=timezone.utc).strftime("%Y%m%d")
+    rows: Iterable[tuple] = conn.execute(
+        """
+        SELECT s.keyword, s.geo, s.date_yyyymmdd, s.scraped_at, s.serp_id, r.url_hash
+        FROM step2_serp_snapshots s
+        JOIN step2_serp_results r ON r.serp_id = s.serp_id
+        WHERE s.site_id = ? AND s.date_yyyymmdd >= ? AND r.rank <= ?
+        ORDER BY s.keyword, s.geo, s.date_yyyymmdd, s.scraped_at, s.serp_id, r.rank
+        """,
+        (site_id, since, depth),
+    )
+    if has_archive(conn):
+        runs = {
+            run[4]: run
+            for run in conn.execute(
+                """
+                SELECT s.keyword, s.geo, s.date_yyyymmdd, s.scraped_at, s.serp_id
+                FROM step2_serp_snapshots s
+                JOIN serp_archive_snapshots a ON a.source = 'step2_serp_results' AND a.serp_id = s.serp_id
+                WHERE s.site_id = ? AND s.date_yyyymmdd >= ?
+                  AND NOT EXISTS (SELECT 1 FROM step2_serp_results r WHERE r.serp_id = s.serp_id)
+                ORDER BY s.keyword, s.geo, s.date_yyyymmdd, s.scraped_at, s.serp_id
+                """,
+                (site_id, since),
+            )
+        }
+        archived = (
+            (*runs[serp_id], row["url_hash"])
+            for serp_id, archived_rows in iter_archived_serps(conn, list(runs), "step2_serp_results")
+            for row in archived_rows
+            if row["rank"] <= depth
+        )
+        rows = heapq.merge(rows, archived, key=lambda row: row[:5])
+    history: Dict[SeriesKey, List[Snapshot]] = {}
+    for key, snapshots in _group_daily(
+        ((keyword_norm(keyword), geo), _step2_day(date), serp_id, url_digest)
+        for keyword, geo, date, _scraped_at, serp_id, url_digest in rows
+    ).items():
+        # Keywords differing only in case/spacing share a series.
+        merged = history.setdefault(key, [])
+        merged.extend(snapshots)
+        merged.sort(key=lambda snap: snap[0])
+    return history
+
+
+def due_step2_keywords(
+    conn: sqlite3.Connection,
+    site_id: str,
+    keywords: Sequence[str],
+    geo: str,
+    *,
+    today: int,
+    policy: Optional[RefreshPolicy] = None,
+) -> List[str]:
+    """The subset of *keywords* the step2 harvest should fetch on day *today*.
+
+    Keywords without step2 history are always due.
+    """
+    policy = policy or RefreshPolicy()
+    history = load_step2_history(conn, site_id, since_day=today - policy.history_days)
+    due = []
+    for keyword in keywords:
+        snapshots = history.get((keyword_norm(keyword), geo))
+        if not snapshots or policy.decide(snapshots).next_due_day <= today:
+            due.append(keyword)
+    return due
+
+
+class AdaptiveRefresh:
+    """Refresh intervals for watchlist rows, from recent ``serp_runs`` history.
+
+    Pass :meth:`interval_seconds` to
+    :class:`~serp_adapter.scheduler.WatchScheduler` as ``interval_for``, and
+    call :meth:`reload` periodically (e.g. daily) to pick up new runs.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        policy: Optional[RefreshPolicy] = None,
+        *,
+        now: Optional[int] = None,
+    ) -> None:
+        self.conn = conn
+        self.policy = policy or RefreshPolicy()
+        self.decisions: Dict[SeriesKey, RefreshDecision] = {}
+        self.reload(now)
+
+    def reload(self, now: Optional[int] = None) -> int:
+        """Recompute decisions; returns the number of series with history."""
+        if now is None:
+            now = int(datetime.now(tz=timezone.utc).timestamp())
+        since = (now // _SECONDS_PER_DAY - self.policy.history_days) * _SECONDS_PER_DAY
+        self.decisions = plan_refresh(load_serp_history(self.conn, since_ts=since), self.policy)
+        return len(self.decisions)
+
+    def decision(self, watch: Watch) -> Optional[RefreshDecision]:
+        request = watch.request
+        return self.decisions.get(
+            (keyword_norm(request.phrase), region_key(request.location), device_key(request.device))
+        )
+
+    def interval_seconds(self, watch: Watch) -> int:
+        decision = self.decision(watch)
+        days = decision.interval_days if decision is not None else self.policy.min_days
+        return days * _SECONDS_PER_DAY
+
+
+@dataclass
+class ReplayResult:
+    """Outcome of replaying a policy over full daily history."""
+
+    series: int
+    days: int
+    fetches: int
+    baseline_fetches: int  # One fetch per series per day
+    changes: int  # Days whose SERP changed materially from the day before
+    detected: int  # Changes followed by a fetch inside the replay window
+    lag_days: List[int]  # Days from each detected change to the fetch that saw it
+
+    @property
+    def fetches_saved(self) -> float:
+        return 1 - self.fetches / self.baseline_fetches if self.baseline_fetches else 0.0
+
+    def lag_quantile(self, q: float) -> float:
+        if not self.lag_days:
+            return 0.0
+        ordered = sorted(self.lag_days)
+        return float(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)])
+
+    def to_dict(self) -> dict[str, object]:
+        return {
+            "series": self.series,
+            "days": self.days,
+            "fetches": self.fetches,
+            "baseline_fetches": self.baseline_fetches,
+            "fetches_saved": round(self.fetches_saved, 4),
+            "changes": self.changes,
+            "changes_detected": self.detected,
+            "mean_lag_days": round(sum(self.lag_days) / len(self.lag_days), 3) if self.lag_days else 0.0,
+            "p50_lag_days": self.lag_quantile(0.5),
+            "p95_lag_days": self.lag_quantile(0.95),
+            "max_lag_days": max(self.lag_days, default=0),
+        }
+
+
+def replay_refresh(history: Dict[SeriesKey, List[Snapshot]], policy: Optional[RefreshPolicy] = None) -> ReplayResult:
+    """Replay *policy* over daily history, as if only its fetches had happened.
+
+    Each series starts with a fetch on its first day.  After every fetch the
+    policy sees only the snapshots it fetched so far and picks the next
+    fetch day.  A day counts as a change when its similarity to the
+    previous day is below ``policy.change_threshold``.  Its lag is the
+    number of days until the next fetch.
+    """
+    policy = policy or RefreshPolicy()
+    result = ReplayResult(series=0, days=0, fetches=0, baseline_fetches=0, changes=0, detected=0, lag_days=[])
+    first_days: List[int] = []
+    last_days: List[int] = []
+    for snapshots in history.values():
+        if not snapshots:
+            continue
+        by_day = dict(snapshots)
+        first, last = snapshots[0][0], snapshots[-1][0]
+        first_days.append(first)
+        last_days.append(last)
+        result.series += 1
+        result.baseline_fetches += len(by_day)
+
+        fetch_days: List[int] = []
+        fetched: List[Snapshot] = []
+        day = first
+        while day <= last:
+            if day in by_day:
+                fetch_days.append(day)
+                fetched.append((day, by_day[day]))
+                day += policy.decide(fetched).interval_days
+            else:
+                day += 1  # No data that day (provider outage): try the next
+        result.fetches += len(fetch_days)
+
+        next_fetch = 0
+        days = sorted(by_day)
+        for previous, current in zip(days, days[1:]):
+            if rank_biased_overlap(by_day[previous], by_day[current], policy.p) >= policy.change_threshold:
+                continue
+            result.changes += 1
+            while next_fetch < len(fetch_days) and fetch_days[next_fetch] < current:
+                next_fetch += 1
+            if next_fetch < len(fetch_days):
+                result.detected += 1
+                result.lag_days.append(fetch_days[next_fetch] - current)
+    if first_days:
+        result.days = max(last_days) - min(first_days) + 1
+    return result
+
@@ -0,0 +1,279 @@
+"""Incrementally maintained daily SERP rollups.
+
+The daily trend graph picks each day's latest ``ok`` run of a phrase and
+joins its ``serp_results``.  The domain-average view needs the best rank of
+every domain per keyword.  Computing either from ``serp_runs`` means a
+``ROW_NUMBER()`` window over every run of the phrase on every read.  The
+tables from ``0032_serp_daily_rollups.sql`` keep the answers instead:
+
+* ``serp_daily_latest`` – the winning run per ``serp_key`` (keyword,
+  region, device and UTC day);
+* ``serp_daily_domain_best`` – best rank per root domain in that run.
+
+:class:`SerpRollups` updates both in the transaction that writes the runs::
+
+    store = SerpStore(conn, write_hooks=[SerpRollups()])
+    store.write(results, user_id)
+    rows = daily_latest_serp_rows(conn, "plumber san jose", since_ms)
+    averages = domain_average_rank(conn, ["plumber san jose", "drain cleaning"])
+
+Existing history is loaded once with :meth:`SerpRollups.rebuild`.  Runs
+written before ``serp_key`` was populated are not rolled up.  Runs whose
+result rows were moved to the archive (:mod:`serp_adapter.archive`) are
+read from their archive blocks.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from serp_adapter.archive import has_archive, iter_archived_serps
+from serp_adapter.keys import device_key, keyword_norm
+
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+
+_UPSERT_LATEST = """
+INSERT INTO serp_daily_latest (serp_key, keyword_norm, region_key, device_key, day, serp_id, created_at)
+SELECT serp_key, keyword_norm, region_key, device_key, date(created_at / 1000, 'unixepoch'), serp_id, created_at
+FROM serp_runs
+WHERE serp_id = ? AND status = 'ok' AND serp_key IS NOT NULL
+ON CONFLICT(serp_key) DO UPDATE SET
+  serp_id = excluded.serp_id,
+  created_at = excluded.created_at
+WHERE excluded.created_at > serp_daily_latest.created_at
+   OR (excluded.created_at = serp_daily_latest.created_at AND excluded.serp_id >= serp_daily_latest.serp_id)
+"""
+
+_DELETE_DOMAIN_BEST = """
+DELETE FROM serp_daily_domain_best
+WHERE keyword_norm = ? AND region_key = ? AND device_key = ? AND day = ?
+"""
+
+_INSERT_DOMAIN_BEST = """
+INSERT INTO serp_daily_domain_best (keyword_norm, region_key, device_key, day, root_domain, best_rank, serp_id)
+SELECT ?, ?, ?, ?, COALESCE(NULLIF(root_domain, ''), domain), MIN(rank), serp_id
+FROM serp_results
+WHERE serp_id = ?
+GROUP BY COALESCE(NULLIF(root_domain, ''), domain)
+"""
+
+# Winners whose result rows only exist in the archive.
+_ARCHIVED_WINNERS = """
+SELECT d.keyword_norm, d.region_key, d.device_key, d.day, d.serp_id
+FROM serp_daily_latest d
+JOIN serp_archive_snapshots a ON a.source = 'serp_results' AND a.serp_id = d.serp_id
+WHERE NOT EXISTS (SELECT 1 FROM serp_results r WHERE r.serp_id = d.serp_id)
+ORDER BY d.keyword_norm, d.region_key, d.device_key, d.day
+"""
+
+
+def _best_ranks(rows: Iterable[Dict[str, object]]) -> Dict[str, int]:
+    """Best rank per root domain (the domain when it has none) of result rows."""
+    best: Dict[str, int] = {}
+    for row in rows:
+        root = row["root_domain"] or row["domain"]
+        best[root] = min(row["rank"], best.get(root, row["rank"]))
+    return best
+
+
+def _day(ms: int) -> str:
+    return datetime.fromtimestamp(ms // 1000, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class SerpRollups:
+    """Maintains ``serp_daily_latest`` and ``serp_daily_domain_best``.
+
+    Instances are :class:`~serp_adapter.store.SerpStore` write hooks:
+    calling one with a connection and the written ``serp_id`` values brings
+    the rollups up to date inside the caller's transaction.
+    """
+
+    def __call__(self, conn: sqlite3.Connection, serp_ids: Sequence[str]) -> None:
+        self.apply(conn, serp_ids)
+
+    def apply(self, conn: sqlite3.Connection, serp_ids: Sequence[str]) -> int:
+        """Fold newly written (or rewritten) runs in; returns days re-aggregated."""
+        if not serp_ids:
+            return 0
+        conn.executemany(_UPSERT_LATEST, [(serp_id,) for serp_id in serp_ids])
+        # Days whose winner is one of these runs: new winners, and rewrites
+        # of the current winner, both need their domain rows rebuilt.
+        winners: List[tuple] = []
+        for start in range(0, len(serp_ids), _SQL_CHUNK):
+            chunk = list(serp_ids[start : start + _SQL_CHUNK])
+            marks = ",".join("?" * len(chunk))
+            winners.extend(
+                conn.execute(
+                    "SELECT d.keyword_norm, d.region_key, d.device_key, d.day, d.serp_id "
+                    "FROM serp_runs r JOIN serp_daily_latest d ON d.serp_key = r.serp_key AND d.serp_id = r.serp_id "
+                    f"WHERE r.serp_id IN ({marks})",
+                    chunk,
+                )
+            )
+        conn.executemany(_DELETE_DOMAIN_BEST, [row[:4] for row in winners])
+        conn.executemany(_INSERT_DOMAIN_BEST, winners)
+        return len(winners)
+
+    def rebuild(self, conn: sqlite3.Connection) -> int:
+        """Recompute both tables from ``serp_runs`` / ``serp_results`` and the archive."""
+        with conn:
+            conn.execute("DELETE FROM serp_daily_domain_best")
+            conn.execute("DELETE FROM serp_daily_latest")
+            conn.execute(
+                """
+                INSERT INTO serp_daily_latest (serp_key, keyword_norm, region_key, device_key, day, serp_id, created_at)
+                SELECT serp_key, keyword_norm, region_key, device_key, date(created_at / 1000, 'unixepoch'),
+                       serp_id, created_at
+                FROM (
+                  SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY serp_key ORDER BY created_at DESC, serp_id DESC
+                  ) AS rn
+                  FROM serp_runs
+                  WHERE status = 'ok' AND serp_key IS NOT NULL
+                )
+                WHERE rn = 1
+                """
+            )
+            conn.execute(
+                """
+                INSERT INTO serp_daily_domain_best (keyword_norm, region_key, device_key, day, root_domain, best_rank, serp_id)
+                SELECT d.keyword_norm, d.region_key, d.device_key, d.day,
+                       COALESCE(NULLIF(r.root_domain, ''), r.domain), MIN(r.rank), d.serp_id
+                FROM serp_daily_latest d
+                JOIN serp_results r ON r.serp_id = d.serp_id
+                GROUP BY d.serp_key, COALESCE(NULLIF(r.root_domain, ''), r.domain)
+                """
+            )
+            if has_archive(conn):
+                archived = {row[4]: row[:4] for row in conn.execute(_ARCHIVED_WINNERS)}
+                for serp_id, rows in iter_archived_serps(conn, list(archived)):
+                    conn.executemany(
+                        "INSERT INTO serp_daily_domain_best "
+                        "(keyword_norm, region_key, device_key, day, root_domain, best_rank, serp_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(*archived[serp_id], root, rank, serp_id) for root, rank in _best_ranks(rows).items()],
+                    )
+        return conn.execute("SELECT COUNT(*) FROM serp_daily_latest").fetchone()[0]
+
+
+def daily_latest_serp_rows(
+    conn: sqlite3.Connection,
+    keyword: str,
+    since_ms: int,
+    device: str = "",
+) -> List[Dict[str, object]]:
+    """Result rows of each day's latest run of *keyword*, oldest day first.
+
+    The rollup equivalent of the worker's ``loadDailyLatestSerpRows``: one
+    run per day (the latest across regions, and across devices unless
+    *device* is given).  Runs without hot rows are looked up in the archive.
+    """
+    sql = """
+        SELECT day, serp_id, created_at FROM serp_daily_latest
+        WHERE keyword_norm = ? AND day >= ?
+    """
+    params: List[object] = [keyword_norm(keyword), _day(since_ms)]
+    if device:
+        sql += " AND device_key = ?"
+        params.append(device_key(device))
+    sql += " ORDER BY day ASC, created_at DESC, serp_id DESC"
+    # Same-day rows come newest first; the first of each day wins.  A first
+    # day whose latest run predates since_ms has no qualifying run at all.
+    winners: Dict[str, str] = {}
+    for day, serp_id, created_at in conn.execute(sql, params):
+        if day not in winners:
+            winners[day] = serp_id if created_at >= since_ms else ""
+    serp_days = {serp_id: day for day, serp_id in winners.items() if serp_id}
+    found: List[Dict[str, object]] = []
+    hot = set()
+    ids = list(serp_days)
+    for start in range(0, len(ids), _SQL_CHUNK):
+        chunk = ids[start : start + _SQL_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        for serp_id, rank, url, domain, title, snippet in conn.execute(
+            f"SELECT serp_id, rank, url, domain, title, snippet FROM serp_results WHERE serp_id IN ({marks})",
+            chunk,
+        ):
+            hot.add(serp_id)
+            found.append(
+                {
+                    "day": serp_days[serp_id],
+                    "rank": rank,
+                    "url": url,
+                    "domain": domain,
+                    "title": title,
+                    "snippet": snippet,
+                }
+            )
+    cold = [serp_id for serp_id in ids if serp_id not in hot]
+    if cold and has_archive(conn):
+        for serp_id, rows in iter_archived_serps(conn, cold):
+            found.extend(
+                {"day": serp_days[serp_id], **{name: row[name] for name in ("rank", "url", "domain", "title", "snippet")}}
+                for row in rows
+            )
+    found.sort(key=lambda row: (row["day"], row["rank"]))
+    return found
+
+
+@dataclass
+class DomainAverage:
+    """A domain's mean best rank over the keywords it ranks for."""
+
+    root_domain: str
+    average_rank: float
+    keywords: int
+
+
+def domain_average_rank(
+    conn: sqlite3.Connection,
+    keywords: Sequence[str],
+    *,
+    since_day: Optional[str] = None,
+    until_day: Optional[str] = None,
+    device: str = "",
+) -> List[DomainAverage]:
+    """Mean best rank per root domain across *keywords*, best first.
+
+    Each keyword (per region and device) contributes its latest rolled-up
+    day in ``[since_day, until_day]`` (``YYYY-MM-DD``, both optional).
+    """
+    norms = sorted({keyword_norm(keyword) for keyword in keywords})
+    if not norms:
+        return []
+    marks = ",".join("?" * len(norms))
+    where = [f"keyword_norm IN ({marks})"]
+    params: List[object] = list(norms)
+    if since_day:
+        where.append("day >= ?")
+        params.append(since_day)
+    if until_day:
+        where.append("day <= ?")
+        params.append(until_day)
+    if device:
+        where.append("device_key = ?")
+        params.append(device_key(device))
+    rows = conn.execute(
+        f"""
+        WITH latest AS (
+          SELECT keyword_norm, region_key, device_key, MAX(day) AS day
+          FROM serp_daily_latest
+          WHERE {" AND ".join(where)}
+          GROUP BY keyword_norm, region_key, device_key
+        )
+        SELECT b.root_domain, AVG(b.best_rank), COUNT(*)
+        FROM latest l
+        JOIN serp_daily_domain_best b
+          ON b.keyword_norm = l.keyword_norm
+         AND b.region_key = l.region_key
+         AND b.device_key = l.device_key
+         AND b.day = l.day
+        GROUP BY b.root_domain
+        ORDER BY AVG(b.best_rank) ASC, b.root_domain ASC
+        """,
+        params,
+    )
+    return [DomainAverage(domain, average, count) for domain, average, count in rows]
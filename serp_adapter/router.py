@@ -0,0 +1,270 @@
+"""Hedged routing of SERP fetches across two providers.
+
+A slow primary provider should not stall a daily run.  :class:`HedgedSerpRouter`
+sends each request to the primary provider and, if no good result has
+arrived after the primary's recent p95 latency, sends the same request to
+a secondary provider.  The first good result wins, the other request is
+cancelled, and the outcome is recorded for ``serp_runs.fallback_reason``::
+
+    router = HedgedSerpRouter(primary, secondary)
+    routed = await router.fetch(SerpRequest("plumber san jose", Location(country="US")))
+    store.write([routed.result], user_id, fallback_reason=[routed.fallback_reason])
+
+``fallback_reason`` is ``None`` when the primary's result was used, and
+otherwise follows the worker's ``"<provider>_failed:<message>"`` form:
+
+* ``"<primary>_failed:<error>"`` – the primary failed; the secondary's
+  result was used
+* ``"<primary>_slow:hedged_after_<ms>ms"`` – the hedge fired and the
+  secondary answered first
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from serp_adapter.adapters.base import BaseSerpAdapter
+from serp_adapter.models import NormalizedSerpResult, SerpRequest
+
+_REASON_MAX = 180  # Message length kept in fallback_reason, as in the worker
+
+
+class SerpProvider(ABC):
+    """Asynchronous source of normalized SERPs."""
+
+    #: Provider name used in ``fallback_reason`` and routing stats.
+    name: str = "provider"
+
+    @abstractmethod
+    async def fetch(self, request: SerpRequest) -> NormalizedSerpResult:
+        """Fetch and normalize one SERP; raise on failure."""
+
+
+class AdapterProvider(SerpProvider):
+    """Provider built from a raw-payload fetcher and a :class:`BaseSerpAdapter`."""
+
+    def __init__(
+        self,
+        name: str,
+        fetch_raw: Callable[[SerpRequest], Awaitable[Any]],
+        adapter: BaseSerpAdapter,
+    ) -> None:
+        self.name = name
+        self.fetch_raw = fetch_raw
+        self.adapter = adapter
+
+    async def fetch(self, request: SerpRequest) -> NormalizedSerpResult:
+        return self.adapter.normalize(await self.fetch_raw(request))
+
+
+class SerpRoutingError(RuntimeError):
+    """Every provider failed for a request."""
+
+    def __init__(self, errors: Dict[str, BaseException]) -> None:
+        detail = "; ".join(f"{name}: {type(exc).__name__}: {exc}" for name, exc in errors.items())
+        super().__init__(f"All SERP providers failed ({detail})")
+        self.errors = errors
+
+
+class EmptySerpError(ValueError):
+    """A provider returned a SERP without organic results."""
+
+
+@dataclass
+class RoutedSerp:
+    """Outcome of one routed fetch."""
+
+    result: NormalizedSerpResult
+    provider: str  # Name of the provider whose result was used
+    fallback_reason: Optional[str]  # None when the primary's result was used
+    latency: float  # Seconds from the first request to the accepted result
+    hedged: bool  # Whether the secondary request was sent
+
+
+class LatencyWindow:
+    """Sliding window of recent latencies with a quantile estimate."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+@dataclass
+class RouterStats:
+    requests: int = 0
+    hedged: int = 0
+    wins: Dict[str, int] = field(default_factory=dict)
+    failures: Dict[str, int] = field(default_factory=dict)
+
+
+def _default_accept(result: NormalizedSerpResult) -> None:
+    if not result.results:
+        raise EmptySerpError("no organic results")
+
+
+def _reason_text(exc: BaseException) -> str:
+    text = str(exc).strip() or type(exc).__name__
+    return text[:_REASON_MAX]
+
+
+class HedgedSerpRouter:
+    """Primary/secondary router with a latency-based hedge.
+
+    Parameters
+    ----------
+    primary, secondary:
+        Providers to route between.
+    hedge_quantile:
+        Quantile of the primary's recent successful latencies used as the
+        hedge delay (default p95).
+    initial_delay:
+        Hedge delay until *min_samples* latencies have been observed.
+    min_delay, max_delay:
+        Bounds on the hedge delay.
+    window:
+        Number of recent primary latencies kept.
+    min_samples:
+        Observations needed before the quantile replaces *initial_delay*.
+    accept:
+        Called with each result; raising rejects it as a failure.  The
+        default rejects SERPs without organic results.
+    """
+
+    def __init__(
+        self,
+        primary: SerpProvider,
+        secondary: SerpProvider,
+        *,
+        hedge_quantile: float = 0.95,
+        initial_delay: float = 2.0,
+        min_delay: float = 0.05,
+        max_delay: float = 30.0,
+        window: int = 200,
+        min_samples: int = 20,
+        accept: Callable[[NormalizedSerpResult], None] = _default_accept,
+    ) -> None:
+        if not 0 < hedge_quantile <= 1:
+            raise ValueError("hedge_quantile must be in (0, 1]")
+        if min_delay > max_delay:
+            raise ValueError("min_delay must be <= max_delay")
+        self.primary = primary
+        self.secondary = secondary
+        self.hedge_quantile = hedge_quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.accept = accept
+        self.latencies = LatencyWindow(window)
+        self.stats = RouterStats()
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary before sending the hedge."""
+        estimate = self.latencies.quantile(self.hedge_quantile)
+        if estimate is None or len(self.latencies) < self.min_samples:
+            estimate = self.initial_delay
+        return min(self.max_delay, max(self.min_delay, estimate))
+
+    async def _attempt(self, provider: SerpProvider, request: SerpRequest) -> NormalizedSerpResult:
+        result = await provider.fetch(request)
+        self.accept(result)
+        return result
+
+    def _won(self, name: str) -> None:
+        self.stats.wins[name] = self.stats.wins.get(name, 0) + 1
+
+    def _failed(self, name: str) -> None:
+        self.stats.failures[name] = self.stats.failures.get(name, 0) + 1
+
+    async def fetch(self, request: SerpRequest) -> RoutedSerp:
+        """Route one request; raises :class:`SerpRoutingError` if both fail."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        delay = self.hedge_delay()
+        self.stats.requests += 1
+
+        primary = asyncio.create_task(self._attempt(self.primary, request))
+        tasks: Dict["asyncio.Task[NormalizedSerpResult]", SerpProvider] = {primary: self.primary}
+        pending: Set["asyncio.Task[NormalizedSerpResult]"] = {primary}
+        errors: Dict[str, BaseException] = {}
+        hedged_at: Optional[float] = None
+        try:
+            while pending:
+                timeout = None if hedged_at is not None else max(0.0, started + delay - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The primary is slower than its recent p95: hedge.
+                    hedged_at = loop.time()
+                    pending.add(self._hedge(request, tasks))
+                    continue
+                for task in done:
+                    provider = tasks[task]
+                    exc = task.exception()
+                    if exc is None:
+                        return self._routed(task.result(), provider, errors, started, hedged_at, loop.time())
+                    errors[provider.name] = exc
+                    self._failed(provider.name)
+                    if provider is self.primary and hedged_at is None:
+                        hedged_at = loop.time()
+                        pending.add(self._hedge(request, tasks))
+            raise SerpRoutingError(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            if primary in pending:
+                # Censored sample: the primary took at least this long.
+                self.latencies.add(loop.time() - started)
+
+    def _hedge(
+        self,
+        request: SerpRequest,
+        tasks: Dict["asyncio.Task[NormalizedSerpResult]", SerpProvider],
+    ) -> "asyncio.Task[NormalizedSerpResult]":
+        self.stats.hedged += 1
+        task = asyncio.create_task(self._attempt(self.secondary, request))
+        tasks[task] = self.secondary
+        return task
+
+    def _routed(
+        self,
+        result: NormalizedSerpResult,
+        provider: SerpProvider,
+        errors: Dict[str, BaseException],
+        started: float,
+        hedged_at: Optional[float],
+        now: float,
+    ) -> RoutedSerp:
+        self._won(provider.name)
+        reason: Optional[str] = None
+        if provider is self.primary:
+            self.latencies.add(now - started)
+        elif self.primary.name in errors:
+            reason = f"{self.primary.name}_failed:{_reason_text(errors[self.primary.name])}"
+        else:
+            waited_ms = round(((hedged_at or now) - started) * 1000)
+            reason = f"{self.primary.name}_slow:hedged_after_{waited_ms}ms"
+        return RoutedSerp(
+            result=result,
+            provider=provider.name,
+            fallback_reason=reason,
+            latency=now - started,
+            hedged=hedged_at is not None,
+        )
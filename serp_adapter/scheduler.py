@@ -0,0 +1,457 @@
+"""In-memory scheduler for ``serp_watchlist`` refreshes.
+
+Instead of repeatedly scanning ``serp_watchlist`` for due rows,
+:class:`WatchScheduler` reads the active rows once and keeps their next-due
+times in a min-heap::
+
+    scheduler = WatchScheduler(conn, coalescer.get, buckets={"apify": TokenBucket(20)})
+    scheduler.load()
+    await scheduler.run(stop_event)
+
+Each heap entry is a single int, ``(due_seconds << 32) | rowid``, where
+``rowid`` is the watch row's SQLite rowid, so the heap holds no strings
+and a million watches take a few tens of MB.  Rows are only read back
+(batched by rowid) when they come due.  A parallel ``array`` of the
+scheduled due time per rowid marks superseded heap entries, which are
+skipped when popped (lazy deletion).
+
+Dispatches go through a per-provider :class:`TokenBucket` and at most
+*max_in_flight* run at once.  Rows are popped only while a slot is free,
+and a dispatch task is created only once its provider has a token, so at
+most *max_in_flight* watches are materialized; the rest stay heap ints.  Outcomes are written to ``last_run_at``,
+``last_serp_id``, ``last_status`` and ``last_error`` with one
+``executemany`` per *flush_every* results or *flush_interval* seconds.
+Watches created, changed or removed elsewhere are reported through
+:meth:`WatchScheduler.schedule` / :meth:`WatchScheduler.unschedule`, or
+picked up by calling :meth:`WatchScheduler.load` again.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import sqlite3
+import time
+from array import array
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from serp_adapter.coalesce import Watch, _location_from_region_json
+from serp_adapter.keys import clean_string
+from serp_adapter.models import SerpRequest
+
+Dispatch = Callable[[str, SerpRequest], Awaitable[Any]]
+
+_ROWID_BITS = 32
+_ROWID_MASK = (1 << _ROWID_BITS) - 1
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+_ERROR_MAX = 300
+
+_UPDATE_STATUS = """
+UPDATE serp_watchlist
+SET last_run_at = ?,
+    last_serp_id = ?,
+    last_status = ?,
+    last_error = ?,
+    updated_at = ?
+WHERE rowid = ?
+"""
+
+
+class TokenBucket:
+    """Token bucket allowing *rate* acquisitions per second, bursting to *burst*."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self._updated = clock()
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """Wait for a token.
+
+        The token is reserved up front (the balance may go negative), so
+        each waiter sleeps once for its own turn instead of every waiter
+        waking on every refill.
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate) - 1
+        self._updated = now
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class WatchScheduler:
+    """Heap-driven, rate-limited dispatcher for active watchlist rows.
+
+    Parameters
+    ----------
+    conn:
+        Connection holding ``serp_watchlist``.
+    dispatch:
+        ``await dispatch(user_id, request)`` fetches one watch, e.g.
+        :meth:`~serp_adapter.coalesce.SerpCoalescer.get`.  Its return
+        value's ``serp_id`` attribute (or the value itself, if a string)
+        becomes ``last_serp_id``; raising marks the watch ``error``.
+    interval_seconds:
+        Time between successful refreshes of a watch.
+    interval_for:
+        Per-watch interval in seconds, overriding *interval_seconds*
+        (e.g. :meth:`~serp_adapter.refresh.AdaptiveRefresh.interval_seconds`).
+    retry_seconds:
+        Delay before a failed watch is tried again.
+    buckets:
+        Token bucket per provider name.
+    provider_for:
+        Provider name of a watch (default: ``"default"`` for every watch).
+    default_rate:
+        Dispatches per second for providers without a bucket in *buckets*.
+    max_in_flight:
+        Concurrent dispatches.
+    flush_every, flush_interval:
+        Status updates are written once this many are pending, or this
+        many seconds after the last write.
+    clock:
+        Current Unix time in seconds (for tests).
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        dispatch: Dispatch,
+        *,
+        interval_seconds: int = 24 * 3600,
+        interval_for: Optional[Callable[[Watch], int]] = None,
+        retry_seconds: int = 15 * 60,
+        buckets: Optional[Dict[str, TokenBucket]] = None,
+        provider_for: Optional[Callable[[Watch], str]] = None,
+        default_rate: float = 50.0,
+        max_in_flight: int = 256,
+        batch_size: int = 1000,
+        flush_every: int = 1000,
+        flush_interval: float = 1.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.conn = conn
+        self.dispatch = dispatch
+        self.interval_seconds = int(interval_seconds)
+        self.interval_for = interval_for
+        self.retry_seconds = int(retry_seconds)
+        self.buckets: Dict[str, TokenBucket] = dict(buckets or {})
+        self.provider_for = provider_for or (lambda _watch: "default")
+        self.default_rate = default_rate
+        self.batch_size = batch_size
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.dispatched = 0
+        self.failed = 0
+        self.max_in_flight = max_in_flight
+        self._active = 0  # Dispatch tasks running
+        self._ready: Dict[str, Deque[Tuple[int, Watch]]] = {}  # Popped, waiting for a token
+        self._held = 0
+        self._heap: List[int] = []
+        self._due = array("q")  # Scheduled due second per rowid; 0 = not scheduled
+        self._live = 0
+        self._in_flight: Set[int] = set()
+        self._updates: List[Tuple[int, Optional[str], str, Optional[str], int, int]] = []
+        self._last_flush = clock()
+        self._wake: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        """Watches currently scheduled (excluding ones being dispatched)."""
+        return self._live
+
+    # -- heap maintenance -------------------------------------------------
+
+    def _set_due(self, rowid: int, due: int) -> None:
+        if rowid > _ROWID_MASK:
+            raise ValueError(f"rowid {rowid} does not fit the scheduler's {_ROWID_BITS}-bit keys")
+        if rowid >= len(self._due):
+            self._due.extend([0] * (rowid + 1 - len(self._due) + len(self._due) // 2))
+        if self._due[rowid] == 0 and due:
+            self._live += 1
+        elif self._due[rowid] and not due:
+            self._live -= 1
+        self._due[rowid] = due
+
+    def _push(self, rowid: int, due: int) -> None:
+        due = max(1, due)
+        self._set_due(rowid, due)
+        heapq.heappush(self._heap, (due << _ROWID_BITS) | rowid)
+        if self._wake is not None:
+            self._wake.set()
+
+    def load(self) -> int:
+        """(Re)build the heap from the active rows of ``serp_watchlist``."""
+        entries: List[int] = []
+        due_by_rowid = array("q")
+        for rowid, last_run_at, interval in self._active_rows():
+            if rowid in self._in_flight:
+                continue  # Rescheduled when its dispatch finishes
+            if rowid > _ROWID_MASK:
+                raise ValueError(f"rowid {rowid} does not fit the scheduler's {_ROWID_BITS}-bit keys")
+            due = last_run_at // 1000 + interval if last_run_at else 1
+            if rowid >= len(due_by_rowid):
+                due_by_rowid.extend([0] * (rowid + 1 - len(due_by_rowid) + len(due_by_rowid) // 2))
+            due_by_rowid[rowid] = due
+            entries.append((due << _ROWID_BITS) | rowid)
+        heapq.heapify(entries)
+        self._heap = entries
+        self._due = due_by_rowid
+        self._live = len(entries)
+        if self._wake is not None:
+            self._wake.set()
+        return len(entries)
+
+    def _active_rows(self) -> Iterator[Tuple[int, Optional[int], int]]:
+        if self.interval_for is None:
+            for rowid, last_run_at in self.conn.execute(
+                "SELECT rowid, last_run_at FROM serp_watchlist WHERE active = 1"
+            ):
+                yield rowid, last_run_at, self.interval_seconds
+            return
+        for rowid, last_run_at, watch_id, user_id, phrase, region_json, device in self.conn.execute(
+            "SELECT rowid, last_run_at, watch_id, user_id, phrase, region_json, device "
+            "FROM serp_watchlist WHERE active = 1"
+        ):
+            watch = Watch(watch_id, user_id, SerpRequest(phrase, _location_from_region_json(region_json), device))
+            yield rowid, last_run_at, int(self.interval_for(watch))
+
+    def _rowid(self, watch_id: str) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT rowid FROM serp_watchlist WHERE watch_id = ? AND active = 1", (watch_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def schedule(self, watch_id: str, due: Optional[float] = None) -> bool:
+        """(Re)schedule an active watch, by default to run now."""
+        rowid = self._rowid(watch_id)
+        if rowid is None:
+            return False
+        self._push(rowid, int(self.clock() if due is None else due))
+        return True
+
+    def unschedule(self, watch_id: str) -> None:
+        """Stop scheduling a watch (deleted or deactivated)."""
+        row = self.conn.execute("SELECT rowid FROM serp_watchlist WHERE watch_id = ?", (watch_id,)).fetchone()
+        if row is None:
+            return
+        rowid = row[0]
+        self._in_flight.discard(rowid)
+        if rowid < len(self._due):
+            self._set_due(rowid, 0)
+
+    def next_due(self) -> Optional[int]:
+        """Unix second of the earliest scheduled watch."""
+        heap = self._heap
+        while heap:
+            key = heap[0]
+            rowid = key & _ROWID_MASK
+            if self._due[rowid] == key >> _ROWID_BITS:
+                return key >> _ROWID_BITS
+            heapq.heappop(heap)  # Superseded entry
+        return None
+
+    def pop_due(self, now: float, limit: Optional[int] = None) -> List[int]:
+        """Remove and return the rowids of watches due at *now*."""
+        heap = self._heap
+        due_array = self._due
+        cutoff = int(now)
+        limit = self.batch_size if limit is None else limit
+        out: List[int] = []
+        while heap and len(out) < limit:
+            key = heap[0]
+            due = key >> _ROWID_BITS
+            if due > cutoff:
+                break
+            heapq.heappop(heap)
+            rowid = key & _ROWID_MASK
+            if due_array[rowid] != due:
+                continue  # Superseded entry
+            self._set_due(rowid, 0)
+            out.append(rowid)
+        return out
+
+    # -- dispatch -----------------------------------------------------------
+
+    def _load_watches(self, rowids: List[int]) -> Dict[int, Watch]:
+        found: Dict[int, Watch] = {}
+        for start in range(0, len(rowids), _SQL_CHUNK):
+            chunk = rowids[start : start + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for rowid, watch_id, user_id, phrase, region_json, device in self.conn.execute(
+                "SELECT rowid, watch_id, user_id, phrase, region_json, device FROM serp_watchlist "
+                f"WHERE rowid IN ({marks}) AND active = 1",
+                chunk,
+            ):
+                found[rowid] = Watch(
+                    watch_id, user_id, SerpRequest(phrase, _location_from_region_json(region_json), device)
+                )
+        return found
+
+    def _bucket(self, provider: str) -> TokenBucket:
+        bucket = self.buckets.get(provider)
+        if bucket is None:
+            bucket = self.buckets[provider] = TokenBucket(self.default_rate)
+        return bucket
+
+    async def _run_watch(self, rowid: int, watch: Watch) -> None:
+        try:
+            outcome = await self.dispatch(watch.user_id, watch.request)
+        except Exception as exc:  # noqa: BLE001 – recorded on the watch row
+            self.failed += 1
+            self._finish(rowid, None, clean_string(f"{type(exc).__name__}: {exc}", _ERROR_MAX), self.retry_seconds)
+        else:
+            serp_id = outcome if isinstance(outcome, str) or outcome is None else getattr(outcome, "serp_id", None)
+            interval = self.interval_seconds if self.interval_for is None else int(self.interval_for(watch))
+            self._finish(rowid, serp_id, None, interval)
+        finally:
+            self._active -= 1
+            if self._wake is not None:
+                self._wake.set()
+
+    def _finish(self, rowid: int, serp_id: Optional[str], error: Optional[str], interval: int) -> None:
+        now = self.clock()
+        now_ms = int(now * 1000)
+        self.dispatched += 1
+        self._updates.append((now_ms, serp_id, "ok" if error is None else "error", error, now_ms, rowid))
+        if rowid in self._in_flight:
+            self._in_flight.discard(rowid)
+            self._push(rowid, int(now) + interval)
+        if len(self._updates) >= self.flush_every or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending status updates; returns how many were written."""
+        updates, self._updates = self._updates, []
+        self._last_flush = self.clock()
+        if updates:
+            with self.conn:
+                self.conn.executemany(_UPDATE_STATUS, updates)
+        return len(updates)
+
+    def _start_ready(self, now: float) -> Tuple[List["asyncio.Task[None]"], Optional[float]]:
+        """Start due watches that have a free slot and a provider token.
+
+        Pops at most as many rows as there are free slots; popped watches
+        without a token yet wait in ``_ready``.  Returns the started tasks
+        and the seconds until the next token, if a watch is waiting for one.
+        """
+        free = self.max_in_flight - self._active - self._held
+        if free > 0:
+            rowids = self.pop_due(now, min(self.batch_size, free))
+            watches = self._load_watches(rowids) if rowids else {}
+            for rowid in rowids:
+                watch = watches.get(rowid)
+                if watch is None:
+                    continue  # Deleted or deactivated since it was scheduled
+                self._in_flight.add(rowid)
+                self._ready.setdefault(self.provider_for(watch), deque()).append((rowid, watch))
+                self._held += 1
+
+        tasks = []
+        token_wait: Optional[float] = None
+        for provider, ready in self._ready.items():
+            bucket = self._bucket(provider)
+            while ready:
+                rowid, watch = ready[0]
+                if rowid not in self._in_flight:
+                    ready.popleft()  # Unscheduled while waiting
+                    self._held -= 1
+                    continue
+                wait = bucket.try_acquire()
+                if wait:
+                    token_wait = wait if token_wait is None else min(token_wait, wait)
+                    break
+                ready.popleft()
+                self._held -= 1
+                self._active += 1
+                tasks.append(asyncio.create_task(self._run_watch(rowid, watch)))
+        return tasks, token_wait
+
+    def _has_due(self, now: float) -> bool:
+        due = self.next_due()
+        return due is not None and due <= now
+
+    async def run_once(self, now: Optional[float] = None) -> int:
+        """Dispatch every watch due at *now*, wait for them, and flush."""
+        now = self.clock() if now is None else now
+        started = 0
+        running: Set["asyncio.Task[None]"] = set()
+        try:
+            while True:
+                tasks, token_wait = self._start_ready(now)
+                started += len(tasks)
+                running.update(tasks)
+                if tasks:
+                    await asyncio.sleep(0)
+                elif token_wait is not None:
+                    await asyncio.sleep(token_wait)
+                elif self._has_due(now):
+                    if self._active >= self.max_in_flight:
+                        # Every slot is busy: wait for a dispatch to finish.
+                        await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    break
+                running = {task for task in running if not task.done()}
+            if running:
+                await asyncio.gather(*running)
+        finally:
+            self.flush()
+        return started
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Dispatch watches as they come due until *stop* is set."""
+        self._wake = asyncio.Event()
+        pending: Set["asyncio.Task[None]"] = set()
+        try:
+            while not stop.is_set():
+                now = self.clock()
+                tasks, token_wait = self._start_ready(now)
+                if tasks:
+                    for task in tasks:
+                        pending.add(task)
+                        task.add_done_callback(pending.discard)
+                    # Let dispatches start before popping more.
+                    await asyncio.sleep(0)
+                    continue
+                if self._updates and now - self._last_flush >= self.flush_interval:
+                    self.flush()
+                timeout = self.flush_interval
+                if token_wait is not None:
+                    timeout = min(timeout, token_wait)
+                if self._active + self._held < self.max_in_flight:
+                    due = self.next_due()
+                    if due is not None:
+                        timeout = min(timeout, max(0.0, due - now))
+                # Otherwise every slot is busy; a finishing dispatch sets _wake.
+                self._wake.clear()
+                stopper = asyncio.ensure_future(stop.wait())
+                waker = asyncio.ensure_future(self._wake.wait())
+                await asyncio.wait({stopper, waker}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                stopper.cancel()
+                waker.cancel()
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            self.flush()
+            self._wake = None
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import Dict, Iterable
+from typing import Dict, Iterable, Iterator, Optional, Protocol, Tuple
 
 _DIRECTORY_DOMAINS = {
     "yelp.com",
@@ -27,6 +27,66 @@ _ECOMMERCE_DOMAINS = {
 }
 
 _ARCHETYPES = ("directory", "local_service", "publisher", "ecommerce")
+# Archetypes backed by root-domain dictionaries, highest precedence first.
+_INDEXED_ARCHETYPES = ("directory", "publisher", "ecommerce")
+
+
+class ArchetypeMatcher(Protocol):
+    """Anything that maps a normalized domain to its indexed archetype."""
+
+    def match(self, domain: str) -> Optional[str]: ...
+
+
+class ArchetypeIndex:
+    """Hash index from root domain to archetype, probed once per label suffix.
+
+    ``add("directory", ["yelp.com"])`` makes ``yelp.com`` and every subdomain
+    of it match.  :meth:`match` looks up ``a.b.c``, ``b.c`` and ``c`` in turn,
+    so the cost depends on the number of hostname labels, not on the number
+    of registered roots.  When several roots match, the archetype earliest in
+    ``directory > publisher > ecommerce`` wins.
+    """
+
+    def __init__(self) -> None:
+        self._roots: Dict[str, int] = {}
+
+    def add(self, archetype: str, domains: Iterable[str]) -> None:
+        if archetype not in _INDEXED_ARCHETYPES:
+            raise ValueError(f"Unknown indexed archetype: {archetype!r}")
+        rank = _INDEXED_ARCHETYPES.index(archetype)
+        roots = self._roots
+        for domain in domains:
+            root = _normalize_domain(domain)
+            if root and rank < roots.get(root, len(_INDEXED_ARCHETYPES)):
+                roots[root] = rank
+
+    def __len__(self) -> int:
+        return len(self._roots)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Yield ``(root_domain, archetype)`` pairs."""
+        for root, rank in self._roots.items():
+            yield root, _INDEXED_ARCHETYPES[rank]
+
+    def match(self, domain: str) -> Optional[str]:
+        """Return the best archetype whose root equals or contains *domain*.
+
+        *domain* must already be normalized (see :func:`_normalize_domain`).
+        """
+        roots = self._roots
+        best = len(_INDEXED_ARCHETYPES)
+        start = 0
+        while True:
+            rank = roots.get(domain[start:])
+            if rank is not None and rank < best:
+                best = rank
+                if best == 0:
+                    break
+            dot = domain.find(".", start)
+            if dot < 0:
+                break
+            start = dot + 1
+        return _INDEXED_ARCHETYPES[best] if best < len(_INDEXED_ARCHETYPES) else None
 
 
 def _normalize_domain(domain: str) -> str:
@@ -34,12 +94,33 @@ def _normalize_domain(domain: str) -> str:
     return normalized.removeprefix("www.")
 
 
-def _is_match(domain: str, roots: set[str]) -> bool:
-    return any(domain == root or domain.endswith(f".{root}") for root in roots)
+def _build_default_index() -> ArchetypeIndex:
+    index = ArchetypeIndex()
+    index.add("directory", _DIRECTORY_DOMAINS)
+    index.add("publisher", _PUBLISHER_DOMAINS)
+    index.add("ecommerce", _ECOMMERCE_DOMAINS)
+    return index
+
+
+_INDEX: ArchetypeMatcher = _build_default_index()
+
+
+def use_archetype_index(index: ArchetypeMatcher) -> ArchetypeMatcher:
+    """Make *index* the source for :func:`classify_domain`; return the previous one.
+
+    Pass an :class:`~serp_adapter.archetype_kb.ReloadingArchetypeKB` to
+    classify from a hot-reloadable KB file.
+    """
+    global _INDEX
+    previous, _INDEX = _INDEX, index
+    return previous
 
 
-def _has_label(domain: str, label: str) -> bool:
-    return label in domain.split(".")
+def register_archetype_domains(archetype: str, domains: Iterable[str]) -> None:
+    """Add root *domains* for *archetype* to the index used by :func:`classify_domain`."""
+    if not isinstance(_INDEX, ArchetypeIndex):
+        raise TypeError("The active archetype index is read-only")
+    _INDEX.add(archetype, domains)
 
 
 def classify_domain(domain: str) -> str:
@@ -48,19 +129,13 @@ def classify_domain(domain: str) -> str:
     if not normalized:
         return "publisher"
 
-    if _is_match(normalized, _DIRECTORY_DOMAINS):
+    matched = _INDEX.match(normalized)
+    if matched == "directory":
         return "directory"
-    if (
-        _is_match(normalized, _PUBLISHER_DOMAINS)
-        or _has_label(normalized, "forum")
-        or _has_label(normalized, "blog")
-    ):
+    labels = normalized.split(".")
+    if matched == "publisher" or "forum" in labels or "blog" in labels:
         return "publisher"
-    if (
-        _is_match(normalized, _ECOMMERCE_DOMAINS)
-        or _has_label(normalized, "shop")
-        or _has_label(normalized, "store")
-    ):
+    if matched == "ecommerce" or "shop" in labels or "store" in labels:
         return "ecommerce"
     return "local_service"
 
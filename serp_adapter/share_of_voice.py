@@ -0,0 +1,339 @@
+"""Volume-weighted share of voice per domain across keyword sets.
+
+"What share of our 20 keywords' estimated clicks does each competitor
+capture?"  Each keyword's monthly volume (``keyword_metrics.volume_us``)
+is spread over its SERP with a position click-through curve.  A domain's
+share of voice (SOV) is the clicks its best-ranked result on each keyword
+collects, divided by all clicks estimated for the set's SERPs::
+
+    today = load_sov_input(conn, keyword_set_ids, day="2025-04-24")
+    yesterday = load_sov_input(conn, keyword_set_ids, day="2025-04-23", vocabulary=today.vocabulary)
+    sov = compute_share_of_voice(today)
+    change = sov.delta(compute_share_of_voice(yesterday))
+    sov.for_group(keyword_set_ids[0])[:5]
+
+Ranks come from the ``serp_daily_domain_best`` rollup (migration 0032),
+one row per root domain and keyword.  All keyword sets are scored in one
+pass of numpy array operations: ``bincount`` over (set, domain) keys.
+Thousands of sites therefore cost about as much as one.  Requires the
+optional ``numpy`` dependency (``serp-adapter[vector]``).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from serp_adapter.infer_intent import _require_numpy
+from serp_adapter.keys import device_key as _device_key
+
+if TYPE_CHECKING:
+    import numpy as np
+
+#: Organic click-through rate by position 1..20, in the range of published
+#: desktop CTR studies.  Pass your own curve to :func:`compute_share_of_voice`.
+DEFAULT_CTR_CURVE: Tuple[float, ...] = (
+    0.319, 0.158, 0.099, 0.071, 0.053, 0.041, 0.032, 0.026, 0.021, 0.018,
+    0.012, 0.010, 0.009, 0.008, 0.007, 0.006, 0.005, 0.005, 0.004, 0.004,
+)
+
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+
+
+@dataclass
+class SovInput:
+    """Rank entries for a batch of keyword sets, as parallel arrays.
+
+    Entry *i* says that ``domains[domain[i]]`` ranks ``rank[i]`` (its best
+    position) for keyword ``keyword[i]`` in keyword set ``groups[group[i]]``.
+    ``volume[k]`` is keyword *k*'s search volume.  Keywords of a set
+    without any ranking rows are listed in ``group_keywords`` so that they
+    can still be reported.
+    """
+
+    groups: List[str]
+    keywords: List[str]
+    domains: List[str]
+    group: "np.ndarray"  # int32 per entry
+    keyword: "np.ndarray"  # int32 per entry
+    domain: "np.ndarray"  # int32 per entry
+    rank: "np.ndarray"  # int16 per entry
+    volume: "np.ndarray"  # float64 per keyword; 0 when unknown
+    group_keywords: "np.ndarray"  # (n, 2) int32 (group, keyword) pairs
+    vocabulary: Dict[str, int]  # domain -> index into domains
+
+
+def _intern(vocabulary: Dict[str, int], domains: List[str], name: str) -> int:
+    index = vocabulary.get(name)
+    if index is None:
+        index = vocabulary[name] = len(domains)
+        domains.append(name)
+    return index
+
+
+def build_sov_input(
+    groups: Sequence[str],
+    group_keywords: Sequence[Tuple[str, str]],
+    volumes: Dict[str, Optional[float]],
+    ranks: Sequence[Tuple[str, str, int]],
+    vocabulary: Optional[Dict[str, int]] = None,
+) -> SovInput:
+    """Arrays for :func:`compute_share_of_voice` from plain rows.
+
+    Parameters
+    ----------
+    groups:
+        Keyword set ids, in output order.
+    group_keywords:
+        ``(group, keyword)`` membership pairs.
+    volumes:
+        Volume per keyword (``None`` counts as 0).
+    ranks:
+        ``(keyword, domain, best_rank)`` rows shared by all sets.
+    vocabulary:
+        Domain ids to reuse, so that two inputs (e.g. two days) share
+        domain indexes for :meth:`ShareOfVoice.delta`.  Updated in place.
+    """
+    np = _require_numpy("build_sov_input")
+    vocabulary = {} if vocabulary is None else vocabulary
+    domains = [""] * len(vocabulary)
+    for name, index in vocabulary.items():
+        domains[index] = name
+    group_ids = {group: i for i, group in enumerate(groups)}
+    keyword_ids: Dict[str, int] = {}
+    pairs: List[Tuple[int, int]] = []
+    for group, keyword in group_keywords:
+        pairs.append((group_ids[group], keyword_ids.setdefault(keyword, len(keyword_ids))))
+
+    rank_keyword: List[int] = []
+    rank_domain: List[int] = []
+    rank_value: List[int] = []
+    for keyword, domain, rank in ranks:
+        k = keyword_ids.get(keyword)
+        if k is not None:
+            rank_keyword.append(k)
+            rank_domain.append(_intern(vocabulary, domains, domain))
+            rank_value.append(rank)
+
+    # Expand every (set, keyword) pair into that keyword's ranking rows.
+    r_keyword = np.array(rank_keyword, dtype=np.int64)
+    order = np.argsort(r_keyword, kind="stable")
+    per_keyword = np.bincount(r_keyword, minlength=len(keyword_ids))
+    starts = np.concatenate(([0], np.cumsum(per_keyword)[:-1])).astype(np.int64)
+    pair_array = np.array(pairs, dtype=np.int32).reshape(-1, 2)
+    counts = per_keyword[pair_array[:, 1]] if len(pair_array) else np.zeros(0, dtype=np.int64)
+    entry_group = np.repeat(pair_array[:, 0], counts)
+    entry_keyword = np.repeat(pair_array[:, 1], counts)
+    offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    picked = order[starts[entry_keyword] + offsets]
+
+    keywords = list(keyword_ids)
+    return SovInput(
+        groups=list(groups),
+        keywords=keywords,
+        domains=domains,
+        group=entry_group.astype(np.int32),
+        keyword=entry_keyword.astype(np.int32),
+        domain=np.array(rank_domain, dtype=np.int32)[picked],
+        rank=np.array(rank_value, dtype=np.int16)[picked],
+        volume=np.array([float(volumes.get(k) or 0.0) for k in keywords], dtype=np.float64),
+        group_keywords=pair_array,
+        vocabulary=vocabulary,
+    )
+
+
+def load_sov_input(
+    conn: sqlite3.Connection,
+    keyword_set_ids: Sequence[str],
+    *,
+    day: Optional[str] = None,
+    region_key: str = "US-en",
+    device: str = "desktop",
+    vocabulary: Optional[Dict[str, int]] = None,
+) -> SovInput:
+    """Load keyword sets, volumes and rollup ranks as of *day*.
+
+    Each keyword uses its latest rolled-up day on or before *day*
+    (``YYYY-MM-DD``; default: latest overall) for *region_key* and
+    *device*.  Keyword sets come from ``keywords.keyword_set_id``, volumes
+    from ``keyword_metrics.volume_us``.
+    """
+    group_keywords: List[Tuple[str, str]] = []
+    volumes: Dict[str, Optional[float]] = {}
+    for start in range(0, len(keyword_set_ids), _SQL_CHUNK):
+        chunk = list(keyword_set_ids[start : start + _SQL_CHUNK])
+        marks = ",".join("?" * len(chunk))
+        for set_id, norm, volume in conn.execute(
+            f"""
+            SELECT k.keyword_set_id, k.keyword_norm, m.volume_us
+            FROM keywords k
+            LEFT JOIN keyword_metrics m ON m.keyword_id = k.kw_id
+            WHERE k.keyword_set_id IN ({marks}) AND k.keyword_norm IS NOT NULL
+            ORDER BY k.keyword_set_id, k.priority, k.keyword_norm
+            """,
+            chunk,
+        ):
+            group_keywords.append((set_id, norm))
+            if volumes.get(norm) is None:
+                volumes[norm] = volume
+
+    ranks: List[Tuple[str, str, int]] = []
+    norms = list(volumes)
+    day_filter = "" if day is None else " AND day <= ?"
+    for start in range(0, len(norms), _SQL_CHUNK):
+        chunk = norms[start : start + _SQL_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        params: List[object] = [*chunk, region_key, _device_key(device)]
+        if day is not None:
+            params.append(day)
+        ranks.extend(
+            conn.execute(
+                f"""
+                WITH latest AS (
+                  SELECT keyword_norm, MAX(day) AS day
+                  FROM serp_daily_latest
+                  WHERE keyword_norm IN ({marks}) AND region_key = ? AND device_key = ?{day_filter}
+                  GROUP BY keyword_norm
+                )
+                SELECT b.keyword_norm, b.root_domain, b.best_rank
+                FROM latest l
+                JOIN serp_daily_domain_best b
+                  ON b.keyword_norm = l.keyword_norm
+                 AND b.region_key = ?
+                 AND b.device_key = ?
+                 AND b.day = l.day
+                """,
+                [*params, region_key, _device_key(device)],
+            )
+        )
+    return build_sov_input(keyword_set_ids, group_keywords, volumes, ranks, vocabulary)
+
+
+@dataclass
+class ShareOfVoice:
+    """Share of voice per (keyword set, domain), sorted by set then share.
+
+    ``total_clicks[g]`` is all estimated clicks on set *g*'s SERPs, the
+    denominator of ``share``.
+    """
+
+    groups: List[str]
+    domains: List[str]
+    group: "np.ndarray"  # int32
+    domain: "np.ndarray"  # int32
+    clicks: "np.ndarray"  # float64
+    share: "np.ndarray"  # float64, 0..1
+    total_clicks: "np.ndarray"  # float64 per group
+
+    def __len__(self) -> int:
+        return len(self.group)
+
+    def for_group(self, group_id: str) -> List[Tuple[str, float, float]]:
+        """``(domain, share, clicks)`` of one keyword set, largest share first."""
+        g = self.groups.index(group_id)
+        lo, hi = (int(x) for x in _group_bounds(self.group, g))
+        return [
+            (self.domains[d], float(s), float(c))
+            for d, s, c in zip(self.domain[lo:hi], self.share[lo:hi], self.clicks[lo:hi])
+        ]
+
+    def delta(self, previous: "ShareOfVoice") -> "SovDelta":
+        """Change in share from *previous* (built with the same vocabulary)."""
+        np = _require_numpy("ShareOfVoice.delta")
+        if previous.groups != self.groups:
+            raise ValueError("delta() needs both results for the same keyword sets")
+        width = max(len(self.domains), len(previous.domains), 1)
+        now_keys = self.group.astype(np.int64) * width + self.domain
+        then_keys = previous.group.astype(np.int64) * width + previous.domain
+        keys = np.union1d(now_keys, then_keys)
+        share = np.zeros(len(keys))
+        before = np.zeros(len(keys))
+        share[np.searchsorted(keys, now_keys)] = self.share
+        before[np.searchsorted(keys, then_keys)] = previous.share
+        change = share - before
+        group = (keys // width).astype(np.int32)
+        order = np.lexsort((-np.abs(change), group))
+        domains = self.domains if len(self.domains) >= len(previous.domains) else previous.domains
+        return SovDelta(
+            groups=self.groups,
+            domains=domains,
+            group=group[order],
+            domain=(keys % width).astype(np.int32)[order],
+            share=share[order],
+            previous_share=before[order],
+            change=change[order],
+        )
+
+
+@dataclass
+class SovDelta:
+    """Share change per (keyword set, domain), largest absolute change first."""
+
+    groups: List[str]
+    domains: List[str]
+    group: "np.ndarray"
+    domain: "np.ndarray"
+    share: "np.ndarray"
+    previous_share: "np.ndarray"
+    change: "np.ndarray"
+
+    def for_group(self, group_id: str) -> List[Tuple[str, float, float]]:
+        """``(domain, share, change)`` of one keyword set."""
+        g = self.groups.index(group_id)
+        lo, hi = (int(x) for x in _group_bounds(self.group, g))
+        return [
+            (self.domains[d], float(s), float(c))
+            for d, s, c in zip(self.domain[lo:hi], self.share[lo:hi], self.change[lo:hi])
+        ]
+
+
+def _group_bounds(group: "np.ndarray", g: int) -> Tuple[int, int]:
+    np = _require_numpy()
+    return (np.searchsorted(group, g, side="left"), np.searchsorted(group, g, side="right"))
+
+
+def compute_share_of_voice(data: SovInput, ctr_curve: Sequence[float] = DEFAULT_CTR_CURVE) -> ShareOfVoice:
+    """Score every keyword set in *data* at once.
+
+    A domain ranked *r* for a keyword of volume *v* earns
+    ``v * ctr_curve[r - 1]`` clicks (nothing beyond the curve).  Each set's
+    denominator is ``sum(v) * sum(ctr_curve)`` over its keywords that have
+    ranking data, i.e. every click the curve hands out on those SERPs.
+    """
+    np = _require_numpy("compute_share_of_voice")
+    ctr = np.zeros(len(ctr_curve) + 1, dtype=np.float64)
+    ctr[1:] = ctr_curve
+    n_groups = len(data.groups)
+    width = max(len(data.domains), 1)
+
+    rank = data.rank.astype(np.intp)
+    rank[(rank < 1) | (rank > len(ctr_curve))] = 0
+    clicks = data.volume[data.keyword] * ctr[rank]
+
+    # Denominator: keywords with ranking rows, once per set.
+    served = np.unique(data.group.astype(np.int64) * max(len(data.keywords), 1) + data.keyword)
+    served_group = served // max(len(data.keywords), 1)
+    served_keyword = served % max(len(data.keywords), 1)
+    total = np.bincount(
+        served_group, weights=data.volume[served_keyword] * ctr.sum(), minlength=n_groups
+    )
+
+    keys = data.group.astype(np.int64) * width + data.domain
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    domain_clicks = np.bincount(inverse, weights=clicks, minlength=len(unique_keys))
+    group = (unique_keys // width).astype(np.int32)
+    domain = (unique_keys % width).astype(np.int32)
+    denominator = total[group]
+    share = np.divide(domain_clicks, denominator, out=np.zeros_like(domain_clicks), where=denominator > 0)
+
+    order = np.lexsort((domain, -share, group))
+    return ShareOfVoice(
+        groups=data.groups,
+        domains=data.domains,
+        group=group[order],
+        domain=domain[order],
+        clicks=domain_clicks[order],
+        share=share[order],
+        total_clicks=total,
+    )
@@ -0,0 +1,292 @@
+"""Bulk writer for normalized SERPs into the D1 SERP schema.
+
+:class:`SerpStore` persists batches of
+:class:`~serp_adapter.models.NormalizedSerpResult` into ``serp_runs``,
+``serp_results``, ``urls`` and ``serp_result_url_map`` (a local SQLite copy
+of the D1 database, migrations 0002 … 0022)::
+
+    store = SerpStore("local.sqlite")
+    serp_ids = store.write(results, user_id="user_1", parser_version="apify-google-v1")
+
+Each call derives the canonical keys in Python, issues one ``executemany``
+per table and commits once.  ``keyword_norm``, ``region_key``,
+``serp_key`` and ``url_hash`` come from :mod:`serp_adapter.keys`, so rows
+written here join with rows written by ``src/worker.ts``.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import uuid
+from os import PathLike
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from serp_adapter.domains import registrable_domain
+from serp_adapter.keys import clean_string, serp_keys, url_hash
+from serp_adapter.models import Location, NormalizedSerpResult
+
+#: Called with the connection and written serp_ids inside each write transaction.
+WriteHook = Callable[[sqlite3.Connection, List[str]], None]
+
+_INSERT_RUN = """
+INSERT INTO serp_runs (
+  serp_id, user_id, phrase, region_json, device, engine, provider, actor,
+  run_id, status, error, created_at, mode, keyword_norm, region_key, device_key,
+  serp_key, parser_version, raw_payload_sha256, extractor_mode, geo_key, fallback_reason
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(serp_id) DO UPDATE SET
+  status = excluded.status,
+  error = excluded.error,
+  run_id = excluded.run_id,
+  parser_version = excluded.parser_version,
+  raw_payload_sha256 = excluded.raw_payload_sha256,
+  extractor_mode = excluded.extractor_mode,
+  fallback_reason = COALESCE(excluded.fallback_reason, serp_runs.fallback_reason)
+"""
+
+_INSERT_RESULT = """
+INSERT INTO serp_results (serp_id, rank, url, url_hash, domain, root_domain, title, snippet)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(serp_id, rank) DO UPDATE SET
+  url = excluded.url,
+  url_hash = excluded.url_hash,
+  domain = excluded.domain,
+  root_domain = excluded.root_domain,
+  title = excluded.title,
+  snippet = excluded.snippet
+"""
+
+# ``urls.id`` is left to its column default (random hex).
+_INSERT_URL = """
+INSERT INTO urls (url, url_hash, domain, created_at) VALUES (?, ?, ?, ?)
+ON CONFLICT(url_hash) DO NOTHING
+"""
+
+_INSERT_URL_MAP = """
+INSERT INTO serp_result_url_map (serp_id, rank, url_id, page_type, geo)
+VALUES (?, ?, ?, NULL, ?)
+ON CONFLICT(serp_id, rank) DO UPDATE SET url_id = excluded.url_id, geo = excluded.geo
+"""
+
+_SQL_CHUNK = 500  # Keeps "IN (?, ...)" lists under SQLite's variable limit
+
+
+def _region_json(location: Location, language: Optional[str]) -> str:
+    """``region_json`` as the worker's ``normalizeRegion`` would emit it."""
+    region = {"country": clean_string(location.country, 2).upper() or "US"}
+    lang = clean_string(location.language or language, 2).lower()
+    if lang:
+        region["language"] = lang
+    if location.region:
+        region["region"] = clean_string(location.region, 120)
+    if location.city:
+        region["city"] = clean_string(location.city, 120)
+    return json.dumps(region, ensure_ascii=False, separators=(",", ":"))
+
+
+class SerpStore:
+    """Batched, transactional writer for normalized SERPs.
+
+    Accepts an open :class:`sqlite3.Connection` or a database path.  A path
+    is opened in WAL mode with ``synchronous=NORMAL`` and a 64 MiB page
+    cache; an existing connection is used as configured unless ``wal=True``
+    is passed.
+
+    ``urls.id`` values are remembered (up to *url_cache_size* entries) so
+    URLs seen in earlier batches skip the ``urls`` upsert and id lookup.
+    The store therefore assumes ``urls`` rows are not deleted while it is
+    in use.
+
+    *write_hooks* are called as ``hook(conn, serp_ids)`` at the end of every
+    :meth:`write` transaction, e.g. :class:`~serp_adapter.rollups.SerpRollups`
+    to keep derived tables in step with the runs.
+    """
+
+    def __init__(
+        self,
+        db: Union[sqlite3.Connection, str, "PathLike[str]"],
+        wal: Optional[bool] = None,
+        url_cache_size: int = 1_000_000,
+        write_hooks: Sequence[WriteHook] = (),
+    ) -> None:
+        if isinstance(db, sqlite3.Connection):
+            self.conn = db
+            self._owns_conn = False
+        else:
+            self.conn = sqlite3.connect(db)
+            self._owns_conn = True
+        if wal if wal is not None else self._owns_conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA cache_size=-65536")
+        self.url_cache_size = url_cache_size
+        self.write_hooks = list(write_hooks)
+        self._url_ids: Dict[str, str] = {}
+
+    def close(self) -> None:
+        if self._owns_conn:
+            self.conn.close()
+
+    def __enter__(self) -> "SerpStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def write(
+        self,
+        results: Iterable[NormalizedSerpResult],
+        user_id: str,
+        *,
+        serp_ids: Optional[Sequence[str]] = None,
+        status: str = "ok",
+        mode: str = "serp",
+        parser_version: Optional[str] = None,
+        extractor_mode: Optional[str] = None,
+        raw_payload_sha256: Optional[Sequence[Optional[str]]] = None,
+        fallback_reason: Optional[Sequence[Optional[str]]] = None,
+        language: Optional[str] = None,
+        replace: bool = False,
+    ) -> List[str]:
+        """Upsert one batch of SERPs in a single transaction.
+
+        Parameters
+        ----------
+        results:
+            Normalized SERPs (a list, a
+            :class:`~serp_adapter.batch.SerpResultBatch`, …).
+        user_id:
+            Owner written to ``serp_runs.user_id``.
+        serp_ids:
+            Explicit ids, one per result, to rewrite existing runs; new
+            ``serp_<uuid4>`` ids are generated by default.
+        raw_payload_sha256:
+            Optional per-result raw payload digests.
+        fallback_reason:
+            Optional per-result ``serp_runs.fallback_reason`` (see
+            :class:`~serp_adapter.router.HedgedSerpRouter`); ``None`` keeps
+            an existing value.
+        language:
+            Language code for ``region_key`` (``"en"`` when omitted).
+        replace:
+            Delete the existing ``serp_results`` and
+            ``serp_result_url_map`` rows of the written runs first, so a
+            re-parse with fewer results leaves no stale ranks.
+
+        Returns
+        -------
+        list of str
+            The ``serp_id`` of every written SERP, in input order.
+        """
+        runs: List[tuple] = []
+        rows: List[tuple] = []
+        maps: List[tuple] = []
+        urls: Dict[str, tuple] = {}
+        written_ids: List[str] = []
+        regions: Dict[Tuple[str, Optional[str], Optional[str], Optional[str]], Tuple[str, str]] = {}
+        url_hashes: Dict[str, str] = {}
+        url_ids = self._url_ids
+        batch_url_ids: Dict[str, str] = {}
+        roots: Dict[str, str] = {}
+
+        for index, result in enumerate(results):
+            serp_id = serp_ids[index] if serp_ids is not None else f"serp_{uuid.uuid4()}"
+            written_ids.append(serp_id)
+
+            keys = serp_keys(result, language)
+            loc = result.location
+            loc_key = (loc.country, loc.language, loc.region, loc.city)
+            region = regions.get(loc_key)
+            if region is None:
+                region = regions[loc_key] = (
+                    _region_json(loc, language),
+                    (loc.country or "us").lower(),
+                )
+            region_json, geo_key = region
+            source = result.source
+            runs.append(
+                (
+                    serp_id,
+                    user_id,
+                    result.query,
+                    region_json,
+                    result.device,
+                    result.engine,
+                    source.provider if source else "unknown",
+                    source.actor if source else None,
+                    source.run_id if source else None,
+                    status,
+                    None,
+                    result.ts * 1000,
+                    mode,
+                    keys.keyword_norm,
+                    keys.region_key,
+                    keys.device_key,
+                    keys.serp_key,
+                    parser_version,
+                    raw_payload_sha256[index] if raw_payload_sha256 is not None else None,
+                    extractor_mode,
+                    geo_key,
+                    fallback_reason[index] if fallback_reason is not None else None,
+                )
+            )
+
+            created_at = result.ts
+            for item in result.results:
+                url = item.url
+                digest = url_hashes.get(url)
+                if digest is None:
+                    digest = url_hashes[url] = url_hash(url)
+                root = item.root_domain
+                if not root:
+                    root = roots.get(item.domain)
+                    if root is None:
+                        root = roots[item.domain] = registrable_domain(item.domain)
+                rows.append(
+                    (serp_id, item.rank, url, digest, item.domain, root, item.title, item.snippet)
+                )
+                if url:
+                    if digest not in batch_url_ids:
+                        cached = url_ids.get(digest)
+                        if cached is None:
+                            urls.setdefault(digest, (url, digest, item.domain, created_at))
+                        else:
+                            batch_url_ids[digest] = cached
+                    maps.append((serp_id, item.rank, digest, geo_key))
+
+        new_url_ids: Dict[str, str] = {}
+        with self.conn:
+            if replace:
+                stale = [(serp_id,) for serp_id in written_ids]
+                self.conn.executemany("DELETE FROM serp_result_url_map WHERE serp_id = ?", stale)
+                self.conn.executemany("DELETE FROM serp_results WHERE serp_id = ?", stale)
+            self.conn.executemany(_INSERT_RUN, runs)
+            self.conn.executemany(_INSERT_RESULT, rows)
+            if urls:
+                self.conn.executemany(_INSERT_URL, urls.values())
+                new_url_ids = self._lookup_url_ids(list(urls))
+                batch_url_ids.update(new_url_ids)
+            self.conn.executemany(
+                _INSERT_URL_MAP,
+                [(serp_id, rank, batch_url_ids[digest], geo) for serp_id, rank, digest, geo in maps],
+            )
+            for hook in self.write_hooks:
+                hook(self.conn, written_ids)
+        # Only cache ids of committed rows.
+        if len(url_ids) + len(new_url_ids) > self.url_cache_size:
+            url_ids.clear()
+        url_ids.update(new_url_ids)
+        return written_ids
+
+    def _lookup_url_ids(self, url_hashes: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        for start in range(0, len(url_hashes), _SQL_CHUNK):
+            chunk = url_hashes[start : start + _SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            found.update(
+                self.conn.execute(
+                    f"SELECT url_hash, id FROM urls WHERE url_hash IN ({marks})", chunk
+                ).fetchall()
+            )
+        return found
@@ -0,0 +1,203 @@
+"""Incremental readers for Apify dataset exports.
+
+Actor datasets are exported either as one JSON array or as JSON Lines.  The
+helpers here parse either layout item by item so a multi-GB export can be
+normalized with constant memory::
+
+    adapter = ApifyGoogleSearchAdapter()
+    for result in adapter.iter_normalize("dataset.jsonl", on_error=errors.append):
+        ...
+"""
+
+from __future__ import annotations
+
+import gzip
+import io
+import itertools
+import json
+import os
+from dataclasses import dataclass
+from typing import IO, Any, Callable, Iterator, Optional, Tuple, Union
+
+from serp_adapter.models import NormalizedSerpResult
+
+Source = Union[str, "os.PathLike[str]", IO[str], IO[bytes]]
+
+_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\r\n"
+
+
+@dataclass
+class ItemError:
+    """A dataset item that could not be parsed or normalized."""
+
+    index: int  # 0-based position of the item in the source
+    error: str  # ``"<ExceptionType>: <message>"``
+    raw: Any = None  # The offending item (or raw line text) when available
+    worker: Optional[int] = None  # PID of the pool worker that hit the error
+
+
+class _Reader:
+    """Wrap *source* as a text stream; closes it only if it was opened here."""
+
+    def __init__(self, source: Source) -> None:
+        self._owned = False
+        self._wrapper: Optional[io.TextIOWrapper] = None
+        if isinstance(source, (str, os.PathLike)):
+            path = os.fspath(source)
+            if path.endswith(".gz"):
+                stream: IO[str] = gzip.open(path, "rt", encoding="utf-8")
+            else:
+                stream = open(path, "r", encoding="utf-8")
+            self._owned = True
+        elif isinstance(source, io.TextIOBase):
+            stream = source
+        elif hasattr(source, "read"):
+            probe = source.read(0)
+            if isinstance(probe, bytes):
+                self._wrapper = io.TextIOWrapper(source, encoding="utf-8")  # type: ignore[arg-type]
+                stream = self._wrapper
+            else:
+                stream = source  # type: ignore[assignment]
+        else:
+            raise TypeError(
+                f"Expected a path or file object, got {type(source).__name__}"
+            )
+        self.stream = stream
+
+    def close(self) -> None:
+        if self._owned:
+            self.stream.close()
+        elif self._wrapper is not None:
+            # Leave the caller's binary stream open.
+            self._wrapper.detach()
+
+
+def _iter_json_array(stream: IO[str], buf: str) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    *buf* holds the text already read, starting just after the opening ``[``.
+    Only the current element (plus at most one read chunk) is ever buffered.
+    """
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+    first = True
+    expect_value = True
+    chunk = _CHUNK_SIZE
+    while True:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            buf, pos = stream.read(chunk), 0
+            eof = not buf
+            continue
+
+        ch = buf[pos]
+        if ch == "]" and (first or not expect_value):
+            return
+        if not expect_value:
+            if ch != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {ch!r}")
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # The element straddles the read boundary: pull in more text.
+            # Doubling the read size keeps huge elements linear overall.
+            more = stream.read(chunk)
+            chunk = min(chunk * 2, 64 * _CHUNK_SIZE)
+            buf, pos = buf[pos:] + more, 0
+            eof = not more
+            continue
+        if end == len(buf) and not eof:
+            # A bare number may continue past the end of the buffer.
+            more = stream.read(chunk)
+            if more:
+                buf, pos = buf[pos:] + more, 0
+                continue
+            eof = True
+        yield value
+        chunk = _CHUNK_SIZE
+        buf, pos = buf[end:], 0
+        first = False
+        expect_value = False
+
+
+def _iter_indexed_items(
+    source: Source,
+    on_error: Optional[Callable[[ItemError], None]],
+) -> Iterator[Tuple[int, Any]]:
+    reader = _Reader(source)
+    try:
+        stream = reader.stream
+        text = ""
+        while not text:
+            piece = stream.read(_CHUNK_SIZE)
+            if not piece:
+                return
+            text = piece.lstrip(_WHITESPACE + "\ufeff")
+
+        if text[0] == "[":
+            yield from enumerate(_iter_json_array(stream, text[1:]))
+            return
+
+        # JSON Lines: complete the partially read last line, then iterate.
+        if not text.endswith("\n"):
+            text += stream.readline()
+        index = 0
+        for line in itertools.chain(text.split("\n"), stream):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as exc:
+                if on_error is not None:
+                    on_error(ItemError(index, f"{type(exc).__name__}: {exc}", line))
+            else:
+                yield index, value
+            index += 1
+    finally:
+        reader.close()
+
+
+def iter_json_items(
+    source: Source,
+    on_error: Optional[Callable[[ItemError], None]] = None,
+) -> Iterator[Any]:
+    """Yield parsed items from a JSON-array or JSON Lines *source*.
+
+    The layout is detected from the first non-whitespace character.  In JSON
+    Lines mode an unparsable line is reported to *on_error* and skipped; a
+    malformed JSON array cannot be resynchronised and raises ``ValueError``.
+    """
+    for _index, item in _iter_indexed_items(source, on_error):
+        yield item
+
+
+def iter_normalize(
+    normalize: Callable[[Any], NormalizedSerpResult],
+    source: Source,
+    on_error: Optional[Callable[[ItemError], None]] = None,
+) -> Iterator[NormalizedSerpResult]:
+    """Stream *source* through *normalize*, one item at a time.
+
+    Items that fail to parse or normalize are passed to *on_error* (when
+    given) and skipped; the stream itself keeps going.
+    """
+    for index, raw in _iter_indexed_items(source, on_error):
+        try:
+            result = normalize(raw)
+        except Exception as exc:  # noqa: BLE001 – reported, stream continues
+            if on_error is not None:
+                on_error(ItemError(index, f"{type(exc).__name__}: {exc}", raw))
+        else:
+            yield result
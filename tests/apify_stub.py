@@ -0,0 +1,185 @@
+"""Local stand-in for the Apify dataset items endpoint.
+
+Serves recorded dataset items (``tests/data/apify_dataset_items.jsonl``)
+over HTTP/1.1 keep-alive with Apify's pagination headers, gzip and chunked
+transfer encoding, a configurable per-response latency and scripted
+failures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE = Path(__file__).parent / "data" / "apify_dataset_items.jsonl"
+
+
+def load_fixture_items() -> List[Any]:
+    with FIXTURE.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+class ApifyStubServer:
+    """``async with ApifyStubServer(items) as server: server.base_url``.
+
+    Parameters
+    ----------
+    items:
+        Dataset items, served from any dataset id.
+    latency:
+        Seconds to wait before each response is sent.
+    gzip_responses:
+        Honour ``Accept-Encoding: gzip``.
+    chunked:
+        Send bodies with chunked transfer encoding (else Content-Length).
+    report_total:
+        Send ``X-Apify-Pagination-Total``.
+    report_count:
+        Send ``X-Apify-Pagination-Count``.
+    fail_statuses:
+        Status codes returned, in order, for the first requests.
+    cut_after_lines:
+        Close the connection after this many lines of the next response
+        (one-shot), to simulate a reset mid-page.
+    short_after_lines:
+        Send only this many lines of the next response in a well-framed
+        body (one-shot), as if the page ended early.
+    truncate_gzip:
+        Send the first half of the next gzip body in a well-framed body
+        (one-shot), so only the gzip stream itself is incomplete.
+    """
+
+    def __init__(
+        self,
+        items: List[Any],
+        *,
+        latency: float = 0.0,
+        gzip_responses: bool = True,
+        chunked: bool = True,
+        report_total: bool = True,
+        report_count: bool = True,
+        fail_statuses: Optional[List[int]] = None,
+        cut_after_lines: Optional[int] = None,
+        short_after_lines: Optional[int] = None,
+        truncate_gzip: bool = False,
+    ) -> None:
+        self.lines = [json.dumps(item).encode("utf-8") for item in items]
+        self.latency = latency
+        self.gzip_responses = gzip_responses
+        self.chunked = chunked
+        self.report_total = report_total
+        self.report_count = report_count
+        self.fail_statuses = list(fail_statuses or [])
+        self.cut_after_lines = cut_after_lines
+        self.short_after_lines = short_after_lines
+        self.truncate_gzip = truncate_gzip
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def __aenter__(self) -> "ApifyStubServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        assert self._server is not None
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if not await self._respond(request_line.decode("latin-1"), headers, writer):
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            return
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line: str, headers: Dict[str, str], writer: asyncio.StreamWriter) -> bool:
+        _method, target, _version = request_line.split(" ", 2)
+        query = {k: v[0] for k, v in parse_qs(urlsplit(target).query).items()}
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", len(self.lines)))
+        self.requests.append({"path": urlsplit(target).path, "query": query, "headers": headers})
+
+        self._active += 1
+        self.max_concurrent = max(self.max_concurrent, self._active)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+        finally:
+            self._active -= 1
+
+        if self.fail_statuses:
+            status = self.fail_statuses.pop(0)
+            body = b'{"error":{"type":"rate-limit-exceeded"}}'
+            writer.write(
+                f"HTTP/1.1 {status} Error\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+            return True
+
+        page = self.lines[offset : offset + limit]
+        cut = self.cut_after_lines
+        self.cut_after_lines = None
+        sent = cut if cut is not None else self.short_after_lines
+        self.short_after_lines = None
+        body = b"".join(line + b"\n" for line in (page if sent is None else page[:sent]))
+        head = [
+            "HTTP/1.1 200 OK",
+            "Content-Type: application/jsonl; charset=utf-8",
+            f"X-Apify-Pagination-Offset: {offset}",
+            f"X-Apify-Pagination-Limit: {limit}",
+        ]
+        if self.report_count:
+            head.append(f"X-Apify-Pagination-Count: {len(page)}")
+        if self.report_total:
+            head.append(f"X-Apify-Pagination-Total: {len(self.lines)}")
+        if self.gzip_responses and "gzip" in headers.get("accept-encoding", ""):
+            body = gzip.compress(body)
+            if self.truncate_gzip:
+                self.truncate_gzip = False
+                body = body[: len(body) // 2]
+            head.append("Content-Encoding: gzip")
+        if cut is not None:
+            # Promise the full page, send part of it, then drop the connection.
+            head.append(f"Content-Length: {len(body) + 100}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            return False
+        if self.chunked:
+            head.append("Transfer-Encoding: chunked")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            for start in range(0, len(body), 4096):
+                piece = body[start : start + 4096]
+                writer.write(f"{len(piece):x}\r\n".encode("latin-1") + piece + b"\r\n")
+            writer.write(b"0\r\n\r\n")
+        else:
+            head.append(f"Content-Length: {len(body)}")
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+        return True
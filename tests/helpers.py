@@ -0,0 +1,110 @@
+"""Fixtures shared by several test modules.
+
+Test modules import from here rather than from each other, so running
+one module never collects another's tests and a helper has one home.
+"""
+
+from pathlib import Path
+import random
+import sqlite3
+
+from serp_adapter.models import (
+    KeywordUniverseRow,
+    Location,
+    NormalizedSerpResult,
+    SerpResultItem,
+    SerpSource,
+)
+from tests.test_adapters import APIFY_RAW_ITEM  # noqa: F401 – re-exported; the fixture lives there
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+
+# Tables SerpStore writes to.
+SCHEMA = (
+    "0002_serp.sql",
+    "0003_worker_endpoints.sql",
+    "0009_serp_canonicalization.sql",
+    "0015_unified_d1_step2_step3.sql",
+    "0022_keywords_serp_inspiration_hardening.sql",
+)
+
+JAN1 = 1735689600  # 2025-01-01 00:00 UTC
+DAY = 86400
+
+
+def connect(path=":memory:") -> sqlite3.Connection:
+    """SQLite DB with the :data:`SCHEMA` migrations and foreign keys on."""
+    conn = sqlite3.connect(path)
+    for name in SCHEMA:
+        conn.executescript((MIGRATIONS / name).read_text())
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def archive_db() -> sqlite3.Connection:
+    """:func:`connect` plus the Step 2 and SERP archive tables."""
+    conn = connect()
+    for name in ("0011_step2_daily_harvest.sql", "0034_serp_archive.sql"):
+        conn.executescript((MIGRATIONS / name).read_text())
+    return conn
+
+
+def apify_items(n):
+    """*n* copies of :data:`APIFY_RAW_ITEM` with distinct search terms."""
+    return [
+        {**APIFY_RAW_ITEM, "searchQuery": {**APIFY_RAW_ITEM["searchQuery"], "term": f"kw {i}"}}
+        for i in range(n)
+    ]
+
+
+def keyword_universe(n):
+    """*n* seeded keyword rows mixing every intent signal and odd CPCs."""
+    rng = random.Random(7)
+    phrases = [
+        "licensed plumber near me",
+        "how to fix clogged drain diy",
+        "best water heater reviews",
+        "acme plumbing san jose",
+        "emergency plumber open now",
+        "what is a sump pump",
+        "drain cleaning",
+    ]
+    domains = ["yelp.com", "reddit.com", "localplumber.com", "amazon.com", "wikihow.com", "acme.com"]
+    rows = []
+    for i in range(n):
+        rows.append(
+            KeywordUniverseRow(
+                kw=rng.choice(phrases) + f" {i}",
+                geo_bucket="US-CA-San Jose",
+                cpc=rng.choice([None, 0.0, -1.0, 0.37, 3.3, 17.1, 49.99, 88.0]),
+                serp_top_domains=rng.sample(domains, rng.randint(0, len(domains))),
+            )
+        )
+    return rows
+
+
+def ranked_serp(phrase, ts, domains):
+    """A desktop US SERP with one result per domain, ranked in order."""
+    return NormalizedSerpResult(
+        query=phrase,
+        location=Location(country="US"),
+        device="desktop",
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(rank=rank, title=f"{domain} title", url=f"https://{domain}/", domain=domain, snippet="s")
+            for rank, domain in enumerate(domains, start=1)
+        ],
+        source=SerpSource(provider="apify"),
+    )
+
+
+def hot_rows(conn, serp_id):
+    """A snapshot's ``serp_results`` rows as dicts, in rank order."""
+    cursor = conn.execute(
+        "SELECT serp_id, rank, url, url_hash, domain, root_domain, title, snippet FROM serp_results "
+        "WHERE serp_id = ? ORDER BY rank",
+        (serp_id,),
+    )
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor]
@@ -0,0 +1,111 @@
+"""Tests for batched actor runs and per-query demultiplexing."""
+
+import pytest
+
+from serp_adapter.actor_runs import batching_report, build_batch_runs
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.keys import keyword_norm, region_key, serp_day, serp_key
+from serp_adapter.models import Location, SerpRequest
+from tests.helpers import APIFY_RAW_ITEM
+
+METROS = [Location(country="US", city="San Jose"), Location(country="US", city="Austin"), Location(country="GB", language="en")]
+KEYWORDS = [f"plumber service {i}" for i in range(20)]
+
+
+def _requests():
+    return [
+        SerpRequest(kw, metro, device=device)
+        for metro in METROS
+        for device in ("mobile", "desktop")
+        for kw in KEYWORDS
+    ]
+
+
+def _actor_items(plan, echo_city=True):
+    """What the actor would put in the run's dataset."""
+    country, language, city, device = plan.group
+    return [
+        {
+            **APIFY_RAW_ITEM,
+            "searchQuery": {
+                "term": query,
+                "countryCode": country.lower(),
+                "languageCode": language,
+                **({"city": city.title()} if echo_city and city else {}),
+            },
+            "device": device.upper(),
+        }
+        for query in plan.queries
+    ]
+
+
+def test_requests_are_packed_per_location_and_device():
+    requests = _requests() + [SerpRequest("  Plumber SERVICE 3", METROS[0], device="mobile")]
+    plans = build_batch_runs(requests, max_queries_per_run=15, base_input={"proxyConfiguration": {"useApifyProxy": True}})
+    # 6 groups of 20 distinct queries, split 15 + 5.
+    assert len(plans) == 12
+    assert sum(len(p.requests) for p in plans) == len(requests)
+    first = plans[0]
+    assert first.group == ("GB", "en", "", "desktop")
+    assert first.input["countryCode"] == "gb"
+    assert first.input["mobileResults"] is False
+    assert first.input["proxyConfiguration"] == {"useApifyProxy": True}
+    assert len(first.queries) == 15
+    assert all(len(set(p.queries)) == len(p.queries) for p in plans)
+    with pytest.raises(ValueError):
+        build_batch_runs(requests, max_queries_per_run=0)
+
+
+@pytest.mark.parametrize("echo_city", [True, False])
+def test_demultiplex_routes_items_to_their_serp_keys(echo_city):
+    requests = _requests() + [SerpRequest("plumber service 3", METROS[0], device="mobile")]
+    adapter = ApifyGoogleSearchAdapter()
+    for plan in build_batch_runs(requests, max_queries_per_run=50):
+        items = _actor_items(plan, echo_city) + [{**APIFY_RAW_ITEM, "searchQuery": {"term": "stray"}}, "junk"]
+        errors = []
+        demux = adapter.demultiplex(items, plan.requests, on_error=errors.append)
+        assert demux.missing == []
+        assert demux.unmatched == [len(items) - 2]
+        assert [e.index for e in errors] == [len(items) - 1]
+        for request, result in zip(plan.requests, demux.by_request):
+            assert result.query.lower() == request.phrase.strip().lower()
+            key = serp_key(
+                keyword_norm(request.phrase), region_key(request.location), request.device, serp_day(result.ts)
+            )
+            assert demux.results[key] is result
+
+
+def test_missing_queries_are_reported():
+    requests = [SerpRequest("a", METROS[0]), SerpRequest("b", METROS[0])]
+    [plan] = build_batch_runs(requests)
+    demux = ApifyGoogleSearchAdapter().demultiplex(_actor_items(plan)[:1], plan.requests)
+    assert [r.phrase for r in demux.missing] == ["b"]
+    assert demux.by_request[1] is None
+
+
+def test_items_only_fall_back_to_an_unambiguous_request():
+    requests = [SerpRequest("plumber", METROS[0], device="desktop"), SerpRequest("plumber", METROS[0], device="mobile")]
+    query = {"term": "plumber", "countryCode": "us", "city": "San Jose"}
+    mobile = {**APIFY_RAW_ITEM, "searchQuery": query, "device": "MOBILE"}
+    other_city = {**mobile, "searchQuery": {**query, "city": "San Jose, CA"}}
+    no_device = {key: value for key, value in mobile.items() if key != "device"}
+    no_echo = {**no_device, "searchQuery": {"term": "plumber", "countryCode": "us"}}
+    demux = ApifyGoogleSearchAdapter().demultiplex([other_city, no_device, no_echo, mobile], requests)
+    # The mobile item fills only the mobile request; the rest match none or both.
+    assert demux.unmatched == [0, 1, 2]
+    assert demux.by_request[0] is None and demux.by_request[1].device == "mobile"
+    assert demux.missing == [requests[0]]
+
+    demux = ApifyGoogleSearchAdapter().demultiplex([no_echo], requests[:1])
+    assert demux.by_request[0] is not None
+
+
+def test_batching_report():
+    requests = _requests()
+    plans = build_batch_runs(requests, max_queries_per_run=100)
+    report = batching_report(requests, plans, run_overhead_seconds=10, seconds_per_query=2, concurrency=4)
+    assert (report.runs_unbatched, report.runs_batched, report.runs_saved) == (120, 6, 114)
+    # 120 runs of 12 s on 4 slots vs 6 runs of 50 s on 4 slots.
+    assert report.seconds_unbatched == 360
+    assert report.seconds_batched == 100
+    assert report.to_dict()["seconds_saved"] == 260
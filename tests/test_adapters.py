@@ -121,6 +121,9 @@ class TestApifyGoogleSearchAdapter:
         assert r.title == "San Jose Emergency Plumbing"
         assert r.domain == "plumbing.sj.com"
 
+    def test_root_domain_is_registrable_domain(self, result):
+        assert [r.root_domain for r in result.results] == ["example.com", "sj.com"]
+
     def test_source_provider(self, result):
         assert result.source.provider == "apify"
 
@@ -163,6 +166,7 @@ class TestApifyGoogleSearchAdapter:
         }
         result = adapter.normalize(raw)
         assert result.results[0].domain == "inferred.com"
+        assert result.results[0].root_domain == "inferred.com"
 
     def test_empty_organic_results(self, adapter):
         raw = {**APIFY_RAW_ITEM, "organicResults": []}
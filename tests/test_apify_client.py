@@ -0,0 +1,124 @@
+"""Tests for the asynchronous Apify dataset client."""
+
+import asyncio
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.apify_client import ApifyDatasetClient, ApifyDatasetError
+from tests.apify_stub import ApifyStubServer, load_fixture_items
+
+ITEMS = load_fixture_items()
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+def _items_via(server_kwargs, client_kwargs=None, **iter_kwargs):
+    async def run():
+        async with ApifyStubServer(ITEMS, **server_kwargs) as server:
+            async with ApifyDatasetClient("tok", base_url=server.base_url, **(client_kwargs or {})) as client:
+                items = await _collect(client.iter_items("ds1", **iter_kwargs))
+                return items, server, client.connections_opened
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("chunked", [True, False])
+@pytest.mark.parametrize("gzip_responses", [True, False])
+def test_pages_are_fetched_concurrently_and_yielded_in_order(chunked, gzip_responses):
+    items, server, opened = _items_via(
+        {"chunked": chunked, "gzip_responses": gzip_responses, "latency": 0.02},
+        {"page_size": 7, "connections": 3},
+    )
+    assert items == ITEMS
+    assert len(server.requests) == 6
+    assert server.max_concurrent == 3
+    # Keep-alive: six pages over at most three connections.
+    assert opened == server.connections <= 3
+    first = server.requests[0]
+    assert first["path"] == "/v2/datasets/ds1/items"
+    assert first["query"]["format"] == "jsonl"
+    assert first["headers"]["authorization"] == "Bearer tok"
+
+
+def test_offset_limit_and_unknown_total():
+    items, server, _ = _items_via({"report_total": False}, {"page_size": 5}, offset=3, limit=12)
+    assert items == ITEMS[3:15]
+    assert [r["query"]["limit"] for r in server.requests] == ["5", "5", "2"]
+
+    items, server, _ = _items_via({"report_total": False}, {"page_size": 16})
+    assert items == ITEMS
+    assert len(server.requests) == 3
+
+
+def test_retries_resume_mid_page():
+    items, server, _ = _items_via(
+        {"fail_statuses": [429, 503], "cut_after_lines": 4},
+        {"page_size": 10, "connections": 1, "backoff": 0.001},
+    )
+    assert items == ITEMS
+    offsets = [r["query"]["offset"] for r in server.requests]
+    # Two throttled attempts, then a page cut after 4 lines is resumed at offset 4.
+    assert offsets[:3] == ["0", "0", "0"]
+    assert offsets.count("4") == 1
+
+
+@pytest.mark.parametrize("report_count", [True, False])
+def test_short_page_is_resumed(report_count):
+    # A well-framed body with fewer items than the Count header (or the known total) promises.
+    items, server, _ = _items_via(
+        {"short_after_lines": 3, "report_count": report_count},
+        {"page_size": 10, "connections": 1, "backoff": 0.001},
+    )
+    assert items == ITEMS
+    assert [r["query"]["offset"] for r in server.requests].count("3") == 1
+
+
+@pytest.mark.parametrize("chunked", [True, False])
+def test_truncated_gzip_stream_is_retried(chunked):
+    errors = []
+    items, server, _ = _items_via(
+        {"truncate_gzip": True, "chunked": chunked},
+        {"page_size": 10, "connections": 1, "backoff": 0.001},
+        on_error=errors.append,
+    )
+    assert items == ITEMS
+    assert errors == []  # The partial last line is dropped, not reported
+    resumed = [int(r["query"]["offset"]) for r in server.requests if int(r["query"]["offset"]) % 10]
+    assert len(resumed) == 1 and resumed[0] < 10
+
+
+def test_non_retryable_status_and_exhausted_retries_raise():
+    with pytest.raises(ApifyDatasetError) as exc_info:
+        _items_via({"fail_statuses": [404]}, {"backoff": 0.001})
+    assert exc_info.value.status == 404
+    with pytest.raises(ApifyDatasetError, match="after 2 retries"):
+        _items_via({"fail_statuses": [500, 500, 500]}, {"retries": 2, "backoff": 0.001})
+
+
+def test_iter_normalize_streams_results_and_reports_errors():
+    bad = list(ITEMS[:6])
+    bad[2] = ["not", "a", "dict"]
+    errors = []
+
+    async def run():
+        async with ApifyStubServer(bad) as server:
+            async with ApifyDatasetClient(base_url=server.base_url, page_size=4) as client:
+                return await _collect(client.iter_normalize("ds1", on_error=errors.append))
+
+    results = asyncio.run(run())
+    adapter = ApifyGoogleSearchAdapter()
+    assert results == [adapter.normalize(item) for i, item in enumerate(bad) if i != 2]
+    assert [e.index for e in errors] == [2]
+
+
+def test_connections_bound_concurrent_requests():
+    pages = -(-len(ITEMS) // 5)
+    for connections, concurrent in ((1, 1), (8, min(8, pages - 1))):
+        items, server, _ = _items_via({"latency": 0.02}, {"page_size": 5, "connections": connections})
+        assert items == ITEMS
+        assert len(server.requests) == pages
+        # The first page is fetched alone to learn the total; the rest overlap.
+        assert server.max_concurrent == concurrent
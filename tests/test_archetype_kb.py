@@ -0,0 +1,93 @@
+"""Tests for the file-backed archetype knowledge base."""
+
+import os
+import struct
+
+import pytest
+
+from serp_adapter.archetype_kb import (
+    ArchetypeKB,
+    ArchetypeKBError,
+    ReloadingArchetypeKB,
+    write_archetype_kb,
+)
+from serp_adapter.serp_archetype import (
+    classify_domain,
+    register_archetype_domains,
+    use_archetype_index,
+)
+
+
+@pytest.fixture()
+def kb_path(tmp_path):
+    path = tmp_path / "archetypes.kb"
+    write_archetype_kb(
+        path,
+        {
+            "directory": ["yelp.com", "Listings.example"],
+            "publisher": ["reddit.com", "listings.example"],
+            "ecommerce": [f"store{i}.com" for i in range(5000)],
+        },
+        version=3,
+    )
+    return path
+
+
+def test_lookup_matches_roots_and_subdomains(kb_path):
+    kb = ArchetypeKB(kb_path)
+    assert kb.version == 3
+    assert len(kb) == 5003
+    assert kb.match("yelp.com") == "directory"
+    assert kb.match("m.yelp.com") == "directory"
+    assert kb.match("listings.example") == "directory"
+    assert kb.match("old.reddit.com") == "publisher"
+    assert kb.match("www.store4999.com") == "ecommerce"
+    assert kb.match("store5000.com") is None
+
+
+def test_rejects_foreign_and_truncated_files(tmp_path):
+    bad = tmp_path / "bad.kb"
+    bad.write_bytes(b"not a kb file at all, just some bytes")
+    with pytest.raises(ArchetypeKBError):
+        ArchetypeKB(bad)
+    bad.write_bytes(b"")
+    with pytest.raises(ArchetypeKBError):
+        ArchetypeKB(bad)
+
+
+def test_rejects_full_slot_table(tmp_path):
+    path = tmp_path / "full.kb"
+    write_archetype_kb(path, {"directory": ["yelp.com"]}, version=1)
+    data = bytearray(path.read_bytes())
+    n_slots = struct.unpack_from("<I", data, 16)[0]
+    struct.pack_into("<I", data, 12, n_slots)  # Claim every slot is used
+    path.write_bytes(bytes(data))
+    with pytest.raises(ArchetypeKBError):
+        ArchetypeKB(path)
+
+
+def test_reloads_replaced_file_and_ignores_broken_one(kb_path):
+    kb = ReloadingArchetypeKB(kb_path, check_interval=0)
+    assert kb.match("newdirectory.com") is None
+
+    write_archetype_kb(kb_path, {"directory": ["newdirectory.com"]}, version=4)
+    assert kb.match("newdirectory.com") == "directory"
+    assert kb.version == 4
+
+    tmp = kb_path.with_suffix(".tmp")
+    tmp.write_bytes(b"garbage")
+    os.replace(tmp, kb_path)
+    assert kb.match("newdirectory.com") == "directory"
+    assert isinstance(kb.last_error, ArchetypeKBError)
+
+
+def test_classify_domain_uses_installed_kb(kb_path):
+    previous = use_archetype_index(ArchetypeKB(kb_path))
+    try:
+        assert classify_domain("www.store12.com") == "ecommerce"
+        assert classify_domain("amazon.com") == "local_service"
+        with pytest.raises(TypeError):
+            register_archetype_domains("directory", ["x.com"])
+    finally:
+        use_archetype_index(previous)
+    assert classify_domain("amazon.com") == "ecommerce"
@@ -0,0 +1,140 @@
+"""Tests for the delta-encoded SERP snapshot archive."""
+
+import json
+import zlib
+
+import pytest
+
+from serp_adapter.archive import (
+    ArchiveBlock,
+    ArchiveError,
+    Snapshot,
+    archive_candidates,
+    archive_serps,
+    encode_block,
+    load_archived_serp,
+)
+from serp_adapter.rank_index import DomainRankIndex
+from serp_adapter.rank_series import RankSeries
+from serp_adapter.refresh import load_serp_history, load_step2_history
+from serp_adapter.rollups import SerpRollups, daily_latest_serp_rows
+from serp_adapter.store import SerpStore
+from tests.helpers import DAY, JAN1, MIGRATIONS, archive_db, hot_rows, ranked_serp
+
+COLUMNS = ("url", "title")
+
+
+def test_block_stores_keyframe_and_edit_scripts():
+    a, b, c, d = (("https://a/", "A"), ("https://b/", "B"), ("https://c/", "C"), ("https://d/", "D"))
+    snapshots = [
+        Snapshot("s1", 1, [(1, a), (2, b), (3, c)]),
+        Snapshot("s2", 2, [(1, b), (2, a), (3, c)]),  # Swap
+        Snapshot("s3", 3, [(1, b), (2, a), (4, d)]),  # c dropped, d entered at a gap
+        Snapshot("s4", 4, [(1, b), (1, b), (2, a)]),  # Duplicate rank and record
+        Snapshot("s5", 5, []),
+    ]
+    data = encode_block(COLUMNS, snapshots)
+    block = ArchiveBlock(data)
+    assert len(block) == 5 and "s3" in block and "zz" not in block
+    assert block.snapshots() == snapshots
+    assert block.snapshot("s3") == snapshots[2]
+
+    entries = json.loads(zlib.decompress(data))["snapshots"]
+    assert entries[0][3:] == [[[1, 0], [2, 1], [3, 2]], [], []]  # Keyframe: all entered
+    assert entries[1][3:] == [[], [], [[2, 1, 1], [1, 2, 0]]]  # Only the two moves
+    assert entries[2][3:] == [[[4, 3]], [[3, 2]], []]
+    with pytest.raises(KeyError):
+        block.snapshot("zz")
+    with pytest.raises(ArchiveError):
+        ArchiveBlock(b"not a block")
+
+
+def test_archive_serps_round_trips_and_extends_blocks():
+    conn = archive_db()
+    store = SerpStore(conn)
+    days = [["a.com", "b.com", "c.com"], ["b.com", "a.com", "c.com"], ["b.com", "a.com", "d.com"]]
+    ids = [store.write([ranked_serp("plumber", JAN1 + i * DAY, domains)], "u1")[0] for i, domains in enumerate(days)]
+    other = store.write([ranked_serp("drain", JAN1, ["x.com"])], "u1")[0]
+    originals = {serp_id: hot_rows(conn, serp_id) for serp_id in [*ids, other]}
+
+    first = archive_candidates(conn, "serp_results", (JAN1 + DAY) * 1000)
+    assert {candidate[0] for candidate in first} == {ids[0], other}
+    with conn:
+        assert archive_serps(conn, "serp_results", first, now_ms=0) == (2, 4, 2)
+    with conn:
+        later = archive_candidates(conn, "serp_results", (JAN1 + 3 * DAY) * 1000)
+        assert archive_serps(conn, "serp_results", later, now_ms=0) == (2, 6, 1)
+
+    assert conn.execute("SELECT COUNT(*) FROM serp_results").fetchone()[0] == 0
+    assert archive_candidates(conn, "serp_results", (JAN1 + 3 * DAY) * 1000) == []
+    blocks = conn.execute("SELECT series_key, period, n_snapshots, n_rows FROM serp_archive_blocks ORDER BY 1").fetchall()
+    assert blocks == [("drain|US-en|desktop", "2025-01", 1, 1), ("plumber|US-en|desktop", "2025-01", 3, 9)]
+    for serp_id, rows in originals.items():
+        assert load_archived_serp(conn, serp_id) == rows
+    assert load_archived_serp(conn, "missing") == []
+
+
+def test_archive_step2_results():
+    conn = archive_db()
+    with conn:
+        for i, urls in enumerate((["https://a/", "https://b/"], ["https://b/", "https://a/"])):
+            serp_id = f"s2_{i}"
+            conn.execute(
+                "INSERT INTO step2_serp_snapshots (serp_id, site_id, keyword, cluster, intent, geo, date_yyyymmdd, scraped_at) "
+                "VALUES (?, 'site_1', 'plumber', 'c', 'i', 'us', ?, ?)",
+                (serp_id, f"2025010{i + 1}", (JAN1 + i * DAY) * 1000),
+            )
+            conn.executemany(
+                "INSERT INTO step2_serp_results (result_id, serp_id, rank, url, url_hash, domain, page_type, "
+                "title_snippet, desc_snippet, created_at) VALUES (?, ?, ?, ?, ?, ?, 'home', 't', NULL, ?)",
+                [
+                    (f"r_{i}_{rank}", serp_id, rank, url, f"h{url}", url[8:-1], (JAN1 + i * DAY) * 1000 + rank)
+                    for rank, url in enumerate(urls, start=1)
+                ],
+            )
+    history = load_step2_history(conn, "site_1", since_day=JAN1 // DAY)
+    candidates = archive_candidates(conn, "step2_serp_results", (JAN1 + 5 * DAY) * 1000)
+    with conn:
+        assert archive_serps(conn, "step2_serp_results", candidates, now_ms=0) == (2, 4, 1)
+    assert load_step2_history(conn, "site_1", since_day=JAN1 // DAY) == history
+    assert conn.execute("SELECT COUNT(*) FROM step2_serp_results").fetchone()[0] == 0
+    assert load_archived_serp(conn, "s2_1", "step2_serp_results") == [
+        {"serp_id": "s2_1", "rank": 1, "url": "https://b/", "url_hash": "hhttps://b/", "domain": "b",
+         "page_type": "home", "title_snippet": "t", "desc_snippet": None, "created_at": (JAN1 + DAY) * 1000 + 1},
+        {"serp_id": "s2_1", "rank": 2, "url": "https://a/", "url_hash": "hhttps://a/", "domain": "a",
+         "page_type": "home", "title_snippet": "t", "desc_snippet": None, "created_at": (JAN1 + DAY) * 1000 + 1},
+    ]
+
+
+def _history_views(conn):
+    index = DomainRankIndex.build(conn)
+    return (
+        SerpRollups().rebuild(conn),
+        daily_latest_serp_rows(conn, "plumber", JAN1 * 1000),
+        conn.execute("SELECT * FROM serp_daily_domain_best ORDER BY 1, 2, 3, 4, 5").fetchall(),
+        RankSeries().rebuild(conn),
+        conn.execute("SELECT * FROM serp_rank_series ORDER BY 1, 2, 3, 4").fetchall(),
+        [(host, list(index.visibility(host))) for host in ("a.com", "b.com", "c.com", "d.com")],
+        load_serp_history(conn, since_ts=JAN1),
+    )
+
+
+def test_history_readers_see_archived_runs():
+    conn = archive_db()
+    for name in ("0032_serp_daily_rollups.sql", "0033_serp_rank_series.sql"):
+        conn.executescript((MIGRATIONS / name).read_text())
+    store = SerpStore(conn)
+    days = [["a.com", "b.com", "c.com"], ["b.com", "a.com", "c.com"], ["b.com", "a.com", "d.com"]]
+    for i, domains in enumerate(days * 2):
+        store.write([ranked_serp("plumber", JAN1 + i * DAY, domains)], "u1")
+        store.write([ranked_serp("drain", JAN1 + i * DAY + 60, domains[::-1])], "u1")
+    # A same-day rerun: the later run wins the day, archived or not.
+    store.write([ranked_serp("plumber", JAN1 + DAY + 3600, ["d.com", "c.com"])], "u1")
+    before = _history_views(conn)
+    assert before[1] and before[2] and before[4] and before[6]
+
+    candidates = archive_candidates(conn, "serp_results", (JAN1 + 4 * DAY) * 1000)
+    with conn:
+        archive_serps(conn, "serp_results", candidates, now_ms=0)
+    assert conn.execute("SELECT COUNT(*) FROM serp_results").fetchone()[0] == 2 * 2 * 3
+    assert _history_views(conn) == before
@@ -0,0 +1,108 @@
+"""Tests for the incremental kw_intent backfill script."""
+
+from pathlib import Path
+import json
+import sqlite3
+
+from scripts.backfill_kw_intent import JOB_ID, backfill_kw_intent
+from serp_adapter.infer_intent import infer_intent
+from serp_adapter.models import KeywordUniverseRow
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    for name in ("0002_serp.sql", "0003_keyword_intent.sql", "0031_kw_intent_backfill.sql"):
+        conn.executescript((MIGRATIONS / name).read_text())
+    return conn
+
+
+def _seed(conn: sqlite3.Connection, n: int) -> None:
+    phrases = ["licensed plumber near me", "how to fix drain", "acme plumbing", "best water heater"]
+    for i in range(n):
+        kw_id = f"kw_{i:04d}"
+        conn.execute(
+            """
+            INSERT INTO keywords (kw_id, user_id, phrase, region_json, created_at, kw, geo_bucket, serp_top_domains_json)
+            VALUES (?, 'user_1', ?, '{}', 0, ?, 'US-CA', ?)
+            """,
+            (kw_id, phrases[i % 4], phrases[i % 4], json.dumps(["yelp.com", f"site{i}.com"])),
+        )
+        conn.execute(
+            "INSERT INTO kw_metrics (kw_id, cpc, updated_at) VALUES (?, ?, 0)",
+            (kw_id, float(i % 7) * 5),
+        )
+    conn.commit()
+
+
+def _intent_rows(conn: sqlite3.Connection):
+    return conn.execute(
+        "SELECT kw_id, intent_bucket, confidence, explanation, inputs_hash FROM kw_intent ORDER BY kw_id"
+    ).fetchall()
+
+
+def test_backfill_scores_all_rows_then_skips_unchanged():
+    conn = _connect()
+    _seed(conn, 25)
+
+    first = backfill_kw_intent(conn, chunk_size=10, brand_terms=["acme"])
+    assert first.to_dict()["inserted_or_updated"] == 25
+    assert first.chunks == 3
+
+    stored = _intent_rows(conn)
+    row = KeywordUniverseRow(
+        kw="acme plumbing", geo_bucket="US-CA", cpc=10.0, serp_top_domains=["yelp.com", "site2.com"]
+    )
+    expected = infer_intent(row, brand_terms=["acme"])
+    assert stored[2][1:4] == (expected.intent_bucket, expected.confidence, expected.explanation)
+
+    second = backfill_kw_intent(conn, chunk_size=10, brand_terms=["acme"])
+    assert (second.scanned, second.unchanged, second.inserted_or_updated) == (25, 25, 0)
+
+    conn.execute("UPDATE kw_metrics SET cpc = 99 WHERE kw_id = 'kw_0004'")
+    conn.execute("UPDATE keywords SET serp_top_domains_json = '[]' WHERE kw_id = 'kw_0011'")
+    conn.commit()
+    third = backfill_kw_intent(conn, chunk_size=10, brand_terms=["acme"])
+    assert third.inserted_or_updated == 2
+
+    # A new brand-term set invalidates every row.
+    fourth = backfill_kw_intent(conn, chunk_size=10, brand_terms=["acme", "rival"])
+    assert fourth.inserted_or_updated == 25
+
+
+def test_backfill_resumes_from_checkpoint():
+    conn = _connect()
+    _seed(conn, 30)
+
+    partial = backfill_kw_intent(conn, chunk_size=10, limit=15)
+    assert partial.scanned == 20
+    checkpoint = conn.execute(
+        "SELECT cursor, rows_scanned, rows_written FROM backfill_checkpoints WHERE job_id = ?", (JOB_ID,)
+    ).fetchone()
+    assert checkpoint == ("kw_0019", 20, 20)
+
+    rest = backfill_kw_intent(conn, chunk_size=10)
+    assert rest.resumed_from == "kw_0019"
+    assert rest.scanned == 10
+    assert len(_intent_rows(conn)) == 30
+    assert conn.execute("SELECT COUNT(*) FROM backfill_checkpoints").fetchone()[0] == 0
+
+
+def test_parallel_backfill_matches_inline():
+    inline, parallel = _connect(), _connect()
+    _seed(inline, 40)
+    _seed(parallel, 40)
+    backfill_kw_intent(inline, chunk_size=7, brand_terms=["acme"])
+    result = backfill_kw_intent(parallel, chunk_size=7, workers=2, brand_terms=["acme"])
+    assert result.inserted_or_updated == 40
+    strip = lambda rows: [r[:4] + (r[4],) for r in rows]  # noqa: E731
+    assert strip(_intent_rows(parallel)) == strip(_intent_rows(inline))
+
+
+def test_dry_run_writes_nothing():
+    conn = _connect()
+    _seed(conn, 5)
+    result = backfill_kw_intent(conn, dry_run=True)
+    assert result.inserted_or_updated == 5
+    assert _intent_rows(conn) == []
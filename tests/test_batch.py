@@ -0,0 +1,77 @@
+"""Tests for the columnar SerpResultBatch."""
+
+import pickle
+
+import pytest
+
+from serp_adapter.batch import SerpResultBatch
+from serp_adapter.models import (
+    Location,
+    NormalizedSerpResult,
+    SerpResultItem,
+    SerpSource,
+)
+
+
+def _serp(query, n, source=True):
+    return NormalizedSerpResult(
+        query=query,
+        location=Location(country="US", region="CA", city="San José"),
+        device="mobile",
+        engine="google",
+        ts=1745485200,
+        results=[
+            SerpResultItem(
+                rank=i + 1,
+                title=f"Title {i} – ünïcode",
+                url=f"https://site{i % 3}.com/{query}/{i}",
+                domain=f"site{i % 3}.com",
+                snippet="" if i % 2 else f"snippet {i}",
+                root_domain=f"site{i % 3}.com",
+            )
+            for i in range(n)
+        ],
+        source=SerpSource(provider="apify", actor="apify/google-search-scraper", run_id="r1")
+        if source
+        else None,
+    )
+
+
+@pytest.fixture()
+def results():
+    return [_serp("plumber", 4), _serp("empty", 0, source=False), _serp("drain", 3)]
+
+
+def test_round_trip_is_lossless(results):
+    batch = SerpResultBatch.from_results(results)
+    assert batch.to_results() == results
+
+
+def test_shape_and_domain_interning(results):
+    batch = SerpResultBatch.from_results(results)
+    assert len(batch) == 3
+    assert batch.num_rows == 7
+    assert batch.domains == ["site0.com", "site1.com", "site2.com"]
+    assert list(batch.row_range(1)) == []
+
+
+def test_row_views_read_from_columns(results):
+    batch = SerpResultBatch.from_results(results)
+    rows = batch.rows(2)
+    assert [r.rank for r in rows] == [1, 2, 3]
+    assert rows[0].url == "https://site0.com/drain/0"
+    assert rows[0].title == "Title 0 – ünïcode"
+    assert rows[1].snippet == ""
+    assert rows[2].domain == "site2.com"
+    assert rows[2].root_domain == "site2.com"
+    assert rows[0].to_item() == results[2].results[0]
+    with pytest.raises(IndexError):
+        batch.row(batch.num_rows)
+
+
+def test_pickle_round_trip(results):
+    batch = pickle.loads(pickle.dumps(SerpResultBatch.from_results(results)))
+    assert batch.to_results() == results
+    batch.append(_serp("again", 2))
+    assert batch.domains == ["site0.com", "site1.com", "site2.com"]
+    assert batch.serp(3).query == "again"
@@ -0,0 +1,151 @@
+"""Tests for cross-user SERP request coalescing."""
+
+import asyncio
+import json
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.coalesce import FETCHED, FRESH, IN_FLIGHT, SerpCoalescer, load_watches
+from serp_adapter.keys import keyword_norm, region_key, serp_key
+from serp_adapter.router import RoutedSerp
+from tests.helpers import APIFY_RAW_ITEM, MIGRATIONS, connect
+
+NOW = 1745485200.0  # 2025-04-24 09:00 UTC, the fixture's crawledAt
+
+
+def _db(watchers=10):
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0007_serp_watchlist.sql").read_text())
+    region = json.dumps({"country": "US", "city": "San Jose"})
+    for i in range(watchers):
+        conn.execute(
+            "INSERT INTO serp_watchlist (watch_id, user_id, phrase, region_json, device, created_at, updated_at) "
+            "VALUES (?, ?, 'plumber san jose', ?, 'mobile', 0, 0)",
+            (f"w{i}", f"user_{i}", region),
+        )
+    conn.execute(
+        "INSERT INTO serp_watchlist (watch_id, user_id, phrase, region_json, device, created_at, updated_at) "
+        "VALUES ('w_other', 'user_0', 'drain cleaning', ?, 'desktop', 0, 0)",
+        (region,),
+    )
+    conn.commit()
+    return conn
+
+
+class SlowFetch:
+    def __init__(self, delay=0.02, fail=False, routed=False):
+        self.delay = delay
+        self.fail = fail
+        self.routed = routed
+        self.calls = []
+
+    async def __call__(self, request):
+        self.calls.append(request.phrase)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("actor timed out")
+        raw = {
+            **APIFY_RAW_ITEM,
+            "searchQuery": {**APIFY_RAW_ITEM["searchQuery"], "term": request.phrase},
+            "device": request.device.upper(),
+        }
+        result = ApifyGoogleSearchAdapter().normalize(raw)
+        if self.routed:
+            return RoutedSerp(result, "dataforseo", "apify_failed:boom", 0.1, True)
+        return result
+
+
+def test_identical_watches_share_one_fetch():
+    conn = _db()
+    fetch = SlowFetch(routed=True)
+    coalescer = SerpCoalescer(conn, fetch, clock=lambda: NOW)
+    outcomes = asyncio.run(coalescer.refresh_watches(load_watches(conn)))
+
+    assert sorted(fetch.calls) == ["drain cleaning", "plumber san jose"]
+    assert conn.execute("SELECT COUNT(*) FROM serp_runs").fetchone()[0] == 2
+    assert [o.source for o in outcomes].count(FETCHED) == 2
+    assert [o.source for o in outcomes].count(IN_FLIGHT) == 9
+    assert (coalescer.stats.fetched, coalescer.stats.in_flight) == (2, 9)
+
+    pointers = dict(conn.execute("SELECT watch_id, last_serp_id FROM serp_watchlist"))
+    shared = {pointers[f"w{i}"] for i in range(10)}
+    assert len(shared) == 1 and None not in shared
+    assert pointers["w_other"] not in shared
+    statuses = {row for row in conn.execute("SELECT last_status, last_run_at FROM serp_watchlist")}
+    assert statuses == {("ok", int(NOW * 1000))}
+    assert conn.execute("SELECT fallback_reason FROM serp_runs WHERE serp_id = ?", (next(iter(shared)),)).fetchone() == (
+        "apify_failed:boom",
+    )
+
+
+def test_later_requests_use_the_fresh_run_inside_the_window():
+    conn = _db(watchers=2)
+    fetch = SlowFetch(delay=0)
+    clock = [NOW]
+    coalescer = SerpCoalescer(conn, fetch, freshness_seconds=3600, clock=lambda: clock[0])
+    [first, *_] = load_watches(conn)
+
+    fetched = asyncio.run(coalescer.refresh_watch(first))
+    clock[0] += 1800
+    again = asyncio.run(coalescer.refresh_watch(load_watches(conn)[1]))
+    assert (fetched.source, again.source) == (FETCHED, FRESH)
+    assert again.serp_id == fetched.serp_id
+    assert len(fetch.calls) == 1
+
+    clock[0] += 3600  # Outside the window: fetch again.
+    assert asyncio.run(coalescer.refresh_watch(first)).source == FETCHED
+    assert len(fetch.calls) == 2
+
+
+def test_fetch_straddling_midnight_is_shared_and_reused():
+    conn = _db(watchers=3)
+    midnight = 1745539200.0  # 2025-04-25 00:00 UTC; the result's ts is on 04-24
+    clock = [midnight - 1]
+
+    class MidnightFetch(SlowFetch):
+        async def __call__(self, request):
+            clock[0] = midnight + 1  # Crosses midnight while in flight
+            return await super().__call__(request)
+
+    fetch = MidnightFetch()
+    coalescer = SerpCoalescer(conn, fetch, freshness_seconds=86400, clock=lambda: clock[0])
+    first, second, third = (w for w in load_watches(conn) if w.watch_id != "w_other")
+
+    async def run():
+        return await asyncio.gather(coalescer.refresh_watch(first), coalescer.refresh_watch(second))
+
+    fetched, shared = asyncio.run(run())
+    clock[0] += 600
+    fresh = asyncio.run(coalescer.refresh_watch(third))
+    assert [o.source for o in (fetched, shared, fresh)] == [FETCHED, IN_FLIGHT, FRESH]
+    assert len(fetch.calls) == 1
+    series = (keyword_norm("plumber san jose"), region_key(third.request.location), "mobile")
+    stored = conn.execute("SELECT serp_key FROM serp_runs").fetchone()[0]
+    assert stored == serp_key(*series, "2025-04-24")
+    assert {o.serp_key for o in (fetched, shared, fresh)} == {stored}
+    assert coalescer.request_key(third.request) == serp_key(*series, "2025-04-25")
+
+
+def test_failed_fetch_is_shared_and_recorded_per_watch():
+    conn = _db(watchers=3)
+    coalescer = SerpCoalescer(conn, SlowFetch(fail=True), clock=lambda: NOW)
+    watches = [w for w in load_watches(conn) if w.watch_id != "w_other"]
+    outcomes = asyncio.run(coalescer.refresh_watches(watches))
+    assert all(o.serp_id is None and o.error == "RuntimeError: actor timed out" for o in outcomes)
+    rows = conn.execute("SELECT last_status, last_error, last_serp_id FROM serp_watchlist WHERE watch_id != 'w_other'").fetchall()
+    assert rows == [("error", "RuntimeError: actor timed out", None)] * 3
+    assert coalescer.stats.errors == 3
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.get("user_0", watches[0].request))
+
+
+def test_load_watches_filters_inactive_and_recent():
+    conn = _db(watchers=3)
+    conn.execute("UPDATE serp_watchlist SET active = 0 WHERE watch_id = 'w0'")
+    conn.execute("UPDATE serp_watchlist SET last_run_at = 500 WHERE watch_id = 'w1'")
+    assert [w.watch_id for w in load_watches(conn)] == ["w1", "w2", "w_other"]
+    watches = load_watches(conn, due_before_ms=100)
+    assert [w.watch_id for w in watches] == ["w2", "w_other"]
+    assert watches[0].request.location.city == "San Jose"
@@ -0,0 +1,53 @@
+"""Tests for the cold-history compaction script."""
+
+import sqlite3
+
+import pytest
+
+from scripts.compact_serp_archive import compact_serp_archive
+from serp_adapter.archive import load_archived_serp
+from serp_adapter.store import SerpStore
+from tests.helpers import DAY, JAN1, MIGRATIONS, SCHEMA, archive_db, hot_rows, ranked_serp
+
+
+def test_compacts_only_old_snapshots_and_can_rerun():
+    conn = archive_db()
+    store = SerpStore(conn)
+    ids = [
+        store.write([ranked_serp(f"kw {i % 3}", JAN1 + (i // 3) * DAY, ["a.com", "b.com", f"c{i % 2}.com"])], "u1")[0]
+        for i in range(30)
+    ]
+    originals = {serp_id: hot_rows(conn, serp_id) for serp_id in ids}
+    now_ms = (JAN1 + 12 * DAY) * 1000
+
+    dry = compact_serp_archive(conn, 5, now_ms=now_ms, dry_run=True)
+    assert (dry.candidates, dry.snapshots) == (21, 0)
+    assert conn.execute("SELECT COUNT(*) FROM serp_archive_blocks").fetchone()[0] == 0
+
+    result = compact_serp_archive(conn, 5, now_ms=now_ms, chunk_size=4)
+    assert (result.candidates, result.snapshots, result.rows, result.blocks) == (21, 21, 63, 3)
+    assert result.chunks == 3  # One per series: chunks split at series boundaries
+    assert result.skipped_sources == []
+    hot = {row[0] for row in conn.execute("SELECT DISTINCT serp_id FROM serp_results")}
+    assert hot == set(ids[21:])
+    assert compact_serp_archive(conn, 5, now_ms=now_ms).candidates == 0
+
+    # A later pass extends the same monthly blocks.
+    later = compact_serp_archive(conn, 0, now_ms=now_ms)
+    assert (later.snapshots, later.blocks) == (9, 3)
+    assert conn.execute("SELECT SUM(n_snapshots) FROM serp_archive_blocks").fetchone()[0] == 30
+    for serp_id, rows in originals.items():
+        assert load_archived_serp(conn, serp_id) == rows
+
+
+def test_skips_missing_sources_and_requires_archive_tables():
+    conn = sqlite3.connect(":memory:")
+    for name in SCHEMA:
+        conn.executescript((MIGRATIONS / name).read_text())
+    with pytest.raises(RuntimeError):
+        compact_serp_archive(conn, 30)
+    conn.executescript((MIGRATIONS / "0034_serp_archive.sql").read_text())
+    result = compact_serp_archive(conn, 30)
+    assert result.skipped_sources == ["step2_serp_results"]
+    with pytest.raises(ValueError):
+        compact_serp_archive(conn, -1)
@@ -0,0 +1,46 @@
+"""Tests for registrable-domain resolution."""
+
+import pytest
+
+from serp_adapter.domains import (
+    PublicSuffixTrie,
+    registrable_domain,
+    split_url_host,
+)
+
+
+@pytest.mark.parametrize(
+    "host, expected",
+    [
+        ("plumbing.sj.com", "sj.com"),
+        ("sj.com", "sj.com"),
+        ("WWW.Example.COM.", "example.com"),
+        ("www.bbc.co.uk", "bbc.co.uk"),
+        ("a.b.c.example.co.uk", "example.co.uk"),
+        ("foo.github.io", "foo.github.io"),
+        ("city.kobe.jp", "city.kobe.jp"),  # exception rule
+        ("a.b.kobe.jp", "a.b.kobe.jp"),  # wildcard rule
+        ("shop.unknowntld", "shop.unknowntld"),
+        ("co.uk", "co.uk"),
+        ("192.168.0.1", "192.168.0.1"),
+        ("", ""),
+    ],
+)
+def test_registrable_domain(host, expected):
+    assert registrable_domain(host) == expected
+
+
+def test_idna_rules_match_punycode_hosts():
+    # 公司.cn is a public suffix; hosts arrive punycoded from urlparse.
+    assert registrable_domain("www.example.xn--55qx5d.cn") == "example.xn--55qx5d.cn"
+
+
+def test_icann_only_trie():
+    trie = PublicSuffixTrie(["com", "github.io"])
+    assert trie.split("foo.github.io") == ("foo.github.io", "github.io")
+    assert trie.split("www.example.com") == ("example.com", "com")
+
+
+def test_split_url_host():
+    assert split_url_host("https://www.plumbing.sj.com/x?y") == ("plumbing.sj.com", "sj.com")
+    assert split_url_host("not a url") == ("", "")
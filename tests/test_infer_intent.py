@@ -1,7 +1,17 @@
 """Tests for deterministic keyword intent inference."""
 
-from serp_adapter.infer_intent import infer_intent
+import pytest
+
+from serp_adapter.infer_intent import (
+    _MATCHER_CACHE_SIZE,
+    _intent_matcher,
+    compile_intent_matcher,
+    infer_intent,
+    infer_intent_batch,
+)
+from serp_adapter.matcher import MultiPatternMatcher
 from serp_adapter.models import KeywordUniverseRow
+from tests.helpers import keyword_universe
 
 
 def test_hire_intent_from_modifier_and_high_cpc():
@@ -37,3 +47,50 @@ def test_brand_navigational_detected():
     )
     result = infer_intent(row, brand_terms=["acme"])
     assert result.intent_bucket == "brand_navigational"
+
+
+def test_batch_matches_scalar_bit_for_bit():
+    pytest.importorskip("numpy")
+    rows = keyword_universe(300)
+    batch = infer_intent_batch(rows, brand_terms=["acme"])
+    assert len(batch) == len(rows)
+    for i, row in enumerate(rows):
+        assert batch[i] == infer_intent(row, brand_terms=["acme"])
+
+
+def test_batch_uses_given_archetype_counts():
+    pytest.importorskip("numpy")
+    rows = keyword_universe(3)
+    counts = [{"directory": 3, "publisher": 1}, None, {}]
+    batch = infer_intent_batch(rows, archetype_counts=counts)
+    for i, row in enumerate(rows):
+        assert batch[i] == infer_intent(row, archetype_counts=counts[i])
+
+
+def test_batch_explanations_are_rendered_on_demand():
+    pytest.importorskip("numpy")
+    rows = keyword_universe(2)
+    batch = infer_intent_batch(rows)
+    assert batch.scores.shape == (2, 5)
+    assert batch.explanation(1) == infer_intent(rows[1]).explanation
+    assert infer_intent_batch([]).scores.shape == (0, 5)
+
+
+def test_compiled_matcher_is_reusable_and_keeps_brand_case_semantics():
+    matcher = compile_intent_matcher(["acme", "rival plumbing"])
+    row = KeywordUniverseRow(kw="ACME plumbing san jose", geo_bucket="US-CA-San Jose", cpc=4.0)
+    assert infer_intent(row, brand_terms=matcher).intent_bucket == "brand_navigational"
+    assert infer_intent(row, brand_terms=["acme"]) == infer_intent(row, brand_terms=matcher)
+    # The keyword is lowercased but terms are not: "Acme" never matched.
+    assert "brand:False" in infer_intent(row, brand_terms=["Acme"]).explanation
+    assert infer_intent(row, brand_terms=compile_intent_matcher(["Acme"])) == infer_intent(row)
+    with pytest.raises(ValueError):
+        infer_intent(row, brand_terms=MultiPatternMatcher({"brand": ["acme"]}))
+
+
+def test_term_lists_share_matchers_by_value_and_cache_is_bounded():
+    matcher = _intent_matcher(["acme", "rival"])
+    assert _intent_matcher(("acme", "rival")) is matcher
+    for i in range(_MATCHER_CACHE_SIZE):
+        _intent_matcher([f"brand {i}"])
+    assert _intent_matcher(["acme", "rival"]) is not matcher
@@ -0,0 +1,116 @@
+"""Tests for the persistent intent feature store."""
+
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from serp_adapter.infer_intent import HIRE_WEIGHTS, compile_intent_matcher, infer_intent
+from serp_adapter.intent_features import (
+    IntentFeatureStore,
+    brand_terms_version,
+    extract_intent_features,
+    intent_inputs_hash,
+    intent_weight_matrix,
+)
+from serp_adapter.models import KeywordUniverseRow
+from tests.helpers import keyword_universe
+
+np = pytest.importorskip("numpy")
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    for name in ("0002_serp.sql", "0003_keyword_intent.sql", "0030_kw_intent_features.sql"):
+        conn.executescript((MIGRATIONS / name).read_text())
+    return conn
+
+
+def _rows(n):
+    return {f"kw_{i:03d}": row for i, row in enumerate(keyword_universe(n))}
+
+
+def test_feature_scores_match_infer_intent():
+    rows = keyword_universe(200)
+    features = extract_intent_features([str(i) for i in range(len(rows))], rows, brand_terms=["acme"])
+    batch = features.score()
+    for i, row in enumerate(rows):
+        expected = infer_intent(row, brand_terms=["acme"])
+        got = batch[i]
+        assert got.intent_bucket == expected.intent_bucket
+        assert got.confidence == pytest.approx(expected.confidence, abs=1e-12)
+        assert got.scores == pytest.approx(expected.scores, abs=1e-12)
+        assert got.explanation == expected.explanation
+
+
+def test_refresh_only_recomputes_changed_inputs():
+    conn = _connect()
+    store = IntentFeatureStore(conn)
+    rows = _rows(20)
+    assert store.refresh(rows, now=1) == 20
+    assert store.refresh(rows, now=2) == 0
+
+    rows["kw_003"] = KeywordUniverseRow(
+        kw=rows["kw_003"].kw, geo_bucket="US", cpc=12.5, serp_top_domains=rows["kw_003"].serp_top_domains
+    )
+    rows["kw_007"] = KeywordUniverseRow(
+        kw=rows["kw_007"].kw, geo_bucket="US", cpc=rows["kw_007"].cpc, serp_top_domains=["yelp.com"]
+    )
+    assert store.stale(rows) == ["kw_003", "kw_007"]
+    assert store.refresh(rows, now=3) == 2
+    assert store.refresh(rows, force=True, now=4) == 20
+
+
+def test_refresh_hashes_brand_version_like_the_backfill():
+    conn = _connect()
+    store = IntentFeatureStore(conn)
+    rows = _rows(10)
+    assert store.refresh(rows, brand_terms=["acme"], now=1) == 10
+    version = brand_terms_version(["acme"])
+    assert store.stored_hashes(["kw_004"]) == {"kw_004": intent_inputs_hash(rows["kw_004"], version)}
+    assert store.stale(rows, version) == []
+    assert store.refresh(rows, brand_terms=["acme", "acme"], now=2) == 0
+    assert store.refresh(rows, brand_terms=["ACME"], now=2) == 10  # Scores differently
+
+    # A new brand list invalidates every row; a compiled matcher needs its version.
+    matcher = compile_intent_matcher(["acme", "rival"])
+    with pytest.raises(ValueError):
+        store.refresh(rows, brand_terms=matcher)
+    version = brand_terms_version(["acme", "rival"])
+    assert store.refresh(rows, brand_terms=matcher, brand_version=version, now=3) == 10
+
+
+def test_reweight_writes_kw_intent_from_stored_features():
+    conn = _connect()
+    store = IntentFeatureStore(conn)
+    rows = _rows(30)
+    store.refresh(rows, now=1)
+
+    store.reweight(now=5)
+    stored = dict(conn.execute("SELECT kw_id, intent_bucket FROM kw_intent"))
+    assert stored == {kw_id: infer_intent(row).intent_bucket for kw_id, row in rows.items()}
+
+    # Making CPC dominate the hire score moves every priced keyword there.
+    weights = intent_weight_matrix(hire={**HIRE_WEIGHTS, "cpc": 10.0})
+    batch = store.reweight(weights, kw_ids=["kw_001", "kw_002"], now=6)
+    assert len(batch) == 2
+    for kw_id, intent in zip(["kw_001", "kw_002"], batch):
+        if (rows[kw_id].cpc or 0) > 5:
+            assert intent.intent_bucket == "commercial_hire"
+    assert conn.execute("SELECT COUNT(*) FROM kw_intent WHERE updated_at = 6").fetchone()[0] == 2
+
+
+def test_load_round_trips_and_reports_missing_ids():
+    conn = _connect()
+    store = IntentFeatureStore(conn)
+    rows = _rows(5)
+    store.refresh(rows)
+    loaded = store.load()
+    computed = extract_intent_features(list(rows), list(rows.values()))
+    assert loaded.kw_ids == computed.kw_ids
+    np.testing.assert_array_equal(loaded.matrix, computed.matrix)
+    assert loaded.archetypes == computed.archetypes
+    with pytest.raises(KeyError):
+        store.load(["kw_000", "nope"])
@@ -0,0 +1,74 @@
+"""Tests for canonical SERP keys against worker-generated golden values."""
+
+from pathlib import Path
+import json
+
+import pytest
+
+from serp_adapter.keys import (
+    SerpKeys,
+    clean_string,
+    keyword_norm,
+    region_key,
+    region_key_from_json,
+    serp_day,
+    serp_key,
+    serp_keys,
+    serp_keys_batch,
+    url_hash,
+)
+from serp_adapter.models import Location, NormalizedSerpResult
+
+GOLDEN = json.loads((Path(__file__).parent / "data" / "serp_keys_golden.json").read_text(encoding="utf-8"))
+CASES = GOLDEN["cases"]
+
+
+@pytest.mark.parametrize("case", CASES, ids=[str(i) for i in range(len(CASES))])
+def test_keys_match_worker(case):
+    inp = case["input"]
+    kw = keyword_norm(inp["phrase"])
+    region = region_key(Location(country=inp["country"], language=inp["language"]))
+    assert kw == case["keyword_norm"]
+    assert region == case["region_key"]
+    assert serp_day(inp["ts"]) == case["day"]
+    assert serp_key(kw, region, case["device_key"], case["day"]) == case["serp_key"]
+    if case["url_hash"]:
+        assert url_hash(inp["url"]) == case["url_hash"]
+
+    result = NormalizedSerpResult(
+        query=inp["phrase"],
+        location=Location(country=inp["country"]),
+        device=inp["device"],
+        engine="google",
+        ts=inp["ts"],
+        results=[],
+    )
+    assert serp_keys(result, language=inp["language"]) == SerpKeys(
+        case["keyword_norm"], case["region_key"], case["device_key"], case["serp_key"]
+    )
+
+
+def test_batch_matches_single_row_keys():
+    rows = [
+        (c["input"]["phrase"], c["input"]["country"], c["input"]["language"], c["input"]["device"], c["input"]["ts"])
+        for c in CASES
+    ] * 3
+    keys = serp_keys_batch(rows)
+    assert [k.serp_key for k in keys] == [c["serp_key"] for c in CASES] * 3
+    assert [k.region_key for k in keys] == [c["region_key"] for c in CASES] * 3
+
+
+def test_normalizers_intern_and_handle_utf16_limits():
+    a = keyword_norm("Plumber  San Jose")
+    b = keyword_norm(" plumber\tsan jose ")
+    assert a is b
+    # One astral character is two UTF-16 units; a cut through it is replaced.
+    assert clean_string("a\U0001F600", 2) == "a\ufffd"
+    assert clean_string("\u3000\ufeffx\u00a0", 10) == "x"
+
+
+def test_region_key_from_stored_json():
+    assert region_key_from_json('{"country":"gb","language":"EN","city":"London"}') == "GB-en"
+    assert region_key_from_json('{"country":"US"}') == "US-en"
+    assert region_key_from_json("not json") == "US-en"
+    assert region_key_from_json(None) == "US-en"
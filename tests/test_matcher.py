@@ -0,0 +1,51 @@
+"""Tests for the multi-pattern keyword matcher."""
+
+import random
+
+from serp_adapter.matcher import MultiPatternMatcher
+
+
+def test_reports_every_category_in_one_scan():
+    matcher = MultiPatternMatcher(
+        {"hire": ["near me", "quote"], "local": ["near me", "open now"], "brand": ["acme"]}
+    )
+    assert matcher.match("Plumber NEAR ME") == {"hire", "local"}
+    assert matcher.match("acme quote") == {"hire", "brand"}
+    assert matcher.match("nothing here") == set()
+    assert matcher.match_flags("open now") == (False, True, False)
+    assert len(matcher) == 5
+
+
+def test_overlapping_and_nested_patterns():
+    matcher = MultiPatternMatcher({"a": ["she"], "b": ["he"], "c": ["hers"], "d": ["his"]})
+    assert matcher.match("ushers") == {"a", "b", "c"}
+    assert matcher.match("ahishe") == {"a", "b", "d"}
+
+
+def test_agrees_with_substring_scan():
+    rng = random.Random(3)
+    alphabet = "abc d"
+    patterns = {
+        f"cat{i}": ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(5)]
+        for i in range(6)
+    }
+    matcher = MultiPatternMatcher(patterns)
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        expected = {c for c, terms in patterns.items() if any(t in text for t in terms)}
+        assert matcher.match(text) == expected
+
+
+def test_word_boundary_mode():
+    matcher = MultiPatternMatcher({"cmp": ["top", "vs"], "brand": ["acme co"]}, word_boundary=True)
+    assert matcher.match("stop the leak") == set()
+    assert matcher.match("top plumbers") == {"cmp"}
+    assert matcher.match("acme vs rival") == {"cmp"}
+    assert matcher.match("(acme co)") == {"brand"}
+    assert matcher.match("acme corp") == set()
+    assert MultiPatternMatcher({"x": ["top"]}).match("stop") == {"x"}
+
+
+def test_empty_pattern_always_matches():
+    matcher = MultiPatternMatcher({"any": [""], "none": []})
+    assert matcher.match("") == {"any"}
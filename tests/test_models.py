@@ -39,6 +39,7 @@ class TestSerpResultItem:
         assert item.url == "https://example.com/plumber"
         assert item.domain == "example.com"
         assert item.snippet == "Top-rated local plumbers."
+        assert item.root_domain == ""
 
 
 class TestSerpSource:
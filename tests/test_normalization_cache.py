@@ -0,0 +1,110 @@
+"""Tests for the content-addressed normalization cache."""
+
+import hashlib
+import json
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.normalization_cache import NormalizationCache, payload_sha256
+from tests.helpers import apify_items
+
+
+def _texts(n):
+    return [json.dumps(item) for item in apify_items(n)]
+
+
+class CountingAdapter(ApifyGoogleSearchAdapter):
+    def __init__(self):
+        self.calls = 0
+
+    def normalize(self, raw):
+        self.calls += 1
+        return super().normalize(raw)
+
+
+def test_reingest_is_served_from_cache(tmp_path):
+    items = _texts(12)
+    adapter = CountingAdapter()
+    with NormalizationCache(tmp_path / "cache.sqlite") as cache:
+        first = list(cache.iter_normalize(adapter, items))
+        assert (cache.hits, cache.misses, adapter.calls) == (0, 12, 12)
+
+    # Reopening keeps the entries; nothing is parsed again.
+    with NormalizationCache(tmp_path / "cache.sqlite") as cache:
+        again = list(cache.iter_normalize(adapter, items))
+        assert (cache.hits, cache.misses, adapter.calls) == (12, 0, 12)
+    assert again == first == [ApifyGoogleSearchAdapter().normalize(json.loads(item)) for item in items]
+
+
+def test_parser_version_is_part_of_the_key_and_raw_is_shared():
+    items = _texts(3)
+    cache = NormalizationCache(":memory:")
+    list(cache.iter_normalize(ApifyGoogleSearchAdapter(), items))
+
+    v2 = CountingAdapter()
+    v2.parser_version = "apify-google-v2"
+    list(cache.iter_normalize(v2, items))
+    assert v2.calls == 3
+    assert len(cache) == 6
+    assert cache.conn.execute("SELECT COUNT(*) FROM raw_payloads").fetchone()[0] == 3
+
+    sha = payload_sha256(items[0])
+    assert cache.raw_payload(sha) == items[0].encode("utf-8")
+
+
+def test_keys_match_the_workers_raw_text_digest():
+    # The worker stores sha256Hex(rawPayload) of the body exactly as received.
+    text = '{"searchQuery": {"term": "kw 0", "countryCode": "US"},\n "organicResults": []}'
+    worker_sha = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    assert payload_sha256(text) == payload_sha256(text.encode("utf-8")) == worker_sha
+
+    cache = NormalizationCache(":memory:")
+    adapter = ApifyGoogleSearchAdapter()
+    assert cache.normalize(adapter, text).query == "kw 0"
+    assert cache.get(worker_sha, adapter.parser_version) is not None
+    assert cache.raw_payload(worker_sha) == text.encode("utf-8")
+
+    # A decoded item has no canonical bytes; it needs the original digest.
+    item = json.loads(text)
+    with pytest.raises(TypeError):
+        payload_sha256(item)
+    with pytest.raises(TypeError):
+        cache.normalize(adapter, item)
+    assert cache.normalize(adapter, item, sha256=worker_sha).query == "kw 0"
+    assert cache.hits == 2
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    items = _texts(40)
+    adapter = ApifyGoogleSearchAdapter()
+    cache = NormalizationCache(":memory:", max_bytes=1 << 30)
+    for item in items:
+        cache.normalize(adapter, item)
+    per_entry = cache.nbytes // 40
+
+    cache.max_bytes = per_entry * 20
+    cache.normalize(adapter, items[0])  # most recently used
+    cache.evict()
+    assert cache.evictions > 0
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.get(payload_sha256(items[0]), adapter.parser_version) is not None
+    assert cache.get(payload_sha256(items[1]), adapter.parser_version) is None
+    orphans = cache.conn.execute(
+        "SELECT COUNT(*) FROM raw_payloads r WHERE NOT EXISTS "
+        "(SELECT 1 FROM normalized n WHERE n.sha256 = r.sha256)"
+    ).fetchone()[0]
+    assert orphans == 0
+
+
+def test_errors_are_reported_and_not_cached():
+    items = _texts(3)
+    items[1] = json.dumps(["not", "a", "dict"])
+    errors = []
+    cache = NormalizationCache(":memory:")
+    results = list(cache.iter_normalize(ApifyGoogleSearchAdapter(), items, on_error=errors.append))
+    assert len(results) == 2
+    assert [e.index for e in errors] == [1]
+    assert len(cache) == 2
+    with pytest.raises(ValueError):
+        NormalizationCache(":memory:", max_bytes=0)
@@ -0,0 +1,35 @@
+"""Tests for process-pool normalization."""
+
+import os
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.parallel import normalize_parallel
+from tests.helpers import apify_items
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_output_order_matches_input(workers):
+    items = apify_items(23)
+    results = list(normalize_parallel(iter(items), workers=workers, chunk_size=4))
+    adapter = ApifyGoogleSearchAdapter()
+    assert results == [adapter.normalize(item) for item in items]
+
+
+def test_per_item_errors_carry_index_and_worker():
+    items = apify_items(10)
+    items[3] = ["not", "a", "dict"]
+    items[7] = "nope"
+    errors = []
+    results = list(normalize_parallel(items, workers=2, chunk_size=3, on_error=errors.append))
+
+    assert len(results) == 8
+    assert [e.index for e in errors] == [3, 7]
+    assert all(e.error.startswith("TypeError") for e in errors)
+    assert all(e.worker is not None and e.worker != os.getpid() for e in errors)
+
+
+def test_rejects_bad_chunk_size():
+    with pytest.raises(ValueError):
+        list(normalize_parallel([], chunk_size=0))
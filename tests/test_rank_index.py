@@ -0,0 +1,141 @@
+"""Tests for the domain → ranking inverted index."""
+
+import pytest
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.rank_index import DomainRankIndex, Posting, RankIndexError
+from serp_adapter.store import SerpStore
+from tests.helpers import connect
+
+JAN1 = 1735689600  # 2025-01-01 00:00 UTC
+
+
+def _serp(phrase, ts, domains, country="US", device="desktop"):
+    return NormalizedSerpResult(
+        query=phrase,
+        location=Location(country=country),
+        device=device,
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(rank=rank, title="t", url=f"https://{domain}/{rank}", domain=domain, snippet=None)
+            for rank, domain in enumerate(domains, start=1)
+        ],
+        source=SerpSource(provider="apify"),
+    )
+
+
+def _legacy(conn, root):
+    """Best rank per series and day straight from the raw tables."""
+    rows = conn.execute(
+        """
+        SELECT r.domain, s.keyword_norm, s.region_key, s.device_key,
+               date(s.created_at / 1000, 'unixepoch') AS day, MIN(r.rank)
+        FROM serp_runs s JOIN serp_results r ON r.serp_id = s.serp_id
+        WHERE s.status = 'ok' AND r.root_domain = ?
+        GROUP BY r.domain, s.keyword_norm, s.region_key, s.device_key, day
+        ORDER BY r.domain, s.keyword_norm, s.region_key, s.device_key, day
+        """,
+        (root,),
+    )
+    return sorted(Posting(*row) for row in rows)
+
+
+def _seeded():
+    conn = connect()
+    store = SerpStore(conn)
+    store.write(
+        [
+            _serp("plumber", JAN1, ["callbighorn.com", "a.com", "blog.callbighorn.com"]),
+            _serp("plumber", JAN1 + 3600, ["a.com", "callbighorn.com"]),  # Same day, worse rank
+            _serp("plumber", JAN1 + 86400, ["a.com", "b.com", "blog.callbighorn.com"]),
+            _serp("plumber", JAN1 + 86400, ["x.com", "callbighorn.com"], country="CA"),
+            _serp("drain", JAN1, ["b.com", "a.com"], device="mobile"),
+        ],
+        "u1",
+    )
+    return conn, store
+
+
+def test_index_matches_raw_tables_and_rolls_up_subdomains():
+    conn, _store = _seeded()
+    index = DomainRankIndex.build(conn)
+
+    assert sorted(index.postings("callbighorn.com")) == _legacy(conn, "callbighorn.com")
+    assert sorted(index.postings("a.com")) == _legacy(conn, "a.com")
+    assert index.hosts("callbighorn.com") == ["callbighorn.com", "blog.callbighorn.com"]
+    assert index.hosts("blog.callbighorn.com") == ["blog.callbighorn.com"]
+    assert index.hosts("callbighorn.com", subdomains=False) == ["callbighorn.com"]
+    assert index.postings("nowhere.com") == []
+
+    visibility = [
+        (v.keyword_norm, v.region_key, v.best_rank, v.best_day, v.latest_rank, v.latest_day, v.days, v.host)
+        for v in index.visibility("www.callbighorn.com")
+    ]
+    assert visibility == [
+        ("plumber", "US-en", 1, "2025-01-01", 3, "2025-01-02", 2, "blog.callbighorn.com"),
+        ("plumber", "CA-en", 2, "2025-01-02", 2, "2025-01-02", 1, "callbighorn.com"),
+    ]
+    since = index.visibility("callbighorn.com", since_day="2025-01-02")
+    assert [(v.region_key, v.best_rank, v.days) for v in since] == [("CA-en", 2, 1), ("US-en", 3, 1)]
+
+
+def test_hosts_use_the_stored_root_domain():
+    conn = connect()
+    SerpStore(conn).write([_serp("blog", JAN1, ["foo.github.io", "a.foo.github.io", "bar.github.io"])], "u1")
+    conn.execute("UPDATE serp_results SET root_domain = 'github.io' WHERE domain LIKE '%github.io'")
+    index = DomainRankIndex.build(conn)
+
+    # The PSL makes foo.github.io its own registrable domain; the rows say github.io.
+    assert index.hosts("foo.github.io") == ["foo.github.io", "a.foo.github.io"]
+    assert [p.rank for p in index.postings("foo.github.io", subdomains=False)] == [1]
+    assert index.hosts("github.io") == ["foo.github.io", "a.foo.github.io", "bar.github.io"]
+
+
+def test_write_hook_updates_incrementally_and_compacts():
+    conn, _store = _seeded()
+    index = DomainRankIndex.build(conn, compact_every=3)
+    store = SerpStore(conn, write_hooks=[index])
+    store.write([_serp("plumber", JAN1 + 2 * 86400, ["callbighorn.com", "new.com"])], "u1")
+    store.write([_serp("roofing", JAN1 + 2 * 86400, ["shop.new.com"])], "u1")
+
+    assert index.hosts("new.com") == ["new.com", "shop.new.com"]
+    for root in ("callbighorn.com", "a.com", "new.com"):
+        assert sorted(index.postings(root)) == _legacy(conn, root)
+    index.compact()
+    assert sorted(index.postings("callbighorn.com")) == _legacy(conn, "callbighorn.com")
+    assert len(index) == len(index.postings("callbighorn.com")) + len(index.postings("a.com")) + len(
+        index.postings("b.com")
+    ) + len(index.postings("x.com")) + len(index.postings("new.com"))
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, use_mmap):
+    conn, _store = _seeded()
+    index = DomainRankIndex.build(conn)
+    index.add("shop.callbighorn.com", "plumber", "US-en", "desktop", "2025-01-05", 4)
+    path = tmp_path / "rank.idx"
+    index.save(path)
+
+    loaded = DomainRankIndex.load(path, use_mmap=use_mmap)
+    assert loaded.postings("callbighorn.com") == index.postings("callbighorn.com")
+    assert loaded.visibility("callbighorn.com") == index.visibility("callbighorn.com")
+
+    # Updates on top of a mapped file land in the pending buffer, then compact.
+    loaded.add("callbighorn.com", "drain", "US-en", "mobile", "2025-01-06", 7)
+    assert Posting("callbighorn.com", "drain", "US-en", "mobile", "2025-01-06", 7) in loaded.postings(
+        "callbighorn.com", subdomains=False
+    )
+    loaded.compact()
+    assert len(loaded.postings("callbighorn.com")) == len(index.postings("callbighorn.com")) + 1
+
+
+def test_load_rejects_bad_files(tmp_path):
+    empty = tmp_path / "empty.idx"
+    empty.write_bytes(b"")
+    with pytest.raises(RankIndexError):
+        DomainRankIndex.load(empty)
+    bogus = tmp_path / "bogus.idx"
+    bogus.write_bytes(b"x" * 64)
+    with pytest.raises(RankIndexError):
+        DomainRankIndex.load(bogus)
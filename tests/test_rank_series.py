@@ -0,0 +1,146 @@
+"""Tests for the compressed rank time-series store."""
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.rank_series import (
+    RankPoint,
+    RankSeries,
+    WeeklyRank,
+    decode_points,
+    encode_points,
+    rank_history,
+    weekly_ranks,
+)
+from serp_adapter.store import SerpStore
+from tests.helpers import MIGRATIONS, connect
+
+JAN6 = 1736121600  # Monday 2025-01-06 00:00 UTC
+DAY = 86400
+
+
+def _db():
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0033_serp_rank_series.sql").read_text())
+    return conn
+
+
+def _serp(phrase, ts, domains):
+    return NormalizedSerpResult(
+        query=phrase,
+        location=Location(country="US"),
+        device="desktop",
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(rank=rank, title="t", url=f"https://{domain}/{rank}", domain=domain, snippet=None)
+            for rank, domain in enumerate(domains, start=1)
+        ],
+        source=SerpSource(provider="apify"),
+    )
+
+
+def _table(conn):
+    return conn.execute("SELECT * FROM serp_rank_series ORDER BY keyword_norm, root_domain").fetchall()
+
+
+def test_points_round_trip_through_varints():
+    points = [(20000, 1), (20001, 3), (20001 + 200, 150), (20300, 0), (20300 + 70000, 2)]
+    encoded = encode_points(points)
+    assert decode_points(encoded, 20000) == points
+    assert len(encode_points([(20000, 4), (20001, 5), (20002, 9)])) == 6  # Two bytes per daily point
+    assert encode_points([]) == b""
+
+
+def test_hook_appends_daily_ranks_with_drop_outs_and_matches_rebuild():
+    conn = _db()
+    store = SerpStore(conn, write_hooks=[RankSeries()])
+    store.write([_serp("Plumber", JAN6, ["a.com", "www.b.com", "b.com"])], "u1")
+    store.write([_serp("plumber", JAN6 + 3600, ["b.com", "a.com"])], "u1")  # Same day, newer: wins
+    store.write([_serp("plumber", JAN6 + 1800, ["c.com"])], "u1")  # Same day, older: ignored
+    store.write([_serp("plumber", JAN6 + DAY, ["c.com", "a.com"])], "u1")
+    store.write([_serp("plumber", JAN6 + 2 * DAY, ["c.com"])], "u1")  # a.com drops out
+    store.write([_serp("plumber", JAN6 + 3 * DAY, ["c.com"])], "u1")  # No second marker
+    store.write([_serp("plumber", JAN6 + 5 * DAY, ["a.com", "b.com"])], "u1")
+    store.write([_serp("drain", JAN6, ["a.com"])], "u1")
+
+    assert rank_history(conn, "plumber", "a.com") == [
+        RankPoint("2025-01-06", 2),
+        RankPoint("2025-01-07", 2),
+        RankPoint("2025-01-08", None),
+        RankPoint("2025-01-11", 1),
+    ]
+    assert rank_history(conn, "plumber", "b.com") == [
+        RankPoint("2025-01-06", 1),
+        RankPoint("2025-01-07", None),
+        RankPoint("2025-01-11", 2),
+    ]
+    assert rank_history(conn, "plumber", "c.com") == [
+        RankPoint("2025-01-07", 1),
+        RankPoint("2025-01-08", 1),
+        RankPoint("2025-01-09", 1),
+        RankPoint("2025-01-11", None),
+    ]
+    assert rank_history(conn, "plumber", "a.com", since_day="2025-01-07", until_day="2025-01-08") == [
+        RankPoint("2025-01-07", 2),
+        RankPoint("2025-01-08", None),
+    ]
+    assert rank_history(conn, "plumber", "a.com", device="mobile") == []
+    assert rank_history(conn, "plumber", "a.com", since_day="2025-02-01") == []
+
+    incremental = _table(conn)
+    assert RankSeries().rebuild(conn) == len(incremental)
+    assert _table(conn) == incremental
+
+
+def test_backfilled_day_is_merged_in_order():
+    conn = _db()
+    store = SerpStore(conn, write_hooks=[RankSeries()])
+    store.write([_serp("kw", JAN6 + 2 * DAY, ["a.com"])], "u1")
+    store.write([_serp("kw", JAN6 + 4 * DAY, ["b.com", "a.com"])], "u1")
+    store.write([_serp("kw", JAN6, ["b.com", "a.com"])], "u1")  # Older day arrives late
+
+    assert rank_history(conn, "kw", "a.com") == [
+        RankPoint("2025-01-06", 2),
+        RankPoint("2025-01-08", 1),
+        RankPoint("2025-01-10", 2),
+    ]
+    # A point appended after the re-encode still lands after the right tail.
+    store.write([_serp("kw", JAN6 + 4 * DAY + 60, ["a.com"])], "u1")
+    assert rank_history(conn, "kw", "a.com")[-1] == RankPoint("2025-01-10", 1)
+    assert RankSeries().rebuild(conn) == 2
+    assert rank_history(conn, "kw", "a.com") == [
+        RankPoint("2025-01-06", 2),
+        RankPoint("2025-01-08", 1),
+        RankPoint("2025-01-10", 1),
+    ]
+
+
+def test_late_run_that_lost_its_day_is_skipped():
+    conn = _db()
+    store = SerpStore(conn, write_hooks=[RankSeries()])
+    store.write([_serp("kw", JAN6 + 3600, ["a.com", "b.com"])], "u1")
+    store.write([_serp("kw", JAN6 + 2 * DAY, ["a.com"])], "u1")
+    # An earlier fetch of Jan 6 arrives after that day's winner and after a newer day.
+    store.write([_serp("kw", JAN6 + 60, ["b.com", "c.com", "a.com"])], "u1")
+
+    assert rank_history(conn, "kw", "a.com") == [RankPoint("2025-01-06", 1), RankPoint("2025-01-08", 1)]
+    assert [row[3] for row in _table(conn)] == ["a.com", "b.com"]  # c.com never won a day
+    hooked = _table(conn)
+    RankSeries().rebuild(conn)
+    assert _table(conn) == hooked
+
+
+def test_weekly_ranks_take_min_and_median():
+    points = [
+        RankPoint("2025-01-06", 4),
+        RankPoint("2025-01-07", 2),
+        RankPoint("2025-01-08", 9),
+        RankPoint("2025-01-12", None),
+        RankPoint("2025-01-13", None),
+        RankPoint("2025-01-20", 3),
+        RankPoint("2025-01-21", 6),
+    ]
+    assert weekly_ranks(points) == [
+        WeeklyRank("2025-01-06", 2, 4, 3),
+        WeeklyRank("2025-01-13", None, None, 0),
+        WeeklyRank("2025-01-20", 3, 4.5, 2),
+    ]
@@ -0,0 +1,171 @@
+"""Tests for volatility-adaptive refresh intervals."""
+
+import json
+
+import pytest
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.refresh import (
+    AdaptiveRefresh,
+    RefreshPolicy,
+    due_step2_keywords,
+    load_serp_history,
+    plan_refresh,
+    rank_biased_overlap,
+    replay_refresh,
+)
+from serp_adapter.scheduler import WatchScheduler
+from serp_adapter.store import SerpStore
+from tests.helpers import MIGRATIONS, connect
+
+DAY = 86_400
+DAY0 = 20_000  # 2024-10-04
+TOP = [f"https://site{i}.com/" for i in range(20)]
+
+
+def _shaken(urls, day):
+    """New pages in the top 3 – a material change."""
+    return [f"https://new{day}-{i}.com/" for i in range(3)] + list(urls[:-3])
+
+
+def test_rank_biased_overlap():
+    assert rank_biased_overlap(TOP, TOP) == pytest.approx(1.0)
+    assert rank_biased_overlap(TOP, [u + "x" for u in TOP]) == 0.0
+    assert rank_biased_overlap([], []) == 1.0
+    assert rank_biased_overlap(TOP, []) == 0.0
+    # Disagreement at the top costs more than at the bottom.
+    top_swap = [TOP[1], TOP[0]] + TOP[2:]
+    bottom_swap = TOP[:18] + [TOP[19], TOP[18]]
+    assert rank_biased_overlap(TOP, top_swap) < rank_biased_overlap(TOP, bottom_swap) < 1.0
+    # Uneven lengths: a prefix of an identical ranking extrapolates to 1.
+    assert rank_biased_overlap(TOP[:10], TOP) == pytest.approx(1.0)
+    assert rank_biased_overlap(TOP, TOP[:10]) == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        rank_biased_overlap(TOP, TOP, p=1.0)
+
+
+def test_stable_series_stretch_and_changes_shrink():
+    policy = RefreshPolicy(min_days=1, max_days=14)
+    stable = [(DAY0 + d, TOP) for d in range(10)]
+    decision = policy.decide(stable)
+    assert decision.stability == pytest.approx(1.0)
+    assert decision.interval_days == 2  # At most double the last gap (1 day)
+    assert decision.next_due_day == DAY0 + 11
+
+    spaced = [(DAY0, TOP), (DAY0 + 4, TOP), (DAY0 + 12, TOP)]
+    assert policy.decide(spaced).interval_days == 14
+
+    changed = spaced + [(DAY0 + 26, _shaken(TOP, 26))]
+    decision = policy.decide(changed)
+    assert decision.changed and decision.interval_days == 1
+
+    assert policy.decide([(DAY0, TOP)]).interval_days == 1
+    with pytest.raises(ValueError):
+        RefreshPolicy(min_days=5, max_days=2)
+
+
+def test_gap_is_normalized_to_per_day_similarity():
+    policy = RefreshPolicy()
+    slightly_moved = TOP[:15] + [TOP[16], TOP[15]] + TOP[17:]
+    daily = policy.decide([(DAY0, TOP), (DAY0 + 1, slightly_moved)])
+    weekly = policy.decide([(DAY0, TOP), (DAY0 + 7, slightly_moved)])
+    assert weekly.stability > daily.stability
+
+
+def _store_day(store, phrase, day, urls, offset=3600):
+    [serp_id] = store.write(
+        [
+            NormalizedSerpResult(
+                query=phrase,
+                location=Location(country="US"),
+                device="desktop",
+                engine="google",
+                ts=day * DAY + offset,
+                results=[
+                    SerpResultItem(rank=r + 1, title="t", url=url, snippet=None, domain=url.split("/")[2], root_domain=url.split("/")[2])
+                    for r, url in enumerate(urls)
+                ],
+                source=SerpSource(provider="apify"),
+            )
+        ],
+        "user_1",
+    )
+    return serp_id
+
+
+def test_history_from_serp_runs_and_watch_intervals():
+    conn = connect()
+    store = SerpStore(conn)
+    for d in range(8):
+        _store_day(store, "plumber san jose", DAY0 + d, TOP)
+        _store_day(store, "drain cleaning", DAY0 + d, TOP if d % 2 else _shaken(TOP, d))
+    # A failed run and a second run the same day: only the latest ok run counts.
+    _store_day(store, "plumber san jose", DAY0 + 7, _shaken(TOP, 7), offset=3000)
+    failed = _store_day(store, "plumber san jose", DAY0 + 7, TOP[::-1], offset=7200)
+    conn.execute("UPDATE serp_runs SET status = 'error' WHERE serp_id = ?", (failed,))
+    conn.commit()
+
+    history = load_serp_history(conn, since_ts=DAY0 * DAY)
+    stable = history[("plumber san jose", "US-en", "desktop")]
+    assert [day for day, _ in stable] == list(range(DAY0, DAY0 + 8))
+    assert all(len(urls) == 20 for _, urls in stable)
+
+    decisions = plan_refresh(history)
+    assert decisions[("plumber san jose", "US-en", "desktop")].interval_days == 2
+    assert decisions[("drain cleaning", "US-en", "desktop")].interval_days == 1
+
+    conn.executescript((MIGRATIONS / "0007_serp_watchlist.sql").read_text())
+    region = json.dumps({"country": "US"})
+    for watch_id, phrase in (("w_stable", "plumber san jose"), ("w_volatile", "drain cleaning"), ("w_new", "new kw")):
+        conn.execute(
+            "INSERT INTO serp_watchlist (watch_id, user_id, phrase, region_json, device, created_at, updated_at, last_run_at) "
+            "VALUES (?, 'user_1', ?, ?, 'desktop', 0, 0, ?)",
+            (watch_id, phrase, region, (DAY0 + 7) * DAY * 1000),
+        )
+    refresher = AdaptiveRefresh(conn, now=(DAY0 + 8) * DAY)
+
+    async def fetch(user_id, request):
+        return "serp"
+
+    scheduler = WatchScheduler(conn, fetch, interval_for=refresher.interval_seconds)
+    scheduler.load()
+    assert scheduler.pop_due((DAY0 + 8) * DAY) == [2, 3]  # Volatile and unknown: daily
+    assert scheduler.next_due() == (DAY0 + 9) * DAY
+
+
+def test_due_step2_keywords():
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0011_step2_daily_harvest.sql").read_text())
+    for d in range(6):
+        date = f"202410{4 + d:02d}"
+        for keyword, urls in (("Plumber San Jose", TOP), ("drain cleaning", _shaken(TOP, d) if d % 2 else TOP)):
+            serp_id = f"{keyword}-{date}"
+            conn.execute(
+                "INSERT INTO step2_serp_snapshots (serp_id, site_id, keyword, cluster, intent, geo, date_yyyymmdd, scraped_at) "
+                "VALUES (?, 'site_1', ?, 'c', 'i', 'us', ?, 0)",
+                (serp_id, keyword, date),
+            )
+            conn.executemany(
+                "INSERT INTO step2_serp_results (result_id, serp_id, rank, url, url_hash, domain, page_type, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 'd', 'p', 0)",
+                [(f"{serp_id}-{r}", serp_id, r + 1, url, url, ) for r, url in enumerate(urls)],
+            )
+    today = DAY0 + 6  # 2024-10-10, the day after the last harvest
+    keywords = ["plumber san jose", "drain cleaning", "water heater"]
+    assert due_step2_keywords(conn, "site_1", keywords, "us", today=today) == ["drain cleaning", "water heater"]
+    assert due_step2_keywords(conn, "site_1", keywords, "us", today=today + 1) == keywords
+
+
+def test_replay_counts_savings_and_lag():
+    shaken = _shaken(TOP, 0)
+    history = {
+        ("stable",): [(d, TOP) for d in range(30)],
+        ("changes_on_day_20",): [(d, TOP if d < 20 else shaken) for d in range(30)],
+    }
+    result = replay_refresh(history, RefreshPolicy(min_days=1, max_days=8))
+    assert result.baseline_fetches == 60
+    assert result.fetches < 30
+    assert result.changes == 1 and result.detected == 1
+    assert 0 <= result.lag_days[0] <= 8
+    summary = result.to_dict()
+    assert summary["fetches_saved"] == pytest.approx(1 - result.fetches / 60, abs=1e-4)
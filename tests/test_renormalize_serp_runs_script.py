@@ -0,0 +1,146 @@
+"""Tests for the parser_version re-normalization backfill script."""
+
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from scripts.renormalize_serp_runs import JOB_ID_PREFIX, renormalize_serp_runs
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.models import SerpResultItem
+from serp_adapter.normalization_cache import NormalizationCache, payload_sha256
+from serp_adapter.store import SerpStore
+from tests.helpers import apify_items
+
+MIGRATIONS = Path(__file__).resolve().parents[1] / "migrations"
+SCHEMA = (
+    "0002_serp.sql",
+    "0003_keyword_intent.sql",
+    "0003_worker_endpoints.sql",
+    "0009_serp_canonicalization.sql",
+    "0015_unified_d1_step2_step3.sql",
+    "0022_keywords_serp_inspiration_hardening.sql",
+    "0031_kw_intent_backfill.sql",
+)
+
+
+class OldAdapter(ApifyGoogleSearchAdapter):
+    """Stand-in for a previous parser that emitted an extra bogus result."""
+
+    parser_version = "apify-google-v0"
+
+    def normalize(self, raw):
+        result = super().normalize(raw)
+        result.results.append(SerpResultItem(rank=99, title="ad", url="https://ads.example/x", domain="ads.example", snippet=""))
+        return result
+
+
+def _setup(n):
+    conn = sqlite3.connect(":memory:")
+    for name in SCHEMA:
+        conn.executescript((MIGRATIONS / name).read_text())
+    cache = NormalizationCache(":memory:")
+    items = [json.dumps(item) for item in apify_items(n)]
+    old = OldAdapter()
+    results = [cache.normalize(old, item) for item in items]
+    shas = [payload_sha256(item) for item in items]
+    ids = SerpStore(conn).write(
+        results,
+        "user_1",
+        serp_ids=[f"serp_{i:03d}" for i in range(n)],
+        parser_version=old.parser_version,
+        raw_payload_sha256=shas,
+    )
+    return conn, cache, ids
+
+
+def _versions(conn):
+    return dict(conn.execute("SELECT serp_id, parser_version FROM serp_runs"))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_rewrites_stale_runs_atomically(workers):
+    conn, cache, ids = _setup(9)
+    conn.execute("UPDATE serp_runs SET raw_payload_sha256 = 'gone' WHERE serp_id = ?", (ids[4],))
+
+    result = renormalize_serp_runs(conn, cache, workers=workers, chunk_size=2)
+    assert (result.scanned, result.rewritten, result.missing_raw, result.failed) == (9, 8, 1, 0)
+    assert result.runs_per_second > 0
+
+    versions = _versions(conn)
+    assert versions.pop(ids[4]) == "apify-google-v0"
+    assert set(versions.values()) == {"apify-google-v1"}
+    # The bogus rank-99 rows and their URL map entries are gone for rewritten runs.
+    assert conn.execute("SELECT serp_id FROM serp_results WHERE rank = 99").fetchall() == [(ids[4],)]
+    assert conn.execute("SELECT serp_id FROM serp_result_url_map WHERE rank = 99").fetchall() == [(ids[4],)]
+    assert conn.execute("SELECT COUNT(*) FROM backfill_checkpoints").fetchone()[0] == 0
+
+    # Nothing left to do for the current parser.
+    again = renormalize_serp_runs(conn, cache, workers=workers)
+    assert (again.scanned, again.rewritten) == (1, 0)
+
+
+def test_payloads_cached_from_decoded_json_are_reported_missing():
+    conn, _cache, ids = _setup(4)
+    # An old cache keyed on re-encoded dicts never matches the worker's raw-text digest.
+    legacy = NormalizationCache(":memory:")
+    old = OldAdapter()
+    for item in apify_items(4):
+        key = hashlib.sha256(json.dumps(item, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+        legacy.put(key, old.parser_version, old.normalize(item), item)
+    conn.execute("UPDATE serp_runs SET raw_payload_sha256 = NULL WHERE serp_id = ?", (ids[0],))
+
+    result = renormalize_serp_runs(conn, legacy)
+    assert (result.scanned, result.rewritten, result.missing_raw, result.no_raw_hash) == (3, 0, 3, 1)
+    assert result.to_dict()["no_raw_hash"] == 1
+    assert set(_versions(conn).values()) == {"apify-google-v0"}
+
+
+def test_dataset_payloads_use_the_item_for_the_run():
+    conn, cache, ids = _setup(3)
+    items = apify_items(4)
+    old = OldAdapter()
+    # Whole dataset responses: the run's own item is not first, or is absent.
+    for i, payload in enumerate(([items[3], items[0]], [items[1], {"searchQuery": "bad"}], [items[3]])):
+        text = json.dumps(payload)
+        cache.put(payload_sha256(text), old.parser_version, old.normalize(items[i]), text)
+        conn.execute("UPDATE serp_runs SET raw_payload_sha256 = ? WHERE serp_id = ?", (payload_sha256(text), ids[i]))
+    written = []
+
+    result = renormalize_serp_runs(conn, cache, write_hooks=[lambda _conn, serp_ids: written.extend(serp_ids)])
+    assert (result.rewritten, result.failed) == (2, 1)
+    assert written == ids[:2]
+    phrases = dict(conn.execute("SELECT serp_id, keyword_norm FROM serp_runs"))
+    assert [phrases[serp_id] for serp_id in ids] == ["kw 0", "kw 1", "kw 2"]
+    assert _versions(conn)[ids[2]] == "apify-google-v0"
+
+
+def test_limit_leaves_a_checkpoint_to_resume_from():
+    conn, cache, ids = _setup(6)
+    first = renormalize_serp_runs(conn, cache, chunk_size=2, limit=3)
+    assert first.scanned == 4
+    job_id = JOB_ID_PREFIX + "apify-google-v1"
+    assert conn.execute(
+        "SELECT cursor, rows_written FROM backfill_checkpoints WHERE job_id = ?", (job_id,)
+    ).fetchone() == (ids[3], 4)
+
+    second = renormalize_serp_runs(conn, cache, chunk_size=2)
+    assert second.resumed_from == ids[3]
+    assert second.scanned == 2
+    assert set(_versions(conn).values()) == {"apify-google-v1"}
+
+
+def test_dry_run_and_unparseable_payloads_change_nothing():
+    conn, cache, ids = _setup(3)
+    cache.put_many([("bad", "x", cache.get(payload_sha256(json.dumps(apify_items(1)[0])), "apify-google-v0"), "not json")])
+    conn.execute("UPDATE serp_runs SET raw_payload_sha256 = 'bad' WHERE serp_id = ?", (ids[0],))
+
+    dry = renormalize_serp_runs(conn, cache, dry_run=True)
+    assert (dry.rewritten, dry.failed) == (2, 1)
+    assert set(_versions(conn).values()) == {"apify-google-v0"}
+
+    wet = renormalize_serp_runs(conn, cache)
+    assert wet.failed == 1
+    assert _versions(conn)[ids[0]] == "apify-google-v0"
@@ -0,0 +1,122 @@
+"""Tests for the incrementally maintained daily SERP rollups."""
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.rollups import SerpRollups, daily_latest_serp_rows, domain_average_rank
+from serp_adapter.store import SerpStore
+from tests.helpers import MIGRATIONS, connect
+
+JAN1 = 1735689600  # 2025-01-01 00:00 UTC
+
+LEGACY_GRAPH = """
+WITH runs AS (
+  SELECT serp_id, date(created_at / 1000, 'unixepoch') AS day, created_at,
+         ROW_NUMBER() OVER (PARTITION BY date(created_at / 1000, 'unixepoch') ORDER BY created_at DESC) AS rn
+  FROM serp_runs
+  WHERE phrase = ? AND status = 'ok' AND created_at >= ? AND (? = '' OR device = ?)
+)
+SELECT runs.day, r.rank, r.url, r.domain, r.title, r.snippet
+FROM runs JOIN serp_results r ON r.serp_id = runs.serp_id
+WHERE runs.rn = 1
+ORDER BY runs.day ASC, r.rank ASC
+"""
+
+
+def _db():
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0032_serp_daily_rollups.sql").read_text())
+    return conn
+
+
+def _serp(phrase, ts, domains, device="desktop"):
+    return NormalizedSerpResult(
+        query=phrase,
+        location=Location(country="US"),
+        device=device,
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(rank=rank, title=f"T{rank}", url=f"https://{domain}/{rank}", domain=domain, snippet=None)
+            for rank, domain in enumerate(domains, start=1)
+        ],
+        source=SerpSource(provider="apify"),
+    )
+
+
+def _legacy(conn, phrase, since_ms, device=""):
+    return [
+        dict(zip(("day", "rank", "url", "domain", "title", "snippet"), row))
+        for row in conn.execute(LEGACY_GRAPH, (phrase, since_ms, device, device))
+    ]
+
+
+def test_rollups_follow_the_latest_run_of_each_day():
+    conn = _db()
+    store = SerpStore(conn, write_hooks=[SerpRollups()])
+    store.write([_serp("kw", JAN1, ["a.com", "c.com"])], "u1")
+    store.write([_serp("kw", JAN1 + 3600, ["b.com", "www.a.com", "a.com"])], "u1")
+    store.write([_serp("kw", JAN1 + 1800, ["z.com"])], "u1")  # Late, older run: loses
+    store.write([_serp("kw", JAN1 + 86400, ["c.com", "a.com"])], "u1")
+
+    assert daily_latest_serp_rows(conn, "kw", JAN1 * 1000) == _legacy(conn, "kw", JAN1 * 1000)
+    assert [(row["day"], row["domain"]) for row in daily_latest_serp_rows(conn, "KW ", JAN1 * 1000)] == [
+        ("2025-01-01", "b.com"),
+        ("2025-01-01", "www.a.com"),
+        ("2025-01-01", "a.com"),
+        ("2025-01-02", "c.com"),
+        ("2025-01-02", "a.com"),
+    ]
+    best = dict(
+        conn.execute("SELECT root_domain, best_rank FROM serp_daily_domain_best WHERE day = '2025-01-01'")
+    )
+    assert best == {"b.com": 1, "a.com": 2}  # www.a.com rolls up into a.com
+
+    # since_ms inside the first day: only runs at or after it count.
+    since = (JAN1 + 7200) * 1000
+    assert daily_latest_serp_rows(conn, "kw", since) == _legacy(conn, "kw", since)
+
+
+def test_device_filter_and_domain_averages():
+    conn = _db()
+    store = SerpStore(conn, write_hooks=[SerpRollups()])
+    store.write(
+        [
+            _serp("kw1", JAN1, ["x.com", "y.com", "www.callbighorn.com", "z.com", "w.com", "hoffmanplumbing.com"]),
+            _serp("kw2", JAN1 + 86400, ["x.com"] * 5 + ["callbighorn.com", "y.com", "z.com", "hoffmanplumbing.com"]),
+            _serp("kw1", JAN1 + 60, ["hoffmanplumbing.com"], device="mobile"),
+        ],
+        "u1",
+    )
+    desktop = daily_latest_serp_rows(conn, "kw1", JAN1 * 1000, device="desktop")
+    assert desktop == _legacy(conn, "kw1", JAN1 * 1000, "desktop")
+    assert {row["domain"] for row in daily_latest_serp_rows(conn, "kw1", JAN1 * 1000, device="mobile")} == {
+        "hoffmanplumbing.com"
+    }
+
+    averages = {a.root_domain: a for a in domain_average_rank(conn, ["kw1", "kw2"], device="desktop")}
+    assert averages["callbighorn.com"].average_rank == 4.5
+    assert averages["hoffmanplumbing.com"].average_rank == 7.5
+    assert averages["callbighorn.com"].keywords == 2
+    assert domain_average_rank(conn, ["kw2"], until_day="2025-01-01") == []
+    assert domain_average_rank(conn, []) == []
+
+
+def test_rewrite_and_rebuild_match_incremental_state():
+    conn = _db()
+    rollups = SerpRollups()
+    store = SerpStore(conn, write_hooks=[rollups])
+    [serp_id] = store.write([_serp("kw", JAN1, ["a.com", "b.com"])], "u1")
+    # A re-parse of the winning run replaces its domain rows.
+    store.write([_serp("kw", JAN1, ["c.com"])], "u1", serp_ids=[serp_id], replace=True)
+    assert dict(conn.execute("SELECT root_domain, best_rank FROM serp_daily_domain_best")) == {"c.com": 1}
+
+    store.write([_serp("kw", JAN1 + 86400 * d, ["a.com", "b.com"][d % 2 :]) for d in range(1, 5)], "u1")
+    snapshot = sorted(conn.execute("SELECT * FROM serp_daily_domain_best"))
+    latest = sorted(conn.execute("SELECT * FROM serp_daily_latest"))
+    assert rollups.rebuild(conn) == 5
+    assert sorted(conn.execute("SELECT * FROM serp_daily_domain_best")) == snapshot
+    assert sorted(conn.execute("SELECT * FROM serp_daily_latest")) == latest
+
+    # Runs written without the hook are picked up by a rebuild.
+    SerpStore(conn).write([_serp("kw", JAN1 + 86400 * 9, ["d.com"])], "u1")
+    rollups.rebuild(conn)
+    assert daily_latest_serp_rows(conn, "kw", JAN1 * 1000) == _legacy(conn, "kw", JAN1 * 1000)
@@ -0,0 +1,118 @@
+"""Tests for hedged primary/secondary SERP routing."""
+
+import asyncio
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.models import Location, SerpRequest
+from serp_adapter.router import AdapterProvider, HedgedSerpRouter, SerpRoutingError
+from serp_adapter.store import SerpStore
+from tests.helpers import APIFY_RAW_ITEM, connect
+
+REQUEST = SerpRequest("plumber san jose", Location(country="US"), device="mobile")
+
+
+class StandInProvider(AdapterProvider):
+    """Serves the recorded Apify item after a scripted latency or error."""
+
+    def __init__(self, name, latencies, errors=(), empty=False):
+        super().__init__(name, self._fetch_raw, ApifyGoogleSearchAdapter())
+        self.latencies = list(latencies)
+        self.errors = list(errors)
+        self.empty = empty
+        self.calls = 0
+        self.cancelled = 0
+
+    async def _fetch_raw(self, request):
+        self.calls += 1
+        latency = self.latencies.pop(0) if self.latencies else 0.0
+        error = self.errors.pop(0) if self.errors else None
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if error is not None:
+            raise error
+        if self.empty:
+            return {**APIFY_RAW_ITEM, "organicResults": []}
+        return {**APIFY_RAW_ITEM, "#runId": self.name}
+
+
+def _route(router, n=1):
+    async def run():
+        return [await router.fetch(REQUEST) for _ in range(n)]
+
+    return asyncio.run(run())
+
+
+def test_fast_primary_is_used_without_hedging():
+    primary = StandInProvider("apify", [0.0])
+    secondary = StandInProvider("dataforseo", [0.0])
+    [routed] = _route(HedgedSerpRouter(primary, secondary, initial_delay=0.2))
+    assert (routed.provider, routed.fallback_reason, routed.hedged) == ("apify", None, False)
+    assert routed.result.source.run_id == "apify"
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary = StandInProvider("apify", [1.0])
+    secondary = StandInProvider("dataforseo", [0.01])
+    router = HedgedSerpRouter(primary, secondary, initial_delay=0.05)
+    [routed] = _route(router)
+    assert routed.provider == "dataforseo"
+    assert routed.hedged
+    assert routed.fallback_reason.startswith("apify_slow:hedged_after_")
+    assert routed.latency < 0.5
+    assert primary.cancelled == 1
+    assert router.stats.hedged == 1 and router.stats.wins == {"dataforseo": 1}
+
+
+def test_primary_that_recovers_after_hedge_still_wins():
+    primary = StandInProvider("apify", [0.08])
+    secondary = StandInProvider("dataforseo", [1.0])
+    [routed] = _route(HedgedSerpRouter(primary, secondary, initial_delay=0.02))
+    assert (routed.provider, routed.fallback_reason, routed.hedged) == ("apify", None, True)
+    assert secondary.cancelled == 1
+
+
+def test_primary_error_falls_back_immediately():
+    primary = StandInProvider("apify", [0.0], [RuntimeError("actor timed out")])
+    secondary = StandInProvider("dataforseo", [0.0])
+    [routed] = _route(HedgedSerpRouter(primary, secondary, initial_delay=5.0))
+    assert routed.provider == "dataforseo"
+    assert routed.fallback_reason == "apify_failed:actor timed out"
+    assert routed.latency < 1.0
+
+
+def test_empty_serp_is_rejected_and_both_failing_raises():
+    primary = StandInProvider("apify", [0.0], empty=True)
+    secondary = StandInProvider("dataforseo", [0.0], [ConnectionError("refused")])
+    router = HedgedSerpRouter(primary, secondary)
+    with pytest.raises(SerpRoutingError) as exc_info:
+        _route(router)
+    assert set(exc_info.value.errors) == {"apify", "dataforseo"}
+    assert router.stats.failures == {"apify": 1, "dataforseo": 1}
+
+
+def test_hedge_delay_tracks_primary_p95():
+    primary = StandInProvider("apify", [0.001] * 19 + [0.03])
+    secondary = StandInProvider("dataforseo", [])
+    router = HedgedSerpRouter(primary, secondary, initial_delay=1.0, min_delay=0.0, min_samples=20)
+    assert router.hedge_delay() == 1.0
+    _route(router, 20)
+    assert router.hedge_delay() < 0.03
+    assert secondary.calls == 0
+    router = HedgedSerpRouter(primary, secondary, initial_delay=1.0, min_delay=0.5, max_delay=2.0)
+    assert router.hedge_delay() == 1.0
+
+
+def test_fallback_reason_is_persisted():
+    conn = connect()
+    primary = StandInProvider("apify", [0.0], [RuntimeError("boom")])
+    [routed] = _route(HedgedSerpRouter(primary, StandInProvider("dataforseo", [0.0])))
+    store = SerpStore(conn)
+    [serp_id] = store.write([routed.result], "user_1", fallback_reason=[routed.fallback_reason])
+    store.write([routed.result], "user_1", serp_ids=[serp_id])
+    assert conn.execute("SELECT fallback_reason FROM serp_runs").fetchone() == ("apify_failed:boom",)
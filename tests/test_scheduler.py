@@ -0,0 +1,218 @@
+"""Tests for the heap-based watchlist scheduler."""
+
+import asyncio
+import json
+
+import pytest
+
+from serp_adapter.coalesce import CoalescedSerp
+from serp_adapter.scheduler import TokenBucket, WatchScheduler
+from tests.helpers import MIGRATIONS, connect
+
+NOW = 1745485200  # 2025-04-24 09:00 UTC
+DAY = 24 * 3600
+
+
+def _db(last_runs):
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0007_serp_watchlist.sql").read_text())
+    region = json.dumps({"country": "US", "language": "en", "city": "San Jose"})
+    for i, last_run_at in enumerate(last_runs):
+        conn.execute(
+            "INSERT INTO serp_watchlist (watch_id, user_id, phrase, region_json, device, created_at, updated_at, "
+            "last_run_at) VALUES (?, ?, ?, ?, 'mobile', 0, 0, ?)",
+            (f"w{i}", f"user_{i % 3}", f"phrase {i}", region, last_run_at),
+        )
+    conn.commit()
+    return conn
+
+
+class Clock:
+    def __init__(self, now=NOW):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    async def __call__(self, user_id, request):
+        self.calls.append((user_id, request.phrase))
+        await asyncio.sleep(0)
+        if request.phrase in self.fail:
+            raise RuntimeError("actor timed out")
+        return CoalescedSerp("key", f"serp:{request.phrase}", "fetched")
+
+
+def test_load_orders_by_next_due_and_skips_inactive():
+    conn = _db([None, (NOW - DAY + 60) * 1000, (NOW - 2 * DAY) * 1000, NOW * 1000])
+    conn.execute("UPDATE serp_watchlist SET active = 0 WHERE watch_id = 'w3'")
+    clock = Clock()
+    scheduler = WatchScheduler(conn, Recorder(), clock=clock)
+
+    assert scheduler.load() == 3
+    assert len(scheduler) == 3
+    assert scheduler.next_due() == 1  # Never run: due immediately
+    assert scheduler.pop_due(NOW) == [1, 3]  # rowids of w0, w2
+    assert scheduler.next_due() == NOW + 60
+    assert scheduler.pop_due(NOW + 59) == []
+    assert scheduler.pop_due(NOW + 60) == [2]
+    assert len(scheduler) == 0
+
+
+def test_run_once_dispatches_and_batches_status_updates():
+    conn = _db([None, None, (NOW - DAY) * 1000, NOW * 1000])
+    clock = Clock()
+    recorder = Recorder(fail={"phrase 1"})
+    scheduler = WatchScheduler(conn, recorder, flush_every=100, flush_interval=3600, clock=clock)
+    scheduler.load()
+
+    assert asyncio.run(scheduler.run_once()) == 3
+    assert sorted(recorder.calls) == [("user_0", "phrase 0"), ("user_1", "phrase 1"), ("user_2", "phrase 2")]
+    assert (scheduler.dispatched, scheduler.failed) == (3, 1)
+    rows = {
+        row[0]: row[1:]
+        for row in conn.execute(
+            "SELECT watch_id, last_run_at, last_serp_id, last_status, last_error, updated_at FROM serp_watchlist"
+        )
+    }
+    now_ms = NOW * 1000
+    assert rows["w0"] == (now_ms, "serp:phrase 0", "ok", None, now_ms)
+    assert rows["w1"] == (now_ms, None, "error", "RuntimeError: actor timed out", now_ms)
+    assert rows["w2"][2] == "ok"
+    assert rows["w3"] == (now_ms, None, None, None, 0)
+
+    # Successes come back after the interval, failures after the retry delay.
+    assert scheduler.next_due() == NOW + scheduler.retry_seconds
+    assert scheduler.pop_due(NOW + DAY) == [2, 1, 3, 4]
+
+
+def test_reschedule_supersedes_and_unschedule_drops():
+    conn = _db([NOW * 1000, NOW * 1000])
+    clock = Clock()
+    recorder = Recorder()
+    scheduler = WatchScheduler(conn, recorder, clock=clock)
+    scheduler.load()
+
+    assert scheduler.schedule("w1", due=NOW + 10)
+    assert not scheduler.schedule("missing")
+    scheduler.unschedule("w0")
+    assert len(scheduler) == 1
+    assert scheduler.next_due() == NOW + 10
+    assert scheduler.pop_due(NOW + 2 * DAY) == [2]  # Old entry for w1 is skipped
+
+    # Deactivated between scheduling and dispatch: not dispatched.
+    scheduler.schedule("w0")
+    conn.execute("UPDATE serp_watchlist SET active = 0 WHERE watch_id = 'w0'")
+    assert asyncio.run(scheduler.run_once()) == 0
+    assert recorder.calls == []
+
+
+def test_dispatch_is_rate_limited_per_provider():
+    conn = _db([None] * 12)
+    recorder = Recorder()
+    buckets = {"apify": TokenBucket(rate=100, burst=2), "dataforseo": TokenBucket(rate=1000, burst=6)}
+    scheduler = WatchScheduler(
+        conn,
+        recorder,
+        buckets=buckets,
+        provider_for=lambda watch: "apify" if int(watch.watch_id[1:]) % 2 else "dataforseo",
+    )
+    scheduler.load()
+
+    async def timed():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        count = await scheduler.run_once()
+        return count, loop.time() - started
+
+    count, elapsed = asyncio.run(timed())
+    assert count == 12
+    # Six apify dispatches with a burst of two need four refills at 100/s.
+    assert elapsed >= 0.035
+
+
+def test_only_max_in_flight_watches_are_materialized():
+    conn = _db([None] * 10)
+    release = asyncio.Event()
+    calls = []
+
+    async def dispatch(user_id, request):
+        calls.append(request.phrase)
+        await release.wait()
+        return "serp"
+
+    scheduler = WatchScheduler(conn, dispatch, max_in_flight=3, flush_interval=0.01)
+    scheduler.load()
+
+    async def main():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(scheduler.run(stop))
+        await asyncio.sleep(0.05)
+        # Three dispatches hold the slots; the other seven are still heap ints.
+        assert len(calls) == 3
+        dispatches = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_run_watch"]
+        assert len(dispatches) == 3
+        assert len(scheduler) == 7
+        release.set()
+        await asyncio.sleep(0.05)
+        stop.set()
+        await runner
+
+    asyncio.run(main())
+    assert len(calls) == 10
+
+
+def test_token_bucket_waiters_each_sleep_once(monkeypatch):
+    bucket = TokenBucket(rate=10, burst=1, clock=Clock(0.0))
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(round(delay, 6))
+        await real_sleep(0)
+
+    async def main():
+        monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+        await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+
+    asyncio.run(main())
+    # Each waiter reserves its own turn; nobody re-checks after a refill.
+    assert sleeps == [0.1, 0.2, 0.3]
+
+
+def test_token_bucket_reports_wait():
+    clock = Clock(0.0)
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.1)
+    clock.now = 0.1
+    assert bucket.try_acquire() == 0
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_run_dispatches_as_watches_come_due():
+    conn = _db([None, None])
+    recorder = Recorder()
+    scheduler = WatchScheduler(conn, recorder, flush_interval=0.01)
+    scheduler.load()
+
+    async def main():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(scheduler.run(stop))
+        await asyncio.sleep(0.05)
+        assert len(recorder.calls) == 2
+        scheduler.schedule("w0")  # Wakes the sleeping loop
+        await asyncio.sleep(0.05)
+        stop.set()
+        await runner
+
+    asyncio.run(main())
+    assert [call[1] for call in recorder.calls].count("phrase 0") == 2
+    assert conn.execute("SELECT COUNT(*) FROM serp_watchlist WHERE last_status = 'ok'").fetchone()[0] == 2
@@ -1,6 +1,12 @@
 """Tests for SERP archetype tagging."""
 
-from serp_adapter.serp_archetype import classify_domain, count_serp_archetypes
+import pytest
+
+from serp_adapter.serp_archetype import (
+    ArchetypeIndex,
+    classify_domain,
+    count_serp_archetypes,
+)
 
 
 def test_classify_directory_domain():
@@ -30,3 +36,38 @@ def test_count_serp_archetypes():
 def test_substring_false_positives_are_not_misclassified():
     assert classify_domain("forumshopping.com") == "local_service"
     assert classify_domain("restore.com") == "local_service"
+
+
+def test_subdomains_match_indexed_roots():
+    assert classify_domain("m.en.wikipedia.org") == "publisher"
+    assert classify_domain("smile.amazon.com") == "ecommerce"
+    assert classify_domain("notyelp.com") == "local_service"
+
+
+def test_index_precedence_directory_over_publisher_over_ecommerce():
+    index = ArchetypeIndex()
+    index.add("ecommerce", ["market.example"])
+    index.add("publisher", ["news.market.example"])
+    index.add("directory", ["market.example"])
+    assert index.match("market.example") == "directory"
+    assert index.match("a.news.market.example") == "directory"
+    assert index.match("other.example") is None
+
+
+def test_label_rules_keep_precedence_below_directory():
+    assert classify_domain("blog.yelp.com") == "directory"
+    assert classify_domain("store.reddit.com") == "publisher"
+    assert classify_domain("forum.amazon.com") == "publisher"
+
+
+def test_large_dictionary_lookup():
+    index = ArchetypeIndex()
+    index.add("directory", (f"listing{i}.com" for i in range(20_000)))
+    assert len(index) == 20_000
+    assert index.match("pros.listing19999.com") == "directory"
+    assert index.match("listing20000.com") is None
+
+
+def test_unknown_archetype_is_rejected():
+    with pytest.raises(ValueError):
+        ArchetypeIndex().add("local_service", ["x.com"])
@@ -0,0 +1,20 @@
+from pathlib import Path
+import sqlite3
+
+
+def apply_sql(conn: sqlite3.Connection, path: Path) -> None:
+    conn.executescript(path.read_text())
+
+
+def _pk(conn: sqlite3.Connection, table: str) -> list:
+    return [row[1] for row in sorted(conn.execute(f"PRAGMA table_info({table})"), key=lambda r: r[5]) if row[5]]
+
+
+def test_serp_archive_tables() -> None:
+    conn = sqlite3.connect(":memory:")
+    apply_sql(conn, Path("migrations/0034_serp_archive.sql"))
+    apply_sql(conn, Path("migrations/0034_serp_archive.sql"))  # Idempotent
+    assert _pk(conn, "serp_archive_blocks") == ["source", "series_key", "period"]
+    assert _pk(conn, "serp_archive_snapshots") == ["source", "serp_id"]
+    blocks = {row[1] for row in conn.execute("PRAGMA table_info(serp_archive_blocks)")}
+    assert {"n_snapshots", "n_rows", "data", "updated_at"} <= blocks
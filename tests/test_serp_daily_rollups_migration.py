@@ -0,0 +1,19 @@
+from pathlib import Path
+import sqlite3
+
+
+def apply_sql(conn: sqlite3.Connection, path: Path) -> None:
+    conn.executescript(path.read_text())
+
+
+def test_serp_daily_rollup_tables() -> None:
+    conn = sqlite3.connect(":memory:")
+    apply_sql(conn, Path("migrations/0032_serp_daily_rollups.sql"))
+    apply_sql(conn, Path("migrations/0032_serp_daily_rollups.sql"))  # Idempotent
+    latest = {row[1] for row in conn.execute("PRAGMA table_info(serp_daily_latest)")}
+    assert {"serp_key", "keyword_norm", "day", "serp_id", "created_at"} <= latest
+    best_pk = [row[1] for row in sorted(conn.execute("PRAGMA table_info(serp_daily_domain_best)"), key=lambda r: r[5]) if row[5]]
+    assert best_pk == ["keyword_norm", "region_key", "device_key", "day", "root_domain"]
+    indexes = {row[1] for row in conn.execute("SELECT type, name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_serp_daily_latest_series_day" in indexes
+    assert "idx_serp_daily_domain_best_domain_day" in indexes
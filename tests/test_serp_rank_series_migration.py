@@ -0,0 +1,18 @@
+from pathlib import Path
+import sqlite3
+
+
+def apply_sql(conn: sqlite3.Connection, path: Path) -> None:
+    conn.executescript(path.read_text())
+
+
+def test_serp_rank_series_table() -> None:
+    conn = sqlite3.connect(":memory:")
+    apply_sql(conn, Path("migrations/0033_serp_rank_series.sql"))
+    apply_sql(conn, Path("migrations/0033_serp_rank_series.sql"))  # Idempotent
+    pk = [row[1] for row in sorted(conn.execute("PRAGMA table_info(serp_rank_series)"), key=lambda r: r[5]) if row[5]]
+    assert pk == ["keyword_norm", "region_key", "device_key", "root_domain"]
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(serp_rank_series)")}
+    assert {"first_day", "last_day", "last_rank", "last_run_at", "tail", "n_points", "points"} <= columns
+    indexes = {row[1] for row in conn.execute("SELECT type, name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_serp_rank_series_domain" in indexes
@@ -0,0 +1,111 @@
+"""Tests for the volume-weighted share-of-voice engine."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource  # noqa: E402
+from serp_adapter.rollups import SerpRollups  # noqa: E402
+from serp_adapter.share_of_voice import (  # noqa: E402
+    DEFAULT_CTR_CURVE,
+    build_sov_input,
+    compute_share_of_voice,
+    load_sov_input,
+)
+from serp_adapter.store import SerpStore  # noqa: E402
+from tests.helpers import MIGRATIONS, connect  # noqa: E402
+
+CTR = (0.5, 0.3, 0.2)
+JAN1 = 1735689600
+
+
+def test_shares_are_volume_weighted_clicks():
+    data = build_sov_input(
+        ["site_a", "site_b"],
+        [("site_a", "kw1"), ("site_a", "kw2"), ("site_b", "kw2"), ("site_b", "kw3")],
+        {"kw1": 1000, "kw2": 100, "kw3": None},
+        [
+            ("kw1", "x.com", 1), ("kw1", "y.com", 2), ("kw1", "z.com", 3),
+            ("kw2", "y.com", 1), ("kw2", "x.com", 3), ("kw2", "w.com", 25),
+            ("kw3", "x.com", 1), ("other", "x.com", 1),
+        ],
+    )
+    sov = compute_share_of_voice(data, CTR)
+
+    # site_a: 1100 volume * 1.0 total CTR; x.com = 1000*.5 + 100*.2
+    a = {domain: (share, clicks) for domain, share, clicks in sov.for_group("site_a")}
+    assert a["x.com"] == (pytest.approx(520 / 1100), pytest.approx(520))
+    assert a["y.com"][1] == pytest.approx(1000 * 0.3 + 100 * 0.5)
+    assert a["w.com"] == (0.0, 0.0)  # Beyond the curve
+    # kw2 has no position 2 result: its 30 clicks go to nobody.
+    assert sum(share for share, _ in a.values()) == pytest.approx(1070 / 1100)
+    assert [row[0] for row in sov.for_group("site_a")][:2] == ["x.com", "y.com"]
+
+    # site_b: kw3 has no volume, so only kw2 counts.
+    b = {domain: share for domain, share, _ in sov.for_group("site_b")}
+    assert b == {"y.com": pytest.approx(0.5), "x.com": pytest.approx(0.2), "w.com": 0.0}
+    assert sov.total_clicks.tolist() == pytest.approx([1100.0, 100.0])
+
+
+def test_delta_between_days_shares_domain_ids():
+    groups = ["site_a"]
+    members = [("site_a", "kw1")]
+    today = build_sov_input(groups, members, {"kw1": 100}, [("kw1", "x.com", 1), ("kw1", "new.com", 2)])
+    before = build_sov_input(
+        groups, members, {"kw1": 100}, [("kw1", "old.com", 1), ("kw1", "x.com", 3)], vocabulary=today.vocabulary
+    )
+    change = compute_share_of_voice(today, CTR).delta(compute_share_of_voice(before, CTR))
+    rows = {domain: (share, delta) for domain, share, delta in change.for_group("site_a")}
+    assert rows["x.com"] == (pytest.approx(0.5), pytest.approx(0.3))
+    assert rows["old.com"] == (0.0, pytest.approx(-0.5))
+    assert rows["new.com"] == (pytest.approx(0.3), pytest.approx(0.3))
+    assert change.for_group("site_a")[0][0] in {"x.com", "old.com"}  # Largest moves first
+
+
+def _serp(phrase, ts, domains):
+    return NormalizedSerpResult(
+        query=phrase,
+        location=Location(country="US"),
+        device="desktop",
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(rank=rank, title="t", url=f"https://{d}/{rank}", domain=d, snippet=None)
+            for rank, d in enumerate(domains, start=1)
+        ],
+        source=SerpSource(provider="apify"),
+    )
+
+
+def test_load_from_keyword_sets_and_rollups():
+    conn = connect()
+    conn.executescript((MIGRATIONS / "0032_serp_daily_rollups.sql").read_text())
+    conn.execute("INSERT INTO sites (site_id, user_id, production_url) VALUES ('site_1', 'u1', 'https://callbighorn.com')")
+    conn.execute("INSERT INTO keyword_sets (id, site_id) VALUES ('set_1', 'site_1')")
+    for kw_id, phrase, volume in (("k1", "plumber san jose", 1000), ("k2", "drain cleaning", 500)):
+        conn.execute(
+            "INSERT INTO keywords (kw_id, user_id, phrase, region_json, created_at, keyword_set_id, keyword, keyword_norm) "
+            "VALUES (?, 'u1', ?, '{}', 0, 'set_1', ?, ?)",
+            (kw_id, phrase, phrase, phrase),
+        )
+        conn.execute("INSERT INTO keyword_metrics (keyword_id, volume_us) VALUES (?, ?)", (kw_id, volume))
+    store = SerpStore(conn, write_hooks=[SerpRollups()])
+    store.write(
+        [
+            _serp("plumber san jose", JAN1, ["www.callbighorn.com", "yelp.com"]),
+            _serp("drain cleaning", JAN1, ["yelp.com", "callbighorn.com"]),
+            _serp("plumber san jose", JAN1 + 86400, ["yelp.com", "callbighorn.com"]),
+        ],
+        "u1",
+    )
+
+    day1 = load_sov_input(conn, ["set_1"], day="2025-01-01")
+    day2 = load_sov_input(conn, ["set_1"], vocabulary=day1.vocabulary)
+    first = dict((d, s) for d, s, _ in compute_share_of_voice(day1).for_group("set_1"))
+    total = 1500 * sum(DEFAULT_CTR_CURVE)
+    assert first["callbighorn.com"] == pytest.approx((1000 * 0.319 + 500 * 0.158) / total)
+    change = dict(
+        (d, c) for d, _, c in compute_share_of_voice(day2).delta(compute_share_of_voice(day1)).for_group("set_1")
+    )
+    assert change["callbighorn.com"] == pytest.approx(-1000 * (0.319 - 0.158) / total)
+    assert change["yelp.com"] == pytest.approx(1000 * (0.319 - 0.158) / total)
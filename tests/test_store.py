@@ -0,0 +1,116 @@
+"""Tests for the bulk SERP persistence writer."""
+
+import hashlib
+import sqlite3
+
+import pytest
+
+from serp_adapter.batch import SerpResultBatch
+from serp_adapter.models import Location, NormalizedSerpResult, SerpResultItem, SerpSource
+from serp_adapter.store import SerpStore
+from tests.helpers import connect
+
+def _serp(query="Plumber  San Jose ", ts=1745485200, urls=("https://www.example.com/a", "https://yelp.com/b")):
+    return NormalizedSerpResult(
+        query=query,
+        location=Location(country="US", city="San Jose"),
+        device="mobile",
+        engine="google",
+        ts=ts,
+        results=[
+            SerpResultItem(
+                rank=i + 1,
+                title=f"T{i}",
+                url=url,
+                domain=url.split("/")[2].removeprefix("www."),
+                snippet="s",
+                root_domain="",
+            )
+            for i, url in enumerate(urls)
+        ],
+        source=SerpSource(provider="apify", actor="apify/google-search-scraper", run_id="run1"),
+    )
+
+
+def test_write_populates_all_tables_with_worker_keys():
+    conn = connect()
+    store = SerpStore(conn)
+    [serp_id] = store.write([_serp()], user_id="user_1", parser_version="apify-google-v1")
+    assert serp_id.startswith("serp_")
+
+    run = conn.execute(
+        "SELECT phrase, region_json, keyword_norm, region_key, device_key, serp_key, created_at, provider, run_id, geo_key "
+        "FROM serp_runs WHERE serp_id = ?",
+        (serp_id,),
+    ).fetchone()
+    expected_key = hashlib.sha256(b"plumber san jose|US-en|mobile|2025-04-24").hexdigest()
+    assert run == (
+        "Plumber  San Jose ",
+        '{"country":"US","city":"San Jose"}',
+        "plumber san jose",
+        "US-en",
+        "mobile",
+        expected_key,
+        1745485200000,
+        "apify",
+        "run1",
+        "us",
+    )
+
+    rows = conn.execute(
+        "SELECT rank, url_hash, domain, root_domain FROM serp_results WHERE serp_id = ? ORDER BY rank", (serp_id,)
+    ).fetchall()
+    assert rows[0] == (
+        1,
+        hashlib.sha256(b"https://www.example.com/a").hexdigest(),
+        "example.com",
+        "example.com",
+    )
+    mapped = conn.execute(
+        "SELECT m.rank, u.url FROM serp_result_url_map m JOIN urls u ON u.id = m.url_id "
+        "WHERE m.serp_id = ? ORDER BY m.rank",
+        (serp_id,),
+    ).fetchall()
+    assert mapped == [(1, "https://www.example.com/a"), (2, "https://yelp.com/b")]
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_urls_are_shared_and_rewrites_are_idempotent():
+    conn = connect()
+    store = SerpStore(conn)
+    batch = SerpResultBatch.from_results([_serp(), _serp(query="drain cleaning")])
+    ids = store.write(batch, user_id="user_1")
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM serp_results").fetchone()[0] == 4
+
+    store.write(
+        [_serp(urls=("https://other.org/x",)), _serp(query="drain cleaning")],
+        user_id="user_1",
+        serp_ids=ids,
+        parser_version="v2",
+    )
+    assert conn.execute("SELECT COUNT(*) FROM serp_runs").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 3
+    assert conn.execute(
+        "SELECT url FROM serp_results WHERE serp_id = ? AND rank = 1", (ids[0],)
+    ).fetchone() == ("https://other.org/x",)
+    assert {r[0] for r in conn.execute("SELECT parser_version FROM serp_runs")} == {"v2"}
+
+
+def test_failed_batch_rolls_back():
+    conn = connect()
+    store = SerpStore(conn)
+    with pytest.raises(sqlite3.IntegrityError):
+        store.write([_serp(), _serp()], user_id="user_1", serp_ids=["serp_a", "serp_a"], status=None)
+    assert conn.execute("SELECT COUNT(*) FROM serp_runs").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0] == 0
+
+
+def test_path_connections_use_wal(tmp_path):
+    db = tmp_path / "serp.sqlite"
+    connect(str(db)).close()
+    with SerpStore(db) as store:
+        assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        store.write([_serp()], user_id="user_1")
+    check = sqlite3.connect(db)
+    assert check.execute("SELECT COUNT(*) FROM serp_results").fetchone()[0] == 2
@@ -0,0 +1,80 @@
+"""Tests for streaming dataset normalization."""
+
+import gzip
+import io
+import json
+
+import pytest
+
+from serp_adapter.adapters.apify import ApifyGoogleSearchAdapter
+from serp_adapter.streaming import iter_json_items
+from tests.helpers import APIFY_RAW_ITEM
+
+
+def _item(term):
+    return {**APIFY_RAW_ITEM, "searchQuery": {**APIFY_RAW_ITEM["searchQuery"], "term": term}}
+
+
+ITEMS = [_item(f"kw {i}") for i in range(5)]
+
+
+@pytest.fixture()
+def adapter():
+    return ApifyGoogleSearchAdapter()
+
+
+def test_json_array_file(adapter, tmp_path):
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps(ITEMS, indent=2))
+    results = list(adapter.iter_normalize(path))
+    assert [r.query for r in results] == [f"kw {i}" for i in range(5)]
+
+
+def test_jsonl_file(adapter, tmp_path):
+    path = tmp_path / "dataset.jsonl"
+    path.write_text("\n".join(json.dumps(item) for item in ITEMS) + "\n")
+    results = list(adapter.iter_normalize(path))
+    assert [r.query for r in results] == [f"kw {i}" for i in range(5)]
+
+
+def test_gzip_path(adapter, tmp_path):
+    path = tmp_path / "dataset.json.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as fh:
+        json.dump(ITEMS, fh)
+    assert len(list(adapter.iter_normalize(path))) == 5
+
+
+def test_binary_stream_is_left_open(adapter):
+    stream = io.BytesIO(json.dumps(ITEMS).encode("utf-8"))
+    assert len(list(adapter.iter_normalize(stream))) == 5
+    assert not stream.closed
+
+
+def test_items_straddling_read_chunks(monkeypatch):
+    import serp_adapter.streaming as streaming
+
+    monkeypatch.setattr(streaming, "_CHUNK_SIZE", 7)
+    data = [{"n": 12345}, 678, "text, with ] brackets", [1, [2]], {}]
+    assert list(iter_json_items(io.StringIO(" [ " + json.dumps(data)[1:]))) == data
+
+
+def test_empty_array_and_empty_source():
+    assert list(iter_json_items(io.StringIO("[ ]"))) == []
+    assert list(iter_json_items(io.StringIO(""))) == []
+
+
+def test_bad_items_are_reported_without_aborting(adapter):
+    lines = [json.dumps(ITEMS[0]), "{not json", json.dumps([1, 2]), json.dumps(ITEMS[1])]
+    errors = []
+    results = list(adapter.iter_normalize(io.StringIO("\n".join(lines)), on_error=errors.append))
+
+    assert [r.query for r in results] == ["kw 0", "kw 1"]
+    assert [e.index for e in errors] == [1, 2]
+    assert errors[0].error.startswith("JSONDecodeError")
+    assert errors[1].error.startswith("TypeError")
+    assert errors[1].raw == [1, 2]
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(iter_json_items(io.StringIO('[{"a": 1}, {"b"')))